@@ -92,7 +92,7 @@ Gleba = None
 
 try:
     from app.utils.utils import (
-        allowed_file, validate_kml_content, sanitize_user_input, 
+        allowed_file, validate_kml_file, sanitize_user_input, 
         create_safe_path, log_security_event
     )
     UTILS_AVAILABLE = True
@@ -115,6 +115,11 @@ except ImportError:
         except Exception as e:
             return False, f"Erro ao validar KML: {str(e)}"
     
+    def validate_kml_file(path):
+        with open(path, encoding='utf-8', newline='') as source:
+            is_valid, result = validate_kml_content(source.read())
+        return (True, "ok") if is_valid else (False, result)
+    
     def sanitize_user_input(input_text):
         if not input_text:
             return ""
@@ -128,6 +133,23 @@ except ImportError:
     def log_security_event(event_type, message, user=None):
         print(f"SECURITY [{event_type}]: {message}")
 
+try:
+    from app.services.gleba_summary import (
+        GlebaSummaryTracker, ensure_summary_table, get_gleba_summary
+    )
+    GLEBA_SUMMARY_AVAILABLE = True
+except ImportError:
+    GLEBA_SUMMARY_AVAILABLE = False
+
+from app.assets.manifest import IMMUTABLE_CACHE_CONTROL, init_assets, send_asset
+from app.assets.bundler import register_bundles
+from app.assets.vendor import init_vendor
+from app.services.render_cache import init_render_cache, prerender_shells, render_shell
+from app.services.shared_cache import init_shared_cache, register_tag_invalidation
+from app.utils.kmz_reader import MAX_UNCOMPRESSED_BYTES as KMZ_MAX_UNCOMPRESSED_BYTES, check_kmz, save_kmz_assets
+
+KMZ_MIMETYPE = 'application/vnd.google-earth.kmz'
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -170,9 +192,14 @@ def create_app(config_name='default'):
     print(f"[DEBUG] Template existe: {os.path.exists(template_dir)}")
     print(f"[DEBUG] Static existe: {os.path.exists(static_dir)}")
     
+    # static_folder=None: /static é servido por static_files (cache por hash)
     app = Flask(__name__, 
                 template_folder=template_dir,
-                static_folder=static_dir)
+                static_folder=None)
+    assets = init_assets(app, static_dir)
+    register_bundles(assets)
+    init_vendor(app, assets)
+    init_render_cache(app)
     
     print("[DEBUG] App Flask criado com caminhos absolutos")
     
@@ -180,6 +207,9 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     print("[DEBUG] Configuracao aplicada")
     
+    # Cache compartilhado entre workers (LRU local + SQLite/Redis)
+    shared_cache = init_shared_cache(app)
+    
     # Corrigir caminho do banco para usar instance folder
     db_uri = app.config.get('SQLALCHEMY_DATABASE_URI')
     if db_uri and 'sqlite:///' in db_uri and not db_uri.startswith('sqlite:////'):
@@ -444,61 +474,24 @@ def create_app(config_name='default'):
     # Rota principal - redireciona para login se não autenticado
     @app.route('/')
     def index():
-        print(f"[DEBUG] ===== INICIANDO FUNÇÃO INDEX =====")
-        try:
-            print(f"[DEBUG] Verificando autenticação...")
-            # Verificar se o usuário está autenticado
-            is_authenticated = False
-            if FLASK_LOGIN_AVAILABLE:
-                print(f"[DEBUG] FLASK_LOGIN_AVAILABLE: True")
-                try:
-                    is_authenticated = current_user.is_authenticated
-                    print(f"[DEBUG] current_user.is_authenticated: {is_authenticated}")
-                except Exception as auth_err:
-                    print(f"[DEBUG] Erro verificando current_user: {auth_err}")
-                    is_authenticated = False
-            else:
-                print(f"[DEBUG] FLASK_LOGIN_AVAILABLE: False")
-            
-            print(f"[DEBUG] is_authenticated final: {is_authenticated}")
-            
-            # Se não estiver autenticado, redirecionar para login
-            if not is_authenticated:
-                print(f"[DEBUG] Não autenticado - redirecionando para login")
-                return redirect(url_for('login'))
-            
-            print(f"[DEBUG] Usuário autenticado - carregando template principal")
-            
-            # Se autenticado, tentar carregar template principal
+        is_authenticated = False
+        if FLASK_LOGIN_AVAILABLE:
             try:
-                print(f"[DEBUG] Tentando carregar template index.html")
-                print(f"[DEBUG] Template folder: {app.template_folder}")
-                
-                # Verificar se o template existe
-                template_path = os.path.join(app.template_folder, 'index.html')
-                print(f"[DEBUG] Caminho completo do template: {template_path}")
-                print(f"[DEBUG] Template existe: {os.path.exists(template_path)}")
-                
-                # Listar arquivos no diretório templates para debug
-                try:
-                    templates_files = os.listdir(app.template_folder)
-                    print(f"[DEBUG] Arquivos em templates/: {templates_files}")
-                except Exception as list_err:
-                    print(f"[DEBUG] Erro listando templates: {list_err}")
-                
-                # Tentar renderizar
-                print(f"[DEBUG] Chamando render_template('index.html')...")
-                result = render_template('index.html')
-                print(f"[DEBUG] render_template executado com sucesso, tamanho: {len(result)} chars")
-                return result
-                
-            except Exception as e:
-                print(f"[ERROR] Falha ao carregar template index.html: {str(e)}")
-                print(f"[ERROR] Tipo do erro: {type(e).__name__}")
-                import traceback
-                print(f"[ERROR] Traceback: {traceback.format_exc()}")
-                # Fallback se template não existir
-                return """
+                is_authenticated = current_user.is_authenticated
+            except Exception as auth_err:
+                app.logger.warning(f'Erro verificando autenticação: {auth_err}')
+        
+        # Se não estiver autenticado, redirecionar para login
+        if not is_authenticated:
+            return redirect(url_for('login'))
+        
+        try:
+            # Esqueleto pré-renderizado + dados do usuário (ETag/304)
+            return render_shell('index.html', current_user)
+        except Exception as e:
+            app.logger.error(f'Erro renderizando index.html: {e}')
+            # Fallback se template não puder ser renderizado
+            return """
                     <!DOCTYPE html>
                     <html>
                     <head>
@@ -531,35 +524,18 @@ def create_app(config_name='default'):
                     </body>
                     </html>
                     """
-        except Exception as outer_e:
-            print(f"[ERROR] Exceção no nível mais alto da função index: {str(outer_e)}")
-            import traceback
-            print(f"[ERROR] Traceback completo: {traceback.format_exc()}")
-            # Fallback completo se tudo falhar
-            return """
-            <!DOCTYPE html>
-            <html>
-            <head><title>WEBAG Professional</title></head>
-            <body style="font-family: Arial; padding: 40px; text-align: center;">
-                <h1>🚀 WEBAG Professional</h1>
-                <h2>✅ Sistema Online!</h2>
-                <p><a href="/login" style="background: #3498db; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Fazer Login</a></p>
-                <p><a href="/api/health">API Health Check</a></p>
-            </body>
-            </html>
-            """
     
     # Rota para o sistema principal (protegida)
     @app.route('/webgis')
     @login_required
     def webgis():
-        return render_template('index.html')
+        return render_shell('index.html', current_user)
     
     # Rota para sistema de glebas com ferramentas geojson.io
     @app.route('/glebas')
     @login_required
     def glebas():
-        return render_template('webgis_glebas.html')
+        return render_shell('webgis_glebas.html', current_user)
     
     # Rota de teste visual
     @app.route('/test')
@@ -596,7 +572,8 @@ def create_app(config_name='default'):
             'status': 'healthy',
             'timestamp': datetime.now().isoformat(),
             'database': True,
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'cache': shared_cache.stats()
         })
 
     # API para dados geográficos
@@ -981,35 +958,86 @@ def create_app(config_name='default'):
             log_security_event('invalid_file_type', f'Usuário {current_user.username} tentou enviar arquivo inválido: {file.filename}')
             return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
         
+        if file.filename.lower().endswith('.kmz'):
+            return upload_kmz(file)
+        
+        # Salvar arquivo de forma segura
+        upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], current_user.username)
+        os.makedirs(upload_dir, exist_ok=True)
+        safe_path = create_safe_path(upload_dir, file.filename)
+        temp_path = safe_path + '.part'
+        
         try:
-            # Ler e validar conteúdo
-            content = file.read().decode('utf-8')
-            is_valid, result = validate_kml_content(content)
+            # Gravado em disco em blocos e validado em streaming antes de decodificar
+            file.save(temp_path)
+            is_valid, result = validate_kml_file(temp_path)
             
             if not is_valid:
                 log_security_event('invalid_kml', f'Usuário {current_user.username} enviou KML inválido')
+                os.remove(temp_path)
                 return jsonify({'error': result}), 400
             
-            # Salvar arquivo de forma segura
-            upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], current_user.username)
-            os.makedirs(upload_dir, exist_ok=True)
+            os.replace(temp_path, safe_path)
+            
+            log_security_event('file_uploaded', f'Usuário {current_user.username} fez upload de {file.filename}')
+            
+            return jsonify({
+                'success': True,
+                'filename': os.path.basename(safe_path),
+                'message': 'Arquivo enviado com sucesso'
+            })
             
-            safe_path = create_safe_path(upload_dir, file.filename)
-            with open(safe_path, 'w', encoding='utf-8') as f:
-                f.write(result)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            log_security_event('upload_error', f'Erro no upload: {str(e)}')
+            return jsonify({'error': 'Erro ao processar arquivo'}), 500
+    
+    def kmz_asset_dir():
+        return app.config.get('KMZ_ASSET_FOLDER') or os.path.join(app.config['UPLOAD_FOLDER'], 'kmz_assets')
+    
+    def upload_kmz(file):
+        """KMZ: gravado em disco em blocos e validado lendo o doc.kml em streaming"""
+        max_bytes = app.config.get('KMZ_MAX_UNCOMPRESSED', KMZ_MAX_UNCOMPRESSED_BYTES)
+        upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], current_user.username)
+        os.makedirs(upload_dir, exist_ok=True)
+        safe_path = create_safe_path(upload_dir, file.filename)
+        temp_path = safe_path + '.part'
+        
+        try:
+            file.save(temp_path)
+            is_valid, message, feature_count = check_kmz(temp_path, max_bytes)
+            if not is_valid:
+                log_security_event('invalid_kmz', f'Usuário {current_user.username} enviou KMZ inválido: {message}')
+                os.remove(temp_path)
+                return jsonify({'error': message}), 400
             
+            assets = save_kmz_assets(temp_path, kmz_asset_dir(), max_bytes)
+            os.replace(temp_path, safe_path)
             log_security_event('file_uploaded', f'Usuário {current_user.username} fez upload de {file.filename}')
             
             return jsonify({
                 'success': True,
                 'filename': os.path.basename(safe_path),
+                'features': feature_count,
+                'assets': {name: url_for('serve_kmz_asset', asset=relative) for name, relative in assets.items()},
                 'message': 'Arquivo enviado com sucesso'
             })
             
         except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             log_security_event('upload_error', f'Erro no upload: {str(e)}')
             return jsonify({'error': 'Erro ao processar arquivo'}), 500
     
+    # Assets de KMZ (ícones, imagens de overlays): nome = sha256 do conteúdo
+    @app.route('/api/kmz-assets/<path:asset>')
+    @login_required
+    def serve_kmz_asset(asset):
+        response = send_from_directory(kmz_asset_dir(), asset)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+    
     # API para servir arquivos KML
     @app.route('/api/files/<path:filename>')
     @login_required
@@ -1027,7 +1055,7 @@ def create_app(config_name='default'):
             return send_from_directory(
                 os.path.dirname(file_path),
                 os.path.basename(file_path),
-                mimetype='application/vnd.google-earth.kml+xml'
+                mimetype=KMZ_MIMETYPE if file_path.lower().endswith('.kmz') else 'application/vnd.google-earth.kml+xml'
             )
             
         except ValueError:
@@ -1149,6 +1177,30 @@ def create_app(config_name='default'):
                 'properties': properties
             }
 
+    # Resumo agregado (bairro/quadra) mantido a cada create/update/delete
+    gleba_summary_tracker = None
+    if GLEBA_SUMMARY_AVAILABLE:
+        gleba_summary_tracker = GlebaSummaryTracker({
+            'bairro': 'bairro',
+            'quadra': 'quadra',
+            'area': 'area'
+        }, scope_field='created_by')
+        gleba_summary_tracker.register(Gleba)
+        
+        with app.app_context():
+            try:
+                from sqlalchemy import inspect
+                with db.engine.begin() as conn:
+                    created = ensure_summary_table(conn)
+                    if created and inspect(conn).has_table(Gleba.__tablename__):
+                        total = gleba_summary_tracker.rebuild(conn, Gleba.__tablename__)
+                        logger.info(f"[DATABASE] Resumo de glebas reconstruído ({total} glebas)")
+            except Exception as e:
+                logger.error(f"[DATABASE] ERRO preparando resumo de glebas: {e}")
+
+    # Listagens de glebas em cache por usuário, invalidadas a cada alteração
+    register_tag_invalidation(Gleba, shared_cache, lambda gleba: [f'glebas:{gleba.created_by}'])
+
     # ==================== APIs DE GLEBAS ====================
     
     @app.route('/api/glebas', methods=['GET'])
@@ -1159,10 +1211,15 @@ def create_app(config_name='default'):
             if not SQLALCHEMY_AVAILABLE:
                 return jsonify({'error': 'Banco de dados não disponível'}), 500
             
-            glebas = Gleba.query.filter_by(created_by=current_user.username).order_by(Gleba.created_at.desc()).all()
+            def load_glebas():
+                glebas = Gleba.query.filter_by(created_by=current_user.username).order_by(Gleba.created_at.desc()).all()
+                return [gleba.to_dict() for gleba in glebas]
+            
+            glebas = shared_cache.get_or_set(f'glebas:list:{current_user.username}', load_glebas,
+                                             tags=[f'glebas:{current_user.username}'])
             
             return jsonify({
-                'glebas': [gleba.to_dict() for gleba in glebas],
+                'glebas': glebas,
                 'total': len(glebas),
                 'message': 'Glebas carregadas com sucesso'
             })
@@ -1371,6 +1428,28 @@ def create_app(config_name='default'):
             app.logger.error(f'Erro exportando glebas: {str(e)}')
             return jsonify({'error': 'Erro interno do servidor'}), 500
     
+    @app.route('/api/glebas/summary', methods=['GET'])
+    @login_required
+    def get_glebas_summary():
+        """Obter totais de glebas agrupados por bairro ou quadra"""
+        try:
+            if not SQLALCHEMY_AVAILABLE or not gleba_summary_tracker:
+                return jsonify({'error': 'Banco de dados não disponível'}), 500
+            
+            group_by = request.args.get('group_by', 'bairro')
+            if group_by not in gleba_summary_tracker.dimensions:
+                return jsonify({
+                    'error': f'Agrupamento inválido: {group_by}',
+                    'available': gleba_summary_tracker.dimensions
+                }), 400
+            
+            summary = get_gleba_summary(db.session.connection(), current_user.username, group_by)
+            return jsonify(summary)
+            
+        except Exception as e:
+            app.logger.error(f'Erro obtendo resumo de glebas: {str(e)}')
+            return jsonify({'error': 'Erro interno do servidor'}), 500
+    
     # ==================== CÁLCULOS AUTOMÁTICOS ====================
     
     def calculate_polygon_sides(coordinates):
@@ -1545,12 +1624,9 @@ def create_app(config_name='default'):
     # Servir arquivos estáticos
     @app.route('/static/<path:filename>')
     def static_files(filename):
-        response = send_from_directory('static', filename)
-        # Adicionar headers para evitar cache
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+        # Caminhos com hash (static/dist): cache imutável e variante .br/.gz;
+        # demais arquivos revalidam a cada request
+        return send_asset(assets, filename)
     
     # Rota para favicon
     @app.route('/favicon.ico')
@@ -1595,6 +1671,13 @@ def create_app(config_name='default'):
     if init_users:
         init_users()
     
+    # Pré-renderizar as páginas do mapa (uma vez por worker/deploy)
+    if not app.debug and not app.testing:
+        try:
+            prerender_shells(app, app.config.get('RENDER_CACHE_ROLES', ('superuser', 'admin', 'user')))
+        except Exception as e:
+            app.logger.error(f'Erro pré-renderizando páginas: {e}')
+    
     print(f"[DEBUG] create_app finalizado com {len(app.url_map._rules)} rotas")
     return app
 
@@ -6,20 +6,43 @@ APIs REST avançadas para gestão robusta de camadas
 import os
 import json
 from datetime import datetime
+from functools import wraps
 from typing import Dict, List, Any, Optional
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context, url_for
 from werkzeug.exceptions import BadRequest, NotFound, Forbidden
+from werkzeug.utils import secure_filename
 
 # Imports do sistema enhanced
 try:
     from app.models.enhanced_models import (
         db, Organization, User, Project, LayerGroup, Layer, Feature, 
-        Gleba, AuditLog, LayerVersion, LayerType, GeometryType, StatusType
+        Gleba, AuditLog, LayerVersion, ImportJob, UploadSession, LayerType, GeometryType, StatusType
     )
     ENHANCED_MODELS_AVAILABLE = True
 except ImportError:
     ENHANCED_MODELS_AVAILABLE = False
 
+from app.services.gleba_summary import get_gleba_summary, SUMMARY_DIMENSIONS
+from app.services.layer_statistics import get_cached_layer_statistics
+from app.services.layer_versioning import diff_versions, rollback_to_version
+from app.services.extents import get_layer_extents
+from app.services.audit_writer import build_audit_event, get_audit_writer
+from app.services.audit_log import encode_cursor, decode_cursor, parse_timestamp, clamp_page_size
+from app.services.layer_features import (
+    MAX_FEATURE_BATCH, STREAM_CHUNK_SIZE, parse_bbox, parse_property_filters, clamp_feature_page_size,
+    parse_feature_input, validate_feature_update, stream_feature_collection, prefetch
+)
+from app.services.bulk_loader import MAX_BULK_FEATURES, bulk_load_features
+from app.services.access import AccessResolver, get_access_resolver
+from app.services.shared_cache import get_shared_cache
+from app.services.import_jobs import IMPORT_EXTENSIONS, ImportJobQueue, get_import_jobs, import_folder, job_progress
+from app.services.chunked_uploads import (
+    ChunkedUploads, OffsetMismatch, UploadBusy, UploadError, get_chunked_uploads, upload_progress
+)
+
+if ENHANCED_MODELS_AVAILABLE:
+    from app.api.serializers import LAYER_LIST, LAYER_DETAIL, LAYER_VERSION_LIST
+
 # Imports para autenticação
 try:
     from flask_login import login_required, current_user
@@ -35,38 +58,45 @@ layer_api = Blueprint('layer_api', __name__, url_prefix='/api/v2')
 
 def requires_auth(f):
     """Decorator para autenticação"""
+    @wraps(f)
     def decorated_function(*args, **kwargs):
         if not FLASK_LOGIN_AVAILABLE or not current_user.is_authenticated:
             return jsonify({'error': 'Authentication required'}), 401
         return f(*args, **kwargs)
     return decorated_function
 
+def _access() -> AccessResolver:
+    """Resolver de acesso do request (projetos/camadas da organização do usuário)"""
+    return get_access_resolver(request.environ, db.session.connection, current_user)
+
+def _find_project(project_id: str):
+    """Projeto da organização do usuário (ou None)"""
+    if not _access().can_access_project(project_id):
+        return None
+    return db.session.get(Project, project_id)
+
+def _find_layer(layer_id: str, *options):
+    """Camada da organização do usuário (ou None), sem join a cada verificação"""
+    if not _access().can_access_layer(layer_id):
+        return None
+    if options:
+        return Layer.query.options(*options).filter(Layer.id == layer_id).first()
+    return db.session.get(Layer, layer_id)
+
 def log_action(action: str, resource_type: str, resource_id: str, 
                old_values: Dict = None, new_values: Dict = None):
-    """Log de auditoria"""
+    """Log de auditoria (enfileirado; gravado em lote fora da transação do request)"""
     if not ENHANCED_MODELS_AVAILABLE:
         return
     
     try:
-        changed_fields = []
-        if old_values and new_values:
-            changed_fields = [k for k in new_values.keys() 
-                            if k in old_values and old_values[k] != new_values[k]]
-        
-        audit_log = AuditLog(
-            table_name=resource_type,
-            record_id=resource_id,
-            operation=action,
-            old_values=old_values,
-            new_values=new_values,
-            changed_fields=changed_fields,
+        event = build_audit_event(
+            action, resource_type, resource_id, old_values, new_values,
             user_id=current_user.id if FLASK_LOGIN_AVAILABLE and current_user.is_authenticated else None,
             user_ip=request.remote_addr,
             user_agent=request.headers.get('User-Agent')
         )
-        
-        db.session.add(audit_log)
-        db.session.commit()
+        get_audit_writer(current_app._get_current_object(), db, AuditLog.__table__).enqueue(event)
         
     except Exception as e:
         current_app.logger.error(f"Erro no log de auditoria: {e}")
@@ -81,37 +111,13 @@ def get_layer_groups(project_id: str):
     """Obter grupos de camadas de um projeto"""
     try:
         # Verificar se projeto existe e usuário tem acesso
-        project = Project.query.filter_by(
-            id=project_id,
-            organization_id=current_user.organization_id
-        ).first()
+        project = _find_project(project_id)
         
         if not project:
             return jsonify({'error': 'Projeto não encontrado'}), 404
         
-        # Obter grupos hierárquicos
-        groups = LayerGroup.query.filter_by(
-            project_id=project_id,
-            parent_group_id=None
-        ).order_by(LayerGroup.display_order).all()
-        
-        def build_group_tree(group):
-            """Construir árvore hierárquica de grupos"""
-            children = LayerGroup.query.filter_by(
-                parent_group_id=group.id
-            ).order_by(LayerGroup.display_order).all()
-            
-            layers = Layer.query.filter_by(
-                layer_group_id=group.id
-            ).order_by(Layer.display_order).all()
-            
-            return {
-                **group.to_dict(),
-                'children': [build_group_tree(child) for child in children],
-                'layers': [layer.to_dict() for layer in layers]
-            }
-        
-        result = [build_group_tree(group) for group in groups]
+        # Obter grupos hierárquicos (grupos e camadas em duas consultas)
+        result = LayerGroup.build_project_tree(project_id)
         
         return jsonify({
             'layer_groups': result,
@@ -137,16 +143,13 @@ def create_layer_group(project_id: str):
             return jsonify({'error': 'Nome do grupo é obrigatório'}), 400
         
         # Verificar projeto
-        project = Project.query.filter_by(
-            id=project_id,
-            organization_id=current_user.organization_id
-        ).first()
+        project = _find_project(project_id)
         
         if not project:
             return jsonify({'error': 'Projeto não encontrado'}), 404
         
         # Verificar permissões
-        if not current_user.has_privilege('canManageLayers'):
+        if not _access().has_privilege('canManageLayers'):
             return jsonify({'error': 'Sem permissão para gerenciar camadas'}), 403
         
         # Criar grupo
@@ -195,7 +198,7 @@ def update_layer_group(group_id: str):
             return jsonify({'error': 'Grupo não encontrado'}), 404
         
         # Verificar permissões
-        if not current_user.has_privilege('canManageLayers'):
+        if not _access().has_privilege('canManageLayers'):
             return jsonify({'error': 'Sem permissão para gerenciar camadas'}), 403
         
         # Salvar valores antigos para auditoria
@@ -241,7 +244,7 @@ def delete_layer_group(group_id: str):
             return jsonify({'error': 'Grupo não encontrado'}), 404
         
         # Verificar permissões
-        if not current_user.has_privilege('canDeleteLayers'):
+        if not _access().has_privilege('canDeleteLayers'):
             return jsonify({'error': 'Sem permissão para deletar'}), 403
         
         # Verificar se tem layers ou subgrupos
@@ -280,10 +283,7 @@ def get_layers(project_id: str):
     """Obter camadas de um projeto"""
     try:
         # Verificar projeto
-        project = Project.query.filter_by(
-            id=project_id,
-            organization_id=current_user.organization_id
-        ).first()
+        project = _find_project(project_id)
         
         if not project:
             return jsonify({'error': 'Projeto não encontrado'}), 404
@@ -312,17 +312,16 @@ def get_layers(project_id: str):
         if group_id:
             query = query.filter_by(layer_group_id=group_id)
         
-        # Ordenação
-        layers = query.order_by(Layer.display_order, Layer.name).all()
+        # Ordenação (grupo e criador carregados na mesma consulta)
+        layers = query.options(*LAYER_LIST.options()).order_by(Layer.display_order, Layer.name).all()
         
         # Serializar com informações adicionais
-        result = []
-        for layer in layers:
-            layer_dict = layer.to_dict()
-            layer_dict['feature_count'] = layer.feature_count
-            layer_dict['group_name'] = layer.layer_group.name if layer.layer_group else None
-            layer_dict['creator_name'] = layer.creator.full_name if layer.creator else None
-            result.append(layer_dict)
+        result = LAYER_LIST.dump_many(layers)
+        
+        # Extensões atualizadas (recalcula apenas as marcadas como sujas)
+        extents = get_layer_extents(db.engine, [layer['id'] for layer in result])
+        for layer_dict in result:
+            layer_dict['bbox_coordinates'] = extents.get(layer_dict['id'])
         
         return jsonify({
             'layers': result,
@@ -355,16 +354,13 @@ def create_layer(project_id: str):
                 return jsonify({'error': f'Campo obrigatório: {field}'}), 400
         
         # Verificar projeto
-        project = Project.query.filter_by(
-            id=project_id,
-            organization_id=current_user.organization_id
-        ).first()
+        project = _find_project(project_id)
         
         if not project:
             return jsonify({'error': 'Projeto não encontrado'}), 404
         
         # Verificar permissões
-        if not current_user.has_privilege('canAddNewLayers'):
+        if not _access().has_privilege('canAddNewLayers'):
             return jsonify({'error': 'Sem permissão para criar camadas'}), 403
         
         # Validar tipo de camada
@@ -449,50 +445,29 @@ def create_layer(project_id: str):
 def get_layer(layer_id: str):
     """Obter detalhes de uma camada específica"""
     try:
-        # Buscar camada
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        # Buscar camada (grupo e criador carregados na mesma consulta)
+        layer = _find_layer(layer_id, *LAYER_DETAIL.options())
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
         
         # Verificar se é pública ou se usuário tem acesso
-        if not layer.is_public and not current_user.has_privilege('canViewAllData'):
+        if not layer.is_public and not _access().has_privilege('canViewAllData'):
             return jsonify({'error': 'Sem permissão para visualizar esta camada'}), 403
         
-        # Obter informações detalhadas
-        layer_dict = layer.to_dict()
+        # Obter informações detalhadas (inclui grupo e criador)
+        layer_dict = LAYER_DETAIL.dump(layer)
+        layer_dict['bbox_coordinates'] = get_layer_extents(db.engine, [layer.id]).get(layer.id)
         
         # Adicionar estatísticas
+        stats = get_cached_layer_statistics(db.session, layer, get_shared_cache(current_app))
         layer_dict['statistics'] = {
             'feature_count': layer.feature_count,
-            'active_features': Feature.query.filter_by(
-                layer_id=layer_id, 
-                status=StatusType.ACTIVE, 
-                is_current=True
-            ).count(),
+            'active_features': stats['active_features'],
             'last_updated': layer.updated_at.isoformat() if layer.updated_at else None,
-            'version_count': layer.versions.count()
+            'version_count': stats['version_count']
         }
         
-        # Adicionar informações do grupo
-        if layer.layer_group:
-            layer_dict['group'] = {
-                'id': layer.layer_group.id,
-                'name': layer.layer_group.name,
-                'description': layer.layer_group.description
-            }
-        
-        # Adicionar informações do criador
-        if layer.creator:
-            layer_dict['creator'] = {
-                'id': layer.creator.id,
-                'name': layer.creator.full_name,
-                'username': layer.creator.username
-            }
-        
         return jsonify({
             'layer': layer_dict
         })
@@ -511,10 +486,7 @@ def update_layer(layer_id: str):
             return jsonify({'error': 'Dados obrigatórios'}), 400
         
         # Buscar camada
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
@@ -598,10 +570,7 @@ def delete_layer(layer_id: str):
     """Deletar camada"""
     try:
         # Buscar camada
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
@@ -611,7 +580,7 @@ def delete_layer(layer_id: str):
             return jsonify({'error': 'Camada não pode ser deletada'}), 400
         
         # Verificar permissões
-        if not current_user.has_privilege('canDeleteLayers') and layer.created_by != current_user.id:
+        if not _access().has_privilege('canDeleteLayers') and layer.created_by != current_user.id:
             return jsonify({'error': 'Sem permissão para deletar esta camada'}), 403
         
         # Verificar modo de deleção
@@ -651,6 +620,584 @@ def delete_layer(layer_id: str):
         current_app.logger.error(f"Erro deletando camada: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+# ================================================
+# LAYER FEATURES
+# ================================================
+
+def _layer_summary(layer) -> Dict[str, Any]:
+    """Contadores e extensão da camada após uma escrita de features"""
+    db.session.refresh(layer, ['feature_count'])
+    return {
+        'id': layer.id,
+        'feature_count': layer.feature_count,
+        'bbox_coordinates': get_layer_extents(db.engine, [layer.id]).get(layer.id)
+    }
+
+@layer_api.route('/layers/<layer_id>/features', methods=['GET'])
+@requires_auth
+def get_layer_features(layer_id: str):
+    """Listar features da camada (FeatureCollection em streaming, paginação por cursor)"""
+    try:
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        try:
+            bbox = parse_bbox(request.args.get('bbox'))
+            status = StatusType(request.args.get('status', 'active'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = clamp_feature_page_size(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        include_history = request.args.get('history', 'false').lower() == 'true'
+        
+        query = Feature.query.filter(Feature.layer_id == layer_id, Feature.status == status)
+        if not include_history:
+            query = query.filter(Feature.is_current.is_(True))
+        
+        # Interseção com a bbox pelas colunas bbox_* (sem ler geometrias)
+        if bbox:
+            min_x, min_y, max_x, max_y = bbox
+            query = query.filter(
+                Feature.bbox_max_x >= min_x, Feature.bbox_min_x <= max_x,
+                Feature.bbox_max_y >= min_y, Feature.bbox_min_y <= max_y
+            )
+        
+        for name, value in parse_property_filters(request.args).items():
+            query = query.filter(Feature.properties[name].as_string() == value)
+        
+        if cursor:
+            query = query.filter(Feature.id > cursor)
+        
+        # Primeiro bloco lido aqui: erro na consulta ainda vira 500
+        features = prefetch(
+            query.order_by(Feature.id).limit(limit + 1).yield_per(STREAM_CHUNK_SIZE),
+            min(limit + 1, STREAM_CHUNK_SIZE)
+        )
+        
+        def stream_error(e: Exception):
+            current_app.logger.error(f"Erro no streaming de features da camada {layer_id}: {e}")
+        
+        return Response(
+            stream_with_context(stream_feature_collection(
+                features, limit, lambda feature: feature.to_geojson(), lambda feature: feature.id,
+                on_error=stream_error
+            )),
+            mimetype='application/geo+json'
+        )
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo features: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/features', methods=['POST'])
+@requires_auth
+def create_layer_features(layer_id: str):
+    """Criar features (Feature ou FeatureCollection) em uma transação"""
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'Dados obrigatórios'}), 400
+        
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canEditLayers'):
+            return jsonify({'error': 'Sem permissão para editar camadas'}), 403
+        
+        try:
+            items = parse_feature_input(data)
+            for item in items:
+                item['feature_type'] = GeometryType(item['feature_type'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Contadores, extensão e versão de dados da camada são mantidos pelos listeners
+        features = [Feature(layer_id=layer_id, created_by=current_user.id, **item) for item in items]
+        db.session.add_all(features)
+        db.session.commit()
+        
+        # Log da ação
+        for feature in features:
+            log_action('INSERT', 'features', feature.id, None, feature.to_dict())
+        
+        return jsonify({
+            'message': f'{len(features)} feature(s) criada(s)',
+            'ids': [feature.id for feature in features],
+            'layer': _layer_summary(layer)
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro criando features: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/features/bulk', methods=['POST'])
+@requires_auth
+def bulk_load_layer_features(layer_id: str):
+    """Carga em lote de uma FeatureCollection (sem o custo por linha do ORM)"""
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'Dados obrigatórios'}), 400
+        
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canImportData'):
+            return jsonify({'error': 'Sem permissão para importar dados'}), 403
+        
+        try:
+            items = parse_feature_input(data, max_features=MAX_BULK_FEATURES)
+            for item in items:
+                item['feature_type'] = GeometryType(item['feature_type'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = bulk_load_features(db.session.connection(), Feature.__table__, layer_id, items, current_user.id)
+        db.session.commit()
+        
+        # Log da ação (um registro por carga)
+        log_action('INSERT', 'features', layer_id, None, {
+            'bulk_load': result['inserted'],
+            'bbox': result['bbox']
+        })
+        
+        return jsonify({
+            'message': f"{result['inserted']} feature(s) carregada(s)",
+            'inserted': result['inserted'],
+            'layer': _layer_summary(layer)
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro na carga em lote: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/features', methods=['DELETE'])
+@requires_auth
+def delete_layer_features(layer_id: str):
+    """Deletar features em lote ({"ids": [...]})"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'error': 'Lista de ids obrigatória'}), 400
+        if len(ids) > MAX_FEATURE_BATCH:
+            return jsonify({'error': f'Máximo de {MAX_FEATURE_BATCH} features por requisição'}), 400
+        
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canEditLayers'):
+            return jsonify({'error': 'Sem permissão para editar camadas'}), 403
+        
+        soft_delete = request.args.get('soft', 'true').lower() == 'true'
+        
+        features = Feature.query.filter(Feature.layer_id == layer_id, Feature.id.in_(ids)).all()
+        deleted = [(feature.id, feature.to_dict()) for feature in features]
+        for feature in features:
+            if soft_delete:
+                feature.status = StatusType.DELETED
+                feature.updated_by = current_user.id
+            else:
+                db.session.delete(feature)
+        db.session.commit()
+        
+        # Log da ação
+        for feature_id, old_values in deleted:
+            log_action('DELETE', 'features', feature_id, old_values, None)
+        
+        return jsonify({
+            'message': f'{len(deleted)} feature(s) deletada(s)',
+            'ids': [feature_id for feature_id, _ in deleted],
+            'layer': _layer_summary(layer)
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro deletando features: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/features/<feature_id>', methods=['GET'])
+@requires_auth
+def get_layer_feature(layer_id: str, feature_id: str):
+    """Obter feature específica (GeoJSON)"""
+    try:
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        feature = Feature.query.filter_by(id=feature_id, layer_id=layer_id).first()
+        if not feature:
+            return jsonify({'error': 'Feature não encontrada'}), 404
+        
+        return jsonify(feature.to_geojson())
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo feature: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/features/<feature_id>', methods=['PUT'])
+@requires_auth
+def update_layer_feature(layer_id: str, feature_id: str):
+    """Atualizar geometria, atributos, estilo ou status de uma feature"""
+    try:
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canEditLayers'):
+            return jsonify({'error': 'Sem permissão para editar camadas'}), 403
+        
+        feature = Feature.query.filter_by(id=feature_id, layer_id=layer_id).first()
+        if not feature:
+            return jsonify({'error': 'Feature não encontrada'}), 404
+        
+        try:
+            changes = validate_feature_update(request.get_json(silent=True))
+            if 'geometry' in changes:
+                changes['feature_type'] = GeometryType(changes['geometry']['type'])
+            if 'status' in changes:
+                changes['status'] = StatusType(changes['status'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Salvar valores antigos para auditoria
+        old_values = feature.to_dict()
+        
+        for field, value in changes.items():
+            setattr(feature, field, value)
+        feature.version = (feature.version or 1) + 1
+        feature.updated_by = current_user.id
+        db.session.commit()
+        
+        # Log da ação
+        log_action('UPDATE', 'features', feature_id, old_values, feature.to_dict())
+        
+        return jsonify({
+            'message': 'Feature atualizada com sucesso',
+            'feature': feature.to_geojson(),
+            'layer': _layer_summary(layer)
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro atualizando feature: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/features/<feature_id>', methods=['DELETE'])
+@requires_auth
+def delete_layer_feature(layer_id: str, feature_id: str):
+    """Deletar feature"""
+    try:
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canEditLayers'):
+            return jsonify({'error': 'Sem permissão para editar camadas'}), 403
+        
+        feature = Feature.query.filter_by(id=feature_id, layer_id=layer_id).first()
+        if not feature:
+            return jsonify({'error': 'Feature não encontrada'}), 404
+        
+        soft_delete = request.args.get('soft', 'true').lower() == 'true'
+        old_values = feature.to_dict()
+        
+        if soft_delete:
+            # Soft delete - apenas marcar como deleted
+            feature.status = StatusType.DELETED
+            feature.updated_by = current_user.id
+        else:
+            db.session.delete(feature)
+        db.session.commit()
+        
+        # Log da ação
+        log_action('DELETE', 'features', feature_id, old_values, None)
+        
+        return jsonify({
+            'message': 'Feature deletada com sucesso',
+            'layer': _layer_summary(layer)
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro deletando feature: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+# ================================================
+# IMPORT JOBS
+# ================================================
+
+def _import_jobs() -> ImportJobQueue:
+    """Fila de importação da aplicação (workers iniciados no primeiro uso)"""
+    return get_import_jobs(current_app._get_current_object(), db, ImportJob.__table__,
+                           Feature.__table__, GeometryType)
+
+@layer_api.route('/layers/<layer_id>/imports', methods=['POST'])
+@requires_auth
+def create_import_job(layer_id: str):
+    """Importar um KML/KMZ na camada em segundo plano (retorna o job imediatamente)"""
+    try:
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canImportData'):
+            return jsonify({'error': 'Sem permissão para importar dados'}), 403
+        
+        file = request.files.get('file')
+        if file is None or not file.filename:
+            return jsonify({'error': 'Nenhum arquivo enviado'}), 400
+        
+        extension = os.path.splitext(file.filename)[1].lower()
+        if extension not in IMPORT_EXTENSIONS:
+            return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
+        
+        # Gravado em blocos; validação e leitura ficam com o worker
+        folder = import_folder(current_app)
+        os.makedirs(folder, exist_ok=True)
+        file_path = os.path.join(folder, os.urandom(16).hex() + extension)
+        file.save(file_path)
+        
+        jobs = _import_jobs()
+        filename = secure_filename(file.filename) or f'upload{extension}'
+        job_id = jobs.create(layer_id, current_user.id, filename, file_path, db.session.connection())
+        db.session.commit()
+        
+        log_action('INSERT', 'import_jobs', job_id, None, {'layer_id': layer_id, 'filename': filename})
+        jobs.wake()
+        
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('layer_api.get_import_job', job_id=job_id),
+            'job': job_progress(jobs.get(job_id))
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro criando job de importação: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/jobs/<job_id>', methods=['GET'])
+@requires_auth
+def get_import_job(job_id: str):
+    """Progresso, contagens e erros de um job de importação"""
+    try:
+        job = _import_jobs().get(job_id)
+        if not job or not _access().can_access_layer(job['layer_id']):
+            return jsonify({'error': 'Job não encontrado'}), 404
+        
+        return jsonify({'job': job_progress(job)})
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo job de importação: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+# ================================================
+# UPLOADS EM BLOCOS
+# ================================================
+
+def _chunked_uploads() -> ChunkedUploads:
+    """Uploads em blocos da aplicação (arquivos gravados na pasta de importação)"""
+    return get_chunked_uploads(current_app._get_current_object(), db, UploadSession.__table__)
+
+def _find_upload(upload_id: str) -> Optional[Dict[str, Any]]:
+    """Upload do usuário atual (uploads de outros usuários não são visíveis)"""
+    upload = _chunked_uploads().get(upload_id)
+    if not upload or upload['created_by'] != current_user.id:
+        return None
+    return upload
+
+def _offset_conflict(e: OffsetMismatch):
+    """409 com o offset a partir do qual o cliente deve retomar (ou tentar de novo, se ocupado)"""
+    response = jsonify({'error': str(e), 'offset': e.offset})
+    response.headers['Upload-Offset'] = str(e.offset)
+    if isinstance(e, UploadBusy):
+        response.headers['Retry-After'] = '1'
+    return response, 409
+
+@layer_api.route('/layers/<layer_id>/uploads', methods=['POST'])
+@requires_auth
+def create_chunked_upload(layer_id: str):
+    """Iniciar um upload em blocos de um KML/KMZ maior que o limite por requisição"""
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'Dados obrigatórios'}), 400
+        
+        layer = _find_layer(layer_id)
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.is_editable:
+            return jsonify({'error': 'Camada não editável'}), 400
+        
+        # Verificar permissões
+        if not _access().has_privilege('canImportData'):
+            return jsonify({'error': 'Sem permissão para importar dados'}), 403
+        
+        filename = secure_filename(data.get('filename') or '')
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in IMPORT_EXTENSIONS:
+            return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
+        
+        uploads = _chunked_uploads()
+        uploads.purge_expired()
+        try:
+            upload = uploads.create(layer_id, current_user.id, filename, data.get('size'), extension)
+        except UploadError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'upload': upload_progress(upload),
+            'chunk_size': uploads.chunk_max_bytes,
+            'upload_url': url_for('layer_api.append_upload_chunk', upload_id=upload['id'])
+        }), 201
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro iniciando upload em blocos: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/uploads/<upload_id>', methods=['GET'])
+@requires_auth
+def get_chunked_upload(upload_id: str):
+    """Estado de um upload; `offset` indica de onde retomar"""
+    try:
+        upload = _find_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload não encontrado'}), 404
+        
+        response = jsonify({'upload': upload_progress(upload)})
+        response.headers['Upload-Offset'] = str(upload['received'])
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo upload: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/uploads/<upload_id>', methods=['PUT'])
+@requires_auth
+def append_upload_chunk(upload_id: str):
+    """
+    Gravar um bloco (corpo bruto da requisição). Cabeçalhos: Upload-Offset
+    (posição do bloco no arquivo) e X-Chunk-SHA256 (hex do bloco)
+    """
+    try:
+        upload = _find_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload não encontrado'}), 404
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'error': 'Cabeçalho Upload-Offset obrigatório'}), 400
+        
+        try:
+            received = _chunked_uploads().append(upload, offset, request.stream, request.content_length,
+                                                 request.headers.get('X-Chunk-SHA256'))
+        except OffsetMismatch as e:
+            return _offset_conflict(e)
+        except UploadError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        response = jsonify({'offset': received, 'size': upload['total_size']})
+        response.headers['Upload-Offset'] = str(received)
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro gravando bloco do upload: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/uploads/<upload_id>/complete', methods=['POST'])
+@requires_auth
+def complete_chunked_upload(upload_id: str):
+    """Finalizar o upload e enfileirar a importação do arquivo montado"""
+    try:
+        upload = _find_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload não encontrado'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        
+        # O arquivo já está na pasta de importação: o job o lê no lugar
+        jobs = _import_jobs()
+        try:
+            job_id = jobs.create(upload['layer_id'], current_user.id, upload['filename'],
+                                 upload['file_path'], db.session.connection())
+            _chunked_uploads().complete(upload, job_id, data.get('sha256'), db.session.connection())
+        except OffsetMismatch as e:
+            db.session.rollback()
+            return _offset_conflict(e)
+        except UploadError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+        
+        log_action('INSERT', 'import_jobs', job_id, None, {
+            'layer_id': upload['layer_id'],
+            'filename': upload['filename'],
+            'upload_id': upload_id
+        })
+        jobs.wake()
+        
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('layer_api.get_import_job', job_id=job_id),
+            'job': job_progress(jobs.get(job_id))
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro finalizando upload: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/uploads/<upload_id>', methods=['DELETE'])
+@requires_auth
+def abort_chunked_upload(upload_id: str):
+    """Cancelar um upload em andamento"""
+    try:
+        upload = _find_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload não encontrado'}), 404
+        
+        if not _chunked_uploads().abort(upload):
+            return jsonify({'error': 'Upload já finalizado'}), 400
+        
+        return jsonify({'message': 'Upload cancelado'})
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro cancelando upload: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 # ================================================
 # LAYER VERSIONING
 # ================================================
@@ -661,24 +1208,17 @@ def get_layer_versions(layer_id: str):
     """Obter versões de uma camada"""
     try:
         # Verificar acesso à camada
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
         
-        # Obter versões
+        # Obter versões (criador carregado na mesma consulta)
         versions = LayerVersion.query.filter_by(
             layer_id=layer_id
-        ).order_by(LayerVersion.version_number.desc()).all()
+        ).options(*LAYER_VERSION_LIST.options()).order_by(LayerVersion.version_number.desc()).all()
         
-        result = []
-        for version in versions:
-            version_dict = version.to_dict()
-            version_dict['creator_name'] = version.creator.full_name if version.creator else None
-            result.append(version_dict)
+        result = LAYER_VERSION_LIST.dump_many(versions)
         
         return jsonify({
             'versions': result,
@@ -690,6 +1230,32 @@ def get_layer_versions(layer_id: str):
         current_app.logger.error(f"Erro obtendo versões: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@layer_api.route('/layers/<layer_id>/versions/<version_id>', methods=['GET'])
+@requires_auth
+def get_layer_version(layer_id: str, version_id: str):
+    """Abrir uma versão específica (configuração completa reconstruída)"""
+    try:
+        layer = _find_layer(layer_id)
+        
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        version = LayerVersion.query.filter_by(
+            id=version_id, layer_id=layer_id
+        ).options(*LAYER_VERSION_LIST.options()).first()
+        
+        if not version:
+            return jsonify({'error': 'Versão não encontrada'}), 404
+        
+        return jsonify({
+            'version': LAYER_VERSION_LIST.dump(version),
+            'layer_config': version.materialize()
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo versão: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @layer_api.route('/layers/<layer_id>/versions', methods=['POST'])
 @requires_auth
 def create_layer_version(layer_id: str):
@@ -700,10 +1266,7 @@ def create_layer_version(layer_id: str):
             return jsonify({'error': 'Dados obrigatórios'}), 400
         
         # Buscar camada
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
@@ -735,6 +1298,96 @@ def create_layer_version(layer_id: str):
         current_app.logger.error(f"Erro criando versão: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@layer_api.route('/layers/<layer_id>/versions/<version_a>/diff/<version_b>', methods=['GET'])
+@requires_auth
+def diff_layer_versions(layer_id: str, version_a: str, version_b: str):
+    """Comparar duas versões de uma camada (features adicionadas/removidas/modificadas)"""
+    try:
+        layer = _find_layer(layer_id)
+        
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        versions = {
+            version.id: version for version in LayerVersion.query.filter(
+                LayerVersion.layer_id == layer_id,
+                LayerVersion.id.in_([version_a, version_b])
+            )
+        }
+        if version_a not in versions or version_b not in versions:
+            return jsonify({'error': 'Versão não encontrada'}), 404
+        
+        diff = diff_versions(db.session, versions[version_a], versions[version_b])
+        
+        return jsonify({
+            'layer_id': layer_id,
+            'from_version': versions[version_a].version_number,
+            'to_version': versions[version_b].version_number,
+            **diff,
+            'summary': {
+                'added': len(diff['added']),
+                'removed': len(diff['removed']),
+                'modified': len(diff['modified'])
+            }
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro comparando versões: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@layer_api.route('/layers/<layer_id>/versions/<version_id>/rollback', methods=['POST'])
+@requires_auth
+def rollback_layer_version(layer_id: str, version_id: str):
+    """Restaurar as features de uma camada para uma versão anterior"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        layer = _find_layer(layer_id)
+        
+        if not layer:
+            return jsonify({'error': 'Camada não encontrada'}), 404
+        
+        if not layer.can_edit(current_user):
+            return jsonify({'error': 'Sem permissão para restaurar esta camada'}), 403
+        
+        version = LayerVersion.query.filter_by(id=version_id, layer_id=layer_id).first()
+        if not version:
+            return jsonify({'error': 'Versão não encontrada'}), 404
+        
+        # Delta reverso e nova versão na mesma transação
+        result = rollback_to_version(db.session, layer, version, current_user)
+        db.session.flush()
+        
+        new_version = None
+        if data.get('create_version', True):
+            new_version = layer.create_version(
+                version_name=data.get('version_name', f'Rollback para versão {version.version_number}'),
+                description=data.get('description', ''),
+                user=current_user
+            )
+            db.session.add(new_version)
+        
+        db.session.commit()
+        
+        # Log da ação
+        log_action('UPDATE', 'layers', layer_id, None, {
+            'rollback_to_version': version.version_number,
+            'restored': len(result['restored']),
+            'reverted': len(result['reverted']),
+            'removed': len(result['removed'])
+        })
+        
+        return jsonify({
+            'message': f'Camada restaurada para a versão {version.version_number}',
+            **result,
+            'version': new_version.to_dict() if new_version else None
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erro restaurando versão: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 # ================================================
 # LAYER STYLES
 # ================================================
@@ -744,10 +1397,7 @@ def create_layer_version(layer_id: str):
 def get_layer_style(layer_id: str):
     """Obter estilo de uma camada"""
     try:
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
@@ -773,16 +1423,13 @@ def update_layer_style(layer_id: str):
         if not data:
             return jsonify({'error': 'Dados obrigatórios'}), 400
         
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
         
         # Verificar permissões
-        if not current_user.has_privilege('canModifyStyles') and layer.created_by != current_user.id:
+        if not _access().has_privilege('canModifyStyles') and layer.created_by != current_user.id:
             return jsonify({'error': 'Sem permissão para modificar estilos'}), 403
         
         # Atualizar estilo
@@ -822,56 +1469,20 @@ def update_layer_style(layer_id: str):
 def get_layer_statistics(layer_id: str):
     """Obter estatísticas detalhadas de uma camada"""
     try:
-        layer = Layer.query.join(Project).filter(
-            Layer.id == layer_id,
-            Project.organization_id == current_user.organization_id
-        ).first()
+        layer = _find_layer(layer_id)
         
         if not layer:
             return jsonify({'error': 'Camada não encontrada'}), 404
         
-        # Estatísticas de features
-        total_features = Feature.query.filter_by(layer_id=layer_id).count()
-        active_features = Feature.query.filter_by(
-            layer_id=layer_id, 
-            status=StatusType.ACTIVE,
-            is_current=True
-        ).count()
-        
-        # Estatísticas por tipo de geometria
-        geometry_stats = {}
-        for geom_type in GeometryType:
-            count = Feature.query.filter_by(
-                layer_id=layer_id,
-                feature_type=geom_type,
-                is_current=True
-            ).count()
-            if count > 0:
-                geometry_stats[geom_type.value] = count
-        
-        # Estatísticas temporais
-        from sqlalchemy import func
-        creation_stats = db.session.query(
-            func.date(Feature.created_at).label('date'),
-            func.count(Feature.id).label('count')
-        ).filter_by(layer_id=layer_id).group_by(
-            func.date(Feature.created_at)
-        ).order_by('date').limit(30).all()
+        # Estatísticas de features (uma agregação, reutilizada enquanto a camada não mudar)
+        stats = get_cached_layer_statistics(db.session, layer, get_shared_cache(current_app))
         
         return jsonify({
             'layer_id': layer_id,
             'statistics': {
-                'total_features': total_features,
-                'active_features': active_features,
-                'deleted_features': total_features - active_features,
-                'geometry_types': geometry_stats,
-                'creation_timeline': [
-                    {'date': str(stat.date), 'count': stat.count}
-                    for stat in creation_stats
-                ],
+                **stats,
                 'last_updated': layer.updated_at.isoformat() if layer.updated_at else None,
-                'file_size_bytes': layer.file_size_bytes,
-                'version_count': layer.versions.count()
+                'file_size_bytes': layer.file_size_bytes
             }
         })
         
@@ -879,6 +1490,122 @@ def get_layer_statistics(layer_id: str):
         current_app.logger.error(f"Erro obtendo estatísticas: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+# ================================================
+# PROJECT EXTENT
+# ================================================
+
+@layer_api.route('/projects/<project_id>/extent', methods=['GET'])
+@requires_auth
+def get_project_extent(project_id: str):
+    """Extensão do projeto e das suas camadas (zoom-to-extent sem baixar features)"""
+    try:
+        project = _find_project(project_id)
+        
+        if not project:
+            return jsonify({'error': 'Projeto não encontrado'}), 404
+        
+        layer_ids = [row.id for row in db.session.query(Layer.id).filter(
+            Layer.project_id == project_id,
+            Layer.status != StatusType.DELETED
+        )]
+        
+        return jsonify({
+            'project_id': project_id,
+            'bbox': project.get_bbox(),
+            'layers': get_layer_extents(db.engine, layer_ids)
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo extensão do projeto: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+# ================================================
+# AUDIT LOG
+# ================================================
+
+@layer_api.route('/audit', methods=['GET'])
+@requires_auth
+def get_audit_log():
+    """Consultar log de auditoria (mais recentes primeiro, paginação por cursor)"""
+    try:
+        if not _access().has_privilege('canViewAuditLog'):
+            return jsonify({'error': 'Sem permissão para ver auditoria'}), 403
+        
+        try:
+            since = parse_timestamp(request.args.get('since'))
+            until = parse_timestamp(request.args.get('until'))
+            cursor = request.args.get('cursor')
+            position = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = clamp_page_size(request.args.get('limit'))
+        
+        # Apenas ações de usuários da organização
+        organization_users = db.session.query(User.id).filter(
+            User.organization_id == current_user.organization_id
+        )
+        query = AuditLog.query.filter(AuditLog.user_id.in_(organization_users))
+        
+        # Filtros (idx_audit_table_record, idx_audit_user_timestamp, idx_audit_timestamp)
+        if request.args.get('table'):
+            query = query.filter(AuditLog.table_name == request.args['table'])
+        if request.args.get('record_id'):
+            query = query.filter(AuditLog.record_id == request.args['record_id'])
+        if request.args.get('user_id'):
+            query = query.filter(AuditLog.user_id == request.args['user_id'])
+        if since:
+            query = query.filter(AuditLog.timestamp >= since)
+        if until:
+            query = query.filter(AuditLog.timestamp < until)
+        if position:
+            timestamp, entry_id = position
+            query = query.filter(db.or_(
+                AuditLog.timestamp < timestamp,
+                db.and_(AuditLog.timestamp == timestamp, AuditLog.id < entry_id)
+            ))
+        
+        entries = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        
+        return jsonify({
+            'entries': [entry.to_dict() for entry in entries],
+            'next_cursor': encode_cursor(entries[-1].timestamp, entries[-1].id) if has_more else None
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro consultando auditoria: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+# ================================================
+# GLEBA SUMMARY
+# ================================================
+
+@layer_api.route('/projects/<project_id>/glebas/summary', methods=['GET'])
+@requires_auth
+def get_project_gleba_summary(project_id: str):
+    """Obter agregados de glebas por bairro, quadra ou zoneamento"""
+    try:
+        project = _find_project(project_id)
+        
+        if not project:
+            return jsonify({'error': 'Projeto não encontrado'}), 404
+        
+        group_by = request.args.get('group_by', 'bairro')
+        if group_by not in SUMMARY_DIMENSIONS:
+            return jsonify({'error': f'Agrupamento inválido: {group_by}'}), 400
+        
+        summary = get_gleba_summary(db.session.connection(), project_id, group_by)
+        
+        return jsonify({
+            'project_id': project_id,
+            **summary
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erro obtendo resumo de glebas: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 # ================================================
 # ERROR HANDLERS
 # ================================================
@@ -0,0 +1,142 @@
+"""
+WEBAG Professional - Serializadores da API de Camadas
+Políticas de carregamento por endpoint (joinedload/selectinload) e
+serialização restrita às colunas necessárias
+"""
+
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Any, Optional, Callable, Sequence
+
+try:
+    from sqlalchemy.orm import joinedload, selectinload, load_only
+    from app.models.enhanced_models import Layer, LayerVersion
+    ENHANCED_MODELS_AVAILABLE = True
+except ImportError:
+    ENHANCED_MODELS_AVAILABLE = False
+
+# ================================================
+# CAMPOS E SERIALIZADOR
+# ================================================
+
+class RelatedField:
+    """
+    Campo derivado de um relacionamento.
+
+    ``columns`` são as únicas colunas carregadas do modelo relacionado e
+    ``getter`` monta o valor serializado a partir do objeto relacionado.
+    Relacionamentos escalares usam joinedload; coleções usam selectinload.
+    """
+
+    def __init__(self, relationship: str, columns: Sequence[str],
+                 getter: Callable[[Any], Any], collection: bool = False,
+                 omit_if_missing: bool = False):
+        self.relationship = relationship
+        self.columns = tuple(columns)
+        self.getter = getter
+        self.collection = collection
+        self.omit_if_missing = omit_if_missing
+
+    def option(self, model):
+        """Opção de carregamento do relacionamento"""
+        attr = getattr(model, self.relationship)
+        target = attr.property.mapper.class_
+        strategy = selectinload if self.collection else joinedload
+        return strategy(attr).load_only(*[getattr(target, c) for c in self.columns])
+
+    def value(self, obj) -> Any:
+        related = getattr(obj, self.relationship)
+        if self.collection:
+            return [self.getter(item) for item in related]
+        return self.getter(related) if related is not None else None
+
+
+class Serializer:
+    """
+    Serializador declarativo de um modelo.
+
+    ``columns`` restringe as colunas lidas (None = todas as colunas da
+    tabela, mesmo formato de ``BaseModel.to_dict``) e ``related`` declara os
+    campos vindos de relacionamentos, carregados antecipadamente.
+    """
+
+    def __init__(self, model, columns: Optional[Sequence[str]] = None,
+                 related: Optional[Dict[str, RelatedField]] = None):
+        self.model = model
+        self.columns = tuple(columns) if columns else tuple(c.name for c in model.__table__.columns)
+        self.related = related or {}
+
+    def options(self) -> List[Any]:
+        """Opções para ``query.options(...)`` com a política deste endpoint"""
+        options = []
+        if len(self.columns) < len(self.model.__table__.columns):
+            options.append(load_only(*[getattr(self.model, c) for c in self.columns]))
+        for field in self.related.values():
+            options.append(field.option(self.model))
+        return options
+
+    def dump(self, obj) -> Dict[str, Any]:
+        """Serializar uma instância"""
+        result = {}
+        for column in self.columns:
+            value = getattr(obj, column)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, Enum):
+                value = value.value
+            result[column] = value
+
+        for name, field in self.related.items():
+            value = field.value(obj)
+            if value is None and field.omit_if_missing:
+                continue
+            result[name] = value
+        return result
+
+    def dump_many(self, objects) -> List[Dict[str, Any]]:
+        """Serializar uma lista de instâncias"""
+        return [self.dump(obj) for obj in objects]
+
+# ================================================
+# POLÍTICAS POR ENDPOINT
+# ================================================
+
+if ENHANCED_MODELS_AVAILABLE:
+
+    # Colunas necessárias para User.full_name
+    USER_NAME_COLUMNS = ('first_name', 'last_name', 'username')
+
+    # GET /projects/<id>/layers
+    LAYER_LIST = Serializer(Layer, related={
+        'group_name': RelatedField('layer_group', ('name',), lambda group: group.name),
+        'creator_name': RelatedField('creator', USER_NAME_COLUMNS, lambda user: user.full_name),
+    })
+
+    # GET /layers/<id>
+    LAYER_DETAIL = Serializer(Layer, related={
+        'group': RelatedField(
+            'layer_group', ('name', 'description'),
+            lambda group: {
+                'id': group.id,
+                'name': group.name,
+                'description': group.description
+            },
+            omit_if_missing=True
+        ),
+        'creator': RelatedField(
+            'creator', USER_NAME_COLUMNS,
+            lambda user: {
+                'id': user.id,
+                'name': user.full_name,
+                'username': user.username
+            },
+            omit_if_missing=True
+        ),
+    })
+
+    # GET /layers/<id>/versions (apenas metadados; layer_config só ao abrir a versão)
+    LAYER_VERSION_LIST = Serializer(LayerVersion, columns=[
+        c.name for c in LayerVersion.__table__.columns if c.name != 'layer_config'
+    ], related={
+        'creator_name': RelatedField('creator', USER_NAME_COLUMNS, lambda user: user.full_name),
+    })
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Bundles de JS/CSS por Página
+Concatena e minifica os scripts e estilos de cada página em um único
+arquivo com source map. Gerados no build (scripts/build_assets.py) ou,
+sem build, no primeiro request que os referencia
+"""
+import os
+import json
+from typing import Dict, List, Any, Optional, Tuple
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+BUNDLE_PREFIX = 'bundles/'
+
+# Arquivos de cada página, na ordem de execução
+BUNDLES: Dict[str, Dict[str, List[str]]] = {
+    'index': {
+        'js': ['map-init.js', 'geojson-style.js', 'app.js'],
+        'css': ['styles.css']
+    },
+    'layer_management': {
+        'js': ['layer_management.js']
+    },
+    'webgis_glebas': {
+        'js': ['glebas.js']
+    },
+    'login': {
+        'js': ['login.js'],
+        'css': ['login-styles.css']
+    }
+}
+
+# Raiz (URL) dos fontes originais no source map
+DEFAULT_SOURCE_ROOT = '/static/'
+
+# Caracteres após os quais uma '/' inicia regex (e não divisão)
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw')
+
+_BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+# ================================================
+# MINIFICAÇÃO
+# ================================================
+# Conservadora: remove comentários, indentação e linhas vazias mas mantém
+# as quebras de linha do código (sem risco com inserção automática de
+# ponto e vírgula), o que permite source maps por linha.
+
+def _regex_allowed(code: List[str]) -> bool:
+    """Uma '/' nesta posição inicia regex? (olha o último token emitido)"""
+    text = ''.join(code[-32:]).rstrip()
+    if not text:
+        return True
+    if text[-1] in _REGEX_PRECEDERS:
+        return True
+    return any(text.endswith(keyword) and (len(text) == len(keyword) or not (text[-len(keyword) - 1].isalnum()
+                                                                          or text[-len(keyword) - 1] in '_$'))
+               for keyword in _REGEX_KEYWORDS)
+
+def _strip_js_comments(source: str) -> Tuple[str, set]:
+    """
+    Código sem comentários (comentários de bloco viram quebras de linha
+    equivalentes) e as linhas tocadas por strings/templates de várias
+    linhas, que são mantidas intactas.
+    """
+    out: List[str] = []
+    protected = set()
+    line = 0
+    i = 0
+    n = len(source)
+    # Chaves abertas em cada nível de ${...} (índice 0: código de topo)
+    braces: List[int] = [0]
+    in_template = False
+
+    while i < n:
+        ch = source[i]
+        nxt = source[i + 1] if i + 1 < n else ''
+
+        if in_template:
+            out.append(ch)
+            if ch == '\\':
+                if nxt:
+                    out.append(nxt)
+                    if nxt == '\n':
+                        protected.update((line, line + 1))
+                        line += 1
+                i += 2
+                continue
+            if ch == '\n':
+                protected.update((line, line + 1))
+                line += 1
+            elif ch == '`':
+                in_template = False
+            elif ch == '$' and nxt == '{':
+                out.append(nxt)
+                braces.append(0)
+                in_template = False
+                i += 2
+                continue
+            i += 1
+            continue
+
+        if ch in ('"', "'"):
+            j = i + 1
+            while j < n and source[j] != ch and source[j] != '\n':
+                if source[j] == '\\' and j + 1 < n:
+                    if source[j + 1] == '\n':
+                        protected.update((line, line + 1))
+                        line += 1
+                    j += 1
+                j += 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+
+        if ch == '`':
+            out.append(ch)
+            in_template = True
+            i += 1
+            continue
+
+        if ch == '{':
+            braces[-1] += 1
+        elif ch == '}':
+            if braces[-1] == 0 and len(braces) > 1:
+                # Fim de ${...}: volta ao template
+                braces.pop()
+                out.append(ch)
+                in_template = True
+                i += 1
+                continue
+            braces[-1] -= 1
+
+        if ch == '/' and nxt == '/':
+            while i < n and source[i] != '\n':
+                i += 1
+            continue
+
+        if ch == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            newlines = source.count('\n', i, end)
+            out.append('\n' * newlines if newlines else ' ')
+            line += newlines
+            i = end
+            continue
+
+        if ch == '/' and _regex_allowed(out):
+            j = i + 1
+            in_class = False
+            while j < n and source[j] != '\n':
+                if source[j] == '\\':
+                    j += 2
+                    continue
+                if source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                elif source[j] == '/' and not in_class:
+                    break
+                j += 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+
+        if ch == '\n':
+            line += 1
+        out.append(ch)
+        i += 1
+
+    return ''.join(out), protected
+
+def _strip_css_comments(source: str) -> Tuple[str, set]:
+    out: List[str] = []
+    i = 0
+    n = len(source)
+    while i < n:
+        ch = source[i]
+        if ch in ('"', "'"):
+            j = i + 1
+            while j < n and source[j] != ch and source[j] != '\n':
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif ch == '/' and source.startswith('*', i + 1):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            newlines = source.count('\n', i, end)
+            out.append('\n' * newlines if newlines else ' ')
+            i = end
+        else:
+            out.append(ch)
+            i += 1
+    return ''.join(out), set()
+
+def _compact_css_line(line: str) -> str:
+    """Remover espaços em volta de { } ; fora de strings"""
+    if '"' in line or "'" in line:
+        return line
+    for token in '{};':
+        line = token.join(part.strip() for part in line.split(token))
+    return line
+
+def minify(source: str, kind: str) -> List[Tuple[str, int, int]]:
+    """
+    Linhas minificadas: (texto, linha original, coluna original).
+    kind: 'js' ou 'css'.
+    """
+    stripped, protected = (_strip_js_comments if kind == 'js' else _strip_css_comments)(source)
+    lines = []
+    for number, text in enumerate(stripped.split('\n')):
+        if number in protected:
+            lines.append((text, number, 0))
+            continue
+        content = text.strip()
+        if not content:
+            continue
+        column = len(text) - len(text.lstrip())
+        if kind == 'css':
+            content = _compact_css_line(content)
+        lines.append((content, number, column))
+    return lines
+
+# ================================================
+# SOURCE MAP (v3)
+# ================================================
+
+def _vlq(value: int) -> str:
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    encoded = ''
+    while True:
+        digit = value & 31
+        value >>= 5
+        if value:
+            digit |= 32
+        encoded += _BASE64[digit]
+        if not value:
+            return encoded
+
+def source_map(file: str, sources: List[str], contents: List[str],
+               mapped_lines: List[Optional[Tuple[int, int, int]]],
+               source_root: str = DEFAULT_SOURCE_ROOT) -> Dict[str, Any]:
+    """
+    Source map com um segmento por linha gerada.
+    mapped_lines[i] = (fonte, linha, coluna) da linha i, ou None.
+    """
+    segments = []
+    previous = (0, 0, 0)
+    for mapping in mapped_lines:
+        if mapping is None:
+            segments.append('')
+            continue
+        segments.append('A' + ''.join(_vlq(value - last) for value, last in zip(mapping, previous)))
+        previous = mapping
+    return {
+        'version': 3,
+        'file': file,
+        'sourceRoot': source_root,
+        'sources': sources,
+        'sourcesContent': contents,
+        'names': [],
+        'mappings': ';'.join(segments)
+    }
+
+# ================================================
+# BUNDLES
+# ================================================
+
+def bundle_names(page: str, kind: str) -> Tuple[str, str]:
+    """(nome lógico do bundle, nome lógico do source map)"""
+    logical = f'{BUNDLE_PREFIX}{page}.{kind}'
+    return logical, logical + '.map'
+
+def render_bundle(static_dir: str, page: str, kind: str,
+                  bundles: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                  source_root: str = DEFAULT_SOURCE_ROOT) -> Dict[str, bytes]:
+    """
+    Bundle minificado e seu source map: {nome lógico: conteúdo}.
+
+    O bundle referencia o source map pelo nome com hash que o manifesto
+    dará a ele (o hash do mapa não depende do bundle).
+    """
+    from app.assets.manifest import content_hash, hashed_name
+
+    files = (bundles or BUNDLES).get(page, {}).get(kind)
+    if not files:
+        raise KeyError(f'Bundle inexistente: {page}.{kind}')
+
+    logical, map_logical = bundle_names(page, kind)
+    output: List[str] = []
+    mapped: List[Optional[Tuple[int, int, int]]] = []
+    contents = []
+    for index, filename in enumerate(files):
+        with open(os.path.join(static_dir, *filename.split('/')), encoding='utf-8') as source:
+            text = source.read()
+        contents.append(text)
+        if index and kind == 'js':
+            # Separador: um arquivo sem ';' final não pode "continuar" no próximo
+            output.append(';')
+            mapped.append(None)
+        for content, line, column in minify(text, kind):
+            output.append(content)
+            mapped.append((index, line, column))
+
+    map_data = json.dumps(
+        source_map(os.path.basename(logical), files, contents, mapped, source_root),
+        separators=(',', ':')
+    ).encode('utf-8')
+    map_url = os.path.basename(hashed_name(map_logical, content_hash(map_data)))
+    output.append(f'//# sourceMappingURL={map_url}' if kind == 'js' else f'/*# sourceMappingURL={map_url} */')
+
+    return {
+        map_logical: map_data,
+        logical: ('\n'.join(output) + '\n').encode('utf-8')
+    }
+
+def render_bundles(static_dir: str, bundles: Optional[Dict[str, Dict[str, List[str]]]] = None) -> Dict[str, bytes]:
+    """Todos os bundles (para o build de deploy)"""
+    rendered: Dict[str, bytes] = {}
+    for page, kinds in (bundles or BUNDLES).items():
+        for kind in kinds:
+            rendered.update(render_bundle(static_dir, page, kind, bundles))
+    return rendered
+
+def register_bundles(manifest, bundles: Optional[Dict[str, Dict[str, List[str]]]] = None) -> None:
+    """Gerar sob demanda os bundles ausentes do manifesto (sem build de deploy)"""
+
+    def generate(logical: str) -> Dict[str, bytes]:
+        name = logical[len(BUNDLE_PREFIX):]
+        if name.endswith('.map'):
+            name = name[:-len('.map')]
+        page, _, kind = name.rpartition('.')
+        return render_bundle(manifest.static_dir, page, kind, bundles)
+
+    manifest.add_generator(BUNDLE_PREFIX, generate)
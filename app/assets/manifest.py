@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Manifesto de Assets Estáticos
+Cópias com hash de conteúdo no nome (static/dist), variantes pré-comprimidas
+(.gz/.br) e cache imutável no navegador
+"""
+import os
+import gzip
+import json
+import hashlib
+import mimetypes
+import threading
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    from flask import request, send_from_directory, url_for
+    FLASK_AVAILABLE = True
+except ImportError:
+    FLASK_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+DIST_DIR = 'dist'
+MANIFEST_FILE = 'manifest.json'
+HASH_LENGTH = 10
+
+# Arquivos fingerprintados e, dentre eles, os que valem a pena comprimir
+FINGERPRINT_EXTENSIONS = ('.js', '.css', '.svg', '.map', '.png', '.jpg', '.gif', '.woff', '.woff2', '.ttf')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.svg', '.map')
+MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Diretórios cujos subdiretórios (pacotes) recebem um hash único e mantêm
+# os nomes internos: URLs relativas do CSS de terceiros continuam válidas
+PACKAGE_DIRS = ('vendor',)
+
+# Codificações pré-comprimidas em ordem de preferência
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# ================================================
+# BUILD
+# ================================================
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def hashed_name(filename: str, digest: str) -> str:
+    """app.js -> app.<hash>.js"""
+    base, ext = os.path.splitext(filename)
+    return f'{base}.{digest}{ext}'
+
+def _walk_files(directory: str) -> List[str]:
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(files)
+
+def _source_files(static_dir: str) -> List[str]:
+    """Arquivos relativos a static_dir (exceto a saída do build e os pacotes)"""
+    skipped = (DIST_DIR,) + PACKAGE_DIRS
+    return [
+        logical for logical in _walk_files(static_dir)
+        if logical.split('/', 1)[0] not in skipped and logical.endswith(FINGERPRINT_EXTENSIONS)
+    ]
+
+def _package_dirs(static_dir: str) -> List[str]:
+    packages = []
+    for group in PACKAGE_DIRS:
+        group_dir = os.path.join(static_dir, group)
+        if os.path.isdir(group_dir):
+            packages.extend(f'{group}/{name}' for name in sorted(os.listdir(group_dir))
+                            if os.path.isdir(os.path.join(group_dir, name)))
+    return packages
+
+def write_compressed_variants(path: str, data: bytes) -> List[str]:
+    """Gravar path.gz (e path.br com brotli instalado); retorna as extensões gravadas"""
+    written = []
+    if len(data) < MIN_COMPRESS_BYTES or not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return written
+    with open(path + '.gz', 'wb') as target:
+        # mtime=0: saída determinística entre builds
+        target.write(gzip.compress(data, compresslevel=9, mtime=0))
+    written.append('.gz')
+    if BROTLI_AVAILABLE:
+        with open(path + '.br', 'wb') as target:
+            target.write(brotli.compress(data, quality=11))
+        written.append('.br')
+    return written
+
+def add_to_manifest(static_dir: str, manifest: Dict[str, str], logical: str, data: bytes,
+                    compress: bool = True) -> str:
+    """Gravar cópia com hash de `data` como asset lógico; retorna o caminho servido"""
+    served = f'{DIST_DIR}/{hashed_name(logical, content_hash(data))}'
+    target = os.path.join(static_dir, *served.split('/'))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if not os.path.exists(target):
+        with open(target, 'wb') as output:
+            output.write(data)
+    if compress:
+        write_compressed_variants(target, data)
+    manifest[logical] = served
+    return served
+
+def add_package_to_manifest(static_dir: str, manifest: Dict[str, str], logical_dir: str,
+                            compress: bool = True) -> str:
+    """
+    Copiar um pacote inteiro para static/dist/<pacote>.<hash>/ (hash de todos
+    os arquivos); retorna o diretório servido.
+    """
+    source_dir = os.path.join(static_dir, *logical_dir.split('/'))
+    files = _walk_files(source_dir)
+    contents = {}
+    digest = hashlib.sha256()
+    for path in files:
+        with open(os.path.join(source_dir, *path.split('/')), 'rb') as source:
+            contents[path] = source.read()
+        digest.update(path.encode('utf-8') + b'\0' + contents[path] + b'\0')
+
+    served_dir = f'{DIST_DIR}/{logical_dir}.{digest.hexdigest()[:HASH_LENGTH]}'
+    for path, data in contents.items():
+        target = os.path.join(static_dir, *served_dir.split('/'), *path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            with open(target, 'wb') as output:
+                output.write(data)
+        if compress:
+            write_compressed_variants(target, data)
+        manifest[f'{logical_dir}/{path}'] = f'{served_dir}/{path}'
+    return served_dir
+
+def build_manifest(static_dir: str, compress: bool = True,
+                   extra: Optional[Dict[str, bytes]] = None) -> Dict[str, str]:
+    """
+    Fingerprintar os assets de static_dir em static/dist e gravar o manifesto.
+
+    `extra` permite incluir assets gerados (ex.: bundles) sem arquivo-fonte.
+    Retorna {nome lógico: caminho com hash relativo a static_dir}.
+    """
+    manifest: Dict[str, str] = {}
+    for logical in _source_files(static_dir):
+        with open(os.path.join(static_dir, *logical.split('/')), 'rb') as source:
+            add_to_manifest(static_dir, manifest, logical, source.read(), compress)
+    for logical, data in (extra or {}).items():
+        add_to_manifest(static_dir, manifest, logical, data, compress)
+    for logical_dir in _package_dirs(static_dir):
+        add_package_to_manifest(static_dir, manifest, logical_dir, compress)
+
+    manifest_path = os.path.join(static_dir, DIST_DIR, MANIFEST_FILE)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest
+
+# ================================================
+# RESOLUÇÃO EM TEMPO DE EXECUÇÃO
+# ================================================
+
+class AssetManifest:
+    """
+    Nomes lógicos -> caminhos com hash.
+
+    Sem build (desenvolvimento) o arquivo original é servido com ?v=<hash>
+    do conteúdo, recalculado apenas quando o arquivo muda.
+    """
+
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self._entries: Optional[Dict[str, str]] = None
+        self._immutable: set = set()
+        self._dev_hashes: Dict[str, Tuple[float, str]] = {}
+        self._generators: List[Tuple[str, Callable[[str], Dict[str, bytes]]]] = []
+        self._lock = threading.Lock()
+        self._generate_lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.static_dir, DIST_DIR, MANIFEST_FILE)
+
+    def entries(self) -> Dict[str, str]:
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    entries = {}
+                    if os.path.exists(self.manifest_path):
+                        with open(self.manifest_path, encoding='utf-8') as source:
+                            entries = json.load(source)
+                    self._immutable = set(entries.values())
+                    self._entries = entries
+        return self._entries
+
+    def reload(self) -> None:
+        with self._lock:
+            self._entries = None
+            self._dev_hashes.clear()
+
+    def register(self, logical: str, served: str) -> None:
+        """Registrar asset gerado em tempo de execução (ex.: bundle montado no 1º request)"""
+        self.entries()
+        with self._lock:
+            self._entries[logical] = served
+            self._immutable.add(served)
+
+    def add_generator(self, prefix: str, generate: Callable[[str], Dict[str, bytes]]) -> None:
+        """
+        Assets gerados (ex.: bundles) ausentes do manifesto: no primeiro
+        pedido de um nome com `prefix`, generate(nome) devolve
+        {nome lógico: conteúdo}, gravado em static/dist e registrado.
+        """
+        self._generators.append((prefix, generate))
+
+    def _generate(self, filename: str) -> Optional[str]:
+        for prefix, generate in self._generators:
+            if not filename.startswith(prefix):
+                continue
+            with self._generate_lock:
+                served = self.entries().get(filename)
+                if served:
+                    return served
+                for logical, data in generate(filename).items():
+                    self.register(logical, add_to_manifest(self.static_dir, {}, logical, data))
+                return self.entries().get(filename)
+        return None
+
+    def is_immutable(self, filename: str) -> bool:
+        """Caminho com hash de conteúdo (pode ser cacheado para sempre)"""
+        self.entries()
+        return filename in self._immutable
+
+    def _dev_hash(self, filename: str) -> Optional[str]:
+        path = os.path.join(self.static_dir, *filename.split('/'))
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._dev_hashes.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as source:
+            digest = content_hash(source.read())
+        self._dev_hashes[filename] = (mtime, digest)
+        return digest
+
+    def resolve(self, filename: str) -> Tuple[str, Optional[str]]:
+        """(caminho a servir, parâmetro de versão para o modo sem build)"""
+        served = self.entries().get(filename) or self._generate(filename)
+        if served:
+            return served, None
+        return filename, self._dev_hash(filename)
+
+# ================================================
+# INTEGRAÇÃO COM FLASK
+# ================================================
+
+def _accepted_encodings() -> List[str]:
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = []
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if token:
+            accepted.append(token.strip().lower())
+    return accepted
+
+def send_asset(manifest: AssetManifest, filename: str):
+    """
+    Servir asset: variante .br/.gz conforme Accept-Encoding e cache imutável
+    para caminhos com hash; demais arquivos revalidam por ETag.
+    """
+    immutable = manifest.is_immutable(filename)
+    mimetype = mimetypes.guess_type(filename)[0]
+    response = None
+
+    if immutable:
+        accepted = _accepted_encodings()
+        for encoding, suffix in ENCODINGS:
+            variant = os.path.join(manifest.static_dir, *filename.split('/')) + suffix
+            if encoding in accepted and os.path.exists(variant):
+                response = send_from_directory(manifest.static_dir, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+
+    if response is None:
+        response = send_from_directory(manifest.static_dir, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    if immutable:
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def init_assets(app, static_dir: str, endpoint: str = 'static_files') -> AssetManifest:
+    """
+    Registrar o manifesto (app.extensions['assets']) e a função de template
+    asset_url, compatível com url_for:
+
+        {{ asset_url('app.js') }}
+        {{ asset_url('static_files', filename='app.js') }}
+    """
+    manifest = AssetManifest(static_dir)
+    app.extensions['assets'] = manifest
+
+    def asset_url(endpoint_or_filename: str, filename: Optional[str] = None, **values: Any) -> str:
+        target_endpoint = endpoint
+        if filename is None:
+            filename = endpoint_or_filename
+        else:
+            target_endpoint = endpoint_or_filename
+        served, version = manifest.resolve(filename)
+        if version:
+            values['v'] = version
+        return url_for(target_endpoint, filename=served, **values)
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    return manifest
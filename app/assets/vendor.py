@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Bibliotecas de Terceiros Servidas Localmente
+Versões fixas de Leaflet, Leaflet.draw, GeometryUtil, toGeoJSON e Font
+Awesome copiadas para static/vendor a partir de um cache local (baixadas
+da CDN só quando ausentes), com verificação SRI e arquivo de lock
+"""
+import os
+import json
+import base64
+import hashlib
+import shutil
+import urllib.request
+from typing import Dict, List, Any, Callable, Optional
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+VENDOR_DIR = 'vendor'
+DEFAULT_LOCK_FILE = 'vendor.lock.json'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'webag', 'vendor')
+CACHE_DIR_ENV = 'WEBAG_VENDOR_CACHE'
+
+LOCK_ALGORITHM = 'sha384'
+DOWNLOAD_TIMEOUT = 30
+
+# Pacotes: versão, URL base na CDN e arquivos (caminho local: caminho remoto).
+# `integrity` fixa o hash dos arquivos já conhecidos; os demais são
+# registrados no lock na primeira obtenção (--update-lock) e verificados
+# em todos os builds seguintes.
+VENDOR_PACKAGES: Dict[str, Dict[str, Any]] = {
+    'leaflet': {
+        'version': '1.9.4',
+        'base_url': 'https://unpkg.com/leaflet@{version}/dist/',
+        'files': ['leaflet.js', 'leaflet.css', 'images/layers.png', 'images/layers-2x.png',
+                  'images/marker-icon.png', 'images/marker-icon-2x.png', 'images/marker-shadow.png'],
+        'integrity': {
+            'leaflet.js': 'sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=',
+            'leaflet.css': 'sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY='
+        }
+    },
+    'leaflet-draw': {
+        'version': '1.0.4',
+        'base_url': 'https://unpkg.com/leaflet-draw@{version}/dist/',
+        'files': ['leaflet.draw.js', 'leaflet.draw.css', 'images/spritesheet.png',
+                  'images/spritesheet-2x.png', 'images/spritesheet.svg']
+    },
+    'leaflet-geometryutil': {
+        'version': '0.10.1',
+        'base_url': 'https://cdn.jsdelivr.net/npm/leaflet-geometryutil@{version}/src/',
+        'files': ['leaflet.geometryutil.js']
+    },
+    'togeojson': {
+        'version': '0.16.0',
+        'base_url': 'https://unpkg.com/@mapbox/togeojson@{version}/',
+        'files': ['togeojson.js']
+    },
+    'font-awesome': {
+        'version': '6.4.0',
+        'base_url': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/{version}/',
+        'files': ['css/all.min.css'] + [
+            f'webfonts/fa-{face}.{ext}'
+            for face in ('solid-900', 'regular-400', 'brands-400', 'v4compatibility')
+            for ext in ('woff2', 'ttf')
+        ],
+        'integrity': {
+            'css/all.min.css': 'sha512-iecdLmaskl7CVkqkXNQ/ZH/XLlvWZOJyj7Yy7tcenmpD1ypASozpmT/E0iPtmFIB46ZmdtAc9eNBvH0H/ZpiBw=='
+        }
+    }
+}
+
+class VendorError(Exception):
+    """Falha ao obter ou verificar uma biblioteca de terceiros"""
+
+# ================================================
+# SRI
+# ================================================
+
+def sri_hash(data: bytes, algorithm: str = LOCK_ALGORITHM) -> str:
+    """Hash no formato Subresource Integrity (ex.: sha384-<base64>)"""
+    digest = hashlib.new(algorithm, data).digest()
+    return f'{algorithm}-{base64.b64encode(digest).decode("ascii")}'
+
+def verify_integrity(data: bytes, integrity: str) -> bool:
+    """Conteúdo confere com algum dos hashes (separados por espaço)?"""
+    for expected in integrity.split():
+        algorithm = expected.split('-', 1)[0]
+        if algorithm in ('sha256', 'sha384', 'sha512') and sri_hash(data, algorithm) == expected:
+            return True
+    return False
+
+# ================================================
+# OBTENÇÃO
+# ================================================
+
+def file_url(package: str, path: str, packages: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    spec = (packages or VENDOR_PACKAGES)[package]
+    return spec['base_url'].format(version=spec['version']) + path
+
+def _download(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+        return response.read()
+
+def fetch_cached(package: str, version: str, path: str, url: str, cache_dir: str,
+                 offline: bool = False, download: Callable[[str], bytes] = _download) -> bytes:
+    """Arquivo do cache local (<cache>/<pacote>@<versão>/<caminho>); baixa se ausente"""
+    cached = os.path.join(cache_dir, f'{package}@{version}', *path.split('/'))
+    if os.path.exists(cached):
+        with open(cached, 'rb') as source:
+            return source.read()
+    if offline:
+        raise VendorError(f'{package}@{version}/{path} ausente do cache {cache_dir}')
+    try:
+        data = download(url)
+    except Exception as e:
+        raise VendorError(f'Erro baixando {url}: {e}')
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    temp_path = cached + '.tmp'
+    with open(temp_path, 'wb') as output:
+        output.write(data)
+    os.replace(temp_path, cached)
+    return data
+
+def load_lock(lock_path: str) -> Dict[str, Any]:
+    if not os.path.exists(lock_path):
+        return {}
+    with open(lock_path, encoding='utf-8') as source:
+        return json.load(source)
+
+def vendor_packages(static_dir: str, lock_path: str, cache_dir: Optional[str] = None,
+                    offline: bool = False, update_lock: bool = False,
+                    names: Optional[List[str]] = None,
+                    packages: Optional[Dict[str, Dict[str, Any]]] = None,
+                    download: Callable[[str], bytes] = _download) -> Dict[str, int]:
+    """
+    Copiar os pacotes para static/vendor/<pacote>/ verificando cada arquivo
+    contra o hash fixo do pacote e o do lock.
+
+    Sem update_lock, arquivo ou versão ausente do lock é erro (o lock é
+    a referência versionada do que pode ser servido). Retorna
+    {pacote: arquivos copiados}.
+    """
+    packages = packages or VENDOR_PACKAGES
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+    lock = load_lock(lock_path)
+    copied: Dict[str, int] = {}
+
+    for name in names or sorted(packages):
+        if name not in packages:
+            raise VendorError(f'Pacote desconhecido: {name}')
+        spec = packages[name]
+        locked = lock.get(name, {})
+        if locked.get('version') != spec['version']:
+            if not update_lock:
+                raise VendorError(f"{name}@{spec['version']} não está no lock: execute com --update-lock")
+            locked = {}
+        locked_files = dict(locked.get('files', {}))
+
+        staged: Dict[str, bytes] = {}
+        for path in spec['files']:
+            url = file_url(name, path, packages)
+            data = fetch_cached(name, spec['version'], path, url, cache_dir, offline, download)
+
+            pinned = spec.get('integrity', {}).get(path)
+            if pinned and not verify_integrity(data, pinned):
+                raise VendorError(f'{name}/{path}: hash não confere com o SRI fixado ({pinned})')
+
+            entry = locked_files.get(path)
+            if entry:
+                if not verify_integrity(data, entry['integrity']):
+                    raise VendorError(f"{name}/{path}: hash não confere com o lock ({entry['integrity']})")
+            elif not update_lock:
+                raise VendorError(f'{name}/{path} não está no lock: execute com --update-lock')
+            else:
+                locked_files[path] = {'url': url, 'integrity': sri_hash(data)}
+            staged[path] = data
+
+        # Só substitui o pacote em static/vendor depois de tudo verificado
+        target_dir = os.path.join(static_dir, VENDOR_DIR, name)
+        shutil.rmtree(target_dir, ignore_errors=True)
+        for path, data in staged.items():
+            target = os.path.join(target_dir, *path.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as output:
+                output.write(data)
+
+        lock[name] = {
+            'version': spec['version'],
+            'files': {path: locked_files[path] for path in spec['files']}
+        }
+        copied[name] = len(staged)
+
+    if update_lock:
+        with open(lock_path, 'w', encoding='utf-8') as output:
+            json.dump(lock, output, indent=2, sort_keys=True)
+            output.write('\n')
+    return copied
+
+# ================================================
+# INTEGRAÇÃO COM FLASK
+# ================================================
+
+def init_vendor(app, manifest, packages: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    """
+    Função de template vendor_url(pacote, arquivo): cópia local (com hash,
+    via asset_url) quando presente em static/vendor, senão a URL fixada na CDN.
+    """
+    packages = packages or VENDOR_PACKAGES
+
+    def vendor_url(package: str, path: str) -> str:
+        logical = f'{VENDOR_DIR}/{package}/{path}'
+        local = os.path.join(manifest.static_dir, VENDOR_DIR, package, *path.split('/'))
+        if logical in manifest.entries() or os.path.exists(local):
+            return app.jinja_env.globals['asset_url'](logical)
+        return file_url(package, path, packages)
+
+    app.jinja_env.globals['vendor_url'] = vendor_url
@@ -12,10 +12,10 @@ from typing import Dict, List, Optional, Any
 # Imports opcionais com fallbacks
 try:
     from flask_sqlalchemy import SQLAlchemy
-    from sqlalchemy import event, text
+    from sqlalchemy import event, text, inspect
     from sqlalchemy.ext.hybrid import hybrid_property
     from sqlalchemy.dialects.postgresql import UUID
-    from sqlalchemy.orm import validates
+    from sqlalchemy.orm import validates, Session
     SQLALCHEMY_AVAILABLE = True
 except ImportError:
     SQLALCHEMY_AVAILABLE = False
@@ -32,6 +32,18 @@ try:
 except ImportError:
     WERKZEUG_AVAILABLE = False
 
+from app.services.gleba_summary import GlebaSummaryTracker
+from app.services.layer_statistics import bump_layer_data_version
+from app.services.feature_counts import register_feature_count_listeners
+from app.services.extents import get_project_extent, register_extent_listeners
+from app.services.feature_metrics import feature_metric_columns
+from app.services.access import register_access_invalidation
+from app.services.version_blobs import externalize_if_large, load_version_config
+from app.services.layer_versioning import (
+    SNAPSHOT_STORAGE, DELTA_STORAGE, mark_features_dirty, build_version_changes,
+    clear_dirty_features, materialize_version
+)
+
 # Import do db global
 try:
     from app import db
@@ -265,9 +277,8 @@ if SQLALCHEMY_AVAILABLE:
             if self.bbox_coordinates:
                 return self.bbox_coordinates
             
-            # Calcular bbox a partir das layers
-            # TODO: Implementar cálculo automático
-            return None
+            # Calcular bbox a partir das extensões das layers
+            return get_project_extent(db.engine, self.id)
 
     # ================================================
     # LAYER MANAGEMENT MODELS
@@ -293,12 +304,60 @@ if SQLALCHEMY_AVAILABLE:
         layers = db.relationship('Layer', backref='layer_group', lazy='dynamic')
         
         def get_all_children(self) -> List['LayerGroup']:
-            """Obter todos os grupos filhos recursivamente"""
+            """Obter todos os grupos filhos recursivamente (uma única CTE recursiva)"""
+            tree = db.session.query(LayerGroup.id).filter(
+                LayerGroup.parent_group_id == self.id
+            ).cte(name='group_tree', recursive=True)
+            tree = tree.union_all(
+                db.session.query(LayerGroup.id).filter(LayerGroup.parent_group_id == tree.c.id)
+            )
+            
+            descendants = LayerGroup.query.filter(
+                LayerGroup.id.in_(db.session.query(tree.c.id))
+            ).order_by(LayerGroup.display_order).all()
+            
+            # Reordenar em pré-ordem (pai antes dos filhos) em memória
+            by_parent: Dict[str, List['LayerGroup']] = {}
+            for group in descendants:
+                by_parent.setdefault(group.parent_group_id, []).append(group)
+            
             children = []
-            for child in self.children:
-                children.append(child)
-                children.extend(child.get_all_children())
+            stack = list(reversed(by_parent.get(self.id, [])))
+            while stack:
+                group = stack.pop()
+                children.append(group)
+                stack.extend(reversed(by_parent.get(group.id, [])))
             return children
+        
+        @staticmethod
+        def build_project_tree(project_id: str) -> List[Dict[str, Any]]:
+            """Montar árvore de grupos e camadas do projeto com duas consultas planas"""
+            groups = LayerGroup.query.filter_by(
+                project_id=project_id
+            ).order_by(LayerGroup.display_order).all()
+            
+            project_group_ids = db.session.query(LayerGroup.id).filter(
+                LayerGroup.project_id == project_id
+            )
+            layers = Layer.query.filter(
+                Layer.layer_group_id.in_(project_group_ids)
+            ).order_by(Layer.display_order).all()
+            
+            nodes = {
+                group.id: {**group.to_dict(), 'children': [], 'layers': []}
+                for group in groups
+            }
+            
+            for layer in layers:
+                nodes[layer.layer_group_id]['layers'].append(layer.to_dict())
+            
+            roots = []
+            for group in groups:
+                if group.parent_group_id is None:
+                    roots.append(nodes[group.id])
+                elif group.parent_group_id in nodes:
+                    nodes[group.parent_group_id]['children'].append(nodes[group.id])
+            return roots
 
     class Layer(BaseModel, db.Model):
         """Modelo de Camada (Enhanced)"""
@@ -324,9 +383,11 @@ if SQLALCHEMY_AVAILABLE:
         
         # Metadados
         srid = db.Column(db.String(20), default='EPSG:4326')
-        bbox_coordinates = db.Column(db.JSON)
+        bbox_coordinates = db.Column(db.JSON)  # Mantida pelas escritas de features
+        bbox_dirty = db.Column(db.Boolean, default=False)  # Recalcular extensão na próxima leitura
         feature_count = db.Column(db.Integer, default=0)
         file_size_bytes = db.Column(db.Integer, default=0)
+        data_version = db.Column(db.Integer, default=0, nullable=False)  # Incrementada a cada escrita de features/versões
         schema_definition = db.Column(db.JSON, default=dict)
         
         # Controle de acesso
@@ -405,25 +466,37 @@ if SQLALCHEMY_AVAILABLE:
             return user.has_privilege('canEditLayers')
         
         def create_version(self, version_name: str, description: str, user: User) -> 'LayerVersion':
-            """Criar nova versão da camada"""
-            version_number = self.versions.count() + 1
+            """Criar nova versão da camada (apenas features alteradas desde a versão pai)"""
+            parent = self.versions.order_by(LayerVersion.version_number.desc()).options(
+                db.defer(LayerVersion.layer_config)
+            ).first()
+            version_number = parent.version_number + 1 if parent else 1
+            
+            changes, consumed_marks = build_version_changes(db.session, self, parent)
             
             layer_config = {
                 'layer_data': self.to_dict(),
-                'features': [f.to_dict() for f in self.features.filter_by(is_current=True)],
                 'created_at': datetime.utcnow().isoformat()
             }
             
             version = LayerVersion(
+                id=os.urandom(16).hex(),
                 layer_id=self.id,
                 version_number=version_number,
                 version_name=version_name,
                 description=description,
                 layer_config=layer_config,
                 feature_count=self.feature_count,
+                parent_version_id=parent.id if parent else None,
+                storage_type=DELTA_STORAGE,
                 created_by=user.id
             )
             
+            for change in changes:
+                version.changes.append(LayerVersionChange(version_id=version.id, **change))
+            
+            clear_dirty_features(db.session, self.id, consumed_marks)
+            
             return version
 
     class Feature(BaseModel, db.Model):
@@ -442,6 +515,10 @@ if SQLALCHEMY_AVAILABLE:
         length_m = db.Column(db.Float)
         perimeter_m = db.Column(db.Float)
         centroid_coordinates = db.Column(db.JSON)
+        bbox_min_x = db.Column(db.Float)
+        bbox_min_y = db.Column(db.Float)
+        bbox_max_x = db.Column(db.Float)
+        bbox_max_y = db.Column(db.Float)
         
         # Versionamento
         version = db.Column(db.Integer, default=1)
@@ -465,7 +542,7 @@ if SQLALCHEMY_AVAILABLE:
         
         def to_geojson(self) -> Dict[str, Any]:
             """Converter para formato GeoJSON"""
-            properties = self.properties.copy()
+            properties = dict(self.properties or {})
             properties.update({
                 'id': self.id,
                 'layer_id': self.layer_id,
@@ -485,15 +562,14 @@ if SQLALCHEMY_AVAILABLE:
             }
         
         def calculate_metrics(self):
-            """Calcular métricas geométricas"""
-            # TODO: Implementar cálculos baseados na geometria
-            # Por enquanto, placeholder
-            if self.feature_type == GeometryType.POLYGON:
-                # Calcular área e perímetro
-                pass
-            elif self.feature_type == GeometryType.LINESTRING:
-                # Calcular comprimento
-                pass
+            """Calcular métricas geométricas (apenas quando a geometria muda)"""
+            if not inspect(self).attrs.geometry.history.has_changes() and self.centroid_coordinates is not None \
+                    and self.bbox_min_x is not None:
+                return
+            
+            # Área/comprimento/perímetro geodésicos, centroide e bounding box
+            for column, value in feature_metric_columns(self.geometry).items():
+                setattr(self, column, value)
 
     # ================================================
     # SPECIALIZED MODELS
@@ -632,6 +708,18 @@ if SQLALCHEMY_AVAILABLE:
             # Usar algoritmo do app.py existente
             pass
 
+    class GlebaSummary(db.Model):
+        """Resumo agregado de glebas (mantido incrementalmente)"""
+        __tablename__ = 'gleba_summaries'
+        
+        scope_id = db.Column(db.String(100), primary_key=True)  # project_id
+        dimension = db.Column(db.String(20), primary_key=True)  # bairro, quadra, zoneamento, *
+        dimension_value = db.Column(db.String(100), primary_key=True, default='')
+        gleba_count = db.Column(db.Integer, nullable=False, default=0)
+        area_total = db.Column(db.Float, nullable=False, default=0)
+        valor_venal_total = db.Column(db.Float, nullable=False, default=0)
+        valor_iptu_total = db.Column(db.Float, nullable=False, default=0)
+
     # ================================================
     # AUDIT & VERSIONING MODELS
     # ================================================
@@ -652,6 +740,12 @@ if SQLALCHEMY_AVAILABLE:
         user_agent = db.Column(db.Text)
         timestamp = db.Column(db.DateTime, default=datetime.utcnow)
         
+        __table_args__ = (
+            db.Index('idx_audit_table_record', 'table_name', 'record_id'),
+            db.Index('idx_audit_timestamp', 'timestamp'),
+            db.Index('idx_audit_user_timestamp', 'user_id', 'timestamp'),
+        )
+        
         # Relacionamentos
         user = db.relationship('User', backref='audit_logs')
 
@@ -664,8 +758,11 @@ if SQLALCHEMY_AVAILABLE:
         version_number = db.Column(db.Integer, nullable=False)
         version_name = db.Column(db.String(100))
         description = db.Column(db.Text)
-        layer_config = db.Column(db.JSON, nullable=False)
+        layer_config = db.deferred(db.Column(db.JSON, nullable=False))  # Carregada só ao abrir a versão
+        config_hash = db.Column(db.String(64))  # Configuração grande em layer_version_blobs
         feature_count = db.Column(db.Integer, default=0)
+        parent_version_id = db.Column(db.String(32), db.ForeignKey('layer_versions.id'))
+        storage_type = db.Column(db.String(20), default=SNAPSHOT_STORAGE)  # snapshot, delta
         created_by = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         
@@ -675,6 +772,98 @@ if SQLALCHEMY_AVAILABLE:
         
         # Relacionamentos
         creator = db.relationship('User', backref='created_versions')
+        changes = db.relationship('LayerVersionChange', backref='version', lazy='dynamic', cascade='all, delete-orphan')
+        
+        def get_config(self) -> Dict[str, Any]:
+            """Configuração armazenada da versão (inline ou do blob store)"""
+            return load_version_config(db.session, self)
+        
+        def materialize(self) -> Dict[str, Any]:
+            """Configuração completa da versão (features reconstruídas a partir dos deltas)"""
+            return materialize_version(db.session, self)
+    
+    class LayerVersionBlob(db.Model):
+        """Configuração de versão comprimida, endereçada pelo hash do conteúdo"""
+        __tablename__ = 'layer_version_blobs'
+        
+        content_hash = db.Column(db.String(64), primary_key=True)  # sha256 do JSON
+        compression = db.Column(db.String(10), nullable=False, default='zlib')
+        size_bytes = db.Column(db.Integer, nullable=False)
+        data = db.Column(db.LargeBinary, nullable=False)
+    
+    class LayerVersionChange(db.Model):
+        """Feature alterada em uma versão delta (upsert com os dados, ou delete)"""
+        __tablename__ = 'layer_version_changes'
+        
+        id = db.Column(db.String(32), primary_key=True, default=lambda: os.urandom(16).hex())
+        version_id = db.Column(db.String(32), db.ForeignKey('layer_versions.id'), nullable=False)
+        feature_id = db.Column(db.String(32), nullable=False)
+        change_type = db.Column(db.String(10), nullable=False)  # upsert, delete
+        feature_data = db.Column(db.JSON)
+        
+        __table_args__ = (
+            db.UniqueConstraint('version_id', 'feature_id'),
+        )
+    
+    class LayerDirtyFeature(db.Model):
+        """Features alteradas desde a última versão da camada"""
+        __tablename__ = 'layer_dirty_features'
+        
+        layer_id = db.Column(db.String(32), primary_key=True)
+        feature_id = db.Column(db.String(32), primary_key=True)
+        mark_id = db.Column(db.String(32))  # renovado a cada nova alteração da feature
+
+    # ================================================
+    # IMPORT JOBS
+    # ================================================
+
+    class ImportJob(BaseModel, db.Model):
+        """Importação de KML/KMZ em segundo plano (fila persistente no banco)"""
+        __tablename__ = 'import_jobs'
+        
+        id = db.Column(db.String(32), primary_key=True, default=lambda: os.urandom(16).hex())
+        layer_id = db.Column(db.String(32), db.ForeignKey('layers.id'), nullable=False)
+        created_by = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False)
+        filename = db.Column(db.String(255), nullable=False)
+        file_path = db.Column(db.Text, nullable=False)
+        file_size = db.Column(db.BigInteger, default=0)
+        status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+        attempts = db.Column(db.Integer, nullable=False, default=0)
+        worker = db.Column(db.String(100))  # worker que detém o job enquanto running
+        features_total = db.Column(db.Integer)  # conhecido após a validação
+        features_read = db.Column(db.Integer, nullable=False, default=0)  # ponto de retomada
+        features_inserted = db.Column(db.Integer, nullable=False, default=0)
+        features_skipped = db.Column(db.Integer, nullable=False, default=0)
+        errors = db.Column(db.JSON)
+        message = db.Column(db.Text)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        started_at = db.Column(db.DateTime)
+        heartbeat_at = db.Column(db.DateTime)
+        finished_at = db.Column(db.DateTime)
+        
+        __table_args__ = (
+            db.Index('idx_import_jobs_status_created', 'status', 'created_at'),
+        )
+
+    class UploadSession(BaseModel, db.Model):
+        """Upload em blocos (retomável) de um arquivo para importação"""
+        __tablename__ = 'upload_sessions'
+        
+        id = db.Column(db.String(32), primary_key=True, default=lambda: os.urandom(16).hex())
+        layer_id = db.Column(db.String(32), db.ForeignKey('layers.id'), nullable=False)
+        created_by = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False)
+        filename = db.Column(db.String(255), nullable=False)
+        file_path = db.Column(db.Text, nullable=False)
+        total_size = db.Column(db.BigInteger, nullable=False)
+        received = db.Column(db.BigInteger, nullable=False, default=0)  # próximo offset esperado
+        status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, completed
+        job_id = db.Column(db.String(32), db.ForeignKey('import_jobs.id'))
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+        
+        __table_args__ = (
+            db.Index('idx_upload_sessions_status_updated', 'status', 'updated_at'),
+        )
 
     # ================================================
     # EVENT LISTENERS
@@ -692,6 +881,59 @@ if SQLALCHEMY_AVAILABLE:
         """Calcular métricas da feature automaticamente"""
         target.calculate_metrics()
 
+    @event.listens_for(Feature, 'after_insert')
+    @event.listens_for(Feature, 'after_delete')
+    @event.listens_for(LayerVersion, 'after_insert')
+    @event.listens_for(LayerVersion, 'after_delete')
+    def bump_layer_on_write(mapper, connection, target):
+        """Invalidar estatísticas da camada quando features/versões mudam"""
+        bump_layer_data_version(connection, [target.layer_id])
+
+    @event.listens_for(LayerVersion, 'before_insert')
+    def store_large_version_config(mapper, connection, target):
+        """Mover configurações grandes para o blob store comprimido"""
+        if target.config_hash:
+            return
+        content_hash = externalize_if_large(connection, target.layer_config)
+        if content_hash:
+            target.config_hash = content_hash
+            target.layer_config = {}
+
+    @event.listens_for(Feature, 'after_update')
+    def bump_layer_on_feature_update(mapper, connection, target):
+        """Invalidar estatísticas da camada (e da anterior, se a feature mudou de camada)"""
+        history = inspect(target).attrs.layer_id.history
+        bump_layer_data_version(connection, [target.layer_id] + list(history.deleted or []))
+
+    @event.listens_for(Feature, 'after_insert')
+    @event.listens_for(Feature, 'after_update')
+    @event.listens_for(Feature, 'after_delete')
+    def mark_feature_dirty(mapper, connection, target):
+        """Registrar feature alterada para a próxima versão (delta) da camada"""
+        history = inspect(target).attrs.layer_id.history
+        layer_ids = [target.layer_id] + list(history.deleted or [])
+        mark_features_dirty(connection, [(layer_id, target.id) for layer_id in layer_ids])
+
+    # Extensões das camadas: expandidas a cada flush, recalculadas quando sujas
+    register_extent_listeners(Session, Feature)
+
+    # Contagem incremental de features (ignorada quando o banco tem os triggers SQL)
+    register_feature_count_listeners(Feature)
+
+    # Cache de verificações de acesso: invalidar quando camadas/projetos mudam
+    register_access_invalidation(Layer, Project)
+
+    # Resumo de glebas por bairro/quadra/zoneamento, atualizado a cada escrita
+    gleba_summary_tracker = GlebaSummaryTracker({
+        'bairro': 'endereco_bairro',
+        'quadra': 'endereco_quadra',
+        'zoneamento': 'zoneamento',
+        'area': 'area_total_m2',
+        'valor_venal': 'valor_venal',
+        'valor_iptu': 'valor_iptu'
+    }, scope_field='project_id')
+    gleba_summary_tracker.register(Gleba)
+
 else:
     # Fallback classes quando SQLAlchemy não está disponível
     class Organization:
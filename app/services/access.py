@@ -0,0 +1,171 @@
+"""
+WEBAG Professional - Resolução de Acesso a Projetos e Camadas
+Verifica se projetos/camadas pertencem à organização do usuário com cache
+por request e cache curto por worker, invalidado quando camadas ou
+projetos mudam
+"""
+
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from sqlalchemy import event, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+ACCESS_CACHE_TTL = 30.0      # segundos
+ACCESS_CACHE_SIZE = 4096
+
+ENVIRON_KEY = 'webag.access_resolver'
+
+PROJECT_SCOPE = 'project'
+LAYER_SCOPE = 'layer'
+
+# Projeto de uma camada e organização desse projeto
+LAYER_ACCESS_SQL = """
+    SELECT l.project_id AS project_id, p.organization_id AS organization_id
+    FROM layers l JOIN projects p ON p.id = l.project_id
+    WHERE l.id = :id
+"""
+
+PROJECT_ACCESS_SQL = "SELECT id AS project_id, organization_id FROM projects WHERE id = :id"
+
+# ================================================
+# CACHE POR WORKER
+# ================================================
+
+class AccessCache:
+    """
+    Cache TTL de verificações de acesso: (usuário, organização, escopo, id)
+    -> projeto do recurso (None = sem acesso).
+    """
+
+    def __init__(self, ttl: float = ACCESS_CACHE_TTL, max_size: int = ACCESS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[Tuple[str, str, str, str], Tuple[float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str, str, str]) -> Tuple[bool, Optional[str]]:
+        """(encontrado, projeto)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, project_id = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False, None
+            return True, project_id
+
+    def set(self, key: Tuple[str, str, str, str], project_id: Optional[str]) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._evict()
+            self._entries[key] = (time.monotonic() + self.ttl, project_id)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._entries.items() if expires < now]
+        for key in expired or list(self._entries)[:self.max_size // 4]:
+            del self._entries[key]
+
+    def invalidate(self, scope: str, resource_id: str) -> None:
+        """Remover entradas do recurso (projeto: também as das suas camadas)"""
+        with self._lock:
+            for key in [k for k, (_, project_id) in self._entries.items()
+                        if (k[2] == scope and k[3] == resource_id)
+                        or (scope == PROJECT_SCOPE and project_id == resource_id)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+# Cache global do worker
+access_cache = AccessCache()
+
+def register_access_invalidation(layer_model, project_model) -> None:
+    """Invalidar o cache quando camadas ou projetos são alterados/removidos"""
+    if not SQLALCHEMY_AVAILABLE:
+        return
+
+    @event.listens_for(layer_model, 'after_update')
+    @event.listens_for(layer_model, 'after_delete')
+    def invalidate_layer_access(mapper, connection, target):
+        access_cache.invalidate(LAYER_SCOPE, target.id)
+
+    @event.listens_for(project_model, 'after_update')
+    @event.listens_for(project_model, 'after_delete')
+    def invalidate_project_access(mapper, connection, target):
+        access_cache.invalidate(PROJECT_SCOPE, target.id)
+
+# ================================================
+# RESOLVER POR REQUEST
+# ================================================
+
+class AccessResolver:
+    """
+    Verificações de acesso do usuário em um request.
+
+    Cada projeto/camada é resolvido no máximo uma vez por request e, entre
+    requests, reaproveitado do cache do worker enquanto válido.
+    """
+
+    def __init__(self, connection_factory, user, cache: Optional[AccessCache] = access_cache):
+        self._connection_factory = connection_factory
+        self.user_id = user.id
+        self.organization_id = user.organization_id
+        self.privileges: Dict[str, Any] = dict(user.privileges or {})
+        self.cache = cache
+        self._resolved: Dict[Tuple[str, str], Optional[str]] = {}
+        self.queries = 0
+
+    def has_privilege(self, privilege: str) -> bool:
+        return bool(self.privileges.get(privilege, False))
+
+    def _resolve(self, scope: str, resource_id: str) -> Optional[str]:
+        """Projeto do recurso se pertencer à organização do usuário"""
+        local_key = (scope, resource_id)
+        if local_key in self._resolved:
+            return self._resolved[local_key]
+
+        cache_key = (self.user_id, self.organization_id, scope, resource_id)
+        found, project_id = self.cache.get(cache_key) if self.cache else (False, None)
+        if not found:
+            sql = LAYER_ACCESS_SQL if scope == LAYER_SCOPE else PROJECT_ACCESS_SQL
+            row = self._connection_factory().execute(text(sql), {'id': resource_id}).first()
+            self.queries += 1
+            project_id = row.project_id if row and row.organization_id == self.organization_id else None
+            if self.cache:
+                self.cache.set(cache_key, project_id)
+
+        self._resolved[local_key] = project_id
+        return project_id
+
+    def can_access_project(self, project_id: str) -> bool:
+        return self._resolve(PROJECT_SCOPE, project_id) is not None
+
+    def can_access_layer(self, layer_id: str) -> bool:
+        return self._resolve(LAYER_SCOPE, layer_id) is not None
+
+    def layer_project(self, layer_id: str) -> Optional[str]:
+        """Projeto da camada (None se inacessível)"""
+        return self._resolve(LAYER_SCOPE, layer_id)
+
+def get_access_resolver(environ: Dict[str, Any], connection_factory, user) -> AccessResolver:
+    """
+    Resolver do request atual, guardado no environ WSGI do request
+    (um contexto de aplicação pode atravessar vários requests; o environ não).
+    """
+    resolver = environ.get(ENVIRON_KEY)
+    if resolver is None or resolver.user_id != user.id:
+        resolver = AccessResolver(connection_factory, user)
+        environ[ENVIRON_KEY] = resolver
+    return resolver
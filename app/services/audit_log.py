@@ -0,0 +1,138 @@
+"""
+WEBAG Professional - Consulta e Retenção do Log de Auditoria
+Cursores keyset para paginação e arquivamento mensal comprimido de
+entradas antigas
+"""
+
+import os
+import gzip
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from sqlalchemy import DateTime, bindparam, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DEFAULT_RETENTION_DAYS = 180
+ARCHIVE_PREFIX = 'audit'
+
+AUDIT_COLUMNS = ('id', 'table_name', 'record_id', 'operation', 'old_values', 'new_values',
+                 'changed_fields', 'user_id', 'user_ip', 'user_agent', 'timestamp')
+
+# ================================================
+# PAGINAÇÃO (KEYSET)
+# ================================================
+
+def encode_cursor(timestamp: datetime, entry_id: str) -> str:
+    """Cursor opaco para a posição (timestamp, id) da última entrada da página"""
+    raw = json.dumps([timestamp.isoformat(), entry_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """(timestamp, id) de um cursor; ValueError se inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, entry_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(entry_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f'Cursor inválido: {cursor}') from e
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Data/hora ISO 8601 de um parâmetro de consulta (ValueError se inválida)"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def clamp_page_size(value: Optional[str]) -> int:
+    try:
+        size = int(value) if value else DEFAULT_PAGE_SIZE
+    except ValueError:
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+# ================================================
+# RETENÇÃO
+# ================================================
+
+def archive_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f'{ARCHIVE_PREFIX}-{month}.jsonl.gz')
+
+def _row_to_entry(row) -> Dict[str, Any]:
+    entry = dict(row._mapping)
+    for column in ('old_values', 'new_values', 'changed_fields'):
+        if isinstance(entry[column], (str, bytes)):
+            entry[column] = json.loads(entry[column])
+    timestamp = entry['timestamp']
+    entry['timestamp'] = timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+    return entry
+
+def _append_archive(path: str, entries: List[Dict[str, Any]]) -> None:
+    """Anexar entradas (novo membro gzip) e garantir a escrita em disco"""
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+            for entry in entries:
+                archive.write((json.dumps(entry, default=str) + '\n').encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+def archive_audit_log(connection, archive_dir: str, before: datetime,
+                      batch_size: int = 1000, commit: bool = False) -> Dict[str, int]:
+    """
+    Mover entradas anteriores a `before` para arquivos mensais comprimidos
+    (audit-AAAA-MM.jsonl.gz) e removê-las da tabela em lotes.
+
+    Cada lote é gravado no arquivo antes de ser removido: uma interrupção
+    pode repetir entradas no arquivo (mesmo id), nunca perdê-las. Com
+    commit=True cada lote é confirmado (connection de engine.connect()),
+    mantendo as transações curtas na tabela quente.
+    Retorna o número de entradas arquivadas por mês.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    select_sql = text(f"""
+        SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log
+        WHERE timestamp < :before
+        ORDER BY timestamp, id LIMIT :batch_size
+    """).bindparams(bindparam('before', type_=DateTime))
+    delete_sql = text("DELETE FROM audit_log WHERE id IN :ids").bindparams(bindparam('ids', expanding=True))
+
+    archived: Dict[str, int] = {}
+    while True:
+        rows = connection.execute(select_sql, {'before': before, 'batch_size': batch_size}).all()
+        if not rows:
+            break
+
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            entry = _row_to_entry(row)
+            by_month.setdefault(str(entry['timestamp'])[:7], []).append(entry)
+
+        for month, entries in by_month.items():
+            _append_archive(archive_path(archive_dir, month), entries)
+            archived[month] = archived.get(month, 0) + len(entries)
+
+        connection.execute(delete_sql, {'ids': [row.id for row in rows]})
+        if commit:
+            connection.commit()
+    return archived
+
+def read_archive(path: str) -> List[Dict[str, Any]]:
+    """Entradas de um arquivo mensal (sem repetições de id)"""
+    entries: Dict[str, Dict[str, Any]] = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry['id']] = entry
+    return list(entries.values())
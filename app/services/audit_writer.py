@@ -0,0 +1,361 @@
+"""
+WEBAG Professional - Gravação Assíncrona do Log de Auditoria
+Eventos enfileirados em memória e gravados em lotes por uma thread de fundo,
+com arquivo de contingência (spill) quando a fila enche ou o banco falha
+"""
+
+import os
+import glob
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from sqlalchemy import bindparam, select
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# Trava de arquivo: fcntl (POSIX) ou msvcrt (Windows)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    import msvcrt
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_init_lock = threading.Lock()
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+EXTENSION_KEY = 'audit_writer'
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0     # segundos
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_PUT_TIMEOUT = 0.05       # espera máxima do request quando a fila está cheia
+DEFAULT_SPILL_FILE = 'audit_spill.jsonl'
+
+# ================================================
+# DIFERENÇAS COMPACTAS
+# ================================================
+
+def _without_empty(values: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not values:
+        return None
+    return {k: v for k, v in values.items() if v is not None}
+
+def compact_changes(old_values: Optional[Dict[str, Any]],
+                    new_values: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict], Optional[Dict], List[str]]:
+    """
+    (old_values, new_values, changed_fields) só com os campos alterados.
+
+    Em atualizações guarda apenas os campos que mudaram; em inserções e
+    remoções guarda o registro sem os campos vazios.
+    """
+    if old_values and new_values:
+        changed = sorted(k for k in set(old_values) | set(new_values)
+                         if old_values.get(k) != new_values.get(k))
+        return ({k: old_values.get(k) for k in changed},
+                {k: new_values.get(k) for k in changed},
+                changed)
+    return _without_empty(old_values), _without_empty(new_values), []
+
+def build_audit_event(operation: str, table_name: str, record_id: str,
+                      old_values: Optional[Dict[str, Any]] = None,
+                      new_values: Optional[Dict[str, Any]] = None,
+                      user_id: Optional[str] = None, user_ip: Optional[str] = None,
+                      user_agent: Optional[str] = None) -> Dict[str, Any]:
+    """Evento de auditoria pronto para gravação (linha de audit_log)"""
+    old_diff, new_diff, changed = compact_changes(old_values, new_values)
+    return {
+        'id': os.urandom(16).hex(),
+        'table_name': table_name,
+        'record_id': record_id,
+        'operation': operation,
+        'old_values': old_diff,
+        'new_values': new_diff,
+        'changed_fields': changed,
+        'user_id': user_id,
+        'user_ip': user_ip,
+        'user_agent': user_agent,
+        'timestamp': datetime.utcnow()
+    }
+
+# ================================================
+# WRITER
+# ================================================
+
+class AuditWriter:
+    """
+    Fila de eventos de auditoria gravados em lotes (um INSERT executemany
+    por lote) fora da transação do request.
+
+    Com a fila cheia o request espera no máximo put_timeout; depois disso,
+    e sempre que a gravação falhar, os eventos vão para o arquivo de spill,
+    que é regravado no banco ao iniciar o writer. Cada processo (worker do
+    gunicorn) reivindica o spill com os.rename antes de regravá-lo.
+    """
+
+    def __init__(self, engine, table, spill_path: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_queue: int = DEFAULT_QUEUE_SIZE,
+                 put_timeout: float = DEFAULT_PUT_TIMEOUT,
+                 synchronous: bool = False):
+        self.engine = engine
+        self.table = table
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.synchronous = synchronous
+        self.stats = {'enqueued': 0, 'written': 0, 'spilled': 0, 'batches': 0}
+
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------- Ciclo de vida ----------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Iniciar a thread de gravação (regrava antes o spill pendente)"""
+        if self.synchronous:
+            self.replay_spill()
+            return
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Parar a thread e gravar (ou salvar em spill) o que restar na fila"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        self.replay_spill()
+        while not self._stop.is_set():
+            batch = self._next_batch(self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    # ---------------- Enfileiramento ----------------
+
+    def _count(self, **deltas: int) -> None:
+        """Atualizar stats (requests e thread de gravação incrementam juntos)"""
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Enfileirar evento; retorna False se foi para o spill (fila cheia)"""
+        self._count(enqueued=1)
+        if self.synchronous:
+            self._write([event])
+            return True
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self._spill([event])
+            return False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def flush(self) -> int:
+        """Gravar imediatamente tudo o que está na fila; retorna eventos processados"""
+        total = 0
+        while True:
+            batch = self._next_batch(None)
+            if not batch:
+                return total
+            self._write(batch)
+            total += len(batch)
+
+    # ---------------- Gravação ----------------
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(self.table.insert(), rows)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        with self._write_lock:
+            try:
+                self._insert(batch)
+                self._count(written=len(batch), batches=1)
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote de auditoria ({len(batch)} eventos): {e}")
+                self._spill(batch)
+
+    # ---------------- Spill ----------------
+
+    def _spill(self, events: List[Dict[str, Any]]) -> None:
+        """Anexar eventos ao arquivo de spill (fsync: sobrevive a queda do processo)"""
+        with self._spill_lock:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                for event in events:
+                    spill.write(json.dumps(event, default=_json_default) + '\n')
+                spill.flush()
+                os.fsync(spill.fileno())
+            self._count(spilled=len(events))
+
+    def replay_spill(self) -> int:
+        """
+        Regravar no banco os eventos do spill (ignora os já gravados).
+
+        O spill é renomeado para um nome deste processo antes da leitura
+        (os.rename é atômico: só um worker o reivindica). Arquivos já
+        reivindicados que sobraram de um replay que falhou são regravados
+        por quem obtiver a trava deles.
+        """
+        claimed = f"{self.spill_path}.{os.getpid()}.{os.urandom(4).hex()}.replay"
+        with self._spill_lock:
+            try:
+                os.rename(self.spill_path, claimed)
+            except FileNotFoundError:
+                pass
+
+        written = 0
+        for path in sorted(glob.glob(glob.escape(self.spill_path) + '.*replay')):
+            written += self._replay_file(path)
+        return written
+
+    def _replay_file(self, path: str) -> int:
+        try:
+            spill = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            return 0  # regravado e removido por outro processo
+        with spill:
+            if not _try_lock(spill):
+                return 0  # outro processo está regravando este arquivo
+            try:
+                events = [_load_event(line) for line in spill if line.strip()]
+                written = 0
+                try:
+                    with self._write_lock:
+                        for start in range(0, len(events), self.batch_size):
+                            batch = events[start:start + self.batch_size]
+                            existing = self._existing_ids([e['id'] for e in batch])
+                            batch = [e for e in batch if e['id'] not in existing]
+                            if batch:
+                                self._insert(batch)
+                                written += len(batch)
+                except Exception as e:
+                    # Mantém o arquivo para a próxima tentativa
+                    logger.error(f"Erro ao regravar spill de auditoria: {e}")
+                    self._count(written=written)
+                    return written
+            finally:
+                _unlock(spill)
+
+        # Eventos já confirmados: quem abrir o arquivo até a remoção não os duplica
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self._count(written=written)
+        return written
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        statement = select(self.table.c.id).where(self.table.c.id.in_(bindparam('ids', expanding=True)))
+        with self.engine.connect() as connection:
+            return {row.id for row in connection.execute(statement, {'ids': ids})}
+
+def _try_lock(handle) -> bool:
+    """Trava exclusiva não bloqueante de um arquivo de spill reivindicado"""
+    try:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+def _unlock(handle) -> None:
+    if FCNTL_AVAILABLE:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _load_event(line: str) -> Dict[str, Any]:
+    event = json.loads(line)
+    if isinstance(event.get('timestamp'), str):
+        event['timestamp'] = datetime.fromisoformat(event['timestamp'])
+    return event
+
+# ================================================
+# INTEGRAÇÃO COM FLASK
+# ================================================
+
+def init_audit_writer(app, db, table) -> AuditWriter:
+    """
+    Criar e iniciar o writer da aplicação (app.extensions['audit_writer']).
+
+    Configuração: AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL, AUDIT_QUEUE_SIZE,
+    AUDIT_PUT_TIMEOUT, AUDIT_SPILL_PATH e AUDIT_ASYNC (padrão: desligado em TESTING).
+    """
+    with app.app_context():
+        engine = db.engine
+
+    writer = AuditWriter(
+        engine, table,
+        spill_path=app.config.get('AUDIT_SPILL_PATH') or os.path.join(app.instance_path, DEFAULT_SPILL_FILE),
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+        max_queue=app.config.get('AUDIT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+        put_timeout=app.config.get('AUDIT_PUT_TIMEOUT', DEFAULT_PUT_TIMEOUT),
+        synchronous=not app.config.get('AUDIT_ASYNC', not app.testing)
+    )
+    app.extensions[EXTENSION_KEY] = writer
+    writer.start()
+    atexit.register(writer.stop)
+    return writer
+
+def get_audit_writer(app, db, table) -> AuditWriter:
+    """Writer da aplicação (criado no primeiro uso)"""
+    writer = app.extensions.get(EXTENSION_KEY)
+    if writer is None:
+        with _init_lock:
+            writer = app.extensions.get(EXTENSION_KEY) or init_audit_writer(app, db, table)
+    return writer
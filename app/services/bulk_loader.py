@@ -0,0 +1,164 @@
+"""
+WEBAG Professional - Carga em Lote de Features
+Insere milhares de features em uma camada sem o custo por linha do ORM:
+métricas de cada lote calculadas em uma passada vetorizada, COPY no PostgreSQL ou executemany
+nos demais bancos, e contadores/extensão atualizados uma vez ao final
+"""
+
+import io
+import os
+import csv
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Any, Iterable, Iterator
+
+from app.services.feature_metrics import batch_metric_columns
+from app.services.feature_counts import apply_feature_count_deltas, has_feature_count_triggers
+from app.services.extents import union_bbox, apply_extent_changes
+from app.services.layer_statistics import bump_layer_data_version
+from app.services.layer_versioning import mark_features_dirty
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+DEFAULT_BULK_BATCH_SIZE = 1000
+
+# Limite de features por carga via API (a CLI não tem limite)
+MAX_BULK_FEATURES = 100000
+
+# Colunas gravadas pela carga (demais ficam com o default do banco)
+BULK_COLUMNS = (
+    'id', 'layer_id', 'feature_type', 'geometry', 'properties', 'style_override',
+    'area_m2', 'length_m', 'perimeter_m', 'centroid_coordinates',
+    'bbox_min_x', 'bbox_min_y', 'bbox_max_x', 'bbox_max_y',
+    'version', 'is_current', 'status', 'validation_status',
+    'created_by', 'created_at', 'updated_at'
+)
+
+JSON_COLUMNS = ('geometry', 'properties', 'style_override', 'centroid_coordinates')
+
+# ================================================
+# PREPARAÇÃO DAS LINHAS
+# ================================================
+
+def _enum_name(value: Any) -> Any:
+    """Enums são gravados pelo nome (mesma convenção do ORM)"""
+    return value.name if isinstance(value, Enum) else value
+
+def _batches(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def prepare_feature_rows(layer_id: str, items: List[Dict[str, Any]], created_by: str) -> List[Dict[str, Any]]:
+    """
+    Linhas completas de features; métricas e bbox do lote inteiro vêm de
+    uma única passada vetorizada (batch_metric_columns).
+
+    `items` vem de parse_feature_input: geometry, properties, style_override
+    e feature_type (GeometryType ou nome do tipo).
+    """
+    now = datetime.utcnow()
+    rows = []
+    metrics = batch_metric_columns([item['geometry'] for item in items])
+    for item, columns in zip(items, metrics):
+        rows.append({
+            'id': os.urandom(16).hex(),
+            'layer_id': layer_id,
+            'feature_type': _enum_name(item['feature_type']),
+            'geometry': item['geometry'],
+            'properties': item.get('properties') or {},
+            'style_override': item.get('style_override') or {},
+            **columns,
+            'version': 1,
+            'is_current': True,
+            'status': 'ACTIVE',
+            'validation_status': 'valid',
+            'created_by': created_by,
+            'created_at': now,
+            'updated_at': now
+        })
+    return rows
+
+# ================================================
+# GRAVAÇÃO
+# ================================================
+
+def _copy_value(column: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if column in JSON_COLUMNS:
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+def _copy_rows(connection, table, rows: List[Dict[str, Any]]) -> bool:
+    """COPY FROM STDIN (psycopg2); False se o driver não suportar"""
+    dbapi_connection = connection.connection.dbapi_connection
+    cursor = dbapi_connection.cursor()
+    try:
+        if not hasattr(cursor, 'copy_expert'):
+            return False
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(column, row[column]) for column in BULK_COLUMNS])
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(BULK_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        return True
+    finally:
+        cursor.close()
+
+def write_feature_rows(connection, table, rows: List[Dict[str, Any]]) -> None:
+    """Gravar um lote: COPY no PostgreSQL, INSERT executemany nos demais"""
+    if connection.dialect.name == 'postgresql' and _copy_rows(connection, table, rows):
+        return
+    connection.execute(table.insert(), rows)
+
+def bulk_load_features(connection, table, layer_id: str, items: Iterable[Dict[str, Any]],
+                       created_by: str, batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Carregar features em uma camada dentro da transação da conexão.
+
+    Os listeners do ORM não são acionados: contagem, extensão, versão de
+    dados e features pendentes de versionamento são atualizados aqui,
+    uma vez por carga (a contagem fica com os triggers, se existirem).
+    """
+    inserted = 0
+    batches = 0
+    bbox = None
+    for batch in _batches(items, batch_size):
+        rows = prepare_feature_rows(layer_id, batch, created_by)
+        write_feature_rows(connection, table, rows)
+        mark_features_dirty(connection, [(layer_id, row['id']) for row in rows])
+        bbox = union_bbox(bbox, *(
+            (row['bbox_min_x'], row['bbox_min_y'], row['bbox_max_x'], row['bbox_max_y'])
+            for row in rows if row['bbox_min_x'] is not None
+        ))
+        inserted += len(rows)
+        batches += 1
+
+    if inserted:
+        if not has_feature_count_triggers(connection):
+            apply_feature_count_deltas(connection, {layer_id: inserted})
+        if bbox:
+            apply_extent_changes(connection, {layer_id: bbox}, {})
+        bump_layer_data_version(connection, [layer_id])
+
+    return {
+        'inserted': inserted,
+        'batches': batches,
+        'bbox': list(bbox) if bbox else None
+    }
@@ -0,0 +1,328 @@
+"""
+WEBAG Professional - Uploads em Blocos Retomáveis
+Arquivos maiores que MAX_CONTENT_LENGTH são enviados em blocos sequenciais
+(init / bloco com offset e SHA-256 / complete). Cada bloco é gravado direto
+na posição final do arquivo de destino, lido do corpo da requisição em
+pedaços: nada é montado em memória nem copiado no final. O estado fica na
+tabela upload_sessions, de modo que o cliente retoma do último offset
+confirmado após uma queda de conexão (ou reinício do servidor)
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, BinaryIO
+
+try:
+    from sqlalchemy import select, update, delete
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# Trava de arquivo: fcntl (POSIX) ou msvcrt (Windows)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    import msvcrt
+    FCNTL_AVAILABLE = False
+
+from app.services.import_jobs import import_folder
+
+logger = logging.getLogger(__name__)
+
+_init_lock = threading.Lock()
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+EXTENSION_KEY = 'chunked_uploads'
+
+UPLOADING = 'uploading'
+COMPLETED = 'completed'
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024    # tamanho total declarado
+DEFAULT_CHUNK_MAX_BYTES = 8 * 1024 * 1024     # por bloco (abaixo de MAX_CONTENT_LENGTH)
+DEFAULT_EXPIRE_SECONDS = 24 * 3600            # uploads parados são descartados
+
+# Leitura do corpo da requisição / do arquivo
+READ_SIZE = 64 * 1024
+
+class UploadError(ValueError):
+    """Requisição de upload inválida (mensagem pronta para a API)"""
+
+class OffsetMismatch(UploadError):
+    """Bloco fora de ordem; `offset` é o próximo esperado pelo servidor"""
+
+    message = 'Offset do bloco não corresponde ao recebido'
+
+    def __init__(self, offset: int):
+        super().__init__(self.message)
+        self.offset = offset
+
+class UploadBusy(OffsetMismatch):
+    """Outra requisição está gravando um bloco deste upload (ex.: retry sobreposto)"""
+
+    message = 'Outro bloco deste upload está sendo gravado'
+
+def upload_progress(upload: Dict[str, Any]) -> Dict[str, Any]:
+    """Representação de um upload para a API (linha de upload_sessions como dicionário)"""
+    return {
+        'id': upload['id'],
+        'layer_id': upload['layer_id'],
+        'filename': upload['filename'],
+        'status': upload['status'],
+        'size': upload['total_size'],
+        'offset': upload['received'],
+        'job_id': upload.get('job_id'),
+        'created_at': _isoformat(upload.get('created_at')),
+        'updated_at': _isoformat(upload.get('updated_at'))
+    }
+
+def _isoformat(value: Any) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+# ================================================
+# UPLOADS
+# ================================================
+
+class ChunkedUploads:
+    """
+    Uploads em blocos sobre a tabela upload_sessions.
+
+    Os blocos devem chegar em ordem: o offset informado precisa ser igual a
+    `received`. Cada bloco é gravado sob uma trava exclusiva do arquivo
+    (retries sobrepostos recebem UploadBusy) e conferido (SHA-256) antes de
+    `received` avançar; um bloco com checksum errado ou interrompido é
+    truncado e pode ser reenviado.
+    """
+
+    def __init__(self, engine, table, folder: str,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 chunk_max_bytes: int = DEFAULT_CHUNK_MAX_BYTES,
+                 expire_seconds: float = DEFAULT_EXPIRE_SECONDS):
+        self.engine = engine
+        self.uploads = table
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.chunk_max_bytes = chunk_max_bytes
+        self.expire_seconds = expire_seconds
+
+    def create(self, layer_id: str, created_by: str, filename: str, size: int,
+               extension: str) -> Dict[str, Any]:
+        """Abrir um upload de `size` bytes (arquivo vazio criado em disco)"""
+        if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+            raise UploadError('Tamanho do arquivo inválido')
+        if size > self.max_bytes:
+            raise UploadError(f'Arquivo muito grande (máximo {self.max_bytes // (1024 * 1024)}MB)')
+
+        upload_id = os.urandom(16).hex()
+        os.makedirs(self.folder, exist_ok=True)
+        file_path = os.path.join(self.folder, upload_id + extension)
+        open(file_path, 'wb').close()
+
+        now = datetime.utcnow()
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(self.uploads.insert().values(
+                    id=upload_id, layer_id=layer_id, created_by=created_by, filename=filename,
+                    file_path=file_path, total_size=size, received=0, status=UPLOADING,
+                    created_at=now, updated_at=now
+                ))
+        except Exception:
+            _remove(file_path)
+            raise
+        return self.get(upload_id)
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(self.uploads).where(self.uploads.c.id == upload_id)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def append(self, upload: Dict[str, Any], offset: int, stream: BinaryIO,
+               length: Optional[int], checksum: Optional[str]) -> int:
+        """Gravar um bloco em `offset`; retorna o próximo offset esperado"""
+        if upload['status'] != UPLOADING:
+            raise UploadError('Upload já finalizado')
+        if offset != upload['received']:
+            raise OffsetMismatch(upload['received'])
+        if not length or length <= 0:
+            raise UploadError('Bloco vazio ou sem Content-Length')
+        if length > self.chunk_max_bytes:
+            raise UploadError(f'Bloco muito grande (máximo {self.chunk_max_bytes} bytes)')
+        if offset + length > upload['total_size']:
+            raise UploadError('Bloco ultrapassa o tamanho declarado')
+        if not checksum:
+            raise UploadError('Checksum SHA-256 do bloco obrigatório')
+
+        with open(upload['file_path'], 'r+b') as target, _exclusive(target, upload['received']):
+            # Revalidar sob a trava: uma requisição sobreposta pode ter
+            # confirmado este offset depois que `upload` foi lido
+            current = self.get(upload['id'])
+            if current is None or current['status'] != UPLOADING:
+                raise UploadError('Upload já finalizado')
+            if offset != current['received']:
+                raise OffsetMismatch(current['received'])
+
+            digest = hashlib.sha256()
+            # Descarta o que sobrou de uma tentativa anterior interrompida
+            target.truncate(offset)
+            target.seek(offset)
+            remaining = length
+            while remaining:
+                block = stream.read(min(READ_SIZE, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                target.write(block)
+                remaining -= len(block)
+            if remaining:
+                target.truncate(offset)
+                raise UploadError('Bloco incompleto')
+            if digest.hexdigest() != checksum.strip().lower():
+                target.truncate(offset)
+                raise UploadError('Checksum do bloco não confere')
+            target.flush()
+            os.fsync(target.fileno())
+
+            received = offset + length
+            with self.engine.begin() as connection:
+                advanced = connection.execute(
+                    update(self.uploads).where(
+                        (self.uploads.c.id == upload['id']) & (self.uploads.c.received == offset) &
+                        (self.uploads.c.status == UPLOADING)
+                    ).values(received=received, updated_at=datetime.utcnow())
+                ).rowcount
+            if not advanced:
+                target.truncate(offset)
+                raise UploadError('Upload alterado durante a gravação do bloco')
+        upload['received'] = received
+        return received
+
+    def complete(self, upload: Dict[str, Any], job_id: str, checksum: Optional[str] = None,
+                 connection=None) -> None:
+        """
+        Encerrar um upload recebido por inteiro e associá-lo ao job de
+        importação. Com `connection` a alteração entra na transação do
+        chamador (a mesma que cria o job).
+        """
+        if upload['status'] != UPLOADING:
+            raise UploadError('Upload já finalizado')
+        if upload['received'] != upload['total_size']:
+            raise OffsetMismatch(upload['received'])
+        if checksum and file_sha256(upload['file_path']) != checksum.strip().lower():
+            raise UploadError('Checksum do arquivo não confere')
+
+        statement = update(self.uploads).where(
+            (self.uploads.c.id == upload['id']) & (self.uploads.c.status == UPLOADING)
+        ).values(status=COMPLETED, job_id=job_id, updated_at=datetime.utcnow())
+        if connection is not None:
+            if connection.execute(statement).rowcount == 0:
+                raise UploadError('Upload já finalizado')
+            return
+        with self.engine.begin() as own_connection:
+            self.complete(upload, job_id, checksum=None, connection=own_connection)
+
+    def abort(self, upload: Dict[str, Any]) -> bool:
+        """Descartar um upload em andamento (registro e arquivo parcial)"""
+        with self.engine.begin() as connection:
+            removed = connection.execute(
+                delete(self.uploads).where(
+                    (self.uploads.c.id == upload['id']) & (self.uploads.c.status == UPLOADING)
+                )
+            ).rowcount
+        if removed:
+            _remove(upload['file_path'])
+        return bool(removed)
+
+    def purge_expired(self) -> int:
+        """Remover uploads sem blocos novos há mais de expire_seconds"""
+        expired_before = datetime.utcnow() - timedelta(seconds=self.expire_seconds)
+        expired = (self.uploads.c.status == UPLOADING) & (self.uploads.c.updated_at < expired_before)
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                select(self.uploads.c.id, self.uploads.c.file_path).where(expired)
+            ).fetchall()
+            if rows:
+                connection.execute(delete(self.uploads).where(
+                    expired & self.uploads.c.id.in_([row.id for row in rows])
+                ))
+        for row in rows:
+            _remove(row.file_path)
+        return len(rows)
+
+@contextmanager
+def _exclusive(target: BinaryIO, offset: int) -> Iterator[None]:
+    """
+    Trava exclusiva (não bloqueante) do arquivo do upload durante a gravação
+    de um bloco; UploadBusy se outra requisição já a detém
+    """
+    try:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(target.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            target.seek(0)
+            msvcrt.locking(target.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        raise UploadBusy(offset)
+    try:
+        yield
+    finally:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(target.fileno(), fcntl.LOCK_UN)
+        else:
+            target.seek(0)
+            msvcrt.locking(target.fileno(), msvcrt.LK_UNLCK, 1)
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Arquivo de upload não removido ({path}): {e}")
+
+# ================================================
+# INTEGRAÇÃO COM FLASK
+# ================================================
+
+def init_chunked_uploads(app, db, table) -> ChunkedUploads:
+    """
+    Criar o gerenciador da aplicação (app.extensions['chunked_uploads']).
+
+    Os arquivos são gravados direto em IMPORT_FOLDER, onde o job de
+    importação os lê sem cópia. Configuração: CHUNKED_UPLOAD_MAX_BYTES,
+    UPLOAD_CHUNK_MAX_BYTES e UPLOAD_EXPIRE_SECONDS.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    uploads = ChunkedUploads(
+        engine, table, import_folder(app),
+        max_bytes=app.config.get('CHUNKED_UPLOAD_MAX_BYTES', DEFAULT_MAX_BYTES),
+        chunk_max_bytes=app.config.get('UPLOAD_CHUNK_MAX_BYTES', DEFAULT_CHUNK_MAX_BYTES),
+        expire_seconds=app.config.get('UPLOAD_EXPIRE_SECONDS', DEFAULT_EXPIRE_SECONDS)
+    )
+    app.extensions[EXTENSION_KEY] = uploads
+    return uploads
+
+def get_chunked_uploads(app, db, table) -> ChunkedUploads:
+    """Gerenciador da aplicação (criado no primeiro uso)"""
+    uploads = app.extensions.get(EXTENSION_KEY)
+    if uploads is None:
+        with _init_lock:
+            uploads = app.extensions.get(EXTENSION_KEY) or init_chunked_uploads(app, db, table)
+    return uploads
@@ -0,0 +1,273 @@
+"""
+WEBAG Professional - Extensão Espacial de Camadas e Projetos
+Bounding boxes mantidas incrementalmente: inserções/edições expandem a
+extensão da camada; remoções no limite a marcam como suja para recálculo
+sob demanda
+"""
+
+import json
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+try:
+    from sqlalchemy import bindparam, event, inspect, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+from app.services.feature_counts import is_counted, COUNTED_CONDITION, COUNTED_PARAMS
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+BBOX_COLUMNS = ('bbox_min_x', 'bbox_min_y', 'bbox_max_x', 'bbox_max_y')
+
+# Colunas que definem a contribuição de uma feature para a extensão da camada
+EXTENT_COLUMNS = ('layer_id', 'is_current', 'status') + BBOX_COLUMNS
+
+BBox = Tuple[float, float, float, float]
+
+# Camadas que compõem a extensão do projeto; status é o enum nativo no
+# PostgreSQL (sem lower()), convertido para texto antes
+VISIBLE_LAYER_CONDITION = "lower(CAST(status AS TEXT)) != 'deleted'"
+
+# ================================================
+# GEOMETRIA
+# ================================================
+
+def _walk_positions(coordinates: Any) -> Iterable[Tuple[float, float]]:
+    """Percorrer posições [x, y, ...] em qualquer nível de aninhamento GeoJSON"""
+    stack = [coordinates]
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, (list, tuple)) or not item:
+            continue
+        if isinstance(item[0], (int, float)):
+            if len(item) >= 2:
+                yield float(item[0]), float(item[1])
+        else:
+            stack.extend(item)
+
+def geometry_bbox(geometry: Optional[Dict[str, Any]]) -> Optional[BBox]:
+    """Bounding box (minX, minY, maxX, maxY) de uma geometria GeoJSON"""
+    if not isinstance(geometry, dict):
+        return None
+    if geometry.get('type') == 'GeometryCollection':
+        return union_bbox(*(geometry_bbox(g) for g in geometry.get('geometries') or []))
+
+    min_x = min_y = float('inf')
+    max_x = max_y = float('-inf')
+    found = False
+    for x, y in _walk_positions(geometry.get('coordinates')):
+        found = True
+        min_x, min_y = min(min_x, x), min(min_y, y)
+        max_x, max_y = max(max_x, x), max(max_y, y)
+    return (min_x, min_y, max_x, max_y) if found else None
+
+def union_bbox(*boxes: Optional[BBox]) -> Optional[BBox]:
+    """União de bounding boxes (ignora None)"""
+    valid = [b for b in boxes if b]
+    if not valid:
+        return None
+    return (
+        min(b[0] for b in valid), min(b[1] for b in valid),
+        max(b[2] for b in valid), max(b[3] for b in valid)
+    )
+
+def _as_bbox(value: Any) -> Optional[BBox]:
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    if isinstance(value, (list, tuple)) and len(value) == 4 and None not in value:
+        return tuple(float(v) for v in value)
+    return None
+
+# ================================================
+# MANUTENÇÃO INCREMENTAL
+# ================================================
+
+def _contribution(target, previous: bool = False) -> Tuple[Optional[str], Optional[BBox]]:
+    """(layer_id, bbox) com que a feature contribui para a extensão (bbox None = não contribui)"""
+    state = inspect(target)
+    row = {}
+    for column in EXTENT_COLUMNS:
+        attr = state.attrs[column]
+        value = attr.value
+        if previous:
+            history = attr.history
+            if history.deleted:
+                value = history.deleted[0]
+            elif history.added:
+                value = None
+        row[column] = value
+
+    if not is_counted(row['status'], row['is_current']):
+        return row['layer_id'], None
+    bbox = tuple(row[c] for c in BBOX_COLUMNS)
+    return row['layer_id'], (bbox if None not in bbox else None)
+
+def collect_extent_changes(new: Iterable[Any], dirty: Iterable[Any],
+                           deleted: Iterable[Any]) -> Tuple[Dict[str, BBox], Dict[str, List[BBox]]]:
+    """
+    Expansões e bboxes retiradas de cada camada em um flush.
+
+    Inserções e edições expandem com a nova bbox; a bbox antiga de uma
+    edição (se mudou ou deixou de contribuir) e a de uma remoção são retiradas.
+    """
+    expand: Dict[str, BBox] = {}
+    removed: Dict[str, List[BBox]] = {}
+
+    def add(layer_id, bbox):
+        if layer_id and bbox:
+            expand[layer_id] = union_bbox(expand.get(layer_id), bbox)
+
+    def remove(layer_id, bbox):
+        if layer_id and bbox:
+            removed.setdefault(layer_id, []).append(bbox)
+
+    for target in new:
+        add(*_contribution(target))
+
+    for target in dirty:
+        old_layer, old_bbox = _contribution(target, previous=True)
+        new_layer, new_bbox = _contribution(target)
+        add(new_layer, new_bbox)
+        if old_layer != new_layer or old_bbox != new_bbox:
+            remove(old_layer, old_bbox)
+
+    for target in deleted:
+        remove(*_contribution(target, previous=True))
+
+    return expand, removed
+
+def _touches_boundary(bbox: BBox, extent: Optional[BBox]) -> bool:
+    """Uma bbox no limite da extensão pode reduzi-la ao ser retirada"""
+    if extent is None:
+        return True
+    return bbox[0] <= extent[0] or bbox[1] <= extent[1] or bbox[2] >= extent[2] or bbox[3] >= extent[3]
+
+def apply_extent_changes(connection, expand: Dict[str, BBox], removed: Dict[str, List[BBox]]) -> None:
+    """
+    Expandir extensões e marcar como sujas as que podem ter diminuído.
+
+    Retirar uma bbox interior não altera a extensão; só quando ela toca o
+    limite a camada é marcada para recálculo completo na próxima leitura.
+    """
+    layer_ids = sorted(set(expand) | set(removed))
+    if not layer_ids:
+        return
+
+    rows = connection.execute(
+        text("SELECT id, bbox_coordinates, bbox_dirty FROM layers WHERE id IN :ids").bindparams(
+            bindparam('ids', expanding=True)
+        ), {'ids': layer_ids}
+    ).all()
+
+    stale = []
+    updates = []
+    for row in rows:
+        if row.bbox_dirty:
+            continue  # Será recalculada por completo na próxima leitura
+        current = _as_bbox(row.bbox_coordinates)
+        if any(_touches_boundary(bbox, current) for bbox in removed.get(row.id, [])):
+            stale.append({'dirty': True, 'layer_id': row.id})
+            continue
+        merged = union_bbox(current, expand.get(row.id))
+        if merged != current:
+            updates.append({'layer_id': row.id, 'bbox': json.dumps(list(merged))})
+
+    if stale:
+        connection.execute(text("UPDATE layers SET bbox_dirty = :dirty WHERE id = :layer_id"), stale)
+    if updates:
+        connection.execute(text("UPDATE layers SET bbox_coordinates = :bbox WHERE id = :layer_id"), updates)
+
+def register_extent_listeners(session_class, feature_model) -> None:
+    """Manter extensões das camadas a cada flush que altere features"""
+    if not SQLALCHEMY_AVAILABLE:
+        return
+
+    # Garantir que a bbox antiga seja conhecida ao alterar colunas expiradas
+    for column in BBOX_COLUMNS:
+        event.listen(getattr(feature_model, column), 'set',
+                     lambda target, value, oldvalue, initiator: value,
+                     active_history=True, retval=True)
+
+    @event.listens_for(session_class, 'after_flush')
+    def update_layer_extents(session, flush_context):
+        def features(objects):
+            return [obj for obj in objects if isinstance(obj, feature_model)]
+
+        new, dirty, deleted = features(session.new), features(session.dirty), features(session.deleted)
+        if not (new or dirty or deleted):
+            return
+        expand, removed = collect_extent_changes(new, dirty, deleted)
+        if expand or removed:
+            apply_extent_changes(session.connection(), expand, removed)
+
+# ================================================
+# LEITURA (RECÁLCULO SOB DEMANDA)
+# ================================================
+
+def refresh_dirty_extents(connection, layer_ids: Optional[List[str]] = None) -> int:
+    """Recalcular (uma agregação) as extensões marcadas como sujas"""
+    sql = "SELECT id FROM layers WHERE bbox_dirty = :dirty"
+    params: Dict[str, Any] = {'dirty': True}
+    if layer_ids is not None:
+        if not layer_ids:
+            return 0
+        sql += " AND id IN :ids"
+        params['ids'] = list(layer_ids)
+    statement = text(sql)
+    if layer_ids is not None:
+        statement = statement.bindparams(bindparam('ids', expanding=True))
+    dirty = [row.id for row in connection.execute(statement, params)]
+    if not dirty:
+        return 0
+
+    extents = {
+        row.layer_id: (row.min_x, row.min_y, row.max_x, row.max_y)
+        for row in connection.execute(text(f"""
+            SELECT layer_id, MIN(bbox_min_x) AS min_x, MIN(bbox_min_y) AS min_y,
+                   MAX(bbox_max_x) AS max_x, MAX(bbox_max_y) AS max_y
+            FROM features
+            WHERE layer_id IN :ids AND {COUNTED_CONDITION} AND bbox_min_x IS NOT NULL
+            GROUP BY layer_id
+        """).bindparams(bindparam('ids', expanding=True)), {'ids': dirty, **COUNTED_PARAMS})
+    }
+
+    connection.execute(
+        text("UPDATE layers SET bbox_coordinates = :bbox, bbox_dirty = :dirty WHERE id = :layer_id"),
+        [{'layer_id': layer_id, 'dirty': False,
+          'bbox': json.dumps(list(extents[layer_id])) if layer_id in extents else None}
+         for layer_id in dirty]
+    )
+    return len(dirty)
+
+def get_layer_extents(engine, layer_ids: List[str]) -> Dict[str, Optional[List[float]]]:
+    """
+    Extensões atualizadas de várias camadas. O recálculo das sujas roda em
+    transação própria e confirmada: chamado de um GET, não seria desfeito
+    no fim da requisição e repetido a cada leitura
+    """
+    if not layer_ids:
+        return {}
+    with engine.begin() as connection:
+        refresh_dirty_extents(connection, layer_ids)
+        rows = connection.execute(
+            text("SELECT id, bbox_coordinates FROM layers WHERE id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(layer_ids)}
+        ).all()
+    result = {}
+    for row in rows:
+        bbox = _as_bbox(row.bbox_coordinates)
+        result[row.id] = list(bbox) if bbox else None
+    return result
+
+def get_project_extent(engine, project_id: str) -> Optional[List[float]]:
+    """Extensão do projeto: união das extensões das suas camadas"""
+    with engine.connect() as connection:
+        layer_ids = [row.id for row in connection.execute(
+            text(f"SELECT id FROM layers WHERE project_id = :project_id AND {VISIBLE_LAYER_CONDITION}"),
+            {'project_id': project_id}
+        )]
+    merged = union_bbox(*(_as_bbox(b) for b in get_layer_extents(engine, layer_ids).values()))
+    return list(merged) if merged else None
@@ -0,0 +1,159 @@
+"""
+WEBAG Professional - Contagem Incremental de Features
+Mantém layers.feature_count por deltas (+1/-1) em vez de COUNT(*) a cada escrita
+"""
+
+import weakref
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from sqlalchemy import event, inspect, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+# Triggers definidos em sql/enhanced_schema.sql (bancos criados pelo script SQL)
+FEATURE_COUNT_TRIGGERS = (
+    'update_layer_feature_count_insert',
+    'update_layer_feature_count_update',
+    'update_layer_feature_count_delete',
+)
+
+# Condição de uma feature contada (status gravado como 'active' ou 'ACTIVE').
+# No PostgreSQL is_current é boolean (comparado por parâmetro) e status é o
+# enum nativo statustype, sem lower(): convertido para texto antes
+COUNTED_CONDITION = "is_current = :is_current AND lower(CAST(status AS TEXT)) = 'active'"
+COUNTED_PARAMS = {'is_current': True}
+
+APPLY_DELTA_SQL = "UPDATE layers SET feature_count = COALESCE(feature_count, 0) + :delta WHERE id = :layer_id"
+
+# Colunas cuja transição altera a contagem
+TRACKED_COLUMNS = ('layer_id', 'is_current', 'status')
+
+# Cache por engine: o banco possui os triggers de contagem?
+_trigger_cache: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+# ================================================
+# DELTAS
+# ================================================
+
+def is_counted(status: Any, is_current: Any) -> bool:
+    """Feature entra em feature_count? (atual e ativa)"""
+    value = getattr(status, 'value', status)
+    return bool(is_current) and value is not None and str(value).lower() == 'active'
+
+def feature_count_deltas(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Deltas por camada para a transição de uma feature entre dois estados"""
+    deltas: Dict[str, int] = {}
+    if old and old.get('layer_id') and is_counted(old.get('status'), old.get('is_current')):
+        deltas[old['layer_id']] = deltas.get(old['layer_id'], 0) - 1
+    if new and new.get('layer_id') and is_counted(new.get('status'), new.get('is_current')):
+        deltas[new['layer_id']] = deltas.get(new['layer_id'], 0) + 1
+    return {layer_id: delta for layer_id, delta in deltas.items() if delta}
+
+def apply_feature_count_deltas(connection, deltas: Dict[str, int]) -> None:
+    """Aplicar deltas em layers.feature_count"""
+    if deltas:
+        connection.execute(text(APPLY_DELTA_SQL), [
+            {'layer_id': layer_id, 'delta': delta}
+            for layer_id, delta in sorted(deltas.items())
+        ])
+
+def has_feature_count_triggers(connection) -> bool:
+    """Verificar (uma vez por engine) se o banco SQLite já mantém a contagem por triggers"""
+    engine = connection.engine
+    if engine not in _trigger_cache:
+        found = False
+        if connection.dialect.name == 'sqlite':
+            rows = connection.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'features'"
+            )).scalars().all()
+            found = any(name in FEATURE_COUNT_TRIGGERS for name in rows)
+        _trigger_cache[engine] = found
+    return _trigger_cache[engine]
+
+# ================================================
+# LISTENERS (caminho ORM)
+# ================================================
+
+def _snapshot(target, previous: bool = False) -> Dict[str, Any]:
+    state = inspect(target)
+    row = {}
+    for column in TRACKED_COLUMNS:
+        attr = state.attrs[column]
+        value = attr.value
+        if previous:
+            history = attr.history
+            if history.deleted:
+                value = history.deleted[0]
+            elif history.added:
+                value = None
+        row[column] = value
+    return row
+
+def register_feature_count_listeners(model) -> None:
+    """Manter feature_count pelo ORM quando o banco não possui os triggers"""
+    if not SQLALCHEMY_AVAILABLE:
+        return
+
+    # Garantir que o valor antigo seja carregado ao alterar colunas expiradas
+    for column in TRACKED_COLUMNS:
+        event.listen(getattr(model, column), 'set',
+                     lambda target, value, oldvalue, initiator: value,
+                     active_history=True, retval=True)
+
+    @event.listens_for(model, 'after_insert')
+    def feature_count_insert(mapper, connection, target):
+        if not has_feature_count_triggers(connection):
+            apply_feature_count_deltas(connection, feature_count_deltas(None, _snapshot(target)))
+
+    @event.listens_for(model, 'after_update')
+    def feature_count_update(mapper, connection, target):
+        if not has_feature_count_triggers(connection):
+            deltas = feature_count_deltas(_snapshot(target, previous=True), _snapshot(target))
+            apply_feature_count_deltas(connection, deltas)
+
+    @event.listens_for(model, 'before_delete')
+    def feature_count_delete(mapper, connection, target):
+        if not has_feature_count_triggers(connection):
+            apply_feature_count_deltas(connection, feature_count_deltas(_snapshot(target, previous=True), None))
+
+# ================================================
+# REPARO
+# ================================================
+
+def recount_feature_counts(connection, layer_id: Optional[str] = None,
+                           dry_run: bool = False) -> List[Tuple[str, int, int]]:
+    """
+    Recalcular feature_count a partir de features (reparo de divergências).
+
+    Retorna (layer_id, valor_atual, valor_correto) das camadas divergentes.
+    """
+    sql = f"""
+        SELECT l.id AS layer_id,
+               COALESCE(l.feature_count, 0) AS stored,
+               (SELECT COUNT(*) FROM features
+                WHERE features.layer_id = l.id AND {COUNTED_CONDITION}) AS actual
+        FROM layers l
+    """
+    params = dict(COUNTED_PARAMS)
+    if layer_id is not None:
+        sql += " WHERE l.id = :layer_id"
+        params['layer_id'] = layer_id
+
+    drift = [
+        (row['layer_id'], row['stored'], row['actual'])
+        for row in connection.execute(text(sql), params).mappings()
+        if row['stored'] != row['actual']
+    ]
+
+    if drift and not dry_run:
+        connection.execute(
+            text("UPDATE layers SET feature_count = :actual WHERE id = :layer_id"),
+            [{'layer_id': lid, 'actual': actual} for lid, _, actual in drift]
+        )
+    return drift
@@ -0,0 +1,110 @@
+"""
+WEBAG Professional - Métricas de Features
+Colunas calculadas a partir da geometria (área, comprimento, perímetro,
+centroide e bounding box) e preenchimento em lote de linhas existentes
+"""
+
+import json
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+try:
+    from sqlalchemy import text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+from app.utils.geo_metrics import geometry_metrics, batch_geometry_metrics
+from app.services.extents import geometry_bbox
+
+# ================================================
+# COLUNAS CALCULADAS
+# ================================================
+
+def _metric_columns(metrics: Dict[str, Any], bbox: Optional[Tuple[float, ...]]) -> Dict[str, Any]:
+    bbox = bbox or (None, None, None, None)
+    return {
+        'area_m2': metrics['area_m2'],
+        'length_m': metrics['length_m'],
+        'perimeter_m': metrics['perimeter_m'],
+        'centroid_coordinates': metrics['centroid'],
+        'bbox_min_x': bbox[0],
+        'bbox_min_y': bbox[1],
+        'bbox_max_x': bbox[2],
+        'bbox_max_y': bbox[3],
+    }
+
+def feature_metric_columns(geometry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Valores das colunas calculadas de uma feature para a geometria"""
+    return _metric_columns(geometry_metrics(geometry), geometry_bbox(geometry))
+
+def batch_metric_columns(geometries: Sequence[Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Colunas calculadas de um lote de geometrias em uma passada vetorizada
+    (batch_geometry_metrics); o que o lote não cobre é calculado por feature
+    """
+    return [
+        _metric_columns(metrics, metrics['bbox']) if metrics is not None else feature_metric_columns(geometry)
+        for geometry, metrics in zip(geometries, batch_geometry_metrics(geometries))
+    ]
+
+# ================================================
+# PREENCHIMENTO EM LOTE
+# ================================================
+
+UPDATE_METRICS_SQL = """
+    UPDATE features SET
+        area_m2 = :area_m2, length_m = :length_m, perimeter_m = :perimeter_m,
+        centroid_coordinates = :centroid_coordinates,
+        bbox_min_x = :bbox_min_x, bbox_min_y = :bbox_min_y,
+        bbox_max_x = :bbox_max_x, bbox_max_y = :bbox_max_y
+    WHERE id = :id
+"""
+
+def backfill_feature_metrics(connection, batch_size: int = 500, only_missing: bool = True,
+                             layer_id: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Calcular métricas de features existentes em lotes (paginação por id).
+
+    Retorna (features atualizadas, camadas cujas extensões foram marcadas
+    para recálculo).
+    """
+    conditions = ["id > :last_id"]
+    params: Dict[str, Any] = {'batch_size': batch_size}
+    if only_missing:
+        conditions.append("(centroid_coordinates IS NULL OR bbox_min_x IS NULL)")
+    if layer_id is not None:
+        conditions.append("layer_id = :layer_id")
+        params['layer_id'] = layer_id
+    select_sql = text(
+        f"SELECT id, layer_id, geometry FROM features WHERE {' AND '.join(conditions)} "
+        "ORDER BY id LIMIT :batch_size"
+    )
+
+    updated = 0
+    layers = set()
+    last_id = ''
+    while True:
+        rows = connection.execute(select_sql, {**params, 'last_id': last_id}).all()
+        if not rows:
+            break
+
+        geometries = [
+            json.loads(row.geometry) if isinstance(row.geometry, (str, bytes)) else row.geometry
+            for row in rows
+        ]
+        batch = []
+        for row, columns in zip(rows, batch_metric_columns(geometries)):
+            last_id = row.id
+            columns['centroid_coordinates'] = json.dumps(columns['centroid_coordinates']) \
+                if columns['centroid_coordinates'] is not None else None
+            batch.append({'id': row.id, **columns})
+            layers.add(row.layer_id)
+
+        connection.execute(text(UPDATE_METRICS_SQL), batch)
+        updated += len(batch)
+
+    # As bboxes mudaram: extensões das camadas são recalculadas na próxima leitura
+    if layers:
+        connection.execute(text("UPDATE layers SET bbox_dirty = :dirty WHERE id = :layer_id"),
+                           [{'dirty': True, 'layer_id': lid} for lid in sorted(layers)])
+    return updated, len(layers)
@@ -0,0 +1,236 @@
+"""
+WEBAG Professional - Resumo Agregado de Glebas
+Tabelas de resumo mantidas incrementalmente (bairro, quadra, zoneamento)
+"""
+
+from typing import Dict, List, Any, Optional
+
+try:
+    from sqlalchemy import event, inspect, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+SUMMARY_TABLE = 'gleba_summaries'
+
+# Dimensões de agrupamento suportadas pelo endpoint de resumo
+SUMMARY_DIMENSIONS = ('bairro', 'quadra', 'zoneamento')
+
+# Dimensão especial com uma única linha por escopo (totais gerais)
+TOTAL_DIMENSION = '*'
+
+CREATE_SUMMARY_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        scope_id VARCHAR(100) NOT NULL,
+        dimension VARCHAR(20) NOT NULL,
+        dimension_value VARCHAR(100) NOT NULL DEFAULT '',
+        gleba_count INTEGER NOT NULL DEFAULT 0,
+        area_total REAL NOT NULL DEFAULT 0,
+        valor_venal_total REAL NOT NULL DEFAULT 0,
+        valor_iptu_total REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope_id, dimension, dimension_value)
+    )
+"""
+
+UPSERT_SUMMARY_SQL = f"""
+    INSERT INTO {SUMMARY_TABLE}
+        (scope_id, dimension, dimension_value, gleba_count,
+         area_total, valor_venal_total, valor_iptu_total)
+    VALUES
+        (:scope_id, :dimension, :dimension_value, :gleba_count,
+         :area_total, :valor_venal_total, :valor_iptu_total)
+    ON CONFLICT (scope_id, dimension, dimension_value) DO UPDATE SET
+        gleba_count = {SUMMARY_TABLE}.gleba_count + excluded.gleba_count,
+        area_total = {SUMMARY_TABLE}.area_total + excluded.area_total,
+        valor_venal_total = {SUMMARY_TABLE}.valor_venal_total + excluded.valor_venal_total,
+        valor_iptu_total = {SUMMARY_TABLE}.valor_iptu_total + excluded.valor_iptu_total
+"""
+
+# ================================================
+# RASTREADOR INCREMENTAL
+# ================================================
+
+class GlebaSummaryTracker:
+    """
+    Mantém a tabela de resumo a partir das escritas de um modelo de gleba.
+
+    ``field_map`` associa cada dimensão/medida lógica ao nome da coluna no
+    modelo (ou None quando o modelo não possui o campo). ``scope_field`` é a
+    coluna que isola os dados (projeto no modelo enhanced, usuário no legado).
+    """
+
+    def __init__(self, field_map: Dict[str, Optional[str]], scope_field: str):
+        self.field_map = field_map
+        self.scope_field = scope_field
+
+    @property
+    def dimensions(self) -> List[str]:
+        """Dimensões de agrupamento disponíveis para o modelo"""
+        return [d for d in SUMMARY_DIMENSIONS if self.field_map.get(d)]
+
+    def _value(self, source: Dict[str, Any], key: str) -> Any:
+        column = self.field_map.get(key)
+        return source.get(column) if column else None
+
+    def contributions(self, row: Optional[Dict[str, Any]], sign: int = 1) -> List[Dict[str, Any]]:
+        """Linhas de delta (uma por dimensão) que uma gleba soma ao resumo"""
+        if not row or row.get(self.scope_field) is None:
+            return []
+
+        measures = {
+            'gleba_count': sign,
+            'area_total': sign * float(self._value(row, 'area') or 0),
+            'valor_venal_total': sign * float(self._value(row, 'valor_venal') or 0),
+            'valor_iptu_total': sign * float(self._value(row, 'valor_iptu') or 0),
+        }
+
+        deltas = []
+        for dimension in (TOTAL_DIMENSION,) + SUMMARY_DIMENSIONS:
+            if dimension != TOTAL_DIMENSION and not self.field_map.get(dimension):
+                continue
+            value = '' if dimension == TOTAL_DIMENSION else self._value(row, dimension)
+            deltas.append({
+                'scope_id': str(row[self.scope_field]),
+                'dimension': dimension,
+                'dimension_value': (str(value).strip() if value is not None else ''),
+                **measures
+            })
+        return deltas
+
+    def snapshot(self, target, previous: bool = False) -> Dict[str, Any]:
+        """Valores relevantes da instância (atuais ou anteriores ao flush)"""
+        columns = {self.scope_field} | {c for c in self.field_map.values() if c}
+        state = inspect(target)
+        row = {}
+        for column in columns:
+            attr = state.attrs[column]
+            value = attr.value
+            if previous:
+                history = attr.history
+                if history.deleted:
+                    value = history.deleted[0]
+                elif history.added:
+                    # Sem valor anterior (active_history garante o carregamento)
+                    value = None
+            row[column] = value
+        return row
+
+    def apply(self, connection, old_row: Optional[Dict[str, Any]], new_row: Optional[Dict[str, Any]]):
+        """Aplica a diferença entre dois estados de uma gleba"""
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        for delta in self.contributions(old_row, -1) + self.contributions(new_row, 1):
+            key = (delta['scope_id'], delta['dimension'], delta['dimension_value'])
+            if key in merged:
+                for measure in ('gleba_count', 'area_total', 'valor_venal_total', 'valor_iptu_total'):
+                    merged[key][measure] += delta[measure]
+            else:
+                merged[key] = dict(delta)
+
+        changed = [d for d in merged.values()
+                   if d['gleba_count'] or d['area_total'] or d['valor_venal_total'] or d['valor_iptu_total']]
+        if not changed:
+            return
+
+        connection.execute(text(UPSERT_SUMMARY_SQL), changed)
+        connection.execute(
+            text(f"DELETE FROM {SUMMARY_TABLE} WHERE gleba_count <= 0 AND scope_id = :scope_id"),
+            [{'scope_id': scope} for scope in {d['scope_id'] for d in changed}]
+        )
+
+    def register(self, model):
+        """Registrar listeners de insert/update/delete no modelo"""
+        if not SQLALCHEMY_AVAILABLE:
+            return
+
+        # Garantir que o valor antigo seja carregado ao alterar colunas expiradas
+        for column in {self.scope_field} | {c for c in self.field_map.values() if c}:
+            event.listen(getattr(model, column), 'set',
+                         lambda target, value, oldvalue, initiator: value,
+                         active_history=True, retval=True)
+
+        @event.listens_for(model, 'after_insert')
+        def gleba_summary_insert(mapper, connection, target):
+            self.apply(connection, None, self.snapshot(target))
+
+        @event.listens_for(model, 'after_update')
+        def gleba_summary_update(mapper, connection, target):
+            old_row = self.snapshot(target, previous=True)
+            new_row = self.snapshot(target)
+            if old_row != new_row:
+                self.apply(connection, old_row, new_row)
+
+        @event.listens_for(model, 'before_delete')
+        def gleba_summary_delete(mapper, connection, target):
+            # Antes do DELETE os atributos ainda podem ser carregados do banco
+            self.apply(connection, self.snapshot(target, previous=True), None)
+
+    def rebuild(self, connection, table_name: str, scope_id: Optional[str] = None) -> int:
+        """Recalcular o resumo a partir da tabela de glebas (reparo de divergências)"""
+        columns = sorted({self.scope_field} | {c for c in self.field_map.values() if c})
+        sql = f"SELECT {', '.join(columns)} FROM {table_name}"
+        params = {}
+        if scope_id is not None:
+            sql += f" WHERE {self.scope_field} = :scope_id"
+            params['scope_id'] = scope_id
+
+        if scope_id is not None:
+            connection.execute(text(f"DELETE FROM {SUMMARY_TABLE} WHERE scope_id = :scope_id"),
+                               {'scope_id': scope_id})
+        else:
+            connection.execute(text(f"DELETE FROM {SUMMARY_TABLE}"))
+
+        count = 0
+        for row in connection.execute(text(sql), params).mappings():
+            self.apply(connection, None, dict(row))
+            count += 1
+        return count
+
+# ================================================
+# CONSULTA
+# ================================================
+
+def ensure_summary_table(connection) -> bool:
+    """Criar tabela de resumo se necessário; retorna True se foi criada agora"""
+    existed = inspect(connection).has_table(SUMMARY_TABLE)
+    if not existed:
+        connection.execute(text(CREATE_SUMMARY_TABLE_SQL))
+    return not existed
+
+def _format_row(row) -> Dict[str, Any]:
+    return {
+        'total_glebas': row['gleba_count'],
+        'area_total_m2': round(row['area_total'], 2),
+        'valor_venal_total': round(row['valor_venal_total'], 2),
+        'valor_iptu_total': round(row['valor_iptu_total'], 2),
+    }
+
+def get_gleba_summary(connection, scope_id: str, group_by: str) -> Dict[str, Any]:
+    """Obter agregados de um escopo agrupados por uma dimensão"""
+    if group_by not in SUMMARY_DIMENSIONS:
+        raise ValueError(f"Agrupamento inválido: {group_by}")
+
+    rows = connection.execute(text(f"""
+        SELECT dimension, dimension_value, gleba_count,
+               area_total, valor_venal_total, valor_iptu_total
+        FROM {SUMMARY_TABLE}
+        WHERE scope_id = :scope_id AND dimension IN (:dimension, :total)
+        ORDER BY dimension_value
+    """), {'scope_id': str(scope_id), 'dimension': group_by, 'total': TOTAL_DIMENSION}).mappings()
+
+    groups = []
+    totals = {'total_glebas': 0, 'area_total_m2': 0.0, 'valor_venal_total': 0.0, 'valor_iptu_total': 0.0}
+    for row in rows:
+        if row['dimension'] == TOTAL_DIMENSION:
+            totals = _format_row(row)
+        else:
+            groups.append({group_by: row['dimension_value'] or None, **_format_row(row)})
+
+    return {
+        'group_by': group_by,
+        'groups': groups,
+        'totals': totals
+    }
@@ -0,0 +1,390 @@
+"""
+WEBAG Professional - Jobs de Importação em Segundo Plano
+O upload só grava o arquivo e cria o job (tabela import_jobs); um pool de
+threads valida o KML/KMZ, lê as features em streaming e carrega-as na
+camada com o bulk_loader, em transações por lote. O estado fica no banco:
+jobs de um worker que morreu voltam para a fila e são retomados do último
+lote confirmado
+"""
+
+import os
+import atexit
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Callable, Optional
+
+try:
+    from sqlalchemy import select, update
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+from app.services.bulk_loader import bulk_load_features
+from app.services.layer_features import parse_feature_input
+from app.utils.kml_reader import check_kml
+from app.utils.kmz_reader import check_kmz, is_kmz, iter_features
+
+logger = logging.getLogger(__name__)
+
+_init_lock = threading.Lock()
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+EXTENSION_KEY = 'import_jobs'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+DEFAULT_IMPORT_WORKERS = 2
+DEFAULT_IMPORT_BATCH_SIZE = 1000   # features por transação
+DEFAULT_POLL_INTERVAL = 2.0        # segundos entre verificações da fila
+DEFAULT_STALE_SECONDS = 300        # sem heartbeat por esse tempo: worker considerado morto
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_IMPORT_FOLDER = 'imports'
+
+# Erros por feature guardados no job (os demais só são contados)
+MAX_STORED_ERRORS = 50
+
+IMPORT_EXTENSIONS = ('.kml', '.kmz')
+
+class LeaseLost(Exception):
+    """O job foi devolvido à fila e assumido por outro worker"""
+
+# ================================================
+# PROGRESSO
+# ================================================
+
+def job_progress(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Representação de um job para a API (linha de import_jobs como dicionário)"""
+    total = job.get('features_total')
+    if job['status'] == COMPLETED:
+        percent = 100.0
+    elif total:
+        percent = round(100.0 * job['features_read'] / total, 1)
+    else:
+        percent = 0.0
+    return {
+        'id': job['id'],
+        'layer_id': job['layer_id'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'progress': percent,
+        'features_total': total,
+        'features_read': job['features_read'],
+        'features_inserted': job['features_inserted'],
+        'features_skipped': job['features_skipped'],
+        'errors': job.get('errors') or [],
+        'message': job.get('message'),
+        'attempts': job['attempts'],
+        'created_at': _isoformat(job.get('created_at')),
+        'started_at': _isoformat(job.get('started_at')),
+        'finished_at': _isoformat(job.get('finished_at'))
+    }
+
+def _isoformat(value: Any) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+# ================================================
+# FILA
+# ================================================
+
+class ImportJobQueue:
+    """
+    Fila de importação sobre a tabela import_jobs.
+
+    Um job é assumido com um UPDATE condicional (status queued -> running),
+    de modo que vários processos podem consumir a mesma fila. Cada lote é
+    gravado na mesma transação que avança features_read; a transação só
+    confirma se o job ainda pertence ao worker. feature_type converte o tipo
+    GeoJSON para o da coluna (GeometryType; ValueError se não suportado).
+    Com synchronous=True (testes) os jobs são processados em wake().
+    """
+
+    def __init__(self, engine, jobs_table, features_table, feature_type: Callable[[str], Any],
+                 workers: int = DEFAULT_IMPORT_WORKERS,
+                 batch_size: int = DEFAULT_IMPORT_BATCH_SIZE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 synchronous: bool = False):
+        self.engine = engine
+        self.jobs = jobs_table
+        self.features_table = features_table
+        self.feature_type = feature_type
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.synchronous = synchronous
+        self.stats = {'completed': 0, 'failed': 0, 'requeued': 0}
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    # ---------------- Ciclo de vida ----------------
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> None:
+        if self.synchronous or self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'import-worker-{index}', daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Parar os workers; um job em andamento volta à fila quando ficar sem heartbeat"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self) -> None:
+        """Avisar que há job novo (ou processá-lo agora, no modo síncrono)"""
+        if self.synchronous:
+            self.run_pending()
+        else:
+            self._wake.set()
+
+    def _run(self) -> None:
+        worker = _worker_id()
+        while not self._stop.is_set():
+            try:
+                if self.run_next(worker):
+                    continue
+            except Exception as e:
+                logger.error(f"Erro no worker de importação: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # ---------------- Jobs ----------------
+
+    def create(self, layer_id: str, created_by: str, filename: str, file_path: str,
+               connection=None) -> str:
+        """
+        Registrar um job para um arquivo já gravado em disco. Com `connection`
+        o job entra na transação do chamador (chame wake() após o commit).
+        """
+        job_id = os.urandom(16).hex()
+        statement = self.jobs.insert().values(
+            id=job_id, layer_id=layer_id, created_by=created_by, filename=filename,
+            file_path=file_path, file_size=os.path.getsize(file_path), status=QUEUED,
+            attempts=0, features_read=0, features_inserted=0, features_skipped=0,
+            errors=[], created_at=datetime.utcnow()
+        )
+        if connection is not None:
+            connection.execute(statement)
+        else:
+            with self.engine.begin() as own_connection:
+                own_connection.execute(statement)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.engine.connect() as connection:
+            row = connection.execute(select(self.jobs).where(self.jobs.c.id == job_id)).mappings().first()
+        return dict(row) if row else None
+
+    def requeue_stale(self) -> int:
+        """Devolver à fila (ou falhar, após max_attempts) jobs sem heartbeat recente"""
+        stale_before = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        stale = (self.jobs.c.status == RUNNING) & (self.jobs.c.heartbeat_at < stale_before)
+        with self.engine.begin() as connection:
+            connection.execute(update(self.jobs).where(stale & (self.jobs.c.attempts >= self.max_attempts)).values(
+                status=FAILED, worker=None, finished_at=datetime.utcnow(),
+                message='Worker interrompido repetidamente'
+            ))
+            requeued = connection.execute(update(self.jobs).where(stale).values(status=QUEUED, worker=None)).rowcount
+        self.stats['requeued'] += requeued
+        return requeued
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Assumir o job mais antigo da fila (None se vazia ou se outro worker venceu)"""
+        with self.engine.begin() as connection:
+            job_id = connection.execute(
+                select(self.jobs.c.id).where(self.jobs.c.status == QUEUED)
+                .order_by(self.jobs.c.created_at).limit(1)
+            ).scalar()
+            if job_id is None:
+                return None
+            now = datetime.utcnow()
+            claimed = connection.execute(
+                update(self.jobs).where((self.jobs.c.id == job_id) & (self.jobs.c.status == QUEUED)).values(
+                    status=RUNNING, worker=worker, attempts=self.jobs.c.attempts + 1,
+                    started_at=now, heartbeat_at=now
+                )
+            ).rowcount
+        return self.get(job_id) if claimed else None
+
+    def run_next(self, worker: Optional[str] = None) -> bool:
+        """Processar um job da fila; False se não havia nenhum"""
+        worker = worker or _worker_id()
+        self.requeue_stale()
+        job = self.claim(worker)
+        if job is None:
+            return False
+        self.process(job, worker)
+        return True
+
+    def run_pending(self) -> int:
+        """Processar a fila até esvaziar; retorna jobs processados"""
+        processed = 0
+        while self.run_next():
+            processed += 1
+        return processed
+
+    # ---------------- Processamento ----------------
+
+    def process(self, job: Dict[str, Any], worker: str) -> None:
+        try:
+            if job['features_total'] is None:
+                total = self._validate(job, worker)
+                if total is None:
+                    return
+                job['features_total'] = total
+            self._load(job, worker)
+        except LeaseLost:
+            logger.warning(f"Job de importação {job['id']} assumido por outro worker")
+        except Exception as e:
+            logger.error(f"Erro no job de importação {job['id']}: {e}")
+            self._finish(job, worker, FAILED, f'Erro ao importar: {e}')
+
+    def _validate(self, job: Dict[str, Any], worker: str) -> Optional[int]:
+        """Primeira passada: arquivo malformado falha antes de gravar qualquer feature"""
+        # Heartbeat durante a passada: arquivos grandes levam minutos para validar
+        def heartbeat(count):
+            self._update(job['id'], worker)
+
+        with open(job['file_path'], 'rb') as source:
+            if is_kmz(source):
+                valid, message, total = check_kmz(source, on_progress=heartbeat, every=self.batch_size)
+            else:
+                valid, message, total = check_kml(source, on_progress=heartbeat, every=self.batch_size)
+        if not valid:
+            self._finish(job, worker, FAILED, message)
+            return None
+        self._update(job['id'], worker, features_total=total)
+        return total
+
+    def _load(self, job: Dict[str, Any], worker: str) -> None:
+        resume_at = job['features_read']
+        state = {
+            'read': resume_at,
+            'skipped': job['features_skipped'],
+            'errors': list(job.get('errors') or [])
+        }
+        items = []
+        with open(job['file_path'], 'rb') as source:
+            for index, feature in enumerate(iter_features(source)):
+                if index < resume_at:
+                    continue  # já confirmado em uma tentativa anterior
+                state['read'] = index + 1
+                try:
+                    item = parse_feature_input(feature, max_features=None)[0]
+                    item['feature_type'] = self.feature_type(item['feature_type'])
+                    items.append(item)
+                except ValueError as e:
+                    state['skipped'] += 1
+                    if len(state['errors']) < MAX_STORED_ERRORS:
+                        state['errors'].append({'feature': index, 'error': str(e)})
+                if state['read'] - resume_at >= self.batch_size:
+                    self._checkpoint(job, worker, items, state)
+                    resume_at, items = state['read'], []
+        self._checkpoint(job, worker, items, state)
+        self._finish(job, worker, COMPLETED, None)
+        try:
+            os.remove(job['file_path'])
+        except OSError as e:
+            logger.warning(f"Arquivo do job {job['id']} não removido: {e}")
+
+    def _checkpoint(self, job: Dict[str, Any], worker: str, items: List[Dict[str, Any]],
+                    state: Dict[str, Any]) -> None:
+        """Gravar o lote e avançar o ponto de retomada na mesma transação"""
+        with self.engine.begin() as connection:
+            inserted = 0
+            if items:
+                inserted = bulk_load_features(connection, self.features_table, job['layer_id'], items,
+                                              job['created_by'], self.batch_size)['inserted']
+            self._update(job['id'], worker, connection=connection,
+                         features_read=state['read'],
+                         features_inserted=self.jobs.c.features_inserted + inserted,
+                         features_skipped=state['skipped'],
+                         errors=state['errors'])
+
+    def _finish(self, job: Dict[str, Any], worker: str, status: str, message: Optional[str]) -> None:
+        self._update(job['id'], worker, status=status, message=message, worker=None,
+                     finished_at=datetime.utcnow())
+        self.stats['completed' if status == COMPLETED else 'failed'] += 1
+
+    def _update(self, job_id: str, owner: str, connection=None, **values: Any) -> None:
+        """UPDATE do job condicionado ao worker dono (LeaseLost desfaz a transação)"""
+        statement = update(self.jobs).where(
+            (self.jobs.c.id == job_id) & (self.jobs.c.worker == owner) & (self.jobs.c.status == RUNNING)
+        ).values(heartbeat_at=datetime.utcnow(), **values)
+        if connection is not None:
+            if connection.execute(statement).rowcount == 0:
+                raise LeaseLost(job_id)
+            return
+        with self.engine.begin() as own_connection:
+            self._update(job_id, owner, own_connection, **values)
+
+def _worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'[:100]
+
+# ================================================
+# INTEGRAÇÃO COM FLASK
+# ================================================
+
+def import_folder(app) -> str:
+    """Diretório dos arquivos aguardando importação"""
+    return app.config.get('IMPORT_FOLDER') or os.path.join(app.instance_path, DEFAULT_IMPORT_FOLDER)
+
+def init_import_jobs(app, db, jobs_table, features_table,
+                     feature_type: Callable[[str], Any]) -> ImportJobQueue:
+    """
+    Criar a fila da aplicação (app.extensions['import_jobs']) e iniciar os workers.
+
+    Configuração: IMPORT_WORKERS, IMPORT_BATCH_SIZE, IMPORT_POLL_INTERVAL,
+    IMPORT_STALE_SECONDS, IMPORT_MAX_ATTEMPTS, IMPORT_FOLDER e IMPORT_ASYNC
+    (padrão: desligado em TESTING).
+    """
+    with app.app_context():
+        engine = db.engine
+
+    jobs = ImportJobQueue(
+        engine, jobs_table, features_table, feature_type,
+        workers=app.config.get('IMPORT_WORKERS', DEFAULT_IMPORT_WORKERS),
+        batch_size=app.config.get('IMPORT_BATCH_SIZE', DEFAULT_IMPORT_BATCH_SIZE),
+        poll_interval=app.config.get('IMPORT_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+        stale_seconds=app.config.get('IMPORT_STALE_SECONDS', DEFAULT_STALE_SECONDS),
+        max_attempts=app.config.get('IMPORT_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+        synchronous=not app.config.get('IMPORT_ASYNC', not app.testing)
+    )
+    app.extensions[EXTENSION_KEY] = jobs
+    jobs.start()
+    atexit.register(jobs.stop)
+    return jobs
+
+def get_import_jobs(app, db, jobs_table, features_table,
+                    feature_type: Callable[[str], Any]) -> ImportJobQueue:
+    """Fila da aplicação (criada no primeiro uso)"""
+    jobs = app.extensions.get(EXTENSION_KEY)
+    if jobs is None:
+        with _init_lock:
+            jobs = app.extensions.get(EXTENSION_KEY) or init_import_jobs(
+                app, db, jobs_table, features_table, feature_type)
+    return jobs
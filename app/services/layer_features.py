@@ -0,0 +1,164 @@
+"""
+WEBAG Professional - Features de Camadas (API v2)
+Validação de entrada GeoJSON, filtros de consulta e saída em streaming
+"""
+
+import json
+import itertools
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+DEFAULT_FEATURE_PAGE_SIZE = 100
+MAX_FEATURE_PAGE_SIZE = 1000
+
+# Máximo de features por escrita em lote (uma transação)
+MAX_FEATURE_BATCH = 1000
+
+# Rows lidas do banco por vez ao gerar a resposta
+STREAM_CHUNK_SIZE = 200
+
+# Campos que um cliente pode alterar em uma feature existente
+UPDATABLE_FEATURE_FIELDS = ('geometry', 'properties', 'style_override', 'status')
+
+# Prefixo dos parâmetros de filtro por atributo (?prop.bairro=Centro)
+PROPERTY_FILTER_PREFIX = 'prop.'
+
+# ================================================
+# PARÂMETROS DE CONSULTA
+# ================================================
+
+def parse_bbox(value: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """bbox=minX,minY,maxX,maxY (ValueError se inválida)"""
+    if not value:
+        return None
+    try:
+        min_x, min_y, max_x, max_y = (float(v) for v in value.split(','))
+    except ValueError:
+        raise ValueError(f'bbox inválida: {value}')
+    if min_x > max_x or min_y > max_y:
+        raise ValueError(f'bbox inválida: {value}')
+    return min_x, min_y, max_x, max_y
+
+def parse_property_filters(args) -> Dict[str, str]:
+    """Filtros por atributo a partir dos parâmetros prop.<nome>=<valor>"""
+    return {
+        key[len(PROPERTY_FILTER_PREFIX):]: value
+        for key, value in args.items()
+        if key.startswith(PROPERTY_FILTER_PREFIX) and len(key) > len(PROPERTY_FILTER_PREFIX)
+    }
+
+def clamp_feature_page_size(value: Optional[str]) -> int:
+    try:
+        size = int(value) if value else DEFAULT_FEATURE_PAGE_SIZE
+    except ValueError:
+        size = DEFAULT_FEATURE_PAGE_SIZE
+    return max(1, min(size, MAX_FEATURE_PAGE_SIZE))
+
+# ================================================
+# ENTRADA GEOJSON
+# ================================================
+
+def _validate_geometry(geometry: Any) -> Dict[str, Any]:
+    if not isinstance(geometry, dict) or not geometry.get('type'):
+        raise ValueError('Geometria inválida')
+    if geometry['type'] != 'GeometryCollection' and not isinstance(geometry.get('coordinates'), list):
+        raise ValueError('Geometria sem coordenadas')
+    return geometry
+
+def parse_feature_input(data: Any, max_features: Optional[int] = MAX_FEATURE_BATCH) -> List[Dict[str, Any]]:
+    """
+    Features de um Feature ou FeatureCollection GeoJSON.
+
+    Retorna dicionários com geometry, properties, style_override e
+    feature_type (tipo GeoJSON da geometria); ValueError se inválido.
+    max_features=None desativa o limite (carga via CLI).
+    """
+    if not isinstance(data, dict):
+        raise ValueError('GeoJSON inválido')
+    if data.get('type') == 'FeatureCollection':
+        items = data.get('features')
+        if not isinstance(items, list) or not items:
+            raise ValueError('FeatureCollection sem features')
+    elif data.get('type') == 'Feature':
+        items = [data]
+    else:
+        raise ValueError('Esperado Feature ou FeatureCollection')
+
+    if max_features is not None and len(items) > max_features:
+        raise ValueError(f'Máximo de {max_features} features por requisição')
+
+    features = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict) or item.get('type') != 'Feature':
+                raise ValueError('item não é uma Feature')
+            geometry = _validate_geometry(item.get('geometry'))
+            properties = item.get('properties') or {}
+            if not isinstance(properties, dict):
+                raise ValueError('properties deve ser um objeto')
+        except ValueError as e:
+            raise ValueError(f'Feature {index}: {e}')
+        features.append({
+            'feature_type': geometry['type'],
+            'geometry': geometry,
+            'properties': properties,
+            'style_override': item.get('style_override') or {}
+        })
+    return features
+
+def validate_feature_update(data: Any) -> Dict[str, Any]:
+    """Campos alteráveis de uma feature (geometry é validada)"""
+    if not isinstance(data, dict):
+        raise ValueError('Dados obrigatórios')
+    changes = {field: data[field] for field in UPDATABLE_FEATURE_FIELDS if field in data}
+    if 'geometry' in changes:
+        _validate_geometry(changes['geometry'])
+    if 'properties' in changes and not isinstance(changes['properties'], dict):
+        raise ValueError('properties deve ser um objeto')
+    return changes
+
+# ================================================
+# SAÍDA EM STREAMING
+# ================================================
+
+def prefetch(items: Iterable[Any], size: int) -> Iterator[Any]:
+    """Ler já os primeiros `size` itens: falhas da consulta aparecem antes da resposta começar"""
+    iterator = iter(items)
+    first = list(itertools.islice(iterator, size))
+    return itertools.chain(first, iterator)
+
+def stream_feature_collection(features: Iterable[Any], limit: int,
+                              serialize: Callable[[Any], Dict[str, Any]],
+                              cursor_of: Callable[[Any], str],
+                              on_error: Optional[Callable[[Exception], None]] = None) -> Iterator[str]:
+    """
+    FeatureCollection gerada feature a feature.
+
+    `features` deve trazer até limit + 1 itens: o excedente só indica que
+    há próxima página (next_cursor, ao final do documento). Uma falha no
+    meio do streaming (status 200 já enviado) é repassada a `on_error` e o
+    documento é fechado com "error" e o cursor da última feature enviada.
+    """
+    yield '{"type":"FeatureCollection","features":['
+    count = 0
+    last = None
+    has_more = False
+    try:
+        for feature in features:
+            if count == limit:
+                has_more = True
+                break
+            yield (',' if count else '') + json.dumps(serialize(feature), default=str)
+            last = feature
+            count += 1
+    except Exception as e:
+        if on_error:
+            on_error(e)
+        resume = cursor_of(last) if last is not None else None
+        yield '],"count":%d,"next_cursor":%s,"error":"Erro interno do servidor"}' % (count, json.dumps(resume))
+        return
+    next_cursor = cursor_of(last) if has_more and last is not None else None
+    yield '],"count":%d,"next_cursor":%s}' % (count, json.dumps(next_cursor))
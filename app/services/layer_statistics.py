@@ -0,0 +1,145 @@
+"""
+WEBAG Professional - Estatísticas de Camadas
+Agregação única por camada (GROUP BY) com cache por versão de dados
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+
+try:
+    from sqlalchemy import func, text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+# Número máximo de camadas mantidas no cache (por processo)
+STATISTICS_CACHE_SIZE = 256
+
+# Dias exibidos na linha do tempo de criação
+TIMELINE_LIMIT = 30
+
+BUMP_DATA_VERSION_SQL = "UPDATE layers SET data_version = COALESCE(data_version, 0) + 1 WHERE id = :layer_id"
+
+# ================================================
+# VERSÃO DE DADOS
+# ================================================
+
+def bump_layer_data_version(connection, layer_ids: Iterable[Optional[str]]) -> None:
+    """Incrementar a versão de dados das camadas (invalida o cache de estatísticas)"""
+    params = [{'layer_id': layer_id} for layer_id in sorted({l for l in layer_ids if l})]
+    if params:
+        connection.execute(text(BUMP_DATA_VERSION_SQL), params)
+
+# ================================================
+# CACHE
+# ================================================
+
+class StatisticsCache:
+    """Cache LRU de estatísticas indexado por (layer_id, data_version)"""
+
+    def __init__(self, max_size: int = STATISTICS_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, tuple[int, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, layer_id: str, data_version: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(layer_id)
+            if entry is None or entry[0] != data_version:
+                return None
+            self._entries.move_to_end(layer_id)
+            return entry[1]
+
+    def set(self, layer_id: str, data_version: int, stats: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[layer_id] = (data_version, stats)
+            self._entries.move_to_end(layer_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+statistics_cache = StatisticsCache()
+
+# ================================================
+# AGREGAÇÃO
+# ================================================
+
+def compute_layer_statistics(session, layer_id: str) -> Dict[str, Any]:
+    """Calcular estatísticas de features da camada com uma agregação GROUP BY"""
+    from app.models.enhanced_models import Feature, LayerVersion, StatusType
+
+    groups = session.query(
+        Feature.feature_type,
+        Feature.status,
+        Feature.is_current,
+        func.count(Feature.id)
+    ).filter(Feature.layer_id == layer_id).group_by(
+        Feature.feature_type, Feature.status, Feature.is_current
+    ).all()
+
+    total_features = 0
+    active_features = 0
+    geometry_stats: Dict[str, int] = {}
+    for feature_type, status, is_current, count in groups:
+        total_features += count
+        if is_current and status == StatusType.ACTIVE:
+            active_features += count
+        if is_current and feature_type is not None:
+            geometry_stats[feature_type.value] = geometry_stats.get(feature_type.value, 0) + count
+
+    timeline = session.query(
+        func.date(Feature.created_at).label('date'),
+        func.count(Feature.id).label('count')
+    ).filter(Feature.layer_id == layer_id).group_by(
+        func.date(Feature.created_at)
+    ).order_by('date').limit(TIMELINE_LIMIT).all()
+
+    version_count = session.query(func.count(LayerVersion.id)).filter(
+        LayerVersion.layer_id == layer_id
+    ).scalar()
+
+    return {
+        'total_features': total_features,
+        'active_features': active_features,
+        'deleted_features': total_features - active_features,
+        'geometry_types': geometry_stats,
+        'creation_timeline': [
+            {'date': str(stat.date), 'count': stat.count}
+            for stat in timeline
+        ],
+        'version_count': version_count or 0
+    }
+
+def get_cached_layer_statistics(session, layer, shared_cache=None) -> Dict[str, Any]:
+    """
+    Estatísticas da camada, reutilizando o cache enquanto os dados não mudarem.
+
+    Com `shared_cache` (TieredCache), uma agregação feita por um worker é
+    reaproveitada pelos demais.
+    """
+    from app.models.enhanced_models import Layer
+
+    # Ler a versão direto do banco: a instância pode estar desatualizada na sessão
+    data_version = session.query(Layer.data_version).filter(Layer.id == layer.id).scalar() or 0
+
+    stats = statistics_cache.get(layer.id, data_version)
+    if stats is None:
+        if shared_cache is not None:
+            stats = shared_cache.get_or_set(
+                f'layer_statistics:{layer.id}:{data_version}',
+                lambda: compute_layer_statistics(session, layer.id),
+                tags=[f'layer:{layer.id}']
+            )
+        else:
+            stats = compute_layer_statistics(session, layer.id)
+        statistics_cache.set(layer.id, data_version, stats)
+    return stats
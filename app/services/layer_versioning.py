@@ -0,0 +1,342 @@
+"""
+WEBAG Professional - Versionamento Incremental de Camadas
+Versões copy-on-write: cada versão guarda apenas as features alteradas
+desde a versão pai; o materializador reconstrói qualquer versão sob demanda
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+try:
+    from sqlalchemy import text
+    from sqlalchemy.orm import defer
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+from app.services.version_blobs import load_version_config
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+# Tipos de armazenamento de LayerVersion
+SNAPSHOT_STORAGE = 'snapshot'  # layer_config com todas as features (legado)
+DELTA_STORAGE = 'delta'        # apenas alterações em layer_version_changes
+
+# Tipos de alteração de uma feature em uma versão delta
+CHANGE_UPSERT = 'upsert'
+CHANGE_DELETE = 'delete'
+
+# Tamanho dos lotes de ids em cláusulas IN
+ID_BATCH_SIZE = 500
+
+# Campos que definem o conteúdo de uma feature (comparados por hash)
+CONTENT_FIELDS = ('feature_type', 'geometry', 'properties', 'style_override', 'status')
+
+# Campos restaurados no rollback
+RESTORE_FIELDS = CONTENT_FIELDS + (
+    'area_m2', 'length_m', 'perimeter_m', 'centroid_coordinates',
+    'validation_status', 'validation_errors'
+)
+
+# Cada marcação grava um mark_id novo: a pendência só é removida se ainda
+# for a mesma lida ao montar a versão (feature alterada de novo continua)
+MARK_DIRTY_SQL = """
+    INSERT INTO layer_dirty_features (layer_id, feature_id, mark_id)
+    VALUES (:layer_id, :feature_id, :mark_id)
+    ON CONFLICT (layer_id, feature_id) DO UPDATE SET mark_id = excluded.mark_id
+"""
+
+CLEAR_DIRTY_SQL = """
+    DELETE FROM layer_dirty_features
+    WHERE layer_id = :layer_id AND feature_id = :feature_id AND COALESCE(mark_id, '') = :mark_id
+"""
+
+# ================================================
+# FEATURES ALTERADAS
+# ================================================
+
+def mark_features_dirty(connection, pairs: Iterable[Tuple[Optional[str], Optional[str]]]) -> None:
+    """Registrar (layer_id, feature_id) alterados desde a última versão da camada"""
+    mark_id = os.urandom(16).hex()
+    params = [{'layer_id': layer_id, 'feature_id': feature_id, 'mark_id': mark_id}
+              for layer_id, feature_id in sorted({p for p in pairs if p[0] and p[1]})]
+    if params:
+        connection.execute(text(MARK_DIRTY_SQL), params)
+
+def _current_features(session, layer_id: str, feature_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Features atuais da camada (opcionalmente restritas a ids)"""
+    from app.models.enhanced_models import Feature
+
+    query = Feature.query.filter(Feature.layer_id == layer_id, Feature.is_current == True)
+    if feature_ids is None:
+        return {feature.id: feature.to_dict() for feature in query}
+
+    # Consultar em lotes para não exceder o limite de parâmetros do banco
+    features = {}
+    for start in range(0, len(feature_ids), ID_BATCH_SIZE):
+        batch = feature_ids[start:start + ID_BATCH_SIZE]
+        features.update({feature.id: feature.to_dict() for feature in query.filter(Feature.id.in_(batch))})
+    return features
+
+def build_version_changes(session, layer, parent) -> Tuple[List[Dict[str, Any]], List[Tuple[str, Optional[str]]]]:
+    """
+    Alterações da camada em relação à versão pai.
+
+    Retorna (alterações, pendências consumidas como (feature_id, mark_id)).
+    Sem pai, a versão contém todas as features atuais; com pai snapshot
+    (legado), as features são comparadas uma única vez com o snapshot.
+    """
+    from app.models.enhanced_models import LayerDirtyFeature
+
+    # Pendências lidas antes das features: o que for marcado depois fica para a próxima versão
+    marks = [(row.feature_id, row.mark_id) for row in session.query(
+        LayerDirtyFeature.feature_id, LayerDirtyFeature.mark_id
+    ).filter(LayerDirtyFeature.layer_id == layer.id)]
+    dirty_ids = [feature_id for feature_id, _ in marks]
+
+    if parent is None:
+        current = _current_features(session, layer.id)
+        changes = [_upsert(fid, data) for fid, data in current.items()]
+        return changes, marks
+
+    if parent.storage_type != DELTA_STORAGE:
+        previous = _snapshot_features(session, parent)
+        current = _current_features(session, layer.id)
+        changes = [_upsert(fid, data) for fid, data in current.items() if previous.get(fid) != data]
+        changes += [_delete(fid) for fid in previous if fid not in current]
+        return changes, marks
+
+    current = _current_features(session, layer.id, dirty_ids)
+    changes = [_upsert(fid, current[fid]) if fid in current else _delete(fid) for fid in dirty_ids]
+    return changes, marks
+
+def clear_dirty_features(session, layer_id: str, marks: List[Tuple[str, Optional[str]]]) -> None:
+    """Remover pendências incorporadas em uma versão (só as que não foram remarcadas)"""
+    if marks:
+        session.execute(text(CLEAR_DIRTY_SQL), [
+            {'layer_id': layer_id, 'feature_id': feature_id, 'mark_id': mark_id or ''}
+            for feature_id, mark_id in marks
+        ])
+
+def _upsert(feature_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {'feature_id': feature_id, 'change_type': CHANGE_UPSERT, 'feature_data': data}
+
+def _delete(feature_id: str) -> Dict[str, Any]:
+    return {'feature_id': feature_id, 'change_type': CHANGE_DELETE, 'feature_data': None}
+
+# ================================================
+# MATERIALIZAÇÃO
+# ================================================
+
+def version_chain(session, version) -> Tuple[Optional[Any], List[Any]]:
+    """(base snapshot ou None, versões delta da mais antiga até ``version``)"""
+    from app.models.enhanced_models import LayerVersion
+
+    versions = {
+        v.id: v for v in LayerVersion.query.filter_by(layer_id=version.layer_id).options(
+            defer(LayerVersion.layer_config)
+        )
+    }
+    versions[version.id] = version
+
+    chain = []
+    current = version
+    seen = set()
+    while current is not None and current.storage_type == DELTA_STORAGE and current.id not in seen:
+        seen.add(current.id)
+        chain.append(current)
+        current = versions.get(current.parent_version_id)
+    chain.reverse()
+    return current, chain
+
+def _snapshot_features(session, version, feature_ids: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    features = load_version_config(session, version).get('features', []) if version is not None else []
+    return {f['id']: f for f in features if feature_ids is None or f['id'] in feature_ids}
+
+def materialize_features(session, version, feature_ids: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Estado das features (id -> dados) em uma versão, opcionalmente restrito a ids"""
+    from app.models.enhanced_models import LayerVersion, LayerVersionChange
+
+    if version.storage_type != DELTA_STORAGE:
+        return _snapshot_features(session, version, feature_ids)
+
+    base, chain = version_chain(session, version)
+    features = _snapshot_features(session, base, feature_ids)
+
+    changes = session.query(LayerVersionChange).join(
+        LayerVersion, LayerVersion.id == LayerVersionChange.version_id
+    ).filter(
+        LayerVersionChange.version_id.in_([v.id for v in chain])
+    )
+    if feature_ids is not None and len(feature_ids) <= ID_BATCH_SIZE:
+        changes = changes.filter(LayerVersionChange.feature_id.in_(sorted(feature_ids)))
+
+    for change in changes.order_by(LayerVersion.version_number):
+        if feature_ids is not None and change.feature_id not in feature_ids:
+            continue
+        if change.change_type == CHANGE_DELETE:
+            features.pop(change.feature_id, None)
+        else:
+            features[change.feature_id] = change.feature_data
+    return features
+
+def materialize_version(session, version) -> Dict[str, Any]:
+    """Reconstruir a configuração completa de uma versão (mesmo formato do snapshot)"""
+    config = dict(load_version_config(session, version))
+    config['features'] = list(materialize_features(session, version).values())
+    config.setdefault('created_at', version.created_at.isoformat() if version.created_at else datetime.utcnow().isoformat())
+    return config
+
+# ================================================
+# COMPARAÇÃO E ROLLBACK
+# ================================================
+
+def feature_hash(data: Dict[str, Any]) -> str:
+    """Hash do conteúdo de uma feature (geometria, propriedades, estilo, tipo e status)"""
+    content = {field: data.get(field) for field in CONTENT_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def changed_feature_ids(session, older, newer) -> Optional[Set[str]]:
+    """
+    Ids de features alteradas entre duas versões da mesma cadeia delta.
+
+    Retorna None quando as versões não estão na mesma cadeia (a comparação
+    precisa considerar todas as features).
+    """
+    from app.models.enhanced_models import LayerVersionChange
+
+    if older.id == newer.id:
+        return set()
+
+    base, chain = version_chain(session, newer)
+    chain_ids = [v.id for v in chain]
+    if older.id in chain_ids:
+        between = chain_ids[chain_ids.index(older.id) + 1:]
+    elif base is not None and older.id == base.id:
+        between = chain_ids
+    else:
+        return None
+
+    if not between:
+        return set()
+    return {
+        row.feature_id for row in session.query(LayerVersionChange.feature_id).filter(
+            LayerVersionChange.version_id.in_(between)
+        ).distinct()
+    }
+
+def _property_changes(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    before = before or {}
+    after = after or {}
+    return {
+        'added': {k: after[k] for k in after if k not in before},
+        'removed': {k: before[k] for k in before if k not in after},
+        'changed': {k: {'from': before[k], 'to': after[k]}
+                    for k in after if k in before and before[k] != after[k]}
+    }
+
+def diff_feature_states(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Features adicionadas, removidas e modificadas entre dois estados"""
+    added = sorted(fid for fid in after if fid not in before)
+    removed = sorted(fid for fid in before if fid not in after)
+
+    modified = []
+    for fid in sorted(fid for fid in after if fid in before):
+        old, new = before[fid], after[fid]
+        if feature_hash(old) == feature_hash(new):
+            continue
+        modified.append({
+            'id': fid,
+            'geometry_changed': old.get('geometry') != new.get('geometry'),
+            'style_changed': old.get('style_override') != new.get('style_override'),
+            'status_changed': old.get('status') != new.get('status'),
+            'properties': _property_changes(old.get('properties'), new.get('properties'))
+        })
+
+    return {'added': added, 'removed': removed, 'modified': modified}
+
+def _ordered(a, b):
+    return (a, b) if a.version_number <= b.version_number else (b, a)
+
+def diff_versions(session, version_a, version_b) -> Dict[str, Any]:
+    """Diferenças da versão A para a versão B (apenas features tocadas entre elas)"""
+    older, newer = _ordered(version_a, version_b)
+    candidates = changed_feature_ids(session, older, newer)
+
+    before = materialize_features(session, version_a, candidates)
+    after = materialize_features(session, version_b, candidates)
+    return diff_feature_states(before, after)
+
+def _latest_version(session, layer_id: str):
+    from app.models.enhanced_models import LayerVersion
+
+    return LayerVersion.query.filter_by(layer_id=layer_id).options(
+        defer(LayerVersion.layer_config)
+    ).order_by(LayerVersion.version_number.desc()).first()
+
+def _restore_feature(feature, data: Dict[str, Any]) -> None:
+    from app.models.enhanced_models import GeometryType, StatusType
+
+    for field in RESTORE_FIELDS:
+        value = data.get(field)
+        if field == 'feature_type' and value is not None:
+            value = GeometryType(value)
+        elif field == 'status' and value is not None:
+            value = StatusType(value)
+        setattr(feature, field, value)
+    feature.is_current = True
+
+def rollback_to_version(session, layer, version, user) -> Dict[str, Any]:
+    """
+    Restaurar as features da camada para o estado de uma versão.
+
+    Aplica o delta reverso (apenas features alteradas desde a versão, mais as
+    pendentes) na sessão; o chamador confirma tudo em uma única transação.
+    """
+    from app.models.enhanced_models import Feature, LayerDirtyFeature
+
+    latest = _latest_version(session, layer.id)
+    candidates = changed_feature_ids(session, version, latest) if latest is not None else None
+    if candidates is not None:
+        candidates |= {row.feature_id for row in session.query(LayerDirtyFeature.feature_id).filter(
+            LayerDirtyFeature.layer_id == layer.id
+        )}
+
+    target = materialize_features(session, version, candidates)
+    live = _current_features(session, layer.id, sorted(candidates) if candidates is not None else None)
+    diff = diff_feature_states(live, target)
+
+    # Features que voltam a existir ou mudam de conteúdo
+    restore_ids = diff['added'] + [item['id'] for item in diff['modified']]
+    existing = {}
+    for start in range(0, len(restore_ids), ID_BATCH_SIZE):
+        batch = restore_ids[start:start + ID_BATCH_SIZE]
+        existing.update({f.id: f for f in Feature.query.filter(Feature.id.in_(batch))})
+
+    for fid in restore_ids:
+        feature = existing.get(fid)
+        if feature is None:
+            feature = Feature(id=fid, layer_id=layer.id,
+                              created_by=target[fid].get('created_by') or user.id)
+            session.add(feature)
+        feature.layer_id = layer.id
+        feature.updated_by = user.id
+        _restore_feature(feature, target[fid])
+
+    # Features criadas depois da versão deixam de ser atuais
+    for start in range(0, len(diff['removed']), ID_BATCH_SIZE):
+        batch = diff['removed'][start:start + ID_BATCH_SIZE]
+        for feature in Feature.query.filter(Feature.id.in_(batch)):
+            feature.is_current = False
+            feature.updated_by = user.id
+
+    return {
+        'restored': diff['added'],
+        'reverted': [item['id'] for item in diff['modified']],
+        'removed': diff['removed']
+    }
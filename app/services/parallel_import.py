@@ -0,0 +1,188 @@
+"""
+WEBAG Professional - Importação Paralela de KML/KMZ
+Os arquivos são lidos e as linhas preparadas em um ProcessPoolExecutor. Os
+workers enviam lotes por uma fila limitada a um único escritor (o processo
+que chama run_parallel_import), que grava em transações grandes: só um
+processo escreve no banco, sem disputa pelo lock do SQLite
+"""
+
+import os
+import json
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple
+
+from app.utils.kmz_reader import iter_features
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Linhas gravadas entre commits do escritor
+DEFAULT_TRANSACTION_SIZE = 20000
+
+# Lotes em trânsito por worker: limita a memória se o escritor atrasar
+QUEUE_BATCHES_PER_WORKER = 4
+
+# Intervalo para o escritor verificar workers que morreram sem avisar
+POLL_SECONDS = 0.5
+
+# ================================================
+# WORKERS
+# ================================================
+
+def prepare_feature(feature: Dict[str, Any], layer_name: str) -> Tuple:
+    """Linha padrão: (camada, tipo, geometria JSON, propriedades JSON)"""
+    geometry = feature['geometry']
+    properties = {**feature['properties'], 'imported_from': layer_name}
+    return layer_name, geometry['type'], json.dumps(geometry), json.dumps(properties)
+
+def parse_file(path: str, layer_name: str, batches, batch_size: int,
+               prepare: Callable[[Dict[str, Any], str], Tuple] = prepare_feature) -> int:
+    """
+    Executado no worker: lê o arquivo em streaming e envia
+    ('start' | 'batch' | 'done' | 'error', caminho, dados) pela fila.
+    """
+    batches.put(('start', path, None))
+    count = 0
+    try:
+        batch = []
+        for feature in iter_features(path):
+            batch.append(prepare(feature, layer_name))
+            if len(batch) >= batch_size:
+                batches.put(('batch', path, batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            batches.put(('batch', path, batch))
+            count += len(batch)
+        batches.put(('done', path, count))
+    except Exception as e:
+        batches.put(('error', path, str(e)))
+    return count
+
+# ================================================
+# ESCRITOR
+# ================================================
+
+def _file_stats(layer_name: str) -> Dict[str, Any]:
+    return {'layer': layer_name, 'features': 0, 'discarded': 0, 'seconds': 0.0, 'features_per_second': 0.0,
+            'error': None, 'finished': False, '_started': None}
+
+def _finish(stats: Dict[str, Any], error: Optional[str] = None) -> None:
+    started = stats.pop('_started', None) or time.perf_counter()
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['features_per_second'] = round(stats['features'] / elapsed, 1) if elapsed > 0 else 0.0
+    stats['error'] = error
+    stats['finished'] = True
+
+def run_parallel_import(files: Iterable[Tuple[str, str]],
+                        write_batch: Callable[[List[Tuple]], None],
+                        commit: Callable[[], None],
+                        discard: Callable[[str, str], None],
+                        workers: Optional[int] = None,
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        transaction_size: int = DEFAULT_TRANSACTION_SIZE,
+                        prepare: Callable[[Dict[str, Any], str], Tuple] = prepare_feature,
+                        progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Importar vários arquivos (caminho, camada) em paralelo.
+
+    write_batch recebe as linhas preparadas por `prepare` (função de nível
+    de módulo, enviada aos workers) e commit fecha a transação corrente.
+
+    Um arquivo que falha no meio já pode ter lotes gravados (e confirmados
+    junto com os dos demais arquivos): discard(caminho, camada) remove essas
+    linhas e o escritor confirma a remoção. Assim cada arquivo é importado
+    por inteiro ou não deixa linhas, e repetir a importação não duplica nada.
+
+    Retorna, por arquivo: features gravadas, descartadas, segundos,
+    features/s e erro.
+    """
+    files = list(files)
+    results = {path: _file_stats(layer_name) for path, layer_name in files}
+    if not files:
+        return results
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+
+    with multiprocessing.Manager() as manager:
+        batches = manager.Queue(maxsize=workers * QUEUE_BATCHES_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(parse_file, path, layer_name, batches, batch_size, prepare): path
+                       for path, layer_name in files}
+            try:
+                _write(batches, futures, results, write_batch, commit, discard, transaction_size, progress)
+            except BaseException:
+                # Workers bloqueados na fila cheia impediriam o pool de encerrar
+                pool.shutdown(wait=False, cancel_futures=True)
+                _drain(batches, futures)
+                raise
+    return results
+
+def _write(batches, futures, results, write_batch, commit, discard, transaction_size, progress) -> None:
+    pending = len(results)
+    uncommitted = 0
+
+    def fail(path, error):
+        nonlocal uncommitted
+        stats = results[path]
+        if stats['features']:
+            discard(path, stats['layer'])
+            commit()
+            uncommitted = 0
+            stats['discarded'], stats['features'] = stats['features'], 0
+        _finish(stats, error)
+
+    while pending:
+        try:
+            kind, path, payload = batches.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            # Worker encerrado à força (OOM, sinal) não envia 'done' nem 'error'
+            for future, path in futures.items():
+                if future.done() and future.exception() is not None and not results[path]['finished']:
+                    fail(path, str(future.exception()))
+                    pending -= 1
+            continue
+
+        stats = results[path]
+        if kind == 'start':
+            stats['_started'] = time.perf_counter()
+        elif kind == 'batch':
+            write_batch(payload)
+            stats['features'] += len(payload)
+            uncommitted += len(payload)
+            if uncommitted >= transaction_size:
+                commit()
+                uncommitted = 0
+            if progress:
+                progress(path, stats)
+        elif not stats['finished']:
+            if kind == 'error':
+                fail(path, payload)
+            else:
+                _finish(stats)
+            pending -= 1
+    commit()
+
+def _drain(batches, futures) -> None:
+    while not all(future.done() for future in futures):
+        try:
+            batches.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            pass
+
+def summarize(results: Dict[str, Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    """Totais de uma importação que levou `seconds` (tempo de parede)"""
+    features = sum(stats['features'] for stats in results.values())
+    return {
+        'files': len(results),
+        'failed': sum(1 for stats in results.values() if stats['error']),
+        'features': features,
+        'seconds': round(seconds, 3),
+        'features_per_second': round(features / seconds, 1) if seconds else 0.0
+    }
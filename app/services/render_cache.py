@@ -0,0 +1,150 @@
+"""
+WEBAG Professional - Cache de Páginas Renderizadas
+O "esqueleto" estático das páginas do mapa (index.html, webgis_glebas.html)
+é renderizado uma vez por deploy para cada idioma/papel de usuário; a cada
+request só os dados do usuário são injetados e a resposta sai com ETag
+"""
+
+import json
+import hashlib
+import threading
+from typing import Dict, Any, Callable, Iterable, Optional, Tuple
+
+try:
+    from flask import current_app, request, render_template, make_response
+    FLASK_AVAILABLE = True
+except ImportError:
+    FLASK_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+# Marcador substituído pelos dados do usuário (templates: {{ user_slot|default('')|safe }})
+USER_SLOT = '<!--webag:user-->'
+
+DEFAULT_LOCALE = 'pt-BR'
+DEFAULT_ROLE = 'user'
+
+# Páginas do mapa pré-renderizadas no início do worker
+SHELL_TEMPLATES = ('index.html', 'webgis_glebas.html')
+
+# ================================================
+# CACHE
+# ================================================
+
+class RenderCache:
+    """Esqueletos renderizados por (template, idioma, papel)"""
+
+    def __init__(self):
+        self._shells: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_name: str, locale: str, role: str,
+            render: Callable[[], str]) -> Tuple[str, str]:
+        """(html do esqueleto, hash) — renderiza na primeira vez"""
+        key = (template_name, locale, role)
+        shell = self._shells.get(key)
+        if shell is not None:
+            self.hits += 1
+            return shell
+        html = render()
+        shell = (html, hashlib.sha256(html.encode('utf-8')).hexdigest()[:16])
+        with self._lock:
+            self.misses += 1
+            self._shells.setdefault(key, shell)
+        return shell
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shells.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._shells), 'hits': self.hits, 'misses': self.misses}
+
+# ================================================
+# DADOS POR USUÁRIO
+# ================================================
+
+def user_payload(user) -> Dict[str, Any]:
+    """Únicos dados por usuário da página (lidos pelo JS em #webag-user)"""
+    privileges = getattr(user, 'privileges', None) or []
+    if isinstance(privileges, dict):
+        privileges = sorted(name for name, enabled in privileges.items() if enabled)
+    return {
+        'id': str(getattr(user, 'id', '') or ''),
+        'username': getattr(user, 'username', None),
+        'name': getattr(user, 'name', None) or getattr(user, 'full_name', None),
+        'role': getattr(user, 'role', None) or DEFAULT_ROLE,
+        'privileges': list(privileges)
+    }
+
+def inject_user(shell: str, payload: Dict[str, Any]) -> str:
+    """Substituir o marcador por <script type="application/json"> com os dados"""
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    # Impede que o conteúdo feche a tag <script>
+    data = data.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+    return shell.replace(USER_SLOT, f'<script id="webag-user" type="application/json">{data}</script>', 1)
+
+# ================================================
+# INTEGRAÇÃO COM FLASK
+# ================================================
+
+def init_render_cache(app) -> RenderCache:
+    cache = RenderCache()
+    app.extensions['render_cache'] = cache
+    return cache
+
+def request_locale(app) -> str:
+    supported = app.config.get('SUPPORTED_LOCALES') or [DEFAULT_LOCALE]
+    return request.accept_languages.best_match(supported) or supported[0]
+
+def _render(template_name: str, locale: str, role: str) -> str:
+    return render_template(template_name, page_locale=locale, page_role=role, user_slot=USER_SLOT)
+
+def render_shell(template_name: str, user):
+    """
+    Página a partir do esqueleto em cache + dados do usuário, com ETag
+    (304 quando o navegador já tem a mesma versão).
+
+    Com recarga de templates ativa (debug) o esqueleto é renderizado a cada
+    request.
+    """
+    app = current_app._get_current_object()
+    payload = user_payload(user)
+    locale = request_locale(app)
+    role = payload['role']
+
+    if app.debug or app.config.get('TEMPLATES_AUTO_RELOAD'):
+        html = _render(template_name, locale, role)
+        shell_hash = hashlib.sha256(html.encode('utf-8')).hexdigest()[:16]
+    else:
+        cache = app.extensions.get('render_cache') or init_render_cache(app)
+        html, shell_hash = cache.get(template_name, locale, role,
+                                     lambda: _render(template_name, locale, role))
+
+    user_hash = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    response = make_response(inject_user(html, payload))
+    response.set_etag(f'{shell_hash}-{user_hash}')
+    # Conteúdo por usuário: navegador pode guardar, mas sempre revalida
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    response.vary.add('Accept-Language')
+    return response.make_conditional(request)
+
+def prerender_shells(app, roles: Iterable[str], locales: Optional[Iterable[str]] = None,
+                     templates: Iterable[str] = SHELL_TEMPLATES) -> int:
+    """Renderizar os esqueletos antes do primeiro acesso; retorna quantos"""
+    cache = app.extensions.get('render_cache') or init_render_cache(app)
+    locales = list(locales or app.config.get('SUPPORTED_LOCALES') or [DEFAULT_LOCALE])
+    rendered = 0
+    with app.test_request_context('/'):
+        for template_name in templates:
+            for locale in locales:
+                for role in roles:
+                    cache.get(template_name, locale, role,
+                              lambda: _render(template_name, locale, role))
+                    rendered += 1
+    return rendered
@@ -0,0 +1,487 @@
+"""
+WEBAG Professional - Cache Compartilhado entre Workers
+Dois níveis: LRU em memória (por processo) na frente de um nível
+compartilhado em arquivo SQLite local (ou Redis, se configurado), com TTL,
+invalidação por tags e métricas de acerto
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session, object_session
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+DEFAULT_TTL = 300.0            # segundos
+LOCAL_CACHE_SIZE = 1024
+# Intervalo mínimo entre verificações de invalidação feitas por outros workers
+SYNC_INTERVAL = 1.0
+DEFAULT_SQLITE_PATH = os.path.join('instance', 'webag_cache.db')
+
+SQLITE_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS cache_tags (
+        tag TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (tag, key)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key)",
+    "CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('generation', 0)"
+)
+
+BUMP_GENERATION_SQL = "UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'"
+
+# Tags coletadas no flush, invalidadas no commit (session.info)
+PENDING_TAGS_KEY = 'shared_cache_pending_tags'
+
+_MISSING = object()
+
+_session_hooks_lock = threading.Lock()
+_session_hooks_registered = False
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+# ================================================
+# NÍVEL LOCAL (POR PROCESSO)
+# ================================================
+
+class LocalTier:
+    """LRU em memória com TTL por entrada e índice de tags"""
+
+    def __init__(self, max_size: int = LOCAL_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value, _ = entry
+            if expires < time.time():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires: float, tags: Tuple[str, ...] = ()) -> None:
+        with self._lock:
+            self._entries[key] = (expires, value, tags)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, (_, _, entry_tags) in self._entries.items() if tags.intersection(entry_tags)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# ================================================
+# NÍVEIS COMPARTILHADOS
+# ================================================
+
+class SQLiteTier:
+    """
+    Nível compartilhado em arquivo SQLite (WAL). Cada processo abre sua
+    própria conexão (também após fork); `generation` muda a cada
+    invalidação para que os demais workers descartem o nível local.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SQLITE_SCHEMA:
+                connection.execute(statement)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+    def get(self, key: str) -> Tuple[Any, float, Tuple[str, ...]]:
+        """(valor ou _MISSING, expiração, tags)"""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT value, expires_at FROM cache_entries WHERE key = ? AND expires_at >= ?',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                return _MISSING, 0.0, ()
+            tags = tuple(tag for (tag,) in connection.execute('SELECT tag FROM cache_tags WHERE key = ?', (key,)))
+        return json.loads(row[0]), row[1], tags
+
+    def set(self, key: str, value: Any, expires: float, tags: Tuple[str, ...] = ()) -> None:
+        data = _dumps(value)
+        with self._transaction() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, data, expires)
+            )
+            connection.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+            connection.executemany('INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)',
+                                   [(tag, key) for tag in tags])
+
+    def delete(self, key: str) -> None:
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            connection.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+            connection.execute(BUMP_GENERATION_SQL)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = sorted(set(tags))
+        if not tags:
+            return 0
+        placeholders = ', '.join('?' * len(tags))
+        with self._transaction() as connection:
+            keys = [key for (key,) in connection.execute(
+                f'SELECT DISTINCT key FROM cache_tags WHERE tag IN ({placeholders})', tags
+            )]
+            connection.executemany('DELETE FROM cache_entries WHERE key = ?', [(k,) for k in keys])
+            connection.executemany('DELETE FROM cache_tags WHERE key = ?', [(k,) for k in keys])
+            connection.execute(BUMP_GENERATION_SQL)
+        return len(keys)
+
+    def generation(self) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def purge_expired(self) -> int:
+        """Remover entradas expiradas (e suas tags)"""
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache_tags WHERE key IN (SELECT key FROM cache_entries WHERE expires_at < ?)', (now,)
+            )
+            removed = connection.execute('DELETE FROM cache_entries WHERE expires_at < ?', (now,)).rowcount
+        return removed
+
+    def clear(self) -> None:
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache_entries')
+            connection.execute('DELETE FROM cache_tags')
+            connection.execute(BUMP_GENERATION_SQL)
+
+class RedisTier:
+    """Nível compartilhado em Redis (ou servidor compatível)"""
+
+    def __init__(self, url: str, prefix: str = 'webag:cache:'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError('Pacote redis não instalado')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f'{self.prefix}k:{key}'
+
+    def _tag(self, tag: str) -> str:
+        return f'{self.prefix}t:{tag}'
+
+    def get(self, key: str) -> Tuple[Any, float, Tuple[str, ...]]:
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return _MISSING, 0.0, ()
+        entry = json.loads(raw)
+        return entry['value'], entry['expires'], tuple(entry['tags'])
+
+    def set(self, key: str, value: Any, expires: float, tags: Tuple[str, ...] = ()) -> None:
+        ttl = max(1, int(expires - time.time()))
+        pipeline = self.client.pipeline()
+        pipeline.set(self._key(key), _dumps({'value': value, 'expires': expires, 'tags': list(tags)}), ex=ttl)
+        for tag in tags:
+            pipeline.sadd(self._tag(tag), key)
+        pipeline.execute()
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self._key(key))
+        self.client.incr(f'{self.prefix}generation')
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in set(tags):
+            keys.update(member.decode('utf-8') for member in self.client.smembers(self._tag(tag)))
+            self.client.delete(self._tag(tag))
+        if keys:
+            self.client.delete(*[self._key(key) for key in keys])
+        self.client.incr(f'{self.prefix}generation')
+        return len(keys)
+
+    def generation(self) -> int:
+        return int(self.client.get(f'{self.prefix}generation') or 0)
+
+    def purge_expired(self) -> int:
+        # O próprio Redis expira as chaves
+        return 0
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+        self.client.incr(f'{self.prefix}generation')
+
+# ================================================
+# CACHE EM NÍVEIS
+# ================================================
+
+class TieredCache:
+    """
+    get/set/get_or_set com TTL e tags. Leitura: nível local, depois o
+    compartilhado (que repopula o local). Invalidação vale para todos os
+    workers: o contador de geração do nível compartilhado é consultado no
+    máximo a cada `sync_interval` segundos e, se mudou, o nível local é
+    descartado.
+
+    Valores precisam ser serializáveis em JSON.
+    """
+
+    def __init__(self, shared=None, local_size: int = LOCAL_CACHE_SIZE,
+                 default_ttl: float = DEFAULT_TTL, sync_interval: float = SYNC_INTERVAL,
+                 namespace: str = ''):
+        self.local = LocalTier(local_size)
+        self.shared = shared
+        self.default_ttl = default_ttl
+        self.sync_interval = sync_interval
+        self.namespace = namespace
+        self._generation: Optional[int] = None
+        self._synced_at = 0.0
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'local_hits': 0, 'shared_hits': 0, 'misses': 0,
+            'sets': 0, 'invalidations': 0, 'errors': 0
+        }
+
+    def _count(self, metric: str) -> None:
+        with self._metrics_lock:
+            self.metrics[metric] += 1
+
+    def _key(self, key: str) -> str:
+        return f'{self.namespace}{key}'
+
+    def _sync(self) -> None:
+        """Descartar o nível local se outro worker invalidou algo"""
+        if self.shared is None:
+            return
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        try:
+            generation = self.shared.generation()
+        except Exception:
+            self._count('errors')
+            return
+        if self._generation is not None and generation != self._generation:
+            self.local.clear()
+        self._generation = generation
+
+    def get(self, key: str, default: Any = None) -> Any:
+        key = self._key(key)
+        self._sync()
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        if self.shared is not None:
+            try:
+                value, expires, tags = self.shared.get(key)
+            except Exception:
+                self._count('errors')
+                value = _MISSING
+            if value is not _MISSING:
+                self.local.set(key, value, expires, tags)
+                self._count('shared_hits')
+                return value
+        self._count('misses')
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        key = self._key(key)
+        tags = tuple(sorted(set(tags)))
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        self.local.set(key, value, expires, tags)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, expires, tags)
+            except Exception:
+                self._count('errors')
+        self._count('sets')
+
+    def get_or_set(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None,
+                   tags: Iterable[str] = ()) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl, tags)
+        return value
+
+    def delete(self, key: str) -> None:
+        key = self._key(key)
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+                self._generation = self.shared.generation()
+            except Exception:
+                self._count('errors')
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = list(tags)
+        self.local.invalidate_tags(tags)
+        if self.shared is not None:
+            try:
+                self.shared.invalidate_tags(tags)
+                # A própria invalidação não deve esvaziar o nível local deste worker
+                self._generation = self.shared.generation()
+            except Exception:
+                self._count('errors')
+        self._count('invalidations')
+
+    def clear(self) -> None:
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+            self._generation = self.shared.generation()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            stats = dict(self.metrics)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+        stats['local_entries'] = len(self.local)
+        stats['backend'] = type(self.shared).__name__ if self.shared is not None else 'LocalTier'
+        return stats
+
+# ================================================
+# INTEGRAÇÃO COM FLASK / SQLALCHEMY
+# ================================================
+
+def create_cache(config: Dict[str, Any], instance_path: Optional[str] = None) -> TieredCache:
+    """
+    Cache a partir da configuração:
+    CACHE_BACKEND ('sqlite' | 'redis' | 'memory'), CACHE_SQLITE_PATH,
+    CACHE_REDIS_URL, CACHE_DEFAULT_TTL, CACHE_LOCAL_SIZE, CACHE_SYNC_INTERVAL.
+    """
+    backend = config.get('CACHE_BACKEND') or ('memory' if config.get('TESTING') else 'sqlite')
+    shared = None
+    if backend == 'redis':
+        shared = RedisTier(config['CACHE_REDIS_URL'])
+    elif backend == 'sqlite':
+        path = config.get('CACHE_SQLITE_PATH') or (
+            os.path.join(instance_path, 'webag_cache.db') if instance_path else DEFAULT_SQLITE_PATH
+        )
+        shared = SQLiteTier(path)
+    return TieredCache(
+        shared,
+        local_size=config.get('CACHE_LOCAL_SIZE', LOCAL_CACHE_SIZE),
+        default_ttl=config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL),
+        sync_interval=config.get('CACHE_SYNC_INTERVAL', SYNC_INTERVAL)
+    )
+
+def init_shared_cache(app) -> TieredCache:
+    cache = create_cache(app.config, app.instance_path)
+    app.extensions['shared_cache'] = cache
+    return cache
+
+def get_shared_cache(app) -> Optional[TieredCache]:
+    """Cache da aplicação (None se não inicializado)"""
+    return app.extensions.get('shared_cache') if app is not None else None
+
+def register_tag_invalidation(model, cache: TieredCache, tags_for: Callable[[Any], List[str]]) -> None:
+    """
+    Invalidar as tags do registro quando ele é criado, alterado ou removido.
+
+    As tags são coletadas no flush e invalidadas só após o commit: antes
+    dele outra requisição ainda lê as linhas antigas e as guardaria em
+    cache por todo o TTL. Num rollback as tags coletadas são descartadas.
+    """
+    if not SQLALCHEMY_AVAILABLE:
+        return
+    _register_session_hooks()
+
+    @event.listens_for(model, 'after_insert')
+    @event.listens_for(model, 'after_update')
+    @event.listens_for(model, 'after_delete')
+    def collect_cached_tags(mapper, connection, target):
+        session = object_session(target)
+        if session is None:
+            cache.invalidate_tags(tags_for(target))
+            return
+        pending = session.info.setdefault(PENDING_TAGS_KEY, {})
+        pending.setdefault(id(cache), (cache, set()))[1].update(tags_for(target))
+
+def _register_session_hooks() -> None:
+    """Invalidação no commit / descarte no rollback (uma vez por processo)"""
+    global _session_hooks_registered
+    with _session_hooks_lock:
+        if _session_hooks_registered:
+            return
+        _session_hooks_registered = True
+
+    @event.listens_for(Session, 'after_commit')
+    def invalidate_committed_tags(session):
+        for cache, tags in session.info.pop(PENDING_TAGS_KEY, {}).values():
+            cache.invalidate_tags(tags)
+
+    @event.listens_for(Session, 'after_rollback')
+    def discard_rolled_back_tags(session):
+        session.info.pop(PENDING_TAGS_KEY, None)
@@ -0,0 +1,124 @@
+"""
+WEBAG Professional - Armazenamento de Configurações de Versão
+Blobs comprimidos endereçados por hash de conteúdo (layer_version_blobs)
+"""
+
+import json
+import zlib
+import hashlib
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from sqlalchemy import text
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+BLOB_TABLE = 'layer_version_blobs'
+
+# Configurações acima deste tamanho (JSON, bytes) vão para o blob store
+BLOB_THRESHOLD_BYTES = 16 * 1024
+
+COMPRESSION = 'zlib'
+COMPRESSION_LEVEL = 6
+
+INSERT_BLOB_SQL = f"""
+    INSERT INTO {BLOB_TABLE} (content_hash, compression, size_bytes, data)
+    VALUES (:content_hash, :compression, :size_bytes, :data)
+    ON CONFLICT (content_hash) DO NOTHING
+"""
+
+# ================================================
+# CODIFICAÇÃO
+# ================================================
+
+def encode_config(config: Dict[str, Any]) -> Tuple[str, bytes, int]:
+    """(hash sha256, dados comprimidos, tamanho original) de uma configuração"""
+    raw = json.dumps(config, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, COMPRESSION_LEVEL), len(raw)
+
+def decode_config(data: bytes, compression: str = COMPRESSION) -> Dict[str, Any]:
+    """Descomprimir e decodificar uma configuração armazenada"""
+    raw = zlib.decompress(data) if compression == COMPRESSION else data
+    return json.loads(raw.decode('utf-8'))
+
+# ================================================
+# ARMAZENAMENTO
+# ================================================
+
+def store_config_blob(connection, config: Dict[str, Any]) -> Tuple[str, int]:
+    """Gravar configuração no blob store (deduplicada pelo hash); retorna (hash, tamanho)"""
+    content_hash, data, size = encode_config(config)
+    connection.execute(text(INSERT_BLOB_SQL), {
+        'content_hash': content_hash,
+        'compression': COMPRESSION,
+        'size_bytes': size,
+        'data': data
+    })
+    return content_hash, size
+
+def load_config_blob(connection, content_hash: str) -> Optional[Dict[str, Any]]:
+    """Ler configuração do blob store"""
+    row = connection.execute(
+        text(f"SELECT compression, data FROM {BLOB_TABLE} WHERE content_hash = :content_hash"),
+        {'content_hash': content_hash}
+    ).first()
+    if row is None:
+        return None
+    return decode_config(row.data, row.compression)
+
+def externalize_if_large(connection, config: Optional[Dict[str, Any]],
+                         threshold: int = BLOB_THRESHOLD_BYTES) -> Optional[str]:
+    """Mover configuração grande para o blob store; retorna o hash ou None se ficar inline"""
+    if not config:
+        return None
+    size = len(json.dumps(config, separators=(',', ':'), default=str))
+    if size <= threshold:
+        return None
+    content_hash, _ = store_config_blob(connection, config)
+    return content_hash
+
+def load_version_config(session, version) -> Dict[str, Any]:
+    """Configuração de uma versão (inline ou do blob store)"""
+    if getattr(version, 'config_hash', None):
+        config = load_config_blob(session.connection(), version.config_hash)
+        if config is not None:
+            return config
+    return version.layer_config or {}
+
+def externalize_version_configs(connection, threshold: int = BLOB_THRESHOLD_BYTES,
+                                batch_size: int = 100) -> Tuple[int, int]:
+    """
+    Mover configurações inline existentes (versões legadas) para o blob store.
+
+    Retorna (versões movidas, bytes liberados em layer_versions).
+    """
+    moved = 0
+    freed = 0
+    last_id = ''
+    while True:
+        # CAST: no PostgreSQL não existe length(json)
+        rows = connection.execute(text("""
+            SELECT id, CAST(layer_config AS TEXT) AS layer_config FROM layer_versions
+            WHERE config_hash IS NULL AND id > :last_id AND LENGTH(CAST(layer_config AS TEXT)) > :threshold
+            ORDER BY id LIMIT :batch_size
+        """), {'last_id': last_id, 'threshold': threshold, 'batch_size': batch_size}).all()
+        if not rows:
+            break
+
+        for row in rows:
+            last_id = row.id
+            raw = row.layer_config
+            config = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+            content_hash, _ = store_config_blob(connection, config)
+            connection.execute(
+                text("UPDATE layer_versions SET layer_config = :empty, config_hash = :content_hash WHERE id = :id"),
+                {'empty': '{}', 'content_hash': content_hash, 'id': row.id}
+            )
+            moved += 1
+            freed += len(raw) if isinstance(raw, (str, bytes)) else 0
+    return moved, freed
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Métricas Geodésicas de Geometrias GeoJSON
+Área, comprimento, perímetro e centroide em coordenadas WGS84 (lon, lat)
+"""
+import math
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+# Dependência (requirements.txt); sem ela os kernels puros cobrem todos os casos
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Raio da Terra em metros (mesmo valor usado nos cálculos de testadas)
+EARTH_RADIUS_M = 6371000.0
+
+# Anéis/linhas a partir deste número de vértices usam o caminho vetorizado
+VECTORIZE_MIN_POINTS = 64
+
+Ring = Sequence[Sequence[float]]
+
+# ================================================
+# KERNELS POR ANEL / LINHA
+# ================================================
+
+def _line_length_py(points: Ring) -> float:
+    total = 0.0
+    for i in range(len(points) - 1):
+        lon1, lat1 = math.radians(points[i][0]), math.radians(points[i][1])
+        lon2, lat2 = math.radians(points[i + 1][0]), math.radians(points[i + 1][1])
+        a = math.sin((lat2 - lat1) / 2) ** 2 + \
+            math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        total += 2 * math.asin(min(1.0, math.sqrt(a)))
+    return total * EARTH_RADIUS_M
+
+def _ring_area_py(points: Ring) -> float:
+    """Área esférica com sinal de um anel (fórmula de Chamberlain & Duquette)"""
+    total = 0.0
+    n = len(points)
+    for i in range(n):
+        lon1, lat1 = points[i][0], points[i][1]
+        lon2, lat2 = points[(i + 1) % n][0], points[(i + 1) % n][1]
+        total += math.radians(lon2 - lon1) * (2 + math.sin(math.radians(lat1)) + math.sin(math.radians(lat2)))
+    return total * EARTH_RADIUS_M ** 2 / 2
+
+def _lon_lat_array(points: Ring):
+    """Matriz (n, 2) em radianos; aceita anéis que misturam posições 2D e 3D"""
+    return np.radians(np.asarray([p[:2] for p in points], dtype=float))
+
+def _line_length_np(points: Ring) -> float:
+    coords = _lon_lat_array(points)
+    lon, lat = coords[:, 0], coords[:, 1]
+    a = np.sin(np.diff(lat) / 2) ** 2 + \
+        np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return float(np.sum(2 * np.arcsin(np.minimum(1.0, np.sqrt(a))))) * EARTH_RADIUS_M
+
+def _ring_area_np(points: Ring) -> float:
+    coords = _lon_lat_array(points)
+    lon, lat = coords[:, 0], coords[:, 1]
+    lon_next, lat_next = np.roll(lon, -1), np.roll(lat, -1)
+    total = np.sum((lon_next - lon) * (2 + np.sin(lat) + np.sin(lat_next)))
+    return float(total) * EARTH_RADIUS_M ** 2 / 2
+
+def line_length(points: Ring) -> float:
+    """Comprimento geodésico (haversine) de uma sequência de posições, em metros"""
+    if len(points) < 2:
+        return 0.0
+    if NUMPY_AVAILABLE and len(points) >= VECTORIZE_MIN_POINTS:
+        return _line_length_np(points)
+    return _line_length_py(points)
+
+def ring_area(points: Ring) -> float:
+    """Área geodésica (sem sinal) de um anel, em metros quadrados"""
+    if len(points) < 3:
+        return 0.0
+    if NUMPY_AVAILABLE and len(points) >= VECTORIZE_MIN_POINTS:
+        return abs(_ring_area_np(points))
+    return abs(_ring_area_py(points))
+
+def _closed(points: Ring) -> List[Sequence[float]]:
+    points = list(points)
+    if points and list(points[0][:2]) != list(points[-1][:2]):
+        points.append(points[0])
+    return points
+
+# ================================================
+# CENTROIDES (planos, adequados à escala de lotes/glebas)
+# ================================================
+
+def _ring_centroid(points: Ring) -> Tuple[float, float, float]:
+    """(área plana com sinal, cx, cy) de um anel pela fórmula do polígono"""
+    area = cx = cy = 0.0
+    n = len(points)
+    for i in range(n):
+        x1, y1 = points[i][0], points[i][1]
+        x2, y2 = points[(i + 1) % n][0], points[(i + 1) % n][1]
+        cross = x1 * y2 - x2 * y1
+        area += cross
+        cx += (x1 + x2) * cross
+        cy += (y1 + y2) * cross
+    area /= 2
+    if area == 0:
+        return 0.0, 0.0, 0.0
+    return area, cx / (6 * area), cy / (6 * area)
+
+def _polygons_centroid(polygons: List[List[Ring]]) -> Optional[List[float]]:
+    total = sx = sy = 0.0
+    for rings in polygons:
+        for index, ring in enumerate(rings):
+            area, cx, cy = _ring_centroid(ring)
+            # Anel externo soma, furos subtraem (independente da orientação)
+            weight = abs(area) if index == 0 else -abs(area)
+            total += weight
+            sx += cx * weight
+            sy += cy * weight
+    if total == 0:
+        return None
+    return [sx / total, sy / total]
+
+def _lines_centroid(lines: List[Ring]) -> Optional[List[float]]:
+    total = sx = sy = 0.0
+    for line in lines:
+        for i in range(len(line) - 1):
+            (x1, y1), (x2, y2) = line[i][:2], line[i + 1][:2]
+            weight = math.hypot(x2 - x1, y2 - y1)
+            total += weight
+            sx += (x1 + x2) / 2 * weight
+            sy += (y1 + y2) / 2 * weight
+    if total == 0:
+        return _points_centroid([p for line in lines for p in line])
+    return [sx / total, sy / total]
+
+def _points_centroid(points: Ring) -> Optional[List[float]]:
+    if not points:
+        return None
+    return [sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)]
+
+# ================================================
+# MÉTRICAS POR GEOMETRIA
+# ================================================
+
+def _polygon_metrics(polygons: List[List[Ring]]) -> Dict[str, Any]:
+    polygons = [[_closed(ring) for ring in rings if ring] for rings in polygons if rings]
+    area = perimeter = 0.0
+    for rings in polygons:
+        for index, ring in enumerate(rings):
+            ring_m2 = ring_area(ring)
+            area += ring_m2 if index == 0 else -ring_m2
+            perimeter += line_length(ring)
+    return {
+        'area_m2': round(max(area, 0.0), 2),
+        'length_m': None,
+        'perimeter_m': round(perimeter, 2),
+        'centroid': _polygons_centroid(polygons)
+    }
+
+def _line_metrics(lines: List[Ring]) -> Dict[str, Any]:
+    return {
+        'area_m2': None,
+        'length_m': round(sum(line_length(line) for line in lines), 2),
+        'perimeter_m': None,
+        'centroid': _lines_centroid(lines)
+    }
+
+def geometry_metrics(geometry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Métricas de uma geometria GeoJSON em WGS84.
+
+    Retorna area_m2/perimeter_m para (Multi)Polygon (furos descontados),
+    length_m para (Multi)LineString e o centroide [lon, lat] em todos os tipos.
+    """
+    empty = {'area_m2': None, 'length_m': None, 'perimeter_m': None, 'centroid': None}
+    if not isinstance(geometry, dict):
+        return empty
+
+    geom_type = geometry.get('type')
+    coordinates = geometry.get('coordinates') or []
+    try:
+        if geom_type == 'Polygon':
+            return _polygon_metrics([coordinates])
+        if geom_type == 'MultiPolygon':
+            return _polygon_metrics(coordinates)
+        if geom_type == 'LineString':
+            return _line_metrics([coordinates])
+        if geom_type == 'MultiLineString':
+            return _line_metrics(coordinates)
+        if geom_type == 'Point':
+            return {**empty, 'centroid': list(coordinates[:2]) or None}
+        if geom_type == 'MultiPoint':
+            return {**empty, 'centroid': _points_centroid(coordinates)}
+    except (TypeError, ValueError, IndexError):
+        pass
+    return empty
+
+# ================================================
+# MÉTRICAS EM LOTE (vetorizadas)
+# ================================================
+
+def _part_coords(points: Ring, close: bool):
+    """Matriz (n, 2) de um anel/linha; None se alguma posição não for numérica"""
+    try:
+        coords = np.asarray(points)
+        if coords.ndim != 2 or coords.shape[1] < 2 or coords.dtype.kind not in 'iuf':
+            raise ValueError
+        coords = coords[:, :2].astype(float)
+    except ValueError:
+        # Posições 2D e 3D misturadas (ou inválidas): conferidas uma a uma
+        positions = [p[:2] for p in points]
+        numbers = (int, float)
+        if not all(len(p) == 2 and isinstance(p[0], numbers) and isinstance(p[1], numbers)
+                   for p in positions):
+            return None
+        coords = np.asarray(positions, dtype=float)
+    if close and (coords[0] != coords[-1]).any():
+        coords = np.vstack((coords, coords[:1]))
+    return coords
+
+def _batch_parts(geometry: Any) -> Optional[Tuple[str, List[Tuple[Any, float]]]]:
+    """
+    Anéis/linhas de uma geometria como (tipo, [(matriz (n, 2), sinal)]).
+
+    O sinal é +1 para anéis externos e linhas e -1 para furos; None para
+    tipos sem segmentos (pontos, coleções) ou coordenadas inválidas.
+    """
+    if not isinstance(geometry, dict):
+        return None
+    geom_type = geometry.get('type')
+    coordinates = geometry.get('coordinates') or []
+    try:
+        if geom_type in ('Polygon', 'MultiPolygon'):
+            polygons = [coordinates] if geom_type == 'Polygon' else coordinates
+            parts = [
+                (_part_coords(ring, close=True), 1.0 if index == 0 else -1.0)
+                for rings in polygons if rings
+                for index, ring in enumerate(r for r in rings if r)
+            ]
+            kind = 'polygon'
+        elif geom_type in ('LineString', 'MultiLineString'):
+            lines = [coordinates] if geom_type == 'LineString' else coordinates
+            parts = [(_part_coords(line, close=False), 1.0) for line in lines if line]
+            kind = 'line'
+        else:
+            return None
+    except (TypeError, ValueError, IndexError):
+        return None
+    if any(coords is None for coords, _ in parts):
+        return None
+    return kind, parts
+
+def _segment_sums(coords, starts):
+    """
+    Somas por parte dos termos de cada segmento (linhas da matriz):
+    comprimento geodésico, área esférica com sinal, área plana e momentos
+    do centroide de polígono, comprimento plano e momentos do centroide de linha
+    """
+    # Segmento i -> i+1 só existe dentro da mesma parte
+    valid = np.ones(len(coords), dtype=bool)
+    valid[starts[1:] - 1] = False
+    valid[-1] = False
+
+    x, y = coords[:, 0], coords[:, 1]
+    x2, y2 = np.append(x[1:], x[-1]), np.append(y[1:], y[-1])
+    lon, lat, lon2, lat2 = np.radians(x), np.radians(y), np.radians(x2), np.radians(y2)
+    a = np.sin((lat2 - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat2) * np.sin((lon2 - lon) / 2) ** 2
+    cross = x * y2 - x2 * y
+    planar = np.hypot(x2 - x, y2 - y)
+    terms = np.stack([
+        2 * np.arcsin(np.minimum(1.0, np.sqrt(a))),
+        (lon2 - lon) * (2 + np.sin(lat) + np.sin(lat2)),
+        cross, (x + x2) * cross, (y + y2) * cross,
+        planar, (x + x2) / 2 * planar, (y + y2) / 2 * planar
+    ]) * valid
+    return np.add.reduceat(terms, starts, axis=1)
+
+def batch_geometry_metrics(geometries: Sequence[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Métricas de um lote de geometrias em uma única passada vetorizada.
+
+    Os anéis e linhas de todo o lote são concatenados em uma matriz de
+    coordenadas; os termos dos segmentos são somados por anel/linha e por
+    geometria sem laço Python por vértice. Cada item traz as chaves de
+    geometry_metrics mais 'bbox' (minX, minY, maxX, maxY). Pontos, coleções
+    e geometrias inválidas ficam como None (cálculo individual), assim como
+    o lote inteiro sem numpy.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(geometries)
+    if not NUMPY_AVAILABLE:
+        return results
+
+    entries = []                      # (índice no lote, tipo, partes)
+    arrays, sizes, signs, owners = [], [], [], []
+    for index, geometry in enumerate(geometries):
+        parsed = _batch_parts(geometry)
+        if parsed is None:
+            continue
+        kind, parts = parsed
+        for coords, sign in parts:
+            arrays.append(coords)
+            sizes.append(len(coords))
+            signs.append(sign)
+            owners.append(len(entries))
+        entries.append((index, kind, parts))
+    if not entries:
+        return results
+
+    count = len(entries)
+    zeros = np.zeros(count)
+    bboxes: List[Optional[Tuple[float, float, float, float]]] = [None] * count
+    if sizes:
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        coords = np.concatenate(arrays)
+        sums = _segment_sums(coords, starts)
+        owner, sign = np.asarray(owners, dtype=np.intp), np.asarray(signs)
+
+        def per_geometry(values):
+            return np.bincount(owner, weights=values, minlength=count)
+
+        length = per_geometry(sums[0]) * EARTH_RADIUS_M
+        area = per_geometry(sign * np.abs(sums[1])) * EARTH_RADIUS_M ** 2 / 2
+        # Centroide de polígono: anel externo soma, furo subtrai (peso = área plana)
+        planar_area = sums[2] / 2
+        nonzero = planar_area != 0
+        safe_area = np.where(nonzero, planar_area, 1.0)
+        weight = np.where(nonzero, sign * np.abs(planar_area), 0.0)
+        poly_total = per_geometry(weight)
+        poly_x = per_geometry(sums[3] / (6 * safe_area) * weight)
+        poly_y = per_geometry(sums[4] / (6 * safe_area) * weight)
+        line_total, line_x, line_y = per_geometry(sums[5]), per_geometry(sums[6]), per_geometry(sums[7])
+
+        # Partes de uma geometria são contíguas: bbox por reduceat nos inícios
+        first_part = np.searchsorted(owner, np.arange(count))
+        has_parts = np.bincount(owner, minlength=count) > 0
+        geometry_starts = starts[first_part[has_parts]]
+        mins = np.minimum.reduceat(coords, geometry_starts).tolist()
+        maxs = np.maximum.reduceat(coords, geometry_starts).tolist()
+        for position, (low, high) in zip(np.flatnonzero(has_parts).tolist(), zip(mins, maxs)):
+            bboxes[position] = (low[0], low[1], high[0], high[1])
+    else:
+        length = area = poly_total = poly_x = poly_y = line_total = line_x = line_y = zeros
+
+    columns = zip(length.tolist(), area.tolist(), poly_total.tolist(), poly_x.tolist(), poly_y.tolist(),
+                  line_total.tolist(), line_x.tolist(), line_y.tolist())
+    for (index, kind, parts), bbox, values in zip(entries, bboxes, columns):
+        g_length, g_area, p_total, p_x, p_y, l_total, l_x, l_y = values
+        if kind == 'polygon':
+            results[index] = {
+                'area_m2': round(max(g_area, 0.0), 2),
+                'length_m': None,
+                'perimeter_m': round(g_length, 2),
+                'centroid': [p_x / p_total, p_y / p_total] if p_total != 0 else None,
+                'bbox': bbox
+            }
+        else:
+            if l_total == 0:
+                centroid = _points_centroid([p for coords, _ in parts for p in coords.tolist()])
+            else:
+                centroid = [l_x / l_total, l_y / l_total]
+            results[index] = {
+                'area_m2': None,
+                'length_m': round(g_length, 2),
+                'perimeter_m': None,
+                'centroid': centroid,
+                'bbox': bbox
+            }
+    return results
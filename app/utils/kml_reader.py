@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Leitura de KML em Streaming
+Percorre o documento com iterparse e gera uma feature GeoJSON por
+Placemark, descartando cada elemento já processado: a memória usada não
+depende do tamanho do arquivo
+"""
+import re
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+
+try:
+    # Protege contra expansão de entidades em arquivos enviados por usuários
+    from defusedxml.ElementTree import iterparse, ParseError
+    DEFUSEDXML_AVAILABLE = True
+except ImportError:
+    from xml.etree.ElementTree import iterparse, ParseError
+    DEFUSEDXML_AVAILABLE = False
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+KML_NAMESPACES = (
+    'http://www.opengis.net/kml/2.2',
+    'http://earth.google.com/kml/2.2',
+    'http://earth.google.com/kml/2.1',
+    'http://earth.google.com/kml/2.0'
+)
+
+# Elementos que agrupam Placemarks (nome vira a propriedade 'folder')
+CONTAINER_TAGS = ('Document', 'Folder')
+
+GEOMETRY_TAGS = ('Point', 'LineString', 'LinearRing', 'Polygon', 'MultiGeometry', 'Track', 'MultiTrack')
+
+# Elementos que viram features: Placemark (geometria) e GroundOverlay (extensão da imagem)
+FEATURE_TAGS = ('Placemark', 'GroundOverlay')
+
+# Tipos de SimpleField convertidos a partir do texto
+_SCHEMA_CASTS = {
+    'int': int, 'uint': int, 'short': int, 'ushort': int,
+    'float': float, 'double': float,
+    'bool': lambda value: value.strip().lower() in ('1', 'true')
+}
+
+_COMMA_SPACES = re.compile(r'\s*,\s*')
+
+def _local(tag: str) -> str:
+    """Nome sem namespace ({http://...}Placemark -> Placemark)"""
+    return tag.rsplit('}', 1)[-1]
+
+def _text(element) -> Optional[str]:
+    if element is None or element.text is None:
+        return None
+    text = element.text.strip()
+    return text or None
+
+def _child(element, name: str):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+def _children(element, name: str) -> List[Any]:
+    return [child for child in element if _local(child.tag) == name]
+
+# ================================================
+# GEOMETRIAS
+# ================================================
+
+def parse_coordinates(text: Optional[str], keep_altitude: bool = False) -> List[List[float]]:
+    """'lon,lat[,alt] lon,lat[,alt] ...' -> [[lon, lat], ...]"""
+    if not text:
+        return []
+    positions = []
+    for token in _COMMA_SPACES.sub(',', text.strip()).split():
+        try:
+            values = [float(v) for v in token.split(',') if v]
+        except ValueError:
+            continue
+        if len(values) < 2:
+            continue
+        positions.append(values[:3] if keep_altitude and len(values) > 2 else values[:2])
+    return positions
+
+def _close_ring(ring: List[List[float]]) -> Optional[List[List[float]]]:
+    if not ring:
+        return None
+    if ring[0] != ring[-1]:
+        ring = ring + [ring[0]]
+    return ring if len(ring) >= 4 else None
+
+def _polygon(element, keep_altitude: bool) -> Optional[Dict[str, Any]]:
+    outer = _child(element, 'outerBoundaryIs')
+    ring = _child(outer, 'LinearRing') if outer is not None else None
+    shell = _close_ring(parse_coordinates(_text(_child(ring, 'coordinates')), keep_altitude)) if ring is not None else None
+    if not shell:
+        return None
+    rings = [shell]
+    # Um ou vários innerBoundaryIs, cada um com um ou mais LinearRing
+    for inner in _children(element, 'innerBoundaryIs'):
+        for hole in _children(inner, 'LinearRing'):
+            closed = _close_ring(parse_coordinates(_text(_child(hole, 'coordinates')), keep_altitude))
+            if closed:
+                rings.append(closed)
+    return {'type': 'Polygon', 'coordinates': rings}
+
+def _track(element, keep_altitude: bool) -> Optional[Dict[str, Any]]:
+    """gx:Track: posições em <gx:coord>lon lat alt</gx:coord>"""
+    positions = []
+    for coord in _children(element, 'coord'):
+        try:
+            values = [float(v) for v in (_text(coord) or '').split()]
+        except ValueError:
+            continue
+        if len(values) >= 2:
+            positions.append(values[:3] if keep_altitude and len(values) > 2 else values[:2])
+    return {'type': 'LineString', 'coordinates': positions} if len(positions) >= 2 else None
+
+def _flatten(geometries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    flat = []
+    for geometry in geometries:
+        if geometry['type'] == 'GeometryCollection':
+            flat.extend(_flatten(geometry['geometries']))
+        else:
+            flat.append(geometry)
+    return flat
+
+def _collection(geometries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """MultiGeometry homogênea -> Multi*; mista -> GeometryCollection"""
+    geometries = _flatten(geometries)
+    if not geometries:
+        return None
+    types = {geometry['type'] for geometry in geometries}
+    if len(types) == 1 and len(geometries) > 1:
+        kind = types.pop()
+        if kind in ('Point', 'LineString', 'Polygon'):
+            return {'type': f'Multi{kind}', 'coordinates': [g['coordinates'] for g in geometries]}
+    if len(geometries) == 1:
+        return geometries[0]
+    return {'type': 'GeometryCollection', 'geometries': geometries}
+
+def parse_geometry(element, keep_altitude: bool = False) -> Optional[Dict[str, Any]]:
+    """Geometria GeoJSON de um elemento de geometria KML (None se vazia)"""
+    name = _local(element.tag)
+    if name == 'Point':
+        positions = parse_coordinates(_text(_child(element, 'coordinates')), keep_altitude)
+        return {'type': 'Point', 'coordinates': positions[0]} if positions else None
+    if name == 'LineString':
+        positions = parse_coordinates(_text(_child(element, 'coordinates')), keep_altitude)
+        return {'type': 'LineString', 'coordinates': positions} if len(positions) >= 2 else None
+    if name == 'LinearRing':
+        ring = _close_ring(parse_coordinates(_text(_child(element, 'coordinates')), keep_altitude))
+        return {'type': 'Polygon', 'coordinates': [ring]} if ring else None
+    if name == 'Polygon':
+        return _polygon(element, keep_altitude)
+    if name == 'Track':
+        return _track(element, keep_altitude)
+    if name in ('MultiGeometry', 'MultiTrack'):
+        parts = [parse_geometry(child, keep_altitude) for child in element if _local(child.tag) in GEOMETRY_TAGS]
+        return _collection([part for part in parts if part])
+    return None
+
+def overlay_geometry(element) -> Optional[Dict[str, Any]]:
+    """Polígono coberto por um GroundOverlay (LatLonBox ou gx:LatLonQuad)"""
+    box = _child(element, 'LatLonBox')
+    if box is not None:
+        try:
+            north, south, east, west = (float(_text(_child(box, side))) for side in ('north', 'south', 'east', 'west'))
+        except (TypeError, ValueError):
+            return None
+        return {'type': 'Polygon', 'coordinates': [[[west, south], [east, south], [east, north], [west, north], [west, south]]]}
+    quad = _child(element, 'LatLonQuad')
+    if quad is not None:
+        ring = _close_ring(parse_coordinates(_text(_child(quad, 'coordinates'))))
+        return {'type': 'Polygon', 'coordinates': [ring]} if ring else None
+    return None
+
+def _icon_href(element) -> Optional[str]:
+    """href do Icon de um elemento (GroundOverlay) ou do IconStyle de um Style"""
+    if element is None:
+        return None
+    icon_style = _child(element, 'IconStyle')
+    icon = _child(icon_style if icon_style is not None else element, 'Icon')
+    return _text(_child(icon, 'href')) if icon is not None else None
+
+# ================================================
+# LEITOR
+# ================================================
+
+class KMLReader:
+    """
+    Iterador de features GeoJSON de um KML (caminho ou arquivo binário).
+
+    Propriedades: name, description, ExtendedData (Data e SchemaData, com
+    os tipos declarados em Schema), icon (href do IconStyle, inline ou via
+    styleUrl), overlay (imagem de um GroundOverlay) e, com include_folder,
+    a pasta de origem. Ao final, `stats` traz placemarks (e overlays) lidos,
+    features geradas e os ignorados por não terem geometria.
+    """
+
+    def __init__(self, source, keep_altitude: bool = False, include_folder: bool = False,
+                 skip_empty: bool = True):
+        self.source = source
+        self.keep_altitude = keep_altitude
+        self.include_folder = include_folder
+        self.skip_empty = skip_empty
+        self.schemas: Dict[str, Dict[str, str]] = {}
+        self.styles: Dict[str, str] = {}
+        self.style_maps: Dict[str, str] = {}
+        self.stats = {'placemarks': 0, 'features': 0, 'skipped': 0}
+        self.root_tag: Optional[str] = None
+
+    def _schema(self, element) -> None:
+        fields = {field.get('name'): field.get('type', 'string') for field in _children(element, 'SimpleField')}
+        for key in (element.get('id'), element.get('name')):
+            if key:
+                self.schemas[key] = fields
+
+    def _style(self, element) -> None:
+        href = _icon_href(element)
+        if element.get('id') and href:
+            self.styles[element.get('id')] = href
+
+    def _style_map(self, element) -> None:
+        for pair in _children(element, 'Pair'):
+            if _text(_child(pair, 'key')) == 'normal' and element.get('id'):
+                self.style_maps[element.get('id')] = (_text(_child(pair, 'styleUrl')) or '').lstrip('#')
+
+    def _placemark_icon(self, placemark) -> Optional[str]:
+        inline = _icon_href(_child(placemark, 'Style'))
+        if inline:
+            return inline
+        style_id = (_text(_child(placemark, 'styleUrl')) or '').lstrip('#')
+        return self.styles.get(self.style_maps.get(style_id, style_id))
+
+    def _cast(self, schema_url: Optional[str], name: str, value: Optional[str]) -> Any:
+        if value is None:
+            return None
+        field_type = self.schemas.get((schema_url or '').lstrip('#'), {}).get(name)
+        cast = _SCHEMA_CASTS.get(field_type)
+        if cast:
+            try:
+                return cast(value)
+            except ValueError:
+                return value
+        return value
+
+    def _properties(self, placemark) -> Dict[str, Any]:
+        properties: Dict[str, Any] = {}
+        for key in ('name', 'description'):
+            value = _text(_child(placemark, key))
+            if value is not None:
+                properties[key] = value
+        extended = _child(placemark, 'ExtendedData')
+        if extended is not None:
+            for data in _children(extended, 'Data'):
+                if data.get('name'):
+                    properties[data.get('name')] = _text(_child(data, 'value'))
+            for schema_data in _children(extended, 'SchemaData'):
+                schema_url = schema_data.get('schemaUrl')
+                for simple in _children(schema_data, 'SimpleData'):
+                    if simple.get('name'):
+                        properties[simple.get('name')] = self._cast(schema_url, simple.get('name'), _text(simple))
+        return properties
+
+    def _feature(self, placemark, folders: List[str]) -> Optional[Dict[str, Any]]:
+        geometry = None
+        overlay = _local(placemark.tag) == 'GroundOverlay'
+        if overlay:
+            geometry = overlay_geometry(placemark)
+        else:
+            for child in placemark:
+                if _local(child.tag) in GEOMETRY_TAGS:
+                    geometry = parse_geometry(child, self.keep_altitude)
+                    break
+        if geometry is None and self.skip_empty:
+            return None
+        properties = self._properties(placemark)
+        href = _icon_href(placemark) if overlay else self._placemark_icon(placemark)
+        if href:
+            properties['overlay' if overlay else 'icon'] = href
+        if self.include_folder and folders:
+            properties['folder'] = '/'.join(folders)
+        feature = {'type': 'Feature', 'geometry': geometry, 'properties': properties}
+        if placemark.get('id'):
+            feature['id'] = placemark.get('id')
+        return feature
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        stack: List[Any] = []
+        folders: List[Optional[str]] = []
+
+        for event, element in iterparse(self.source, events=('start', 'end')):
+            name = _local(element.tag)
+            if event == 'start':
+                if self.root_tag is None:
+                    self.root_tag = element.tag
+                stack.append(element)
+                if name in CONTAINER_TAGS:
+                    folders.append(None)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+
+            if name in FEATURE_TAGS:
+                self.stats['placemarks'] += 1
+                feature = self._feature(element, [f for f in folders if f])
+                if feature is None:
+                    self.stats['skipped'] += 1
+                else:
+                    self.stats['features'] += 1
+                    yield feature
+            elif name == 'Schema':
+                self._schema(element)
+            elif name == 'Style':
+                self._style(element)
+            elif name == 'StyleMap':
+                self._style_map(element)
+            elif name == 'name' and parent is not None and _local(parent.tag) in CONTAINER_TAGS:
+                folders[-1] = _text(element)
+            elif name in CONTAINER_TAGS:
+                folders.pop()
+
+            # Descartar o que já foi processado. Só filhos diretos de
+            # kml/Document/Folder: o conteúdo de Placemark, Schema etc.
+            # precisa continuar na árvore até o fim do elemento que o contém
+            if parent is not None and (parent is stack[0] or _local(parent.tag) in CONTAINER_TAGS):
+                element.clear()
+                parent.remove(element)
+
+def iter_kml_features(source, **options) -> Iterator[Dict[str, Any]]:
+    """Atalho para iter(KMLReader(source, **options))"""
+    return iter(KMLReader(source, **options))
+
+def check_kml(source, on_progress: Optional[Callable[[int], None]] = None,
+              every: int = 1000) -> Tuple[bool, str, int]:
+    """
+    Validar um KML percorrendo-o inteiro em streaming.
+    Retorna (válido, mensagem, número de features); on_progress, se
+    informado, é chamado a cada `every` features lidas.
+    """
+    reader = KMLReader(source)
+    count = 0
+    try:
+        for _ in reader:
+            count += 1
+            if on_progress and count % every == 0:
+                on_progress(count)
+    except (ParseError, ValueError):
+        # ValueError: entidades/DTD recusadas pelo defusedxml
+        return False, 'Arquivo XML malformado', 0
+    if reader.root_tag is None or _local(reader.root_tag) != 'kml' or \
+            (reader.root_tag.startswith('{') and reader.root_tag[1:].split('}', 1)[0] not in KML_NAMESPACES):
+        return False, 'Arquivo não é um documento KML válido', 0
+    return True, 'ok', count
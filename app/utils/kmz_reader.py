@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Leitura de KMZ
+O KML principal é descomprimido em streaming direto para o KMLReader, sem
+extrair o arquivo para o disco nem carregá-lo inteiro na memória. Ícones e
+imagens de overlays embutidos são gravados por conteúdo (sha256): o mesmo
+arquivo enviado em vários KMZ ocupa espaço uma única vez
+"""
+import os
+import hashlib
+import posixpath
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, Optional, Tuple
+
+from app.utils.kml_reader import KMLReader, check_kml, iter_kml_features
+
+# ================================================
+# CONSTANTES
+# ================================================
+
+KML_MEMBER = 'doc.kml'
+
+# Limites contra "zip bombs": tamanho descomprimido total e taxa de compressão
+MAX_UNCOMPRESSED_BYTES = 512 * 1024 * 1024
+MAX_COMPRESSION_RATIO = 200
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+# Arquivos embutidos tratados como assets (ícones, overlays, fotos)
+ASSET_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.tif', '.tiff', '.svg'}
+
+# Propriedades que referenciam um arquivo do KMZ diretamente
+HREF_PROPERTIES = ('icon', 'overlay')
+
+CHUNK_SIZE = 64 * 1024
+
+class KMZError(ValueError):
+    """KMZ inválido ou acima dos limites"""
+
+# ================================================
+# ARQUIVO
+# ================================================
+
+def is_kmz(source) -> bool:
+    """Verifica a assinatura zip (caminho ou arquivo binário, posição preservada)"""
+    if hasattr(source, 'seek'):
+        position = source.tell()
+        try:
+            return zipfile.is_zipfile(source)
+        finally:
+            source.seek(position)
+    return zipfile.is_zipfile(source)
+
+def check_limits(archive: zipfile.ZipFile, max_bytes: int = MAX_UNCOMPRESSED_BYTES) -> None:
+    """Recusar arquivos cujo conteúdo descomprimido seria grande demais"""
+    total = 0
+    for info in archive.infolist():
+        total += info.file_size
+        if total > max_bytes:
+            raise KMZError('Conteúdo descomprimido do KMZ excede o limite')
+        if info.file_size > RATIO_CHECK_MIN_BYTES and \
+                info.file_size > MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+            raise KMZError(f'Taxa de compressão suspeita em {info.filename}')
+
+def find_kml_member(archive: zipfile.ZipFile) -> str:
+    """doc.kml ou, como o Google Earth, o primeiro .kml da raiz (ou de qualquer pasta)"""
+    names = [info.filename for info in archive.infolist()
+             if not info.is_dir() and info.filename.lower().endswith('.kml')]
+    if KML_MEMBER in names:
+        return KML_MEMBER
+    root_level = [name for name in names if '/' not in name]
+    if root_level or names:
+        return (root_level or names)[0]
+    raise KMZError('KMZ não contém arquivo KML')
+
+@contextmanager
+def open_kml_stream(archive: zipfile.ZipFile, member: Optional[str] = None):
+    """Stream descomprimido do KML principal (lido sob demanda pelo parser)"""
+    with archive.open(member or find_kml_member(archive)) as stream:
+        yield stream
+
+# ================================================
+# ASSETS POR CONTEÚDO
+# ================================================
+
+def asset_path(digest: str, extension: str) -> str:
+    """Caminho relativo de um asset: ab/abcdef...png"""
+    return posixpath.join(digest[:2], digest + extension.lower())
+
+def store_asset(stream, asset_dir: str, extension: str) -> str:
+    """Copia o stream para um temporário calculando o sha256 e o move para o nome final"""
+    os.makedirs(asset_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    handle, temp_path = tempfile.mkstemp(dir=asset_dir, suffix='.part')
+    try:
+        with os.fdopen(handle, 'wb') as target:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                target.write(chunk)
+        relative = asset_path(digest.hexdigest(), extension)
+        final_path = os.path.join(asset_dir, *relative.split('/'))
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+        return relative
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def extract_assets(archive: zipfile.ZipFile, asset_dir: str) -> Dict[str, str]:
+    """Grava os assets embutidos; retorna {nome no KMZ: caminho relativo}"""
+    assets = {}
+    for info in archive.infolist():
+        extension = posixpath.splitext(info.filename)[1].lower()
+        if info.is_dir() or extension not in ASSET_EXTENSIONS:
+            continue
+        with archive.open(info) as stream:
+            assets[info.filename] = store_asset(stream, asset_dir, extension)
+    return assets
+
+def link_assets(properties: Dict[str, Any], assets: Dict[str, str], kml_member: str,
+                asset_url: Callable[[str], str]) -> None:
+    """Trocar referências a arquivos do KMZ pelas URLs dos assets gravados"""
+    base = posixpath.dirname(kml_member)
+    for key in HREF_PROPERTIES:
+        href = properties.get(key)
+        if isinstance(href, str) and '://' not in href:
+            member = posixpath.normpath(posixpath.join(base, href))
+            if member in assets:
+                properties[key] = asset_url(assets[member])
+    # Descrições HTML costumam referenciar imagens (<img src="files/foto.jpg">)
+    for key, value in properties.items():
+        if key in HREF_PROPERTIES or not isinstance(value, str):
+            continue
+        for member, relative in assets.items():
+            reference = posixpath.relpath(member, base) if base else member
+            if reference in value:
+                value = value.replace(reference, asset_url(relative))
+        properties[key] = value
+
+# ================================================
+# LEITURA
+# ================================================
+
+def iter_kmz_features(source, asset_dir: Optional[str] = None,
+                      asset_url: Optional[Callable[[str], str]] = None,
+                      max_bytes: int = MAX_UNCOMPRESSED_BYTES, **options) -> Iterator[Dict[str, Any]]:
+    """
+    Features GeoJSON de um KMZ (caminho ou arquivo binário com seek).
+    Com asset_dir, os assets embutidos são gravados e as propriedades
+    passam a apontar para asset_url(caminho relativo).
+    """
+    with zipfile.ZipFile(source) as archive:
+        check_limits(archive, max_bytes)
+        member = find_kml_member(archive)
+        assets = extract_assets(archive, asset_dir) if asset_dir else {}
+        with open_kml_stream(archive, member) as stream:
+            for feature in KMLReader(stream, **options):
+                if assets:
+                    link_assets(feature['properties'], assets, member, asset_url or (lambda relative: relative))
+                yield feature
+
+def iter_features(source, asset_dir: Optional[str] = None,
+                  asset_url: Optional[Callable[[str], str]] = None,
+                  max_bytes: int = MAX_UNCOMPRESSED_BYTES, **options) -> Iterator[Dict[str, Any]]:
+    """Features de um KML ou KMZ, detectado pelo conteúdo"""
+    if is_kmz(source):
+        return iter_kmz_features(source, asset_dir, asset_url, max_bytes, **options)
+    return iter_kml_features(source, **options)
+
+def check_kmz(source, max_bytes: int = MAX_UNCOMPRESSED_BYTES,
+              on_progress: Optional[Callable[[int], None]] = None, every: int = 1000) -> Tuple[bool, str, int]:
+    """Validar o KML principal de um KMZ em streaming: (válido, mensagem, features)"""
+    try:
+        with zipfile.ZipFile(source) as archive:
+            check_limits(archive, max_bytes)
+            with open_kml_stream(archive) as stream:
+                return check_kml(stream, on_progress, every)
+    except zipfile.BadZipFile:
+        return False, 'Arquivo KMZ corrompido', 0
+    except KMZError as e:
+        return False, str(e), 0
+
+def save_kmz_assets(source, asset_dir: str, max_bytes: int = MAX_UNCOMPRESSED_BYTES) -> Dict[str, str]:
+    """Gravar só os assets de um KMZ já validado"""
+    with zipfile.ZipFile(source) as archive:
+        check_limits(archive, max_bytes)
+        return extract_assets(archive, asset_dir)
@@ -1,6 +1,8 @@
+import io
 import re
 import os
-import xml.etree.ElementTree as ET
+
+from app.utils.kml_reader import check_kml
 
 # Imports opcionais
 try:
@@ -75,27 +77,53 @@ def sanitize_html(html_content):
         
         return sanitized
 
+MAX_KML_BYTES = 10 * 1024 * 1024  # 10MB
+
 def validate_kml_content(kml_content):
     """Validar e sanitizar conteúdo KML"""
     try:
-        # Verificar se é XML válido
-        root = ET.fromstring(kml_content)
-        
-        # Verificar se é um documento KML válido
-        if root.tag != '{http://www.opengis.net/kml/2.2}kml':
-            return False, "Arquivo não é um documento KML válido"
-        
         # Verificar tamanho do arquivo
-        if len(kml_content) > 10 * 1024 * 1024:  # 10MB
+        if len(kml_content) > MAX_KML_BYTES:
             return False, "Arquivo muito grande"
         
+        # Verificar se é XML/KML válido (leitura em streaming, sem montar a árvore)
+        is_valid, message, _ = check_kml(io.StringIO(kml_content))
+        if not is_valid:
+            return False, message
+        
         # Sanitizar conteúdo
         sanitized_content = sanitize_kml_content(kml_content)
         
         return True, sanitized_content
         
-    except ET.ParseError:
-        return False, "Arquivo XML malformado"
+    except Exception as e:
+        return False, f"Erro ao processar arquivo: {str(e)}"
+
+def validate_kml_file(path):
+    """
+    Validar e sanitizar (no lugar) um KML já gravado em disco.
+    Tamanho e estrutura são verificados em streaming: só um arquivo válido
+    e dentro do limite é decodificado para a sanitização
+    """
+    try:
+        if os.path.getsize(path) > MAX_KML_BYTES:
+            return False, "Arquivo muito grande"
+        
+        is_valid, message, _ = check_kml(path)
+        if not is_valid:
+            return False, message
+        
+        with open(path, encoding='utf-8', newline='') as source:
+            content = source.read()
+        sanitized_content = sanitize_kml_content(content)
+        if sanitized_content != content:
+            temp_path = path + '.sanitized'
+            with open(temp_path, 'w', encoding='utf-8', newline='') as target:
+                target.write(sanitized_content)
+            os.replace(temp_path, path)
+        
+        return True, "ok"
+        
     except Exception as e:
         return False, f"Erro ao processar arquivo: {str(e)}"
 
@@ -26,11 +26,28 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
     UPLOAD_FOLDER = '/tmp/uploads'  # Render usa /tmp para arquivos temporários
     ALLOWED_EXTENSIONS = {'kml', 'kmz', 'geojson'}
+    KMZ_MAX_UNCOMPRESSED = 512 * 1024 * 1024  # conteúdo descomprimido de um KMZ
+    KMZ_ASSET_FOLDER = None  # padrão: <UPLOAD_FOLDER>/kmz_assets
     
     # Configurações de rate limiting
     RATELIMIT_DEFAULT = "100 per hour"
     RATELIMIT_STORAGE_URL = "memory://"
-    
+
+    # Cache compartilhado entre workers: 'sqlite' (arquivo local), 'redis' ou 'memory'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND')  # padrão: 'sqlite' ('memory' em TESTING)
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')  # padrão: instance/webag_cache.db
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_DEFAULT_TTL = 300  # segundos
+
+    # Jobs de importação KML/KMZ (fila na tabela import_jobs)
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS') or 2)  # threads por processo
+    IMPORT_BATCH_SIZE = 1000  # features por transação
+    IMPORT_STALE_SECONDS = 300  # sem heartbeat: job volta para a fila
+    IMPORT_FOLDER = os.environ.get('IMPORT_FOLDER')  # padrão: instance/imports
+    CHUNKED_UPLOAD_MAX_BYTES = 4 * 1024 * 1024 * 1024  # arquivo enviado em blocos
+    UPLOAD_CHUNK_MAX_BYTES = 8 * 1024 * 1024  # por bloco (abaixo de MAX_CONTENT_LENGTH)
+    UPLOAD_EXPIRE_SECONDS = 24 * 3600  # uploads parados por mais tempo são descartados
+
     # Configurações de CORS
     CORS_ORIGINS = ['*']  # Liberado para desenvolvimento, restringir em produção
     
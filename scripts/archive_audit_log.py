@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Retenção do Log de Auditoria
+Move entradas antigas de audit_log para arquivos mensais comprimidos
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+
+from app.services.audit_log import DEFAULT_RETENTION_DAYS, archive_audit_log
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Arquivar entradas antigas de audit_log')
+    parser.add_argument('database', nargs='?', default='instance/webgis_enhanced.db',
+                        help='Caminho do banco SQLite ou URL SQLAlchemy')
+    parser.add_argument('--days', type=int, default=DEFAULT_RETENTION_DAYS,
+                        help='Manter na tabela as entradas dos últimos N dias')
+    parser.add_argument('--archive-dir', default='instance/audit_archive',
+                        help='Diretório dos arquivos mensais (audit-AAAA-MM.jsonl.gz)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Entradas por lote')
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else f'sqlite:///{args.database}'
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"❌ Banco não encontrado: {args.database}")
+        return 1
+
+    before = datetime.utcnow() - timedelta(days=args.days)
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        archived = archive_audit_log(connection, args.archive_dir, before, args.batch_size, commit=True)
+
+    for month, count in sorted(archived.items()):
+        print(f"📦 {month}: {count} entrada(s)")
+    print(f"✅ {sum(archived.values())} entrada(s) anteriores a {before:%Y-%m-%d} arquivada(s) em {args.archive_dir}")
+    if archived and url.startswith('sqlite'):
+        print("💡 Execute VACUUM para devolver o espaço ao sistema de arquivos")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
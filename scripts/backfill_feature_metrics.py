@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Preenchimento de Métricas de Features
+Calcula área, comprimento, perímetro, centroide e bbox de features existentes
+"""
+
+import os
+import sys
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+
+from app.services.feature_metrics import backfill_feature_metrics
+from app.utils.geo_metrics import NUMPY_AVAILABLE
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Preencher métricas geométricas de features existentes')
+    parser.add_argument('database', nargs='?', default='instance/webgis_enhanced.db',
+                        help='Caminho do banco SQLite ou URL SQLAlchemy')
+    parser.add_argument('--layer', help='Processar apenas uma camada')
+    parser.add_argument('--all', action='store_true',
+                        help='Recalcular todas as features (padrão: apenas as sem métricas)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Features por lote')
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else f'sqlite:///{args.database}'
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"❌ Banco não encontrado: {args.database}")
+        return 1
+
+    if not NUMPY_AVAILABLE:
+        print("⚠️ numpy não instalado - usando cálculo em Python puro")
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        updated, layers = backfill_feature_metrics(connection, args.batch_size,
+                                                   only_missing=not args.all, layer_id=args.layer)
+
+    print(f"✅ {updated} feature(s) atualizada(s) em {layers} camada(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Build dos Assets Estáticos
+Gera em static/dist as cópias com hash de conteúdo, os bundles por página,
+as variantes .gz/.br e o manifest.json usado por asset_url()
+"""
+
+import os
+import sys
+import shutil
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.assets.manifest import BROTLI_AVAILABLE, DIST_DIR, build_manifest
+from app.assets.bundler import render_bundles
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Fingerprintar e comprimir os assets estáticos')
+    parser.add_argument('static_dir', nargs='?',
+                        default=os.path.join(os.path.dirname(__file__), '..', 'static'),
+                        help='Diretório static do projeto')
+    parser.add_argument('--clean', action='store_true', help='Remover o build anterior antes de gerar')
+    parser.add_argument('--no-compress', action='store_true', help='Não gerar variantes .gz/.br')
+    args = parser.parse_args()
+
+    static_dir = os.path.abspath(args.static_dir)
+    if not os.path.isdir(static_dir):
+        print(f"❌ Diretório não encontrado: {args.static_dir}")
+        return 1
+
+    if args.clean:
+        shutil.rmtree(os.path.join(static_dir, DIST_DIR), ignore_errors=True)
+
+    manifest = build_manifest(static_dir, compress=not args.no_compress, extra=render_bundles(static_dir))
+    for logical, served in sorted(manifest.items()):
+        print(f"📦 {logical} -> {served}")
+    print(f"✅ {len(manifest)} asset(s) em {os.path.join(static_dir, DIST_DIR)}")
+    if not args.no_compress and not BROTLI_AVAILABLE:
+        print("💡 Instale 'brotli' para gerar também as variantes .br")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Carga em Lote de Features
+Carrega um arquivo GeoJSON (FeatureCollection) em uma camada enhanced
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, text
+
+from app.models.enhanced_models import Feature, GeometryType
+from app.services.bulk_loader import DEFAULT_BULK_BATCH_SIZE, bulk_load_features
+from app.services.layer_features import parse_feature_input
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Carregar GeoJSON em uma camada enhanced')
+    parser.add_argument('layer_id', help='Id da camada de destino')
+    parser.add_argument('geojson', help='Arquivo GeoJSON (Feature ou FeatureCollection)')
+    parser.add_argument('--database', default='instance/webgis_enhanced.db',
+                        help='Caminho do banco SQLite ou URL SQLAlchemy')
+    parser.add_argument('--user', help='Id do usuário autor (padrão: criador da camada)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BULK_BATCH_SIZE, help='Features por lote')
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else f'sqlite:///{args.database}'
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"❌ Banco não encontrado: {args.database}")
+        return 1
+
+    try:
+        with open(args.geojson, encoding='utf-8') as source:
+            items = parse_feature_input(json.load(source), max_features=None)
+        for item in items:
+            item['feature_type'] = GeometryType(item['feature_type'])
+    except (OSError, ValueError) as e:
+        print(f"❌ GeoJSON inválido: {e}")
+        return 1
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        layer = connection.execute(
+            text("SELECT id, created_by FROM layers WHERE id = :layer_id"), {'layer_id': args.layer_id}
+        ).first()
+        if layer is None:
+            print(f"❌ Camada não encontrada: {args.layer_id}")
+            return 1
+
+        result = bulk_load_features(connection, Feature.__table__, layer.id, items,
+                                    args.user or layer.created_by, args.batch_size)
+
+    print(f"✅ {result['inserted']} feature(s) carregada(s) em {result['batches']} lote(s)")
+    print(f"📐 Extensão: {result['bbox']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
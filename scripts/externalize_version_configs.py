@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Migração de Configurações de Versão
+Move snapshots grandes de layer_versions para o blob store comprimido
+"""
+
+import os
+import sys
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+
+from app.services.version_blobs import BLOB_THRESHOLD_BYTES, externalize_version_configs
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Mover layer_config grandes para layer_version_blobs')
+    parser.add_argument('database', nargs='?', default='instance/webgis_enhanced.db',
+                        help='Caminho do banco SQLite ou URL SQLAlchemy')
+    parser.add_argument('--threshold', type=int, default=BLOB_THRESHOLD_BYTES,
+                        help='Tamanho mínimo (bytes) para mover a configuração')
+    parser.add_argument('--batch-size', type=int, default=100, help='Versões por lote')
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else f'sqlite:///{args.database}'
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"❌ Banco não encontrado: {args.database}")
+        return 1
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        moved, freed = externalize_version_configs(connection, args.threshold, args.batch_size)
+
+    print(f"✅ {moved} versão(ões) movida(s), {freed / 1024:.1f} KB liberados em layer_versions")
+    if moved and url.startswith('sqlite'):
+        print("💡 Execute VACUUM para devolver o espaço ao sistema de arquivos")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
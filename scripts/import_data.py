@@ -1,7 +1,7 @@
 import os
 import json
-import xml.etree.ElementTree as ET
 from app import create_app, db
+from app.utils.kmz_reader import iter_features
 from models import GeoFeature
 
 # Estrutura de propriedades padrão
@@ -31,34 +31,18 @@ def get_default_properties():
     }
 
 def parse_kml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    namespace = {'kml': 'http://www.opengis.net/kml/2.2'}
     features = []
 
-    for placemark in root.findall('.//kml:Placemark', namespace):
+    # KML ou KMZ, lido em streaming
+    for feature in iter_features(file_path):
         properties = get_default_properties()
-        name_element = placemark.find('kml:name', namespace)
-        if name_element is not None:
-            properties['nome_gleba'] = name_element.text
+        if feature['properties'].get('name'):
+            properties['nome_gleba'] = feature['properties']['name']
 
-        # Extrair geometria (Polygon)
-        try:
-            coords_text = placemark.find('.//kml:coordinates', namespace).text.strip()
-            coords_list = [item.split(',')[:2] for item in coords_text.split()] 
-            coords_float = [[float(lon), float(lat)] for lon, lat in coords_list]
-            
-            geometry = {
-                "type": "Polygon",
-                "coordinates": [coords_float]
-            }
-            features.append({
-                "geometry": geometry,
-                "properties": properties
-            })
-        except (AttributeError, IndexError, ValueError) as e:
-            print(f"Erro ao processar geometria para um Placemark em {os.path.basename(file_path)}: {e}")
-            continue
+        features.append({
+            "geometry": feature['geometry'],
+            "properties": properties
+        })
 
     return features
 
@@ -72,7 +56,7 @@ def main():
 
         kml_dir = 'WEBGIS_ANDERSON'
         for filename in os.listdir(kml_dir):
-            if filename.endswith('.kml'):
+            if filename.endswith(('.kml', '.kmz')):
                 file_path = os.path.join(kml_dir, filename)
                 print(f"Processando arquivo: {filename}")
                 layer_name = os.path.splitext(filename)[0]
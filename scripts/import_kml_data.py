@@ -5,101 +5,40 @@ Script para importar dados KML para o banco
 """
 import sqlite3
 import os
+import sys
 import json
-import xml.etree.ElementTree as ET
-from datetime import datetime
+import time
+import argparse
 
-def parse_kml_file(kml_path):
-    """Parse básico de arquivo KML"""
-    try:
-        tree = ET.parse(kml_path)
-        root = tree.getroot()
-        
-        # Namespace do KML
-        ns = {'kml': 'http://www.opengis.net/kml/2.2'}
-        
-        features = []
-        
-        # Buscar placemarks
-        for placemark in root.findall('.//kml:Placemark', ns):
-            feature = {}
-            
-            # Nome
-            name_elem = placemark.find('kml:name', ns)
-            if name_elem is not None:
-                feature['name'] = name_elem.text
-            
-            # Descrição
-            desc_elem = placemark.find('kml:description', ns)
-            if desc_elem is not None:
-                feature['description'] = desc_elem.text
-            
-            # Geometria (simplificada)
-            point = placemark.find('.//kml:Point/kml:coordinates', ns)
-            if point is not None:
-                coords = point.text.strip().split(',')
-                if len(coords) >= 2:
-                    feature['geometry'] = {
-                        'type': 'Point',
-                        'coordinates': [float(coords[0]), float(coords[1])]
-                    }
-            
-            polygon = placemark.find('.//kml:Polygon', ns)
-            if polygon is not None:
-                feature['geometry'] = {
-                    'type': 'Polygon',
-                    'coordinates': 'complex_polygon_data'  # Simplificado
-                }
-            
-            linestring = placemark.find('.//kml:LineString', ns)
-            if linestring is not None:
-                feature['geometry'] = {
-                    'type': 'LineString', 
-                    'coordinates': 'complex_line_data'  # Simplificado
-                }
-            
-            if feature:
-                features.append(feature)
-        
-        return features
-        
-    except Exception as e:
-        print(f"❌ Erro parseando {kml_path}: {e}")
-        return []
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-def import_features_to_db(db_path, features, layer_name, project_id):
-    """Importa features para o banco"""
-    try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            
-            imported = 0
-            for feature in features:
-                properties = {
-                    'name': feature.get('name', 'Sem nome'),
-                    'description': feature.get('description', ''),
-                    'imported_from': layer_name
-                }
-                
-                cursor.execute("""
-                    INSERT INTO geo_features 
-                    (project_id, layer_name, feature_type, geometry, properties)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    project_id,
-                    layer_name,
-                    feature.get('geometry', {}).get('type', 'Unknown'),
-                    json.dumps(feature.get('geometry', {})),
-                    json.dumps(properties)
-                ))
-                imported += 1
-            
-            print(f"✅ Importadas {imported} features de {layer_name}")
-            return imported
-            
-    except Exception as e:
-        print(f"❌ Erro importando para banco: {e}")
-        return 0
+from app.services.parallel_import import (
+    DEFAULT_BATCH_SIZE, DEFAULT_TRANSACTION_SIZE, run_parallel_import, summarize
+)
+
+# KML files para importar
+KML_FILES = [
+    ('building.kml', 'Edifícios'),
+    ('roads.kml', 'Estradas'),
+    ('places.kml', 'Lugares'),
+    ('ma_setores_2021.kml', 'Setores Censitários')
+]
+
+def feature_row(feature, layer_name):
+    """Executado nos workers: linha de geo_features sem o project_id"""
+    properties = {
+        'name': 'Sem nome',
+        'description': '',
+        **feature['properties'],
+        'imported_from': layer_name
+    }
+    return (
+        layer_name,
+        feature['geometry']['type'],
+        json.dumps(feature['geometry']),
+        json.dumps(properties)
+    )
 
 def get_project_id(db_path):
     """Obtém ID do projeto exemplo"""
@@ -114,10 +53,18 @@ def get_project_id(db_path):
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description='Importar arquivos KML/KMZ em paralelo')
+    parser.add_argument('--database', default='instance/webgis.db', help='Caminho do banco SQLite')
+    parser.add_argument('--kml-dir', default='WEBGIS_ANDERSON', help='Diretório dos arquivos KML/KMZ')
+    parser.add_argument('--workers', type=int, default=None, help='Processos de leitura (padrão: núcleos da CPU)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Features por lote enviado ao escritor')
+    parser.add_argument('--transaction-size', type=int, default=DEFAULT_TRANSACTION_SIZE,
+                        help='Features gravadas por transação')
+    args = parser.parse_args()
+    
     print("=== WEBAG KML Data Importer ===")
     
-    db_path = "instance/webgis.db"
-    kml_dir = "WEBGIS_ANDERSON"
+    db_path = args.database
     
     # Verificar banco
     if not os.path.exists(db_path):
@@ -132,32 +79,59 @@ def main():
     
     print(f"📁 Usando projeto ID: {project_id}")
     
-    # KML files para importar
-    kml_files = [
-        ('building.kml', 'Edifícios'),
-        ('roads.kml', 'Estradas'),
-        ('places.kml', 'Lugares'),
-        ('ma_setores_2021.kml', 'Setores Censitários')
-    ]
-    
-    total_imported = 0
-    
-    for kml_file, layer_name in kml_files:
-        kml_path = os.path.join(kml_dir, kml_file)
+    files = []
+    for kml_file, layer_name in KML_FILES:
+        kml_path = os.path.join(args.kml_dir, kml_file)
+        kmz_path = os.path.splitext(kml_path)[0] + '.kmz'
+        if not os.path.exists(kml_path) and os.path.exists(kmz_path):
+            kml_path = kmz_path
         
         if os.path.exists(kml_path):
-            print(f"📄 Processando {kml_file}...")
-            features = parse_kml_file(kml_path)
-            
-            if features:
-                imported = import_features_to_db(db_path, features, layer_name, project_id)
-                total_imported += imported
-            else:
-                print(f"⚠️  Nenhuma feature encontrada em {kml_file}")
+            files.append((kml_path, layer_name))
         else:
             print(f"⚠️  Arquivo não encontrado: {kml_path}")
     
-    print(f"\n🎉 Importação concluída: {total_imported} features totais")
+    started = time.perf_counter()
+    with sqlite3.connect(db_path) as conn:
+        # Linhas desta execução: rowid acima do maior existente (escritor único)
+        first_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM geo_features").fetchone()[0]
+        
+        # Único escritor: os workers só leem e preparam as linhas
+        def write_batch(rows):
+            conn.executemany("""
+                INSERT INTO geo_features 
+                (project_id, layer_name, feature_type, geometry, properties)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(project_id, *row) for row in rows])
+        
+        def discard(path, layer_name):
+            # Arquivo falhou no meio: remover o que já foi gravado dele
+            conn.execute(
+                "DELETE FROM geo_features WHERE project_id = ? AND layer_name = ? AND rowid > ?",
+                (project_id, layer_name, first_rowid)
+            )
+        
+        def progress(path, stats):
+            print(f"   📄 {os.path.basename(path)}: {stats['features']} features", end='\r', flush=True)
+        
+        results = run_parallel_import(files, write_batch, conn.commit, discard, workers=args.workers,
+                                      batch_size=args.batch_size, transaction_size=args.transaction_size,
+                                      prepare=feature_row, progress=progress)
+    summary = summarize(results, time.perf_counter() - started)
+    
+    print()
+    for path, stats in results.items():
+        if stats['error']:
+            print(f"❌ Erro importando {os.path.basename(path)}: {stats['error']}"
+                  f" ({stats['discarded']} features descartadas)")
+        elif stats['features']:
+            print(f"✅ {stats['layer']}: {stats['features']} features em {stats['seconds']:.2f}s "
+                  f"({stats['features_per_second']:.0f} features/s)")
+        else:
+            print(f"⚠️  Nenhuma feature encontrada em {os.path.basename(path)}")
+    
+    print(f"\n🎉 Importação concluída: {summary['features']} features totais "
+          f"em {summary['seconds']:.2f}s ({summary['features_per_second']:.0f} features/s)")
     
     # Verificar resultado
     try:
@@ -169,7 +143,7 @@ def main():
     except Exception as e:
         print(f"❌ Erro verificando resultado: {e}")
     
-    return 0
+    return 1 if summary['failed'] else 0
 
 if __name__ == "__main__":
     exit(main())
\ No newline at end of file
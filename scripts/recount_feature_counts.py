@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Recontagem de Features
+Corrige divergências em layers.feature_count (contagem incremental)
+"""
+
+import os
+import sys
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+
+from app.services.feature_counts import recount_feature_counts
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Recalcular layers.feature_count a partir de features')
+    parser.add_argument('database', nargs='?', default='instance/webgis_enhanced.db',
+                        help='Caminho do banco SQLite ou URL SQLAlchemy')
+    parser.add_argument('--layer', help='Recalcular apenas esta camada')
+    parser.add_argument('--dry-run', action='store_true', help='Apenas listar divergências')
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else f'sqlite:///{args.database}'
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"❌ Banco não encontrado: {args.database}")
+        return 1
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        drift = recount_feature_counts(connection, layer_id=args.layer, dry_run=args.dry_run)
+
+    if not drift:
+        print("✅ Nenhuma divergência encontrada")
+        return 0
+
+    for layer_id, stored, actual in drift:
+        print(f"  📋 {layer_id}: {stored} -> {actual}")
+    action = "encontradas" if args.dry_run else "corrigidas"
+    print(f"{'🔍' if args.dry_run else '✅'} {len(drift)} camada(s) com divergência {action}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Worker de Importação
+Consome a fila import_jobs fora do servidor web (pode rodar em várias máquinas
+apontando para o mesmo banco); jobs de workers interrompidos são retomados
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+
+from app.models.enhanced_models import Feature, GeometryType, ImportJob
+from app.services.import_jobs import (
+    DEFAULT_IMPORT_BATCH_SIZE, DEFAULT_IMPORT_WORKERS, DEFAULT_POLL_INTERVAL, DEFAULT_STALE_SECONDS,
+    ImportJobQueue
+)
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description='Processar jobs de importação KML/KMZ')
+    parser.add_argument('--database', default='instance/webgis_enhanced.db',
+                        help='Caminho do banco SQLite ou URL SQLAlchemy')
+    parser.add_argument('--workers', type=int, default=DEFAULT_IMPORT_WORKERS, help='Threads de importação')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_IMPORT_BATCH_SIZE, help='Features por transação')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Segundos entre verificações da fila')
+    parser.add_argument('--stale-seconds', type=float, default=DEFAULT_STALE_SECONDS,
+                        help='Segundos sem heartbeat até um job voltar para a fila')
+    parser.add_argument('--once', action='store_true', help='Processar a fila atual e sair')
+    args = parser.parse_args()
+
+    url = args.database if '://' in args.database else f'sqlite:///{args.database}'
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"❌ Banco não encontrado: {args.database}")
+        return 1
+
+    jobs = ImportJobQueue(create_engine(url), ImportJob.__table__, Feature.__table__, GeometryType,
+                          workers=args.workers, batch_size=args.batch_size,
+                          poll_interval=args.poll_interval, stale_seconds=args.stale_seconds)
+
+    if args.once:
+        processed = jobs.run_pending()
+        print(f"✅ {processed} job(s) processado(s): {jobs.stats}")
+        return 0
+
+    print(f"🔄 Worker de importação iniciado ({args.workers} thread(s)); Ctrl+C para parar")
+    jobs.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        jobs.stop()
+    print(f"👋 Worker encerrado: {jobs.stats}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
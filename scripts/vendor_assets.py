@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+WEBAG Professional - Bibliotecas de Terceiros Locais
+Copia as versões fixadas de Leaflet, Leaflet.draw, GeometryUtil, toGeoJSON
+e Font Awesome para static/vendor (cache local primeiro), verificando SRI
+e o vendor.lock.json. Rode antes de scripts/build_assets.py
+"""
+
+import os
+import sys
+import argparse
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.assets.vendor import (
+    CACHE_DIR_ENV, DEFAULT_CACHE_DIR, DEFAULT_LOCK_FILE, VENDOR_PACKAGES, VendorError, vendor_packages
+)
+
+def main():
+    """Função principal"""
+    project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    parser = argparse.ArgumentParser(description='Copiar bibliotecas de terceiros para static/vendor')
+    parser.add_argument('packages', nargs='*', help=f"Pacotes (padrão: todos — {', '.join(sorted(VENDOR_PACKAGES))})")
+    parser.add_argument('--static-dir', default=os.path.join(project_dir, 'static'), help='Diretório static')
+    parser.add_argument('--lock', default=os.path.join(project_dir, DEFAULT_LOCK_FILE), help='Arquivo de lock')
+    parser.add_argument('--cache-dir', default=os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR),
+                        help=f'Cache local dos downloads (ou ${CACHE_DIR_ENV})')
+    parser.add_argument('--offline', action='store_true', help='Usar apenas o cache local')
+    parser.add_argument('--update-lock', action='store_true',
+                        help='Registrar no lock versões/arquivos novos (revise o diff antes de commitar)')
+    args = parser.parse_args()
+
+    try:
+        copied = vendor_packages(args.static_dir, args.lock, args.cache_dir, offline=args.offline,
+                                 update_lock=args.update_lock, names=args.packages or None)
+    except VendorError as e:
+        print(f"❌ {e}")
+        return 1
+
+    for name, count in sorted(copied.items()):
+        print(f"📦 {name}@{VENDOR_PACKAGES[name]['version']}: {count} arquivo(s)")
+    print(f"✅ Bibliotecas em {os.path.join(args.static_dir, 'vendor')}")
+    if args.update_lock:
+        print(f"🔒 Lock atualizado: {args.lock}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -111,8 +111,10 @@ CREATE TABLE IF NOT EXISTS layers (
     -- Metadados
     srid VARCHAR(20) DEFAULT 'EPSG:4326',
     bbox_coordinates TEXT, -- JSON bounding box da camada
+    bbox_dirty BOOLEAN DEFAULT 0, -- extensão a recalcular (após remoções)
     feature_count INTEGER DEFAULT 0,
     file_size_bytes INTEGER DEFAULT 0,
+    data_version INTEGER NOT NULL DEFAULT 0,
     
     -- Schema de atributos (para validação)
     schema_definition TEXT DEFAULT '{}', -- JSON schema dos atributos
@@ -156,6 +158,10 @@ CREATE TABLE IF NOT EXISTS features (
     length_m REAL, -- Comprimento em metros (se aplicável)
     perimeter_m REAL, -- Perímetro em metros (se aplicável)
     centroid_coordinates TEXT, -- JSON coordenadas do centroide
+    bbox_min_x REAL, -- Bounding box da geometria
+    bbox_min_y REAL,
+    bbox_max_x REAL,
+    bbox_max_y REAL,
     
     -- Versionamento
     version INTEGER DEFAULT 1,
@@ -261,6 +267,18 @@ CREATE TABLE IF NOT EXISTS glebas (
     UNIQUE(project_id, numero_gleba)
 );
 
+-- Resumo agregado de glebas (mantido incrementalmente pela aplicação)
+CREATE TABLE IF NOT EXISTS gleba_summaries (
+    scope_id VARCHAR(100) NOT NULL, -- project_id
+    dimension VARCHAR(20) NOT NULL, -- bairro, quadra, zoneamento, * (totais)
+    dimension_value VARCHAR(100) NOT NULL DEFAULT '',
+    gleba_count INTEGER NOT NULL DEFAULT 0,
+    area_total REAL NOT NULL DEFAULT 0,
+    valor_venal_total REAL NOT NULL DEFAULT 0,
+    valor_iptu_total REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope_id, dimension, dimension_value)
+);
+
 -- ================================================
 -- AUDIT & VERSIONING - Auditoria e Versionamento
 -- ================================================
@@ -287,13 +305,80 @@ CREATE TABLE IF NOT EXISTS layer_versions (
     version_number INTEGER NOT NULL,
     version_name VARCHAR(100),
     description TEXT,
-    layer_config TEXT NOT NULL, -- JSON snapshot completo da layer
+    layer_config TEXT NOT NULL, -- JSON da layer ('{}' quando movido para layer_version_blobs)
+    config_hash VARCHAR(64), -- sha256 da configuração em layer_version_blobs
     feature_count INTEGER DEFAULT 0,
+    parent_version_id TEXT REFERENCES layer_versions(id),
+    storage_type VARCHAR(20) DEFAULT 'snapshot', -- snapshot, delta
     created_by TEXT NOT NULL REFERENCES users(id),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(layer_id, version_number)
 );
 
+-- Configurações grandes de versões (JSON comprimido, endereçado por hash)
+CREATE TABLE IF NOT EXISTS layer_version_blobs (
+    content_hash VARCHAR(64) PRIMARY KEY, -- sha256 do JSON
+    compression VARCHAR(10) NOT NULL DEFAULT 'zlib',
+    size_bytes INTEGER NOT NULL, -- tamanho original do JSON
+    data BLOB NOT NULL
+);
+
+-- Features alteradas em cada versão delta (copy-on-write)
+CREATE TABLE IF NOT EXISTS layer_version_changes (
+    id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(16)))),
+    version_id TEXT NOT NULL REFERENCES layer_versions(id) ON DELETE CASCADE,
+    feature_id TEXT NOT NULL,
+    change_type VARCHAR(10) NOT NULL, -- upsert, delete
+    feature_data TEXT, -- JSON da feature (NULL quando removida)
+    UNIQUE(version_id, feature_id)
+);
+
+-- Features alteradas desde a última versão de cada camada
+CREATE TABLE IF NOT EXISTS layer_dirty_features (
+    layer_id TEXT NOT NULL,
+    feature_id TEXT NOT NULL,
+    mark_id TEXT, -- renovado a cada nova alteração da feature
+    PRIMARY KEY (layer_id, feature_id)
+);
+
+-- Importações de KML/KMZ em segundo plano (fila persistente)
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(16)))),
+    layer_id TEXT NOT NULL REFERENCES layers(id) ON DELETE CASCADE,
+    created_by TEXT NOT NULL REFERENCES users(id),
+    filename VARCHAR(255) NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size BIGINT DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, completed, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR(100), -- worker que detém o job enquanto running
+    features_total INTEGER, -- conhecido após a validação
+    features_read INTEGER NOT NULL DEFAULT 0, -- ponto de retomada
+    features_inserted INTEGER NOT NULL DEFAULT 0,
+    features_skipped INTEGER NOT NULL DEFAULT 0,
+    errors TEXT, -- JSON
+    message TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    heartbeat_at DATETIME,
+    finished_at DATETIME
+);
+
+-- Uploads em blocos (retomáveis) aguardando importação
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(16)))),
+    layer_id TEXT NOT NULL REFERENCES layers(id) ON DELETE CASCADE,
+    created_by TEXT NOT NULL REFERENCES users(id),
+    filename VARCHAR(255) NOT NULL,
+    file_path TEXT NOT NULL,
+    total_size BIGINT NOT NULL,
+    received BIGINT NOT NULL DEFAULT 0, -- próximo offset esperado
+    status VARCHAR(20) NOT NULL DEFAULT 'uploading', -- uploading, completed
+    job_id TEXT REFERENCES import_jobs(id),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ================================================
 -- PERFORMANCE INDEXES - Índices para Performance
 -- ================================================
@@ -311,10 +396,14 @@ CREATE INDEX IF NOT EXISTS idx_glebas_project ON glebas(project_id);
 CREATE INDEX IF NOT EXISTS idx_glebas_feature ON glebas(feature_id);
 CREATE INDEX IF NOT EXISTS idx_audit_table_record ON audit_log(table_name, record_id);
 CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log(timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_user_timestamp ON audit_log(user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_import_jobs_status_created ON import_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_status_updated ON upload_sessions(status, updated_at);
 
 -- Índices compostos para queries específicas
 CREATE INDEX IF NOT EXISTS idx_layers_project_visible ON layers(project_id, is_visible, display_order);
 CREATE INDEX IF NOT EXISTS idx_features_layer_current ON features(layer_id, is_current, status);
+CREATE INDEX IF NOT EXISTS idx_features_layer_bbox ON features(layer_id, bbox_min_x, bbox_max_x, bbox_min_y, bbox_max_y);
 
 -- ================================================
 -- TRIGGERS - Automação e Integridade
@@ -358,36 +447,42 @@ BEGIN
 END;
 
 -- Trigger para contagem automática de features
+-- Contagem incremental (+1/-1) conforme a transição de is_current/status;
+-- divergências são corrigidas com scripts/recount_feature_counts.py.
+-- status é comparado com lower() pois o ORM grava o nome do enum ('ACTIVE').
+DROP TRIGGER IF EXISTS update_layer_feature_count_insert;
+DROP TRIGGER IF EXISTS update_layer_feature_count_update;
+DROP TRIGGER IF EXISTS update_layer_feature_count_delete;
+
 CREATE TRIGGER IF NOT EXISTS update_layer_feature_count_insert
     AFTER INSERT ON features
+    WHEN NEW.is_current = 1 AND lower(NEW.status) = 'active'
 BEGIN
     UPDATE layers 
-    SET feature_count = (
-        SELECT COUNT(*) FROM features 
-        WHERE layer_id = NEW.layer_id AND is_current = 1 AND status = 'active'
-    )
+    SET feature_count = COALESCE(feature_count, 0) + 1
     WHERE id = NEW.layer_id;
 END;
 
 CREATE TRIGGER IF NOT EXISTS update_layer_feature_count_update
-    AFTER UPDATE ON features
+    AFTER UPDATE OF layer_id, is_current, status ON features
 BEGIN
     UPDATE layers 
-    SET feature_count = (
-        SELECT COUNT(*) FROM features 
-        WHERE layer_id = NEW.layer_id AND is_current = 1 AND status = 'active'
-    )
-    WHERE id = NEW.layer_id;
+    SET feature_count = COALESCE(feature_count, 0) - 1
+    WHERE id = OLD.layer_id
+      AND OLD.is_current = 1 AND lower(OLD.status) = 'active';
+    
+    UPDATE layers 
+    SET feature_count = COALESCE(feature_count, 0) + 1
+    WHERE id = NEW.layer_id
+      AND NEW.is_current = 1 AND lower(NEW.status) = 'active';
 END;
 
 CREATE TRIGGER IF NOT EXISTS update_layer_feature_count_delete
     AFTER DELETE ON features
+    WHEN OLD.is_current = 1 AND lower(OLD.status) = 'active'
 BEGIN
     UPDATE layers 
-    SET feature_count = (
-        SELECT COUNT(*) FROM features 
-        WHERE layer_id = OLD.layer_id AND is_current = 1 AND status = 'active'
-    )
+    SET feature_count = COALESCE(feature_count, 0) - 1
     WHERE id = OLD.layer_id;
 END;
 
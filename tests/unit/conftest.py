@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Fixtures compartilhadas dos testes unitários
+Aplicação Flask com banco enhanced em memória (SQLite)
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Os modelos enhanced e os legados (app.models.models) compartilham o mesmo
+# MetaData e ambos definem 'glebas': carregar os enhanced já na coleta garante
+# que estes testes não dependam da ordem de execução dos demais.
+import app.models.enhanced_models  # noqa: E402,F401
+
+
+@pytest.fixture
+def enhanced_app(request, tmp_path):
+    """
+    Aplicação com os modelos enhanced e dados padrão criados. Com
+    parametrize(..., ['file'], indirect=True) o banco fica em arquivo: cada
+    conexão é independente e só enxerga o que foi confirmado
+    """
+    from flask import Flask
+    from app import db
+    from app.models.enhanced_models import init_enhanced_database
+
+    app = Flask(__name__)
+    if getattr(request, 'param', None) == 'file':
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'enhanced.db'}"
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test-secret'
+    app.config['TESTING'] = True
+    db.init_app(app)
+
+    with app.app_context():
+        assert init_enhanced_database()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def api_client(enhanced_app):
+    """Cliente da API v2 autenticado como o administrador padrão"""
+    from flask_login import LoginManager
+    from app.api.enhanced_layer_api import layer_api
+    from app import db
+    from app.models.enhanced_models import User
+    from app.services.access import access_cache
+
+    access_cache.clear()
+    login_manager = LoginManager(enhanced_app)
+    login_manager.user_loader(lambda user_id: db.session.get(User, user_id))
+    enhanced_app.register_blueprint(layer_api)
+
+    admin = User.query.filter_by(username='admin_super').first()
+    client = enhanced_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = admin.id
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager que conta os comandos SQL executados no bloco"""
+    return _count_queries
+
+
+@contextmanager
+def _count_queries(engine):
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
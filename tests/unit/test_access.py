@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da resolução de acesso a projetos e camadas
+"""
+import pytest
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='acesso', display_name='Acesso',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id, is_public=True)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _access_queries(statements):
+    return [s for s in statements if 'FROM layers l JOIN projects p' in s or 'FROM projects WHERE id' in s]
+
+
+def test_resolver_caches_per_request_and_per_worker(enhanced_app, layer):
+    from app import db
+    from app.models.enhanced_models import User
+    from app.services.access import AccessResolver, AccessCache
+
+    admin = User.query.filter_by(username='admin_super').first()
+    cache = AccessCache(ttl=60)
+
+    first = AccessResolver(db.session.connection, admin, cache)
+    assert first.can_access_layer(layer.id) and first.can_access_layer(layer.id)
+    assert first.layer_project(layer.id) == layer.project_id
+    assert not first.can_access_layer('inexistente')
+    assert first.queries == 2
+
+    second = AccessResolver(db.session.connection, admin, cache)
+    assert second.can_access_layer(layer.id) and not second.can_access_layer('inexistente')
+    assert second.can_access_project(layer.project_id)
+    assert second.queries == 1  # apenas o projeto, ainda não visto
+
+    expired = AccessCache(ttl=-1)
+    third = AccessResolver(db.session.connection, admin, expired)
+    third.can_access_layer(layer.id)
+    assert AccessResolver(db.session.connection, admin, expired).can_access_layer(layer.id)
+    assert expired.get((admin.id, admin.organization_id, 'layer', layer.id)) == (False, None)
+
+
+def test_other_organization_is_denied_and_changes_invalidate(api_client, layer, count_queries):
+    from app import db
+    from app.models.enhanced_models import Organization, Project
+    from app.services.access import access_cache
+
+    assert api_client.get(f'/api/v2/layers/{layer.id}').status_code == 200
+    with count_queries(db.engine) as statements:
+        assert api_client.get(f'/api/v2/layers/{layer.id}/statistics').status_code == 200
+    assert _access_queries(statements) == []
+
+    other = Organization(name='Outra', slug='outra')
+    db.session.add(other)
+    db.session.commit()
+    project = db.session.get(Project, layer.project_id)
+    project.organization_id = other.id
+    db.session.commit()
+
+    assert api_client.get(f'/api/v2/layers/{layer.id}').status_code == 404
+    assert api_client.get(f'/api/v2/projects/{project.id}/extent').status_code == 404
+    access_cache.clear()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do manifesto de assets com hash de conteúdo
+"""
+import gzip
+import json
+
+import pytest
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'app.js').write_text('console.log("webag");\n' * 100)
+    (static / 'tiny.css').write_text('body{margin:0}')
+    (static / 'readme.txt').write_text('não é asset')
+    return static
+
+
+@pytest.fixture
+def asset_app(static_dir):
+    from flask import Flask, render_template_string
+    from app.assets.manifest import init_assets, send_asset
+
+    app = Flask(__name__, static_folder=None)
+    assets = init_assets(app, str(static_dir))
+
+    @app.route('/static/<path:filename>')
+    def static_files(filename):
+        return send_asset(assets, filename)
+
+    @app.route('/page')
+    def page():
+        return render_template_string("{{ asset_url('app.js') }}|{{ asset_url('static_files', filename='tiny.css') }}")
+
+    return app
+
+
+def test_build_manifest_fingerprints_and_compresses(static_dir):
+    from app.assets.manifest import build_manifest, content_hash
+
+    manifest = build_manifest(str(static_dir))
+
+    data = (static_dir / 'app.js').read_bytes()
+    assert manifest['app.js'] == f'dist/app.{content_hash(data)}.js'
+    assert 'readme.txt' not in manifest
+    hashed = static_dir / manifest['app.js']
+    assert hashed.read_bytes() == data
+    assert gzip.decompress((static_dir / (manifest['app.js'] + '.gz')).read_bytes()) == data
+    # Arquivos pequenos não ganham variante comprimida
+    assert not (static_dir / (manifest['tiny.css'] + '.gz')).exists()
+    assert json.loads((static_dir / 'dist' / 'manifest.json').read_text()) == manifest
+
+    # Rebuild não fingerprinta a própria saída
+    assert build_manifest(str(static_dir)) == manifest
+
+
+def test_asset_url_without_build_uses_content_version(asset_app, static_dir):
+    from app.assets.manifest import content_hash
+
+    client = asset_app.test_client()
+    js_url, css_url = client.get('/page').get_data(as_text=True).split('|')
+    assert js_url == f"/static/app.js?v={content_hash((static_dir / 'app.js').read_bytes())}"
+    assert css_url.startswith('/static/tiny.css?v=')
+
+    response = client.get('/static/app.js')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_hashed_asset_is_immutable_and_negotiates_encoding(asset_app, static_dir):
+    from app.assets.manifest import build_manifest
+
+    manifest = build_manifest(str(static_dir))
+    asset_app.extensions['assets'].reload()
+    client = asset_app.test_client()
+
+    js_url = client.get('/page').get_data(as_text=True).split('|')[0]
+    assert js_url == '/static/' + manifest['app.js']
+
+    plain = client.get(js_url)
+    assert plain.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = client.get(js_url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.mimetype == 'text/javascript'
+    assert gzip.decompress(compressed.data) == plain.data
+
+    refused = client.get(js_url, headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da consulta paginada e da retenção do log de auditoria
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def entries(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import AuditLog, User
+
+    admin = User.query.filter_by(username='admin_super').first()
+    base = datetime(2026, 1, 30, 12, 0)
+    logs = []
+    for i in range(7):
+        logs.append(AuditLog(table_name='layers' if i % 2 else 'layer_groups', record_id=f'r{i}',
+                             operation='UPDATE', new_values={'name': f'n{i}'}, user_id=admin.id,
+                             timestamp=base + timedelta(days=i)))
+    # Mesmo timestamp: o desempate é pelo id
+    logs.append(AuditLog(id='0' * 32, table_name='layers', record_id='r7', operation='INSERT',
+                         user_id=admin.id, timestamp=base))
+    db.session.add_all(logs)
+    db.session.commit()
+    return logs
+
+
+def test_audit_pages_with_cursor(api_client, entries):
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/v2/audit?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        payload = api_client.get(url).get_json()
+        seen.extend(entry['record_id'] for entry in payload['entries'])
+        cursor = payload['next_cursor']
+        if not cursor:
+            break
+    assert seen == ['r6', 'r5', 'r4', 'r3', 'r2', 'r1', 'r0', 'r7']
+
+
+def test_audit_filters(api_client, entries):
+    payload = api_client.get('/api/v2/audit?table=layers&since=2026-01-31T00:00:00Z&until=2026-02-04').get_json()
+    assert [entry['record_id'] for entry in payload['entries']] == ['r3', 'r1']
+    assert api_client.get('/api/v2/audit?cursor=@@').status_code == 400
+
+
+def test_archive_moves_old_entries_to_monthly_files(enhanced_app, entries, tmp_path):
+    from app import db
+    from app.models.enhanced_models import AuditLog
+    from app.services.audit_log import archive_audit_log, archive_path, read_archive
+
+    archived = archive_audit_log(db.session.connection(), str(tmp_path), datetime(2026, 2, 2), batch_size=2)
+    db.session.commit()
+
+    assert archived == {'2026-01': 3, '2026-02': 1}
+    assert sorted(e['record_id'] for e in read_archive(archive_path(str(tmp_path), '2026-01'))) == ['r0', 'r1', 'r7']
+    assert [e['new_values'] for e in read_archive(archive_path(str(tmp_path), '2026-02'))] == [{'name': 'n2'}]
+    assert sorted(log.record_id for log in AuditLog.query) == ['r3', 'r4', 'r5', 'r6']
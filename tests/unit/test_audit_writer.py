@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da gravação em lote do log de auditoria
+"""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def writer_factory(enhanced_app, tmp_path):
+    from app import db
+    from app.models.enhanced_models import AuditLog
+    from app.services.audit_writer import AuditWriter
+
+    def factory(**kwargs):
+        return AuditWriter(db.engine, AuditLog.__table__, str(tmp_path / 'spill.jsonl'), **kwargs)
+    return factory
+
+
+def _event(record_id='r1', **values):
+    from app.services.audit_writer import build_audit_event
+    return build_audit_event('UPDATE', 'layers', record_id, {'name': 'a', 'opacity': 1.0},
+                             {'name': values.get('name', 'b'), 'opacity': 1.0})
+
+
+def test_compact_changes_keeps_only_changed_fields():
+    from app.services.audit_writer import compact_changes
+
+    old, new, changed = compact_changes({'name': 'a', 'opacity': 1.0, 'x': 1}, {'name': 'b', 'opacity': 1.0})
+    assert (old, new, changed) == ({'name': 'a', 'x': 1}, {'name': 'b', 'x': None}, ['name', 'x'])
+    assert compact_changes(None, {'name': 'a', 'description': None}) == (None, {'name': 'a'}, [])
+
+
+def test_events_are_written_in_one_batch(writer_factory, count_queries):
+    from app import db
+    from app.models.enhanced_models import AuditLog
+
+    writer = writer_factory()
+    for i in range(5):
+        assert writer.enqueue(_event(f'r{i}'))
+    assert AuditLog.query.count() == 0
+
+    with count_queries(db.engine) as statements:
+        assert writer.flush() == 5
+    assert len([s for s in statements if s.startswith('INSERT INTO audit_log')]) == 1
+
+    log = AuditLog.query.filter_by(record_id='r3').one()
+    assert log.old_values == {'name': 'a'} and log.new_values == {'name': 'b'}
+    assert log.changed_fields == ['name'] and log.operation.value == 'UPDATE'
+
+
+def test_full_queue_spills_and_replays_once(writer_factory):
+    from app.models.enhanced_models import AuditLog
+
+    writer = writer_factory(max_queue=1, put_timeout=0)
+    first, second = _event('r1'), _event('r2')
+    assert writer.enqueue(first)
+    assert not writer.enqueue(second)
+
+    with open(writer.spill_path) as spill:
+        assert json.loads(spill.read())['record_id'] == 'r2'
+
+    writer.flush()
+    assert writer.replay_spill() == 1
+    assert AuditLog.query.count() == 2
+
+    # Um spill regravado de novo (queda durante o replay) não duplica eventos
+    writer._spill([second])
+    assert writer.replay_spill() == 0
+    assert AuditLog.query.count() == 2
+
+
+def test_spill_is_replayed_by_a_single_worker(writer_factory, monkeypatch):
+    import glob
+    import threading
+    from app.models.enhanced_models import AuditLog
+
+    # Dois workers com o mesmo spill iniciando ao mesmo tempo
+    first, second = writer_factory(), writer_factory()
+    first._spill([_event('r1'), _event('r2')])
+
+    inserting, release = threading.Event(), threading.Event()
+    insert = first._insert
+
+    def slow_insert(rows):
+        inserting.set()
+        release.wait(5)
+        insert(rows)
+    monkeypatch.setattr(first, '_insert', slow_insert)
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(first.replay_spill()))
+    worker.start()
+    assert inserting.wait(5)
+    assert second.replay_spill() == 0
+    release.set()
+    worker.join(5)
+
+    assert results == [2] and AuditLog.query.count() == 2
+    assert glob.glob(first.spill_path + '*') == []
+
+
+def test_failed_replay_is_kept_for_next_worker(writer_factory, monkeypatch):
+    from app.models.enhanced_models import AuditLog
+
+    first, second = writer_factory(), writer_factory()
+    first._spill([_event('r1')])
+
+    def fail(rows):
+        raise RuntimeError('banco indisponível')
+    monkeypatch.setattr(first, '_insert', fail)
+    assert first.replay_spill() == 0
+
+    assert second.replay_spill() == 1 and second.stats['written'] == 1
+    assert AuditLog.query.count() == 1
+
+
+def test_failed_batch_goes_to_spill(writer_factory, monkeypatch):
+    writer = writer_factory()
+
+    def fail(rows):
+        raise RuntimeError('banco indisponível')
+    monkeypatch.setattr(writer, '_insert', fail)
+
+    writer.enqueue(_event())
+    writer.flush()
+    assert writer.stats['spilled'] == 1
+
+
+def test_background_thread_drains_queue(writer_factory):
+    from app.models.enhanced_models import AuditLog
+
+    writer = writer_factory(flush_interval=0.01)
+    writer.start()
+    writer.enqueue(_event())
+    writer.stop()
+    assert not writer.running and AuditLog.query.count() == 1
+
+
+def test_api_logs_compact_diff(api_client, enhanced_app, tmp_path):
+    from app.models.enhanced_models import AuditLog, Project
+
+    enhanced_app.config['AUDIT_SPILL_PATH'] = str(tmp_path / 'spill.jsonl')
+    project = Project.query.first()
+    group_id = api_client.post(f'/api/v2/projects/{project.id}/layer-groups',
+                               json={'name': 'Base'}).get_json()['group']['id']
+    api_client.put(f'/api/v2/layer-groups/{group_id}', json={'name': 'Base 2'})
+
+    update = AuditLog.query.filter_by(record_id=group_id, operation='UPDATE').one()
+    assert update.old_values['name'] == 'Base' and update.new_values['name'] == 'Base 2'
+    assert 'description' not in update.new_values
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da carga em lote de features
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'sql', 'enhanced_schema.sql')
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='carga', display_name='Carga',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _square(x, y, size=0.01):
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    return {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [ring]}, 'properties': {'n': x}}
+
+
+def test_bulk_endpoint_loads_in_few_statements(api_client, layer, count_queries):
+    from app import db
+    from app.models.enhanced_models import Feature, Layer, LayerDirtyFeature
+
+    collection = {'type': 'FeatureCollection', 'features': [_square(i, 0) for i in range(2500)]}
+    with count_queries(db.engine) as statements:
+        response = api_client.post(f'/api/v2/layers/{layer.id}/features/bulk', json=collection)
+    assert response.status_code == 201
+    payload = response.get_json()
+    assert payload['inserted'] == 2500
+    assert payload['layer']['feature_count'] == 2500
+    assert payload['layer']['bbox_coordinates'] == [0, 0, 2499.01, 0.01]
+
+    inserts = [s for s in statements if s.startswith('INSERT INTO features')]
+    assert 0 < len(inserts) <= 10
+
+    db.session.expire_all()
+    feature = Feature.query.filter_by(layer_id=layer.id).first()
+    assert feature.area_m2 == pytest.approx(1.2364e6, rel=1e-2) and feature.is_current
+    assert feature.to_geojson()['properties']['n'] == feature.properties['n']
+    assert db.session.get(Layer, layer.id).data_version > 0
+    assert LayerDirtyFeature.query.filter_by(layer_id=layer.id).count() == 2500
+
+
+def test_bulk_load_with_sql_triggers_counts_once(tmp_path):
+    from app.models.enhanced_models import Feature, GeometryType
+    from app.services.bulk_loader import bulk_load_features
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'enhanced.db'}")
+    raw = engine.raw_connection()
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        raw.executescript(f.read())
+    raw.close()
+
+    items = [{'feature_type': GeometryType.POLYGON, **_square(i, i)} for i in range(5)]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO layers (id, project_id, name, display_name, layer_type, created_by)
+            VALUES ('l1', 'proj_default', 'l1', 'L1', 'vector', 'user_admin')
+        """))
+        result = bulk_load_features(conn, Feature.__table__, 'l1', items, 'user_admin', batch_size=2)
+        assert (result['inserted'], result['batches']) == (5, 3)
+        layer = conn.execute(text("SELECT feature_count, bbox_coordinates FROM layers WHERE id = 'l1'")).first()
+        assert layer.feature_count == 5
+        assert layer.bbox_coordinates == '[0.0, 0.0, 4.01, 4.01]'
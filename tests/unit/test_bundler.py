@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos bundles de JS/CSS por página
+"""
+import json
+
+import pytest
+
+BUNDLES = {'page': {'js': ['a.js', 'b.js'], 'css': ['a.css']}}
+
+A_JS = """// cabeçalho
+var url = "http://exemplo/*nao*/";   // comentário
+/* bloco
+   de várias linhas */
+var re = /\\/\\*x[/]/g;
+var half = 10 / 2 / 1;
+"""
+
+B_JS = """function tpl(name) {
+    return `linha 1  
+  ${name /* dentro */}  // não é comentário
+`;
+}
+"""
+
+A_CSS = """/* tema */
+body {
+    content: "a  /* b */";
+    margin : 0 ;
+}
+"""
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'a.js').write_text(A_JS)
+    (static / 'b.js').write_text(B_JS)
+    (static / 'a.css').write_text(A_CSS)
+    return static
+
+
+def _decode_mappings(mappings):
+    from app.assets.bundler import _BASE64
+
+    lines = []
+    state = [0, 0, 0]
+    for segment in mappings.split(';'):
+        if not segment:
+            lines.append(None)
+            continue
+        values, shift, value = [], 0, 0
+        for char in segment:
+            digit = _BASE64.index(char)
+            value += (digit & 31) << shift
+            if digit & 32:
+                shift += 5
+                continue
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            shift, value = 0, 0
+        # values[0] é a coluna gerada (sempre 0: um segmento por linha)
+        state = [s + v for s, v in zip(state, values[1:])]
+        lines.append(tuple(state))
+    return lines
+
+
+def test_minify_js_keeps_strings_regex_and_templates():
+    from app.assets.bundler import minify
+
+    lines = [text for text, _, _ in minify(A_JS, 'js')]
+    assert lines == [
+        'var url = "http://exemplo/*nao*/";',
+        'var re = /\\/\\*x[/]/g;',
+        'var half = 10 / 2 / 1;'
+    ]
+
+    template = [text for text, _, _ in minify(B_JS, 'js')]
+    assert '    return `linha 1  ' in template
+    assert '  ${name  }  // não é comentário' in template
+
+
+def test_minify_css():
+    from app.assets.bundler import minify
+
+    assert [text for text, _, _ in minify(A_CSS, 'css')] == [
+        'body{',
+        'content: "a  /* b */";',
+        'margin : 0;',
+        '}'
+    ]
+
+
+def test_render_bundle_with_source_map(static_dir):
+    from app.assets.bundler import render_bundle
+    from app.assets.manifest import content_hash
+
+    rendered = render_bundle(str(static_dir), 'page', 'js', BUNDLES)
+    code = rendered['bundles/page.js'].decode('utf-8').splitlines()
+    source_map = json.loads(rendered['bundles/page.js.map'])
+
+    assert code[-1] == f"//# sourceMappingURL=page.js.{content_hash(rendered['bundles/page.js.map'])}.map"
+    assert source_map['sources'] == ['a.js', 'b.js']
+    assert source_map['sourcesContent'] == [A_JS, B_JS]
+
+    mapped = _decode_mappings(source_map['mappings'])
+    assert len(mapped) == len(code) - 1
+    for line, mapping in zip(code, mapped):
+        if mapping is None:
+            assert line == ';'
+            continue
+        source, number, column = mapping
+        original = [A_JS, B_JS][source].splitlines()[number]
+        if not line.startswith('  ${'):
+            assert original[column:].startswith(line.split(' ')[0])
+
+
+def test_bundle_generated_on_first_request(static_dir):
+    from flask import Flask, render_template_string
+    from app.assets.bundler import register_bundles
+    from app.assets.manifest import init_assets, send_asset
+
+    app = Flask(__name__, static_folder=None)
+    assets = init_assets(app, str(static_dir))
+    register_bundles(assets, BUNDLES)
+
+    @app.route('/static/<path:filename>')
+    def static_files(filename):
+        return send_asset(assets, filename)
+
+    with app.test_request_context():
+        url = render_template_string("{{ asset_url('bundles/page.css') }}")
+    assert url.startswith('/static/dist/bundles/page.') and url.endswith('.css')
+    assert (static_dir / 'dist' / 'bundles').is_dir()
+
+    response = app.test_client().get(url)
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.get_data(as_text=True).startswith('body{')
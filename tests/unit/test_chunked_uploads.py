@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do upload em blocos retomável (init / blocos / complete)
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def _kml(count):
+    placemarks = b''.join(
+        b'<Placemark><name>p%d</name><Point><coordinates>%d,1</coordinates></Point></Placemark>' % (i, i)
+        for i in range(count)
+    )
+    return b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>' + placemarks + b'</Document></kml>'
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def layer(enhanced_app, tmp_path):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    enhanced_app.config['IMPORT_FOLDER'] = str(tmp_path / 'imports')
+    enhanced_app.config['UPLOAD_CHUNK_MAX_BYTES'] = 256
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='cadastro', display_name='Cadastro',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _put(client, url, offset, chunk, checksum=None):
+    return client.put(url, data=chunk, headers={
+        'Upload-Offset': str(offset),
+        'X-Chunk-SHA256': checksum or _sha256(chunk)
+    })
+
+
+def test_chunked_upload_resumes_and_imports(api_client, layer):
+    from app import db
+    from app.models.enhanced_models import Feature
+
+    content = _kml(12)
+    response = api_client.post(f'/api/v2/layers/{layer.id}/uploads',
+                               json={'filename': 'estadual.kml', 'size': len(content)})
+    assert response.status_code == 201
+    payload = response.get_json()
+    url, chunk_size = payload['upload_url'], payload['chunk_size']
+    assert chunk_size == 256 and payload['upload']['offset'] == 0
+
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    assert _put(api_client, url, 0, chunks[0]).get_json()['offset'] == chunk_size
+
+    # Checksum errado: bloco descartado, offset não avança
+    response = _put(api_client, url, chunk_size, chunks[1], checksum='0' * 64)
+    assert response.status_code == 400
+
+    # Bloco repetido (resposta perdida) ou fora de ordem: 409 com o offset para retomar
+    response = _put(api_client, url, 0, chunks[0])
+    assert response.status_code == 409 and response.get_json()['offset'] == chunk_size
+
+    # Retomada a partir do estado consultado
+    status = api_client.get(url)
+    offset = int(status.headers['Upload-Offset'])
+    assert offset == chunk_size and os.path.getsize(
+        os.path.join(api_client.application.config['IMPORT_FOLDER'], status.get_json()['upload']['id'] + '.kml')
+    ) == chunk_size
+    for chunk in chunks[1:]:
+        offset = _put(api_client, url, offset, chunk).get_json()['offset']
+    assert offset == len(content)
+
+    response = api_client.post(url + '/complete', json={'sha256': _sha256(content)})
+    assert response.status_code == 202
+    job = api_client.get(response.get_json()['status_url']).get_json()['job']
+    assert job['status'] == 'completed' and job['features_inserted'] == 12
+
+    upload = api_client.get(url).get_json()['upload']
+    assert upload['status'] == 'completed' and upload['job_id'] == job['id']
+    db.session.expire_all()
+    assert Feature.query.filter_by(layer_id=layer.id).count() == 12
+    assert os.listdir(api_client.application.config['IMPORT_FOLDER']) == []
+
+    # Upload finalizado não aceita mais blocos
+    assert _put(api_client, url, offset, b'x').status_code == 400
+
+
+def test_chunked_upload_validation(api_client, layer):
+    response = api_client.post(f'/api/v2/layers/{layer.id}/uploads',
+                               json={'filename': 'dados.csv', 'size': 10})
+    assert response.status_code == 400
+    response = api_client.post(f'/api/v2/layers/{layer.id}/uploads',
+                               json={'filename': 'a.kml', 'size': -1})
+    assert response.status_code == 400
+
+    url = api_client.post(f'/api/v2/layers/{layer.id}/uploads',
+                          json={'filename': 'a.kml', 'size': 300}).get_json()['upload_url']
+    assert _put(api_client, url, 0, b'x' * 257).status_code == 400       # bloco acima do limite
+    assert api_client.put(url, data=b'abc', headers={'Upload-Offset': '0'}).status_code == 400
+    assert _put(api_client, url, 0, b'x' * 100).status_code == 200
+    assert _put(api_client, url, 100, b'x' * 201).status_code == 400     # passa do tamanho declarado
+
+    # Incompleto: complete indica de onde continuar
+    response = api_client.post(url + '/complete', json={})
+    assert response.status_code == 409 and response.get_json()['offset'] == 100
+
+    assert api_client.delete(url).status_code == 200
+    assert api_client.get(url).status_code == 404
+    assert api_client.get('/api/v2/uploads/naoexiste').status_code == 404
+
+
+def test_expired_uploads_are_purged(layer, tmp_path):
+    from app import db
+    from app.models.enhanced_models import UploadSession
+    from app.services.chunked_uploads import ChunkedUploads
+
+    uploads = ChunkedUploads(db.engine, UploadSession.__table__, str(tmp_path / 'uploads'),
+                             expire_seconds=60)
+    old = uploads.create(layer.id, layer.created_by, 'velho.kml', 10, '.kml')
+    recent = uploads.create(layer.id, layer.created_by, 'novo.kml', 10, '.kml')
+    db.session.query(UploadSession).filter_by(id=old['id']).update(
+        {'updated_at': datetime.utcnow() - timedelta(hours=2)})
+    db.session.commit()
+
+    assert uploads.purge_expired() == 1
+    assert uploads.get(old['id']) is None and not os.path.exists(old['file_path'])
+    assert uploads.get(recent['id']) is not None and os.path.exists(recent['file_path'])
+
+
+def test_overlapping_appends_do_not_corrupt_file(tmp_path):
+    import io
+    import threading
+    from sqlalchemy import create_engine
+    from app import db
+    from app.models.enhanced_models import UploadSession
+    from app.services.chunked_uploads import ChunkedUploads, OffsetMismatch, UploadBusy, UploadError
+
+    # Banco em arquivo: cada requisição com a sua conexão, como em produção
+    engine = create_engine(f"sqlite:///{tmp_path / 'uploads.db'}")
+    db.metadata.create_all(engine)
+    uploads = ChunkedUploads(engine, UploadSession.__table__, str(tmp_path / 'uploads'), chunk_max_bytes=64)
+    upload = uploads.create('camada', 'autor', 'a.kml', 96, '.kml')
+    first, second = b'a' * 64, b'b' * 32
+
+    class Stalled(io.RawIOBase):
+        """Corpo que para no meio (conexão caída) até ser liberado"""
+        def __init__(self):
+            self.started, self.release, self.sent = threading.Event(), threading.Event(), False
+
+        def read(self, size=-1):
+            if not self.sent:
+                self.sent = True
+                return first[:10]
+            self.started.set()
+            self.release.wait(5)
+            return b''
+
+    stalled, errors = Stalled(), []
+    original = threading.Thread(target=lambda: errors.append(pytest.raises(
+        UploadError, uploads.append, dict(upload), 0, stalled, 64, _sha256(first))))
+    original.start()
+    assert stalled.started.wait(5)
+
+    # Retry sobreposto ao envio original: recusado sem tocar no arquivo
+    with pytest.raises(UploadBusy) as busy:
+        uploads.append(dict(upload), 0, io.BytesIO(first), 64, _sha256(first))
+    assert busy.value.offset == 0
+
+    stalled.release.set()
+    original.join(5)
+    assert errors and 'incompleto' in str(errors[0].value)
+    assert os.path.getsize(upload['file_path']) == 0
+
+    stale = dict(upload)
+    assert uploads.append(dict(upload), 0, io.BytesIO(first), 64, _sha256(first)) == 64
+    # Cópia antiga do estado (lida antes do commit acima) não trunca o que foi confirmado
+    with pytest.raises(OffsetMismatch) as mismatch:
+        uploads.append(stale, 0, io.BytesIO(b'c' * 10), 10, _sha256(b'c' * 10))
+    assert mismatch.value.offset == 64 and os.path.getsize(upload['file_path']) == 64
+
+    assert uploads.append(uploads.get(upload['id']), 64, io.BytesIO(second), 32, _sha256(second)) == 96
+    with open(upload['file_path'], 'rb') as source:
+        assert source.read() == first + second
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das extensões (bounding boxes) de camadas e projetos
+"""
+import pytest
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='extensao', display_name='Extensão',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id, is_public=True)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _point(db, layer, x, y):
+    from app.models.enhanced_models import Feature, GeometryType
+
+    feature = Feature(layer_id=layer.id, feature_type=GeometryType.POINT,
+                      geometry={'type': 'Point', 'coordinates': [x, y]}, created_by=layer.created_by)
+    db.session.add(feature)
+    db.session.commit()
+    return feature
+
+
+def test_geometry_bbox_handles_nested_geometries():
+    from app.services.extents import geometry_bbox
+
+    polygon = {'type': 'MultiPolygon', 'coordinates': [
+        [[[0, 0], [4, 0], [4, 3], [0, 0]]],
+        [[[-2, 5, 10], [1, 6, 10], [-2, 5, 10]]]
+    ]}
+    assert geometry_bbox(polygon) == (-2, 0, 4, 6)
+    assert geometry_bbox({'type': 'GeometryCollection', 'geometries': [
+        {'type': 'Point', 'coordinates': [1, 1]}, {'type': 'Point', 'coordinates': [-1, 2]}
+    ]}) == (-1, 1, 1, 2)
+    assert geometry_bbox({'type': 'Point', 'coordinates': []}) is None
+
+
+def test_extent_expands_on_write_and_recomputes_after_delete(api_client, layer, count_queries):
+    from app import db
+    from app.models.enhanced_models import Layer
+
+    far = _point(db, layer, -50, -20)
+    _point(db, layer, 10, 5)
+    moved = _point(db, layer, 1, 1)
+
+    db.session.expire_all()
+    stored = db.session.get(Layer, layer.id)
+    assert stored.bbox_coordinates == [-50, -20, 10, 5] and not stored.bbox_dirty
+
+    moved.geometry = {'type': 'Point', 'coordinates': [30, 40]}
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(Layer, layer.id).bbox_coordinates == [-50, -20, 30, 40]
+
+    db.session.delete(far)
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(Layer, layer.id).bbox_dirty
+
+    payload = api_client.get(f'/api/v2/layers/{layer.id}').get_json()['layer']
+    assert payload['bbox_coordinates'] == [10, 5, 30, 40]
+    db.session.expire_all()
+    assert not db.session.get(Layer, layer.id).bbox_dirty
+
+
+@pytest.mark.parametrize('enhanced_app', ['file'], indirect=True)
+def test_extent_refresh_on_read_is_committed(api_client, layer):
+    from sqlalchemy import create_engine, text
+    from app import db
+
+    far = _point(db, layer, -50, -20)
+    _point(db, layer, 10, 5)
+    db.session.delete(far)
+    db.session.commit()
+
+    payload = api_client.get(f'/api/v2/layers/{layer.id}').get_json()['layer']
+    assert payload['bbox_coordinates'] == [10, 5, 10, 5]
+
+    # Conexão nova: o recálculo feito no GET foi confirmado
+    engine = create_engine(db.engine.url)
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT bbox_coordinates, bbox_dirty FROM layers WHERE id = :id"),
+                                 {'id': layer.id}).one()
+    engine.dispose()
+    assert not row.bbox_dirty and row.bbox_coordinates == '[10.0, 5.0, 10.0, 5.0]'
+
+
+def test_project_extent_unions_layers(api_client, layer):
+    from app import db
+    from app.models.enhanced_models import Layer, LayerType, StatusType
+
+    other = Layer(project_id=layer.project_id, name='outra', display_name='Outra',
+                  layer_type=LayerType.VECTOR, created_by=layer.created_by)
+    db.session.add(other)
+    db.session.commit()
+    _point(db, layer, 0, 0)
+    _point(db, other, 5, -5)
+    hidden = _point(db, layer, 100, 100)
+    hidden.status = StatusType.DELETED
+    db.session.commit()
+
+    payload = api_client.get(f'/api/v2/projects/{layer.project_id}/extent').get_json()
+    assert payload['bbox'] == [0, -5, 5, 0]
+    assert payload['layers'] == {layer.id: [0, 0, 0, 0], other.id: [5, -5, 5, -5]}
+
+    listing = api_client.get(f'/api/v2/projects/{layer.project_id}/layers').get_json()
+    assert {l['id']: l['bbox_coordinates'] for l in listing['layers']}[other.id] == [5, -5, 5, -5]
+
+
+def test_extent_queries_are_postgres_safe():
+    from sqlalchemy import text
+    from sqlalchemy.dialects import postgresql
+    from app.services.extents import VISIBLE_LAYER_CONDITION
+    from app.services.feature_counts import COUNTED_CONDITION
+
+    # layers.status e features.status são o enum nativo statustype no PostgreSQL
+    for condition in (VISIBLE_LAYER_CONDITION, COUNTED_CONDITION):
+        sql = str(text(f"SELECT id FROM layers WHERE {condition}").compile(dialect=postgresql.dialect()))
+        assert 'lower(status)' not in sql and 'lower(CAST(status AS TEXT))' in sql
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da contagem incremental de features (ORM e triggers SQLite)
+"""
+import os
+
+from sqlalchemy import create_engine, text
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'sql', 'enhanced_schema.sql')
+
+
+def _stored_count(db, layer_id):
+    return db.session.execute(
+        text("SELECT feature_count FROM layers WHERE id = :id"), {'id': layer_id}
+    ).scalar()
+
+
+def test_orm_path_tracks_transitions(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, Feature, LayerType, GeometryType, StatusType
+    from app.services.feature_counts import recount_feature_counts
+
+    project = Project.query.first()
+    layers = [
+        Layer(project_id=project.id, name=f'contagem_{i}', display_name=f'Contagem {i}',
+              layer_type=LayerType.VECTOR, created_by=project.owner_id)
+        for i in range(2)
+    ]
+    db.session.add_all(layers)
+    db.session.commit()
+    first, second = layers
+
+    features = [
+        Feature(layer_id=first.id, feature_type=GeometryType.POINT,
+                geometry={'type': 'Point', 'coordinates': [0, i]}, created_by=project.owner_id)
+        for i in range(5)
+    ]
+    db.session.add_all(features)
+    db.session.commit()
+    assert _stored_count(db, first.id) == 5
+
+    db.session.expire_all()
+    features[0].status = StatusType.DELETED
+    features[1].is_current = False
+    features[2].layer_id = second.id
+    db.session.delete(features[3])
+    features[1].status = StatusType.ARCHIVED  # já não contada: sem efeito
+    db.session.commit()
+
+    assert _stored_count(db, first.id) == 1
+    assert _stored_count(db, second.id) == 1
+    assert recount_feature_counts(db.session.connection(), dry_run=True) == []
+
+
+def test_sql_triggers_and_recount(tmp_path):
+    from app.services.feature_counts import has_feature_count_triggers, recount_feature_counts
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'enhanced.db'}")
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        schema = f.read()
+    raw = engine.raw_connection()
+    raw.executescript(schema)
+    raw.close()
+
+    with engine.begin() as conn:
+        assert has_feature_count_triggers(conn)
+        conn.execute(text("""
+            INSERT INTO layers (id, project_id, name, display_name, layer_type, created_by)
+            VALUES ('l1', 'proj_default', 'l1', 'L1', 'vector', 'user_admin'),
+                   ('l2', 'proj_default', 'l2', 'L2', 'vector', 'user_admin')
+        """))
+        conn.execute(text("""
+            INSERT INTO features (id, layer_id, feature_type, geometry, status, created_by)
+            VALUES (:id, 'l1', 'Point', '{}', :status, 'user_admin')
+        """), [{'id': f'f{i}', 'status': 'ACTIVE' if i % 2 else 'active'} for i in range(6)])
+
+        def count(layer_id):
+            return conn.execute(text("SELECT feature_count FROM layers WHERE id = :id"),
+                                {'id': layer_id}).scalar()
+
+        assert count('l1') == 6
+        conn.execute(text("UPDATE features SET status = 'deleted' WHERE id = 'f0'"))
+        conn.execute(text("UPDATE features SET layer_id = 'l2' WHERE id = 'f1'"))
+        conn.execute(text("UPDATE features SET properties = '{\"a\": 1}' WHERE id = 'f2'"))
+        conn.execute(text("DELETE FROM features WHERE id IN ('f0', 'f3')"))
+        assert (count('l1'), count('l2')) == (3, 1)
+
+        conn.execute(text("UPDATE layers SET feature_count = 42 WHERE id = 'l1'"))
+        assert recount_feature_counts(conn) == [('l1', 42, 3)]
+        assert count('l1') == 3
+        assert recount_feature_counts(conn) == []
+
+
+def test_counted_condition_is_postgres_safe():
+    from sqlalchemy.dialects import postgresql
+    from app.services.feature_counts import COUNTED_CONDITION, COUNTED_PARAMS
+
+    # PostgreSQL não aceita boolean = integer: is_current vai como parâmetro
+    compiled = text(f"SELECT 1 FROM features WHERE {COUNTED_CONDITION}").bindparams(**COUNTED_PARAMS).compile(
+        dialect=postgresql.dialect())
+    assert 'is_current = %(is_current)s' in str(compiled)
+    assert compiled.params == {'is_current': True}
+    # Nem lower(statustype): o enum nativo é convertido para texto antes
+    assert 'lower(status)' not in str(compiled)
+    assert "lower(CAST(status AS TEXT)) = 'active'" in str(compiled)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das métricas geodésicas de features
+"""
+import pytest
+
+
+SQUARE = [[0, 0], [0.01, 0], [0.01, 0.01], [0, 0.01], [0, 0]]
+HOLE = [[0.0025, 0.0025], [0.0075, 0.0025], [0.0075, 0.0075], [0.0025, 0.0075], [0.0025, 0.0025]]
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='metricas', display_name='Métricas',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def test_polygon_area_perimeter_and_holes():
+    from app.utils.geo_metrics import geometry_metrics
+
+    metrics = geometry_metrics({'type': 'Polygon', 'coordinates': [SQUARE]})
+    assert metrics['area_m2'] == pytest.approx(1.2364e6, rel=1e-3)
+    assert metrics['perimeter_m'] == pytest.approx(4447.8, rel=1e-3)
+    assert metrics['centroid'] == pytest.approx([0.005, 0.005])
+
+    holed = geometry_metrics({'type': 'MultiPolygon', 'coordinates': [[SQUARE, HOLE]]})
+    assert holed['area_m2'] == pytest.approx(metrics['area_m2'] * 0.75, rel=1e-3)
+    assert holed['perimeter_m'] == pytest.approx(metrics['perimeter_m'] * 1.5, rel=1e-3)
+
+
+def test_line_length_matches_vectorized_path():
+    from app.utils import geo_metrics
+
+    # 200 vértices: acima de VECTORIZE_MIN_POINTS, calculado pelos kernels numpy
+    assert geo_metrics.NUMPY_AVAILABLE
+    line = [[i / 1000, 0] for i in range(200)]
+    length = geo_metrics.geometry_metrics({'type': 'MultiLineString', 'coordinates': [line, line]})['length_m']
+    assert length == pytest.approx(2 * 199 * 111.19, rel=1e-3)
+    assert geo_metrics._line_length_py(line) == pytest.approx(length / 2, abs=0.01)
+    assert geo_metrics.geometry_metrics({'type': 'Point', 'coordinates': [1, 2, 3]})['centroid'] == [1, 2]
+
+
+def test_vectorized_kernels_match_pure_python():
+    import math
+    from app.utils import geo_metrics
+
+    # Anel com posições 2D e 3D misturadas (aceito pelo caminho puro)
+    ring = [[math.cos(i * math.pi / 50) / 100, math.sin(i * math.pi / 50) / 100] + ([12.0] if i % 2 else [])
+            for i in range(100)]
+    ring.append(ring[0])
+    assert geo_metrics._ring_area_np(ring) == pytest.approx(geo_metrics._ring_area_py(ring), rel=1e-9)
+    assert geo_metrics._line_length_np(ring) == pytest.approx(geo_metrics._line_length_py(ring), rel=1e-9)
+    assert geo_metrics.ring_area(ring) == pytest.approx(abs(geo_metrics._ring_area_py(ring)), rel=1e-9)
+
+
+def test_batch_metrics_match_per_feature_columns():
+    from app.services.feature_metrics import batch_metric_columns, feature_metric_columns
+
+    open_ring = [[10, 10], [10.02, 10], [10.02, 10.03, 5], [10, 10.03]]
+    geometries = [
+        {'type': 'Polygon', 'coordinates': [SQUARE, HOLE]},
+        {'type': 'MultiPolygon', 'coordinates': [[open_ring], [], [SQUARE]]},
+        {'type': 'LineString', 'coordinates': [[0, 0], [0, 0.01], [0.02, 0.01]]},
+        {'type': 'MultiLineString', 'coordinates': [[[5, 5], [5, 5]], []]},
+        {'type': 'Point', 'coordinates': [1, 2]},
+        {'type': 'Polygon', 'coordinates': [[[1], [2], [3]]]},
+        {'type': 'LineString', 'coordinates': [['a', 'b'], [1, 2]]},
+        {'type': 'Polygon', 'coordinates': []},
+        None,
+    ]
+    batch = batch_metric_columns(geometries)
+    assert len(batch) == len(geometries)
+    for geometry, columns in zip(geometries, batch):
+        expected = feature_metric_columns(geometry)
+        assert columns.keys() == expected.keys()
+        for key, value in expected.items():
+            assert columns[key] == pytest.approx(value, abs=0.011), (geometry, key)
+
+
+def test_metrics_recomputed_only_when_geometry_changes(layer, monkeypatch):
+    from app import db
+    from app.models import enhanced_models
+    from app.models.enhanced_models import Feature, GeometryType
+
+    feature = Feature(layer_id=layer.id, feature_type=GeometryType.POLYGON,
+                      geometry={'type': 'Polygon', 'coordinates': [SQUARE]}, created_by=layer.created_by)
+    db.session.add(feature)
+    db.session.commit()
+    assert feature.area_m2 == pytest.approx(1.2364e6, rel=1e-3)
+
+    calls = []
+    original = enhanced_models.feature_metric_columns
+    monkeypatch.setattr(enhanced_models, 'feature_metric_columns',
+                        lambda geometry: calls.append(geometry) or original(geometry))
+
+    feature.name = 'renomeada'
+    db.session.commit()
+    assert calls == []
+
+    feature.geometry = {'type': 'Polygon', 'coordinates': [SQUARE, HOLE]}
+    db.session.commit()
+    assert len(calls) == 1
+    assert feature.area_m2 == pytest.approx(1.2364e6 * 0.75, rel=1e-3)
+
+
+def test_backfill_fills_missing_rows(layer):
+    from sqlalchemy import text
+    from app import db
+    from app.models.enhanced_models import Feature, GeometryType, Layer
+    from app.services.feature_metrics import backfill_feature_metrics
+
+    line = Feature(layer_id=layer.id, feature_type=GeometryType.LINESTRING,
+                   geometry={'type': 'LineString', 'coordinates': [[0, 0], [0, 0.01]]},
+                   created_by=layer.created_by)
+    db.session.add(line)
+    db.session.commit()
+    db.session.execute(text(
+        "UPDATE features SET length_m = NULL, centroid_coordinates = NULL, bbox_min_x = NULL WHERE id = :id"
+    ), {'id': line.id})
+    db.session.commit()
+
+    assert backfill_feature_metrics(db.session.connection(), batch_size=1) == (1, 1)
+    db.session.commit()
+    db.session.expire_all()
+
+    stored = db.session.get(Feature, line.id)
+    assert stored.length_m == pytest.approx(1111.95, rel=1e-3)
+    assert stored.centroid_coordinates == pytest.approx([0, 0.005])
+    assert stored.bbox_min_x == 0 and db.session.get(Layer, layer.id).bbox_dirty
+    assert backfill_feature_metrics(db.session.connection()) == (0, 0)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+WEBAG - Testes do resumo incremental de glebas
+"""
+from sqlalchemy import text
+
+
+def _criar_gleba(db, project, user, numero, **campos):
+    from app.models.enhanced_models import Layer, Feature, Gleba, LayerType, GeometryType
+
+    layer = Layer.query.filter_by(project_id=project.id, name='glebas').first()
+    if not layer:
+        layer = Layer(project_id=project.id, name='glebas', display_name='Glebas',
+                      layer_type=LayerType.VECTOR, created_by=user.id)
+        db.session.add(layer)
+        db.session.flush()
+
+    feature = Feature(layer_id=layer.id, feature_type=GeometryType.POLYGON,
+                      geometry={'type': 'Polygon', 'coordinates': []}, created_by=user.id)
+    db.session.add(feature)
+    db.session.flush()
+
+    gleba = Gleba(project_id=project.id, feature_id=feature.id, numero_gleba=numero,
+                  created_by=user.id, **campos)
+    db.session.add(gleba)
+    db.session.commit()
+    return gleba
+
+
+def _resumo_por_full_scan(db, project_id, coluna):
+    rows = db.session.execute(text(f"""
+        SELECT COALESCE({coluna}, '') AS chave, COUNT(*) AS total, SUM(COALESCE(area_total_m2, 0)) AS area,
+               SUM(COALESCE(valor_venal, 0)) AS venal, SUM(COALESCE(valor_iptu, 0)) AS iptu
+        FROM glebas WHERE project_id = :project GROUP BY COALESCE({coluna}, '')
+    """), {'project': project_id}).mappings()
+    return {row['chave'] or None: (row['total'], round(row['area'], 2), round(row['venal'], 2),
+                                   round(row['iptu'], 2)) for row in rows}
+
+
+def _resumo_incremental(db, project_id, group_by):
+    from app.services.gleba_summary import get_gleba_summary
+
+    summary = get_gleba_summary(db.session.connection(), project_id, group_by)
+    return {g[group_by]: (g['total_glebas'], g['area_total_m2'], g['valor_venal_total'],
+                          g['valor_iptu_total']) for g in summary['groups']}, summary['totals']
+
+
+def test_resumo_acompanha_create_update_delete(enhanced_app):
+    """Resumo incremental deve coincidir com um GROUP BY completo"""
+    from app import db
+    from app.models.enhanced_models import Project, User
+
+    project = Project.query.first()
+    user = User.query.first()
+
+    g1 = _criar_gleba(db, project, user, 'G1', endereco_bairro='Centro', endereco_quadra='Q1',
+                      zoneamento='ZR1', area_total_m2=100.0, valor_venal=1000.0, valor_iptu=10.0)
+    _criar_gleba(db, project, user, 'G2', endereco_bairro='Centro', endereco_quadra='Q2',
+                 zoneamento='ZC', area_total_m2=250.5, valor_venal=2500.0, valor_iptu=25.0)
+    g3 = _criar_gleba(db, project, user, 'G3', endereco_bairro='Jardim', area_total_m2=80.0)
+
+    # Mudança de bairro e de valores
+    g1.endereco_bairro = 'Jardim'
+    g1.valor_venal = 1500.0
+    db.session.commit()
+
+    # Atualização de instância expirada (valores antigos carregados sob demanda)
+    db.session.expire(g3)
+    g3.area_total_m2 = 90.0
+    db.session.commit()
+
+    for dimensao, coluna in (('bairro', 'endereco_bairro'), ('quadra', 'endereco_quadra'),
+                             ('zoneamento', 'zoneamento')):
+        incremental, _ = _resumo_incremental(db, project.id, dimensao)
+        assert incremental == _resumo_por_full_scan(db, project.id, coluna)
+
+    db.session.delete(g3)
+    db.session.commit()
+
+    incremental, totals = _resumo_incremental(db, project.id, 'bairro')
+    assert incremental == _resumo_por_full_scan(db, project.id, 'endereco_bairro')
+    assert totals['total_glebas'] == 2
+    assert totals['area_total_m2'] == 350.5
+    assert totals['valor_venal_total'] == 4000.0
+
+
+def test_rebuild_repara_divergencias(enhanced_app):
+    """Rebuild deve recalcular o resumo a partir da tabela de glebas"""
+    from app import db
+    from app.models.enhanced_models import Project, User, gleba_summary_tracker
+
+    project = Project.query.first()
+    user = User.query.first()
+    _criar_gleba(db, project, user, 'G1', endereco_bairro='Centro', area_total_m2=10.0)
+
+    db.session.execute(text("UPDATE gleba_summaries SET gleba_count = 99"))
+    gleba_summary_tracker.rebuild(db.session.connection(), 'glebas', project.id)
+
+    incremental, totals = _resumo_incremental(db, project.id, 'bairro')
+    assert incremental == {'Centro': (1, 10.0, 0.0, 0.0)}
+    assert totals['total_glebas'] == 1
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos jobs de importação KML/KMZ em segundo plano
+"""
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def _kml(count, extra=b''):
+    placemarks = b''.join(
+        b'<Placemark><name>p%d</name><Point><coordinates>%d,1</coordinates></Point></Placemark>' % (i, i)
+        for i in range(count)
+    )
+    return b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>' + placemarks + extra + b'</Document></kml>'
+
+
+@pytest.fixture
+def layer(enhanced_app, tmp_path):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    enhanced_app.config['IMPORT_FOLDER'] = str(tmp_path / 'imports')
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='importada', display_name='Importada',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _queue(**kwargs):
+    from app import db
+    from app.models.enhanced_models import Feature, GeometryType, ImportJob
+    from app.services.import_jobs import ImportJobQueue
+
+    return ImportJobQueue(db.engine, ImportJob.__table__, Feature.__table__, GeometryType, **kwargs)
+
+
+def test_upload_returns_job_and_loads_features(api_client, layer):
+    from app import db
+    from app.models.enhanced_models import Feature, Layer
+
+    mixed = (b'<Placemark><name>misto</name><MultiGeometry><Point><coordinates>1,1</coordinates></Point>'
+             b'<LineString><coordinates>0,0 1,1</coordinates></LineString></MultiGeometry></Placemark>')
+    response = api_client.post(f'/api/v2/layers/{layer.id}/imports',
+                               data={'file': (io.BytesIO(_kml(5, mixed)), 'lotes.kml')},
+                               content_type='multipart/form-data')
+    assert response.status_code == 202
+    payload = response.get_json()
+    assert payload['status_url'] == f"/api/v2/jobs/{payload['job_id']}"
+
+    job = api_client.get(payload['status_url']).get_json()['job']
+    assert job['status'] == 'completed' and job['progress'] == 100.0
+    assert (job['features_total'], job['features_inserted'], job['features_skipped']) == (6, 5, 1)
+    assert job['errors'][0]['feature'] == 5 and 'GeometryCollection' in job['errors'][0]['error']
+
+    db.session.expire_all()
+    assert Feature.query.filter_by(layer_id=layer.id).count() == 5
+    assert db.session.get(Layer, layer.id).feature_count == 5
+    # Arquivo removido após a importação
+    assert os.listdir(api_client.application.config['IMPORT_FOLDER']) == []
+
+
+def test_invalid_upload_and_unknown_job(api_client, layer):
+    response = api_client.post(f'/api/v2/layers/{layer.id}/imports',
+                               data={'file': (io.BytesIO(b'x'), 'dados.csv')},
+                               content_type='multipart/form-data')
+    assert response.status_code == 400
+
+    response = api_client.post(f'/api/v2/layers/{layer.id}/imports',
+                               data={'file': (io.BytesIO(b'<kml><Placemark>'), 'quebrado.kml')},
+                               content_type='multipart/form-data')
+    job = api_client.get(response.get_json()['status_url']).get_json()['job']
+    assert job['status'] == 'failed' and job['message'] == 'Arquivo XML malformado'
+    assert job['features_inserted'] == 0
+
+    assert api_client.get('/api/v2/jobs/naoexiste').status_code == 404
+
+
+def test_stale_job_resumes_from_checkpoint(layer, tmp_path):
+    from app import db
+    from app.models.enhanced_models import Feature, ImportJob
+
+    path = tmp_path / 'grande.kml'
+    path.write_bytes(_kml(25))
+    queue = _queue(batch_size=10, stale_seconds=60)
+    job_id = queue.create(layer.id, layer.created_by, 'grande.kml', str(path))
+
+    # Worker "morre" depois de confirmar o primeiro lote
+    job = queue.claim('worker-morto')
+    job['features_total'] = 25
+    queue._update(job_id, 'worker-morto', features_total=25)
+    original = queue._checkpoint
+
+    def checkpoint_then_die(*args):
+        original(*args)
+        raise SystemExit
+
+    queue._checkpoint = checkpoint_then_die
+    with pytest.raises(SystemExit):
+        queue._load(job, 'worker-morto')
+    queue._checkpoint = original
+    assert queue.get(job_id)['features_read'] == 10
+
+    # Ainda com heartbeat recente: não volta para a fila
+    assert queue.requeue_stale() == 0
+    db.session.query(ImportJob).filter_by(id=job_id).update(
+        {'heartbeat_at': datetime.utcnow() - timedelta(minutes=5)})
+    db.session.commit()
+
+    assert queue.run_pending() == 1
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts'], job['features_inserted']) == ('completed', 2, 25)
+    assert Feature.query.filter_by(layer_id=layer.id).count() == 25
+    names = sorted(int(f.properties['name'][1:]) for f in Feature.query.filter_by(layer_id=layer.id))
+    assert names == list(range(25))
+
+
+def test_lost_lease_rolls_back_batch(layer, tmp_path):
+    from app.models.enhanced_models import Feature
+    from app.services.import_jobs import LeaseLost
+
+    path = tmp_path / 'a.kml'
+    path.write_bytes(_kml(3))
+    queue = _queue()
+    job_id = queue.create(layer.id, layer.created_by, 'a.kml', str(path))
+    job = queue.claim('primeiro')
+    job['features_total'] = 3
+
+    with pytest.raises(LeaseLost):
+        queue._load(job, 'outro')
+    assert Feature.query.filter_by(layer_id=layer.id).count() == 0
+    assert queue.get(job_id)['worker'] == 'primeiro'
+
+
+def test_background_workers_process_queue(tmp_path):
+    import time
+    from sqlalchemy import create_engine
+    from app import db
+    from app.models.enhanced_models import Feature, GeometryType, ImportJob
+    from app.services.import_jobs import ImportJobQueue
+
+    # Banco em arquivo: cada thread com a sua conexão, como em produção
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    db.metadata.create_all(engine)
+    queue = ImportJobQueue(engine, ImportJob.__table__, Feature.__table__, GeometryType,
+                           workers=2, poll_interval=0.05)
+    job_ids = []
+    for index in range(3):
+        path = tmp_path / f'{index}.kml'
+        path.write_bytes(_kml(4))
+        job_ids.append(queue.create('camada', 'autor', path.name, str(path)))
+
+    queue.start()
+    try:
+        deadline = time.time() + 10
+        while time.time() < deadline and any(queue.get(j)['status'] != 'completed' for j in job_ids):
+            time.sleep(0.05)
+    finally:
+        queue.stop()
+
+    jobs = [queue.get(j) for j in job_ids]
+    assert [(job['status'], job['features_inserted']) for job in jobs] == [('completed', 4)] * 3
+    with engine.connect() as connection:
+        assert len(connection.execute(Feature.__table__.select()).fetchall()) == 12
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do leitor de KML em streaming
+"""
+import io
+
+import pytest
+
+
+KML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">
+<Document>
+  <name>Fazenda</name>
+  <Schema name="talhoes" id="talhoes">
+    <SimpleField name="area_ha" type="double"/>
+    <SimpleField name="safra" type="int"/>
+    <SimpleField name="irrigado" type="bool"/>
+  </Schema>
+  <Folder>
+    <name>Talhoes</name>
+    <Placemark id="t1">
+      <name>Talhao 1</name>
+      <description>Soja</description>
+      <ExtendedData>
+        <Data name="cultura"><value>soja</value></Data>
+        <SchemaData schemaUrl="#talhoes">
+          <SimpleData name="area_ha">12.5</SimpleData>
+          <SimpleData name="safra">2024</SimpleData>
+          <SimpleData name="irrigado">true</SimpleData>
+        </SchemaData>
+      </ExtendedData>
+      <Polygon>
+        <outerBoundaryIs><LinearRing><coordinates>
+          0,0,10 4,0,10 4,4,10 0,4,10
+        </coordinates></LinearRing></outerBoundaryIs>
+        <innerBoundaryIs><LinearRing><coordinates>1,1 2,1 2,2 1,1</coordinates></LinearRing></innerBoundaryIs>
+      </Polygon>
+    </Placemark>
+  </Folder>
+  <Placemark><name>Sede</name><Point><coordinates>-47.1, -22.5, 600</coordinates></Point></Placemark>
+  <Placemark><name>Estrada</name><LineString><coordinates>0,0 1,1 x,y 2,2</coordinates></LineString></Placemark>
+  <Placemark><name>Sem geometria</name></Placemark>
+  <Placemark>
+    <name>Pocos</name>
+    <MultiGeometry><Point><coordinates>1,1</coordinates></Point><Point><coordinates>2,2</coordinates></Point></MultiGeometry>
+  </Placemark>
+  <Placemark>
+    <name>Misto</name>
+    <MultiGeometry>
+      <Point><coordinates>1,1</coordinates></Point>
+      <LineString><coordinates>0,0 1,0</coordinates></LineString>
+    </MultiGeometry>
+  </Placemark>
+  <Placemark>
+    <name>Trajeto</name>
+    <gx:Track><gx:coord>1 2 3</gx:coord><gx:coord>4 5 6</gx:coord></gx:Track>
+  </Placemark>
+</Document>
+</kml>"""
+
+
+def _features(**options):
+    from app.utils.kml_reader import iter_kml_features
+    return {f['properties']['name']: f for f in iter_kml_features(io.BytesIO(KML), **options)}
+
+
+def test_geometries():
+    features = _features()
+
+    polygon = features['Talhao 1']['geometry']
+    assert polygon['type'] == 'Polygon'
+    assert polygon['coordinates'][0] == [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]]
+    assert polygon['coordinates'][1] == [[1, 1], [2, 1], [2, 2], [1, 1]]
+
+    assert features['Sede']['geometry'] == {'type': 'Point', 'coordinates': [-47.1, -22.5]}
+    # Tokens inválidos são ignorados
+    assert features['Estrada']['geometry']['coordinates'] == [[0, 0], [1, 1], [2, 2]]
+    assert features['Pocos']['geometry'] == {'type': 'MultiPoint', 'coordinates': [[1, 1], [2, 2]]}
+    assert features['Misto']['geometry']['type'] == 'GeometryCollection'
+    assert [g['type'] for g in features['Misto']['geometry']['geometries']] == ['Point', 'LineString']
+    assert features['Trajeto']['geometry'] == {'type': 'LineString', 'coordinates': [[1, 2], [4, 5]]}
+
+
+def test_altitude_kept_on_request():
+    features = _features(keep_altitude=True)
+    assert features['Sede']['geometry']['coordinates'] == [-47.1, -22.5, 600]
+    assert features['Talhao 1']['geometry']['coordinates'][0][0] == [0, 0, 10]
+
+
+def test_properties_and_schema_types():
+    feature = _features(include_folder=True)['Talhao 1']
+
+    assert feature['id'] == 't1'
+    assert feature['properties'] == {
+        'name': 'Talhao 1', 'description': 'Soja', 'cultura': 'soja',
+        'area_ha': 12.5, 'safra': 2024, 'irrigado': True, 'folder': 'Fazenda/Talhoes'
+    }
+    assert 'folder' not in _features()['Talhao 1']['properties']
+
+
+def test_stats_and_empty_placemarks():
+    from app.utils.kml_reader import KMLReader
+
+    reader = KMLReader(io.BytesIO(KML))
+    assert len(list(reader)) == 6
+    assert reader.stats == {'placemarks': 7, 'features': 6, 'skipped': 1}
+
+    kept = list(KMLReader(io.BytesIO(KML), skip_empty=False))
+    assert [f['geometry'] for f in kept if f['properties']['name'] == 'Sem geometria'] == [None]
+
+
+def test_processed_elements_are_released():
+    from app.utils import kml_reader
+
+    placemark = b'<Placemark><name>p</name><Point><coordinates>1,2</coordinates></Point></Placemark>'
+    source = io.BytesIO(b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>' +
+                        placemark * 500 + b'</Document></kml>')
+    roots = []
+    original = kml_reader.iterparse
+
+    def spy(*args, **kwargs):
+        for event, element in original(*args, **kwargs):
+            if not roots:
+                roots.append(element)
+            yield event, element
+
+    kml_reader.iterparse = spy
+    try:
+        count = sum(1 for _ in kml_reader.iter_kml_features(source))
+    finally:
+        kml_reader.iterparse = original
+
+    assert count == 500
+    # Nenhum Placemark permanece pendurado na árvore
+    assert len(roots[0]) == 0
+
+
+def test_check_kml():
+    from app.utils.kml_reader import check_kml
+
+    assert check_kml(io.BytesIO(KML)) == (True, 'ok', 6)
+    assert check_kml(io.BytesIO(b'<kml><Placemark>'))[0] is False
+    assert check_kml(io.BytesIO(b'<svg xmlns="http://www.w3.org/2000/svg"/>')) == \
+        (False, 'Arquivo não é um documento KML válido', 0)
+    assert check_kml(io.BytesIO(b'<kml xmlns="http://example.com/kml"/>'))[0] is False
+
+
+def test_validate_kml_file_checks_on_disk_before_decoding(tmp_path, monkeypatch):
+    from app.utils import utils
+
+    path = tmp_path / 'upload.kml'
+    path.write_bytes(b'<kml xmlns="http://www.opengis.net/kml/2.2">\r\n<Placemark><name>a</name>'
+                     b'<description><![CDATA[<script>alert(1)</script>ok]]></description>'
+                     b'<Point><coordinates>1,2</coordinates></Point></Placemark></kml>')
+    assert utils.validate_kml_file(str(path)) == (True, 'ok')
+    # Sanitizado no lugar, sem alterar as quebras de linha
+    assert path.read_bytes().startswith(b'<kml xmlns="http://www.opengis.net/kml/2.2">\r\n')
+    assert b'<script>' not in path.read_bytes() and b'ok]]>' in path.read_bytes()
+
+    path.write_bytes(b'<kml><Placemark>')
+    assert utils.validate_kml_file(str(path)) == (False, 'Arquivo XML malformado')
+
+    # Acima do limite: recusado pelo tamanho em disco, sem ler o conteúdo
+    monkeypatch.setattr(utils, 'MAX_KML_BYTES', 10)
+    monkeypatch.setattr(utils, 'check_kml', lambda *args: pytest.fail('arquivo lido'))
+    assert utils.validate_kml_file(str(path)) == (False, 'Arquivo muito grande')
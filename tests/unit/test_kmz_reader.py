@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da leitura de KMZ e do armazenamento de assets por conteúdo
+"""
+import io
+import os
+import zipfile
+
+import pytest
+
+
+ICON = b'\x89PNG\r\n\x1a\n' + b'icone' * 50
+PHOTO = b'\xff\xd8\xff' + b'foto' * 50
+
+DOC = b"""<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+  <Style id="sede"><IconStyle><Icon><href>files/icon.png</href></Icon></IconStyle></Style>
+  <StyleMap id="sede-map">
+    <Pair><key>normal</key><styleUrl>#sede</styleUrl></Pair>
+    <Pair><key>highlight</key><styleUrl>#outro</styleUrl></Pair>
+  </StyleMap>
+  <Placemark>
+    <name>Sede</name>
+    <description><![CDATA[<img src="files/foto.jpg">]]></description>
+    <styleUrl>#sede-map</styleUrl>
+    <Point><coordinates>-47.1,-22.5</coordinates></Point>
+  </Placemark>
+  <Placemark>
+    <name>Remoto</name>
+    <Style><IconStyle><Icon><href>http://maps.example.com/pin.png</href></Icon></IconStyle></Style>
+    <Point><coordinates>1,2</coordinates></Point>
+  </Placemark>
+  <GroundOverlay>
+    <name>Imagem</name>
+    <Icon><href>files/foto.jpg</href></Icon>
+    <LatLonBox><north>2</north><south>1</south><east>4</east><west>3</west></LatLonBox>
+  </GroundOverlay>
+</Document>
+</kml>"""
+
+
+def _kmz(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def test_features_streamed_from_doc_kml():
+    from app.utils.kmz_reader import iter_features
+
+    features = {f['properties']['name']: f for f in iter_features(_kmz({
+        'files/icon.png': ICON, 'doc.kml': DOC, 'extra.kml': b'<kml/>'
+    }))}
+
+    assert features['Sede']['geometry'] == {'type': 'Point', 'coordinates': [-47.1, -22.5]}
+    assert features['Sede']['properties']['icon'] == 'files/icon.png'
+    assert features['Remoto']['properties']['icon'] == 'http://maps.example.com/pin.png'
+    assert features['Imagem']['geometry']['coordinates'] == [[[3, 1], [4, 1], [4, 2], [3, 2], [3, 1]]]
+    assert features['Imagem']['properties']['overlay'] == 'files/foto.jpg'
+
+
+def test_plain_kml_also_accepted():
+    from app.utils.kmz_reader import iter_features
+
+    assert [f['properties']['name'] for f in iter_features(io.BytesIO(DOC))] == ['Sede', 'Remoto', 'Imagem']
+
+
+def test_first_root_kml_used_without_doc_kml():
+    from app.utils.kmz_reader import find_kml_member
+
+    with zipfile.ZipFile(_kmz({'sub/a.kml': b'', 'mapa.kml': b'', 'b.kml': b''})) as archive:
+        assert find_kml_member(archive) == 'mapa.kml'
+
+
+def test_assets_stored_by_content(tmp_path):
+    from app.utils.kmz_reader import iter_kmz_features, save_kmz_assets
+
+    asset_dir = str(tmp_path / 'assets')
+    source = _kmz({'doc.kml': DOC, 'files/icon.png': ICON, 'files/foto.jpg': PHOTO, 'files/copia.png': ICON})
+    features = {f['properties']['name']: f for f in iter_kmz_features(
+        source, asset_dir=asset_dir, asset_url=lambda relative: '/assets/' + relative)}
+
+    stored = sorted(os.path.relpath(os.path.join(root, name), asset_dir)
+                    for root, _, names in os.walk(asset_dir) for name in names)
+    # Mesmo conteúdo (icon.png e copia.png) gravado uma vez só
+    assert len(stored) == 2
+    assert not any(name.endswith('.part') for name in stored)
+
+    icon_url = features['Sede']['properties']['icon']
+    assert icon_url.startswith('/assets/') and icon_url.endswith('.png')
+    with open(os.path.join(asset_dir, icon_url[len('/assets/'):]), 'rb') as stored_icon:
+        assert stored_icon.read() == ICON
+    assert features['Sede']['properties']['description'] == \
+        '<img src="%s">' % features['Imagem']['properties']['overlay']
+
+    source.seek(0)
+    assert save_kmz_assets(source, asset_dir)['files/copia.png'] == icon_url[len('/assets/'):]
+
+
+def test_check_kmz_rejects_bad_archives():
+    from app.utils.kmz_reader import check_kmz
+
+    assert check_kmz(_kmz({'doc.kml': DOC})) == (True, 'ok', 3)
+    assert check_kmz(io.BytesIO(b'PK\x03\x04 nada')) == (False, 'Arquivo KMZ corrompido', 0)
+    assert check_kmz(_kmz({'files/icon.png': ICON})) == (False, 'KMZ não contém arquivo KML', 0)
+    assert check_kmz(_kmz({'doc.kml': b'<kml><Placemark>'}))[0] is False
+    # Zip bomb: alta taxa de compressão
+    valid, message, _ = check_kmz(_kmz({'doc.kml': b'<kml>' + b' ' * (4 * 1024 * 1024) + b'</kml>'}))
+    assert not valid and 'compressão' in message
+    assert check_kmz(_kmz({'doc.kml': DOC}), max_bytes=100)[0] is False
+
+
+def test_limits_enforced_when_iterating():
+    from app.utils.kmz_reader import KMZError, iter_kmz_features
+
+    with pytest.raises(KMZError):
+        list(iter_kmz_features(_kmz({'doc.kml': DOC}), max_bytes=100))
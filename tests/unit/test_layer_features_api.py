@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das rotas de features de camadas (API v2)
+"""
+import pytest
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    project = Project.query.first()
+    layer = Layer(project_id=project.id, name='lotes', display_name='Lotes',
+                  layer_type=LayerType.VECTOR, created_by=project.owner_id)
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _point(x, y, **properties):
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [x, y]}, 'properties': properties}
+
+
+def _create(api_client, layer, features):
+    return api_client.post(f'/api/v2/layers/{layer.id}/features',
+                           json={'type': 'FeatureCollection', 'features': features})
+
+
+def test_batch_create_updates_layer_counters(api_client, layer):
+    response = _create(api_client, layer, [_point(i, i, bairro='Centro' if i % 2 else 'Norte') for i in range(5)])
+    assert response.status_code == 201
+    payload = response.get_json()
+    assert len(payload['ids']) == 5
+    assert payload['layer']['feature_count'] == 5
+    assert payload['layer']['bbox_coordinates'] == [0, 0, 4, 4]
+
+    invalid = _create(api_client, layer, [_point(0, 0), {'type': 'Feature', 'geometry': {'type': 'Circle'}}])
+    assert invalid.status_code == 400 and 'Feature 1' in invalid.get_json()['error']
+
+
+def test_list_filters_and_pages(api_client, layer):
+    _create(api_client, layer, [_point(i, i, bairro='Centro' if i % 2 else 'Norte') for i in range(6)])
+
+    in_box = api_client.get(f'/api/v2/layers/{layer.id}/features?bbox=0.5,0.5,3.5,3.5').get_json()
+    assert sorted(f['geometry']['coordinates'][0] for f in in_box['features']) == [1, 2, 3]
+
+    centro = api_client.get(f'/api/v2/layers/{layer.id}/features?prop.bairro=Centro').get_json()
+    assert centro['count'] == 3
+
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        page = api_client.get(f'/api/v2/layers/{layer.id}/features?limit=4&cursor={cursor}').get_json()
+        seen.extend(f['id'] for f in page['features'])
+        cursor = page['next_cursor']
+    assert len(seen) == 6 and seen == sorted(seen)
+
+    assert api_client.get(f'/api/v2/layers/{layer.id}/features?bbox=1,2').status_code == 400
+
+
+def test_stream_error_closes_document_and_logs(api_client, layer, monkeypatch, caplog):
+    from app.models.enhanced_models import Feature
+
+    _create(api_client, layer, [_point(i, i) for i in range(5)])
+    original, calls = Feature.to_geojson, []
+
+    def failing(self, *args, **kwargs):
+        calls.append(self.id)
+        if len(calls) == 3:
+            raise RuntimeError('geometria corrompida')
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(Feature, 'to_geojson', failing)
+    response = api_client.get(f'/api/v2/layers/{layer.id}/features')
+    assert response.status_code == 200
+
+    # Documento válido, marcado com erro e retomável da última feature enviada
+    page = response.get_json()
+    assert page['error'] and page['count'] == 2
+    assert page['next_cursor'] == page['features'][-1]['id'] == calls[1]
+    assert 'geometria corrompida' in caplog.text
+
+
+def test_query_error_before_stream_is_500(api_client, layer, monkeypatch):
+    from sqlalchemy.orm import Query
+
+    def broken(self, *args, **kwargs):
+        raise RuntimeError('conexão perdida')
+
+    monkeypatch.setattr(Query, '__iter__', broken)
+    response = api_client.get(f'/api/v2/layers/{layer.id}/features')
+    assert response.status_code == 500 and response.get_json()['error']
+
+
+def test_update_and_delete_keep_extent_consistent(api_client, layer):
+    ids = _create(api_client, layer, [_point(0, 0), _point(10, 10), _point(5, 5)]).get_json()['ids']
+
+    moved = api_client.put(f'/api/v2/layers/{layer.id}/features/{ids[2]}',
+                           json={'geometry': {'type': 'Point', 'coordinates': [20, 1]}}).get_json()
+    assert moved['feature']['properties']['id'] == ids[2]
+    assert moved['layer']['bbox_coordinates'] == [0, 0, 20, 10]
+
+    removed = api_client.delete(f'/api/v2/layers/{layer.id}/features', json={'ids': ids[:2]}).get_json()
+    assert removed['layer'] == {'id': layer.id, 'feature_count': 1, 'bbox_coordinates': [20, 1, 20, 1]}
+
+    listed = api_client.get(f'/api/v2/layers/{layer.id}/features').get_json()
+    assert [f['id'] for f in listed['features']] == [ids[2]]
+    deleted = api_client.get(f'/api/v2/layers/{layer.id}/features?status=deleted').get_json()
+    assert deleted['count'] == 2
+
+    assert api_client.delete(f'/api/v2/layers/{layer.id}/features/{ids[2]}?soft=false').status_code == 200
+    assert api_client.get(f'/api/v2/layers/{layer.id}/features/{ids[2]}').status_code == 404
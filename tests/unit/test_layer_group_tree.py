@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da montagem da árvore de grupos de camadas
+Número de consultas constante, independente da profundidade/largura
+"""
+
+
+def _build_groups(db, project, depth, width):
+    """Criar uma árvore de grupos com uma camada por grupo"""
+    from app.models.enhanced_models import LayerGroup, Layer, LayerType
+
+    created = []
+    parents = [None]
+    for level in range(depth):
+        next_parents = []
+        for parent in parents:
+            for index in range(width):
+                group = LayerGroup(
+                    project_id=project.id,
+                    parent_group_id=parent.id if parent else None,
+                    name=f'Grupo {level}.{index}',
+                    display_order=index
+                )
+                db.session.add(group)
+                db.session.flush()
+                db.session.add(Layer(
+                    project_id=project.id,
+                    layer_group_id=group.id,
+                    name=f'camada_{group.id}',
+                    display_name=f'Camada {group.name}',
+                    layer_type=LayerType.VECTOR,
+                    created_by=project.owner_id
+                ))
+                next_parents.append(group)
+                created.append(group)
+        parents = next_parents
+    db.session.commit()
+    return created
+
+
+def _count_nodes(nodes):
+    return sum(1 + _count_nodes(node['children']) for node in nodes)
+
+
+def test_layer_groups_endpoint_uses_constant_queries(api_client, count_queries):
+    from app import db
+    from app.models.enhanced_models import Project
+    from app.services.access import access_cache
+
+    project = Project.query.first()
+    url = f'/api/v2/projects/{project.id}/layer-groups'
+
+    _build_groups(db, project, depth=2, width=2)
+    db.session.expire_all()
+    access_cache.clear()
+    with count_queries(db.engine) as small:
+        response = api_client.get(url)
+    assert response.status_code == 200
+    assert _count_nodes(response.get_json()['layer_groups']) == 6
+
+    _build_groups(db, project, depth=4, width=2)
+    db.session.expire_all()
+    access_cache.clear()
+    with count_queries(db.engine) as large:
+        response = api_client.get(url)
+    assert response.status_code == 200
+
+    payload = response.get_json()['layer_groups']
+    assert _count_nodes(payload) == 6 + 30
+    assert all(len(node['layers']) == 1 for node in payload)
+    assert len(large) == len(small)
+
+
+def test_get_all_children_matches_recursive_walk(enhanced_app, count_queries):
+    from app import db
+    from app.models.enhanced_models import Project, LayerGroup
+
+    project = Project.query.first()
+    groups = _build_groups(db, project, depth=3, width=2)
+    root = groups[0]
+
+    def walk(group):
+        result = []
+        for child in sorted(group.children, key=lambda g: g.display_order):
+            result.append(child)
+            result.extend(walk(child))
+        return result
+
+    expected = [g.id for g in walk(root)]
+    db.session.expire_all()
+    root = db.session.get(LayerGroup, root.id)
+
+    with count_queries(db.engine) as statements:
+        children = root.get_all_children()
+
+    assert [g.id for g in children] == expected
+    assert len(statements) == 1
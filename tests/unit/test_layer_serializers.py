@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das políticas de carregamento dos endpoints de listagem
+Número de consultas constante, independente da quantidade de linhas
+"""
+
+
+def _add_user(db, project, index):
+    from app.models.enhanced_models import User
+
+    user = User(
+        organization_id=project.organization_id,
+        username=f'usuario_{index}',
+        email=f'usuario_{index}@webag.local',
+        first_name='Usuário',
+        last_name=str(index)
+    )
+    user.set_password('senha-teste')
+    db.session.add(user)
+    return user
+
+
+def _add_layers(db, project, count, offset=0):
+    """Criar camadas com grupo e criador distintos para cada uma"""
+    from app.models.enhanced_models import LayerGroup, Layer, LayerType
+
+    layers = []
+    for index in range(offset, offset + count):
+        user = _add_user(db, project, index)
+        group = LayerGroup(project_id=project.id, name=f'Grupo {index}')
+        db.session.add(group)
+        db.session.flush()
+
+        layer = Layer(
+            project_id=project.id,
+            layer_group_id=group.id,
+            name=f'camada_{index}',
+            display_name=f'Camada {index}',
+            layer_type=LayerType.VECTOR,
+            created_by=user.id
+        )
+        db.session.add(layer)
+        layers.append(layer)
+    db.session.commit()
+    return layers
+
+
+def _add_versions(db, project, layer, count, offset=0):
+    """Criar versões da camada, cada uma com um criador distinto"""
+    from app.models.enhanced_models import LayerVersion
+
+    for index in range(offset, offset + count):
+        user = _add_user(db, project, f'v{index}')
+        db.session.flush()
+        db.session.add(LayerVersion(
+            layer_id=layer.id,
+            version_number=index + 1,
+            layer_config={},
+            created_by=user.id
+        ))
+    db.session.commit()
+
+
+def _measure(api_client, db, count_queries, url):
+    from app.services.access import access_cache
+
+    db.session.expire_all()
+    access_cache.clear()
+    with count_queries(db.engine) as statements:
+        response = api_client.get(url)
+    assert response.status_code == 200
+    return response.get_json(), len(statements)
+
+
+def test_layer_list_runs_constant_queries(api_client, count_queries):
+    from app import db
+    from app.models.enhanced_models import Project
+
+    project = Project.query.first()
+    url = f'/api/v2/projects/{project.id}/layers'
+
+    _add_layers(db, project, 2)
+    small, small_count = _measure(api_client, db, count_queries, url)
+
+    _add_layers(db, project, 8, offset=2)
+    large, large_count = _measure(api_client, db, count_queries, url)
+
+    assert small['total'] == 2 and large['total'] == 10
+    assert large_count == small_count
+    first = next(layer for layer in large['layers'] if layer['name'] == 'camada_3')
+    assert first['group_name'] == 'Grupo 3'
+    assert first['creator_name'] == 'Usuário 3'
+
+
+def test_layer_versions_runs_constant_queries(api_client, count_queries):
+    from app import db
+    from app.models.enhanced_models import Project
+
+    project = Project.query.first()
+    layer = _add_layers(db, project, 1)[0]
+    url = f'/api/v2/layers/{layer.id}/versions'
+
+    _add_versions(db, project, layer, 2)
+    small, small_count = _measure(api_client, db, count_queries, url)
+
+    _add_versions(db, project, layer, 6, offset=2)
+    large, large_count = _measure(api_client, db, count_queries, url)
+
+    assert small['total'] == 2 and large['total'] == 8
+    assert large_count == small_count
+    assert {v['creator_name'] for v in large['versions']} == {f'Usuário v{i}' for i in range(8)}
+
+
+def test_layer_detail_includes_group_and_creator(api_client):
+    from app import db
+    from app.models.enhanced_models import Project
+
+    project = Project.query.first()
+    layer = _add_layers(db, project, 1)[0]
+    layer.is_public = True
+    db.session.commit()
+
+    payload = api_client.get(f'/api/v2/layers/{layer.id}').get_json()['layer']
+    assert payload['group']['name'] == 'Grupo 0'
+    assert payload['creator'] == {'id': layer.created_by, 'name': 'Usuário 0', 'username': 'usuario_0'}
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das estatísticas de camada (agregação única + cache por data_version)
+"""
+import pytest
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+    from app.services.layer_statistics import statistics_cache
+
+    statistics_cache.clear()
+    project = Project.query.first()
+    layer = Layer(
+        project_id=project.id,
+        name='estatisticas',
+        display_name='Estatísticas',
+        layer_type=LayerType.VECTOR,
+        created_by=project.owner_id,
+        is_public=True
+    )
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _add_feature(db, layer, feature_type, **kwargs):
+    from app.models.enhanced_models import Feature
+
+    feature = Feature(
+        layer_id=layer.id,
+        feature_type=feature_type,
+        geometry={'type': 'Point', 'coordinates': [0, 0]},
+        created_by=layer.created_by,
+        **kwargs
+    )
+    db.session.add(feature)
+    db.session.commit()
+    return feature
+
+
+def test_statistics_match_per_type_counts(api_client, layer):
+    from app import db
+    from app.models.enhanced_models import GeometryType, StatusType
+
+    _add_feature(db, layer, GeometryType.POINT)
+    _add_feature(db, layer, GeometryType.POINT)
+    _add_feature(db, layer, GeometryType.POLYGON, status=StatusType.DELETED)
+    _add_feature(db, layer, GeometryType.POLYGON, is_current=False)
+
+    stats = api_client.get(f'/api/v2/layers/{layer.id}/statistics').get_json()['statistics']
+    assert stats['total_features'] == 4
+    assert stats['active_features'] == 2
+    assert stats['deleted_features'] == 2
+    assert stats['geometry_types'] == {'Point': 2, 'Polygon': 1}
+    assert sum(day['count'] for day in stats['creation_timeline']) == 4
+    assert stats['version_count'] == 0
+
+
+def test_statistics_cached_until_layer_changes(api_client, layer, count_queries):
+    from app import db
+    from app.models.enhanced_models import GeometryType
+
+    url = f'/api/v2/layers/{layer.id}/statistics'
+    feature = _add_feature(db, layer, GeometryType.POINT)
+
+    def fetch():
+        with count_queries(db.engine) as statements:
+            stats = api_client.get(url).get_json()['statistics']
+        aggregated = any('GROUP BY' in statement for statement in statements)
+        return stats, aggregated
+
+    stats, aggregated = fetch()
+    assert aggregated and stats['active_features'] == 1
+
+    stats, aggregated = fetch()
+    assert not aggregated and stats['active_features'] == 1
+
+    _add_feature(db, layer, GeometryType.POINT)
+    stats, aggregated = fetch()
+    assert aggregated and stats['active_features'] == 2
+
+    feature.feature_type = GeometryType.LINESTRING
+    db.session.commit()
+    stats, aggregated = fetch()
+    assert aggregated and stats['geometry_types'] == {'Point': 1, 'LineString': 1}
+
+    db.session.add(layer.create_version('v1', 'Primeira versão', layer.creator))
+    db.session.commit()
+    stats, aggregated = fetch()
+    assert aggregated and stats['version_count'] == 1
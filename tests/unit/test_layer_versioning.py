@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do versionamento incremental (delta) de camadas
+"""
+import pytest
+
+
+@pytest.fixture
+def layer(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+
+    project = Project.query.first()
+    layer = Layer(
+        project_id=project.id,
+        name='versionada',
+        display_name='Versionada',
+        layer_type=LayerType.VECTOR,
+        created_by=project.owner_id
+    )
+    db.session.add(layer)
+    db.session.commit()
+    return layer
+
+
+def _add_features(db, layer, count):
+    from app.models.enhanced_models import Feature, GeometryType
+
+    features = [
+        Feature(layer_id=layer.id, feature_type=GeometryType.POINT,
+                geometry={'type': 'Point', 'coordinates': [i, i]},
+                properties={'n': i}, created_by=layer.created_by)
+        for i in range(count)
+    ]
+    db.session.add_all(features)
+    db.session.commit()
+    return features
+
+
+def _version(db, layer, name):
+    version = layer.create_version(name, '', layer.creator)
+    db.session.add(version)
+    db.session.commit()
+    return version
+
+
+def _state(db, layer):
+    from app.models.enhanced_models import Feature
+    return {f.id: f.to_dict() for f in Feature.query.filter_by(layer_id=layer.id, is_current=True)}
+
+
+def test_delta_versions_store_only_changes(layer):
+    from app import db
+
+    features = _add_features(db, layer, 20)
+    v1 = _version(db, layer, 'v1')
+    assert v1.changes.count() == 20
+    state_v1 = _state(db, layer)
+
+    features[0].properties = {'n': 'alterada'}
+    db.session.delete(features[1])
+    new = _add_features(db, layer, 1)[0]
+    v2 = _version(db, layer, 'v2')
+
+    assert v2.parent_version_id == v1.id
+    assert {c.feature_id: c.change_type for c in v2.changes} == {
+        features[0].id: 'upsert', features[1].id: 'delete', new.id: 'upsert'
+    }
+    state_v2 = _state(db, layer)
+
+    v3 = _version(db, layer, 'v3')
+    assert v3.changes.count() == 0
+
+    assert {f['id']: f for f in v1.materialize()['features']} == state_v1
+    assert {f['id']: f for f in v2.materialize()['features']} == state_v2
+    assert {f['id']: f for f in v3.materialize()['features']} == state_v2
+    assert 'features' not in v2.layer_config
+
+
+def test_feature_changed_while_version_is_built_stays_dirty(layer, monkeypatch):
+    from app import db
+    from app.models import enhanced_models
+    from app.models.enhanced_models import LayerDirtyFeature
+    from app.services.layer_versioning import mark_features_dirty
+
+    features = _add_features(db, layer, 3)
+    _version(db, layer, 'v1')
+    features[0].properties = {'n': 'primeira'}
+    db.session.commit()
+
+    # Outra escrita marca a feature de novo entre a leitura das pendências e a limpeza
+    original = enhanced_models.clear_dirty_features
+
+    def concurrent_edit(session, layer_id, marks):
+        mark_features_dirty(session.connection(), [(layer_id, features[0].id)])
+        original(session, layer_id, marks)
+
+    monkeypatch.setattr(enhanced_models, 'clear_dirty_features', concurrent_edit)
+    v2 = _version(db, layer, 'v2')
+    monkeypatch.undo()
+
+    assert [c.feature_id for c in v2.changes] == [features[0].id]
+    assert [row.feature_id for row in LayerDirtyFeature.query.filter_by(layer_id=layer.id)] == [features[0].id]
+    assert [c.feature_id for c in _version(db, layer, 'v3').changes] == [features[0].id]
+    assert LayerDirtyFeature.query.filter_by(layer_id=layer.id).count() == 0
+
+
+def test_legacy_snapshot_parent_is_used_as_base(layer):
+    from app import db
+    from app.models.enhanced_models import LayerVersion
+
+    features = _add_features(db, layer, 5)
+    snapshot = LayerVersion(
+        layer_id=layer.id, version_number=1, created_by=layer.created_by,
+        layer_config={'layer_data': layer.to_dict(), 'features': list(_state(db, layer).values())}
+    )
+    db.session.add(snapshot)
+    db.session.commit()
+
+    features[2].properties = {'n': 'nova'}
+    db.session.commit()
+    delta = _version(db, layer, 'v2')
+
+    assert delta.storage_type == 'delta' and delta.parent_version_id == snapshot.id
+    assert [c.feature_id for c in delta.changes] == [features[2].id]
+    assert {f['id']: f for f in delta.materialize()['features']} == _state(db, layer)
+
+
+def test_diff_endpoint_reports_feature_changes(api_client, layer):
+    from app import db
+
+    features = _add_features(db, layer, 4)
+    v1 = _version(db, layer, 'v1')
+
+    features[0].properties = {'n': 0, 'nome': 'Lote A'}
+    features[1].geometry = {'type': 'Point', 'coordinates': [9, 9]}
+    db.session.delete(features[2])
+    new = _add_features(db, layer, 1)[0]
+    v2 = _version(db, layer, 'v2')
+
+    payload = api_client.get(f'/api/v2/layers/{layer.id}/versions/{v1.id}/diff/{v2.id}').get_json()
+    assert payload['added'] == [new.id]
+    assert payload['removed'] == [features[2].id]
+    modified = {item['id']: item for item in payload['modified']}
+    assert set(modified) == {features[0].id, features[1].id}
+    assert modified[features[0].id]['properties']['added'] == {'nome': 'Lote A'}
+    assert not modified[features[0].id]['geometry_changed']
+    assert modified[features[1].id]['geometry_changed']
+
+    reverse = api_client.get(f'/api/v2/layers/{layer.id}/versions/{v2.id}/diff/{v1.id}').get_json()
+    assert reverse['added'] == [features[2].id] and reverse['removed'] == [new.id]
+
+
+def test_rollback_endpoint_restores_version_state(api_client, layer):
+    from app import db
+
+    features = _add_features(db, layer, 3)
+    v1 = _version(db, layer, 'v1')
+    state_v1 = _state(db, layer)
+
+    features[0].properties = {'n': 'alterada'}
+    db.session.delete(features[1])
+    _add_features(db, layer, 2)
+    _version(db, layer, 'v2')
+    features[2].geometry = {'type': 'Point', 'coordinates': [7, 7]}  # alteração pendente
+    db.session.commit()
+
+    response = api_client.post(f'/api/v2/layers/{layer.id}/versions/{v1.id}/rollback', json={})
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['restored'] == [features[1].id]
+    assert sorted(payload['reverted']) == sorted([features[0].id, features[2].id])
+    assert len(payload['removed']) == 2
+
+    db.session.expire_all()
+    assert _state(db, layer).keys() == state_v1.keys()
+    for fid, data in _state(db, layer).items():
+        assert {k: data[k] for k in ('geometry', 'properties')} == \
+            {k: state_v1[fid][k] for k in ('geometry', 'properties')}
+    assert layer.feature_count == 3
+    assert payload['version']['version_number'] == 3
+
+
+def test_large_configs_go_to_blob_store_and_list_is_metadata_only(api_client, layer, count_queries):
+    from app import db
+    from app.models.enhanced_models import LayerVersion, LayerVersionBlob
+
+    features = _add_features(db, layer, 300)
+    config = {'layer_data': layer.to_dict(), 'features': list(_state(db, layer).values())}
+    for number in (1, 2):
+        db.session.add(LayerVersion(layer_id=layer.id, version_number=number,
+                                    created_by=layer.created_by, layer_config=config))
+    db.session.commit()
+
+    # Conteúdo idêntico: um único blob, referenciado pelas duas versões
+    assert LayerVersionBlob.query.count() == 1
+    snapshot = LayerVersion.query.filter_by(layer_id=layer.id, version_number=2).first()
+    assert snapshot.config_hash and snapshot.layer_config == {}
+
+    features[0].properties = {'n': 'alterada'}
+    db.session.commit()
+    delta = _version(db, layer, 'v3')
+    assert [c.feature_id for c in delta.changes] == [features[0].id]
+
+    db.session.expire_all()
+    with count_queries(db.engine) as statements:
+        listing = api_client.get(f'/api/v2/layers/{layer.id}/versions').get_json()
+    assert listing['total'] == 3
+    assert all('layer_config' not in v for v in listing['versions'])
+    assert not any('layer_version_blobs' in s or 'layer_versions.layer_config' in s for s in statements)
+
+    opened = api_client.get(f'/api/v2/layers/{layer.id}/versions/{snapshot.id}').get_json()
+    assert len(opened['layer_config']['features']) == 300
+    opened = api_client.get(f'/api/v2/layers/{layer.id}/versions/{delta.id}').get_json()
+    assert {f['id']: f for f in opened['layer_config']['features']} == _state(db, layer)
+
+
+def test_externalize_existing_inline_configs(layer):
+    from app import db
+    from app.models.enhanced_models import LayerVersion
+    from app.services.version_blobs import externalize_version_configs
+
+    _add_features(db, layer, 50)
+    config = {'layer_data': layer.to_dict(), 'features': list(_state(db, layer).values())}
+    db.session.add(LayerVersion(layer_id=layer.id, version_number=1, created_by=layer.created_by,
+                                layer_config=config, config_hash='x'))  # força gravação inline
+    db.session.commit()
+    db.session.execute(db.text("UPDATE layer_versions SET config_hash = NULL"))
+
+    moved, freed = externalize_version_configs(db.session.connection(), threshold=1024)
+    db.session.commit()
+    assert moved == 1 and freed > 0
+
+    version = LayerVersion.query.first()
+    assert version.layer_config == {} and version.get_config() == config
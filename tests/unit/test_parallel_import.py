@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da importação paralela de KML (pool de leitura + escritor único)
+"""
+import json
+import os
+
+import pytest
+
+
+PLACEMARK = b'<Placemark><name>p</name><Point><coordinates>1,2</coordinates></Point></Placemark>'
+
+
+def _kml(path, count):
+    with open(path, 'wb') as target:
+        target.write(b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>' +
+                     PLACEMARK * count + b'</Document></kml>')
+    return str(path)
+
+
+def test_files_imported_by_single_writer(tmp_path):
+    from app.services.parallel_import import run_parallel_import, summarize
+
+    files = [(_kml(tmp_path / 'a.kml', 250), 'A'), (_kml(tmp_path / 'b.kml', 40), 'B')]
+    broken = tmp_path / 'quebrado.kml'
+    broken.write_bytes(b'<kml><Placemark>')
+    files.append((str(broken), 'C'))
+    # Falha depois de dois lotes gravados: as linhas do arquivo são descartadas
+    truncated = tmp_path / 'truncado.kml'
+    truncated.write_bytes(b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>' + PLACEMARK * 250)
+    files.append((str(truncated), 'D'))
+
+    rows, commits, progress, discarded = [], [], [], []
+
+    def discard(path, layer):
+        discarded.append((os.path.basename(path), layer))
+        rows[:] = [row for row in rows if row[0] != layer]
+
+    results = run_parallel_import(
+        files, rows.extend, lambda: commits.append(len(rows)), discard, workers=2,
+        batch_size=100, transaction_size=200,
+        progress=lambda path, stats: progress.append((os.path.basename(path), stats['features']))
+    )
+
+    assert len(rows) == 290
+    layer, kind, geometry, properties = next(row for row in rows if row[0] == 'A')
+    assert kind == 'Point' and json.loads(geometry) == {'type': 'Point', 'coordinates': [1, 2]}
+    assert json.loads(properties) == {'name': 'p', 'imported_from': 'A'}
+
+    # Commit ao passar de transaction_size e um último ao final
+    assert commits[-1] == 290 and len(commits) >= 2
+    assert ('a.kml', 100) in progress and ('a.kml', 250) in progress
+
+    a, b, c, d = (results[path] for path, _ in files)
+    assert (a['features'], a['layer'], a['error']) == (250, 'A', None)
+    assert b['features'] == 40 and b['features_per_second'] > 0
+    assert c['features'] == 0 and c['error'] and c['discarded'] == 0
+    assert (d['features'], d['discarded']) == (0, 200) and d['error']
+    assert discarded == [('truncado.kml', 'D')]
+
+    summary = summarize(results, 2.0)
+    assert summary == {'files': 4, 'failed': 2, 'features': 290, 'seconds': 2.0, 'features_per_second': 145.0}
+
+
+def test_writer_error_stops_import(tmp_path):
+    from app.services.parallel_import import run_parallel_import
+
+    files = [(_kml(tmp_path / f'{name}.kml', 500), name) for name in 'abc']
+
+    def write_batch(rows):
+        raise RuntimeError('disco cheio')
+
+    # Workers presos na fila cheia não podem travar o encerramento
+    with pytest.raises(RuntimeError):
+        run_parallel_import(files, write_batch, lambda: None, lambda path, layer: None, workers=3, batch_size=10)
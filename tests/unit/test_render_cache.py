@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do cache de páginas pré-renderizadas
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def shell_app(tmp_path):
+    from flask import Flask
+    from app.services.render_cache import init_render_cache, render_shell
+
+    (tmp_path / 'page.html').write_text(
+        "<html lang=\"{{ page_locale }}\"><body>{{ user_slot|default('')|safe }}"
+        "<p>{{ page_role }}</p><p>{{ renders() }}</p></body></html>"
+    )
+    app = Flask(__name__, template_folder=str(tmp_path))
+    app.config['SUPPORTED_LOCALES'] = ['pt-BR', 'en']
+    init_render_cache(app)
+
+    counter = {'renders': 0}
+
+    def renders():
+        counter['renders'] += 1
+        return counter['renders']
+
+    app.jinja_env.globals['renders'] = renders
+    users = {
+        'ana': SimpleNamespace(id='1', username='ana', name='Ana </script>', role='admin',
+                               privileges={'canEditLayers': True, 'canDelete': False}),
+        'rui': SimpleNamespace(id='2', username='rui', name='Rui', role='user', privileges=['canEditLayers'])
+    }
+
+    @app.route('/page/<username>')
+    def page(username):
+        return render_shell('page.html', users[username])
+
+    app.counter = counter
+    return app
+
+
+def _user_data(html):
+    start = html.index('<script id="webag-user" type="application/json">') + len(
+        '<script id="webag-user" type="application/json">')
+    return json.loads(html[start:html.index('</script>', start)])
+
+
+def test_shell_rendered_once_per_role(shell_app):
+    client = shell_app.test_client()
+
+    first = client.get('/page/ana').get_data(as_text=True)
+    again = client.get('/page/ana').get_data(as_text=True)
+    assert first == again
+    assert shell_app.counter['renders'] == 1
+    assert '<p>admin</p>' in first and 'lang="pt-BR"' in first
+
+    other = client.get('/page/rui').get_data(as_text=True)
+    assert '<p>user</p>' in other
+    english = client.get('/page/rui', headers={'Accept-Language': 'en-US,en;q=0.9'}).get_data(as_text=True)
+    assert 'lang="en"' in english
+    assert shell_app.counter['renders'] == 3
+    assert shell_app.extensions['render_cache'].stats() == {'entries': 3, 'hits': 1, 'misses': 3}
+
+
+def test_user_data_injected_and_escaped(shell_app):
+    html = shell_app.test_client().get('/page/ana').get_data(as_text=True)
+
+    assert html.count('</script>') == 1
+    assert _user_data(html) == {
+        'id': '1', 'username': 'ana', 'name': 'Ana </script>', 'role': 'admin',
+        'privileges': ['canEditLayers']
+    }
+
+
+def test_etag_and_not_modified(shell_app):
+    client = shell_app.test_client()
+
+    response = client.get('/page/ana')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = client.get('/page/ana', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    # Mesmo esqueleto, outro usuário: ETag diferente
+    assert client.get('/page/rui').headers['ETag'] != etag
+
+
+def test_debug_renders_every_request(shell_app):
+    shell_app.debug = True
+    client = shell_app.test_client()
+
+    client.get('/page/ana')
+    client.get('/page/ana')
+    assert shell_app.counter['renders'] == 2
+    assert shell_app.extensions['render_cache'].stats()['entries'] == 0
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do cache em níveis (LRU local + SQLite compartilhado)
+"""
+import time
+
+import pytest
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'cache.db')
+
+
+def _worker(cache_path, **kwargs):
+    """Um 'worker': nível local próprio, mesmo arquivo compartilhado"""
+    from app.services.shared_cache import SQLiteTier, TieredCache
+
+    kwargs.setdefault('sync_interval', 0)
+    return TieredCache(SQLiteTier(cache_path), **kwargs)
+
+
+def test_value_shared_between_workers(cache_path):
+    first, second = _worker(cache_path), _worker(cache_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'total': 3, 'items': ['a', 'b']}
+
+    assert first.get_or_set('k', compute) == {'total': 3, 'items': ['a', 'b']}
+    assert second.get_or_set('k', compute) == {'total': 3, 'items': ['a', 'b']}
+    assert second.get('k') == {'total': 3, 'items': ['a', 'b']}
+    assert len(calls) == 1
+
+    stats = second.stats()
+    assert (stats['shared_hits'], stats['local_hits'], stats['misses']) == (1, 1, 0)
+    assert stats['hit_ratio'] == 1.0 and stats['backend'] == 'SQLiteTier'
+
+
+def test_ttl_expires_in_both_tiers(cache_path):
+    cache = _worker(cache_path)
+    cache.set('k', 1, ttl=0.05)
+    assert cache.get('k') == 1
+    time.sleep(0.1)
+    assert cache.get('k', 'ausente') == 'ausente'
+    assert cache.shared.purge_expired() == 1
+
+
+def test_tag_invalidation_reaches_other_workers(cache_path):
+    first, second = _worker(cache_path), _worker(cache_path)
+    first.set('glebas:ana', [1, 2], tags=['glebas:ana'])
+    first.set('glebas:rui', [3], tags=['glebas:rui'])
+    assert second.get('glebas:ana') == [1, 2]
+    assert second.get('glebas:rui') == [3]
+
+    first.invalidate_tags(['glebas:ana'])
+
+    # O nível local do segundo worker é descartado ao notar a nova geração
+    assert second.get('glebas:ana') is None
+    assert second.get('glebas:rui') == [3]
+    # O worker que invalidou mantém o que não foi afetado no nível local
+    assert first.get('glebas:rui') == [3]
+    assert first.stats()['local_hits'] == 1
+
+
+def test_local_tier_is_bounded_lru():
+    from app.services.shared_cache import TieredCache
+
+    cache = TieredCache(local_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['backend'] == 'LocalTier'
+
+
+def test_model_changes_invalidate_tags(enhanced_app):
+    from app import db
+    from app.models.enhanced_models import Project, Layer, LayerType
+    from app.services.shared_cache import TieredCache, register_tag_invalidation
+
+    cache = TieredCache()
+    register_tag_invalidation(Layer, cache, lambda layer: [f'project:{layer.project_id}'])
+    project = Project.query.first()
+    cache.set('layers', ['cached'], tags=[f'project:{project.id}'])
+
+    db.session.add(Layer(project_id=project.id, name='descartada', display_name='Descartada',
+                         layer_type=LayerType.VECTOR, created_by=project.owner_id))
+    db.session.flush()
+    # Antes do commit outras requisições ainda leem as linhas antigas
+    assert cache.get('layers') == ['cached']
+    db.session.rollback()
+    db.session.commit()
+    assert cache.get('layers') == ['cached']
+
+    db.session.add(Layer(project_id=project.id, name='nova', display_name='Nova',
+                         layer_type=LayerType.VECTOR, created_by=project.owner_id))
+    db.session.flush()
+    assert cache.get('layers') == ['cached']
+    db.session.commit()
+
+    assert cache.get('layers') is None
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das bibliotecas de terceiros servidas localmente
+"""
+import json
+
+import pytest
+
+LIB_JS = b'window.Lib = {version: "1.0.0"};\n'
+LIB_CSS = b'.lib-icon{background:url(images/icon.png)}\n'
+ICON = b'\x89PNG fake'
+
+REMOTE = {
+    'https://cdn.test/lib@1.0.0/lib.js': LIB_JS,
+    'https://cdn.test/lib@1.0.0/lib.css': LIB_CSS,
+    'https://cdn.test/lib@1.0.0/images/icon.png': ICON
+}
+
+
+def _packages(integrity=None):
+    from app.assets.vendor import sri_hash
+
+    return {
+        'lib': {
+            'version': '1.0.0',
+            'base_url': 'https://cdn.test/lib@{version}/',
+            'files': ['lib.js', 'lib.css', 'images/icon.png'],
+            'integrity': {'lib.js': integrity or sri_hash(LIB_JS, 'sha256')}
+        }
+    }
+
+
+@pytest.fixture
+def paths(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    return {'static': static, 'lock': tmp_path / 'vendor.lock.json', 'cache': tmp_path / 'cache'}
+
+
+def _vendor(paths, downloads=None, **kwargs):
+    from app.assets.vendor import vendor_packages
+
+    def download(url):
+        if downloads is not None:
+            downloads.append(url)
+        return REMOTE[url]
+
+    kwargs.setdefault('packages', _packages())
+    return vendor_packages(str(paths['static']), str(paths['lock']), str(paths['cache']),
+                           download=download, **kwargs)
+
+
+def test_vendor_requires_lock_then_uses_cache(paths):
+    from app.assets.vendor import VendorError, sri_hash
+
+    with pytest.raises(VendorError, match='update-lock'):
+        _vendor(paths)
+    assert not (paths['static'] / 'vendor' / 'lib').exists()
+
+    downloads = []
+    assert _vendor(paths, downloads, update_lock=True) == {'lib': 3}
+    assert len(downloads) == 3
+    lock = json.loads(paths['lock'].read_text())
+    assert lock['lib']['version'] == '1.0.0'
+    assert lock['lib']['files']['lib.css'] == {
+        'url': 'https://cdn.test/lib@1.0.0/lib.css', 'integrity': sri_hash(LIB_CSS)
+    }
+    assert (paths['static'] / 'vendor' / 'lib' / 'images' / 'icon.png').read_bytes() == ICON
+
+    # Builds seguintes: somente cache local e verificação contra o lock
+    downloads.clear()
+    assert _vendor(paths, downloads, offline=True) == {'lib': 3}
+    assert downloads == []
+
+
+def test_vendor_rejects_tampered_files(paths):
+    from app.assets.vendor import VendorError
+
+    _vendor(paths, update_lock=True)
+    (paths['cache'] / 'lib@1.0.0' / 'lib.css').write_bytes(b'.lib-icon{}')
+    with pytest.raises(VendorError, match='lock'):
+        _vendor(paths, offline=True)
+
+    with pytest.raises(VendorError, match='SRI'):
+        _vendor(paths, offline=True, packages=_packages('sha256-AAAA'))
+
+
+def test_vendor_package_is_fingerprinted_as_a_directory(paths):
+    from flask import Flask, render_template_string
+    from app.assets.manifest import build_manifest, init_assets
+    from app.assets.vendor import init_vendor
+
+    app = Flask(__name__, static_folder=None)
+    app.add_url_rule('/static/<path:filename>', 'static_files', lambda filename: '')
+    assets = init_assets(app, str(paths['static']))
+    init_vendor(app, assets, _packages())
+    template = "{{ vendor_url('lib', 'lib.css') }}"
+
+    # Sem cópia local: URL fixada na CDN
+    with app.test_request_context():
+        assert render_template_string(template) == 'https://cdn.test/lib@1.0.0/lib.css'
+
+    _vendor(paths, update_lock=True)
+    manifest = build_manifest(str(paths['static']))
+    assets.reload()
+
+    css = manifest['vendor/lib/lib.css']
+    icon = manifest['vendor/lib/images/icon.png']
+    assert css.startswith('dist/vendor/lib.') and css.endswith('/lib.css')
+    # Mesmo diretório com hash: url(images/icon.png) do CSS continua válida
+    assert icon == css.rsplit('/', 1)[0] + '/images/icon.png'
+    assert (paths['static'] / icon).read_bytes() == ICON
+
+    with app.test_request_context():
+        assert render_template_string(template) == '/static/' + css